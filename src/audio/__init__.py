@@ -0,0 +1,17 @@
+# coding=utf-8
+"""音声データ処理モジュール（セグメント結合・PCM 変換・Discord 用フレーム化等）。"""
+
+from src.audio.discord_pcm import FRAME_BYTES, DiscordPCMEncoder, to_discord_frames
+from src.audio.join import join_segments, trim_silence
+from src.audio.pcm import float_to_pcm16, float_to_wav_bytes, wav_bytes_to_float
+
+__all__ = [
+    "FRAME_BYTES",
+    "DiscordPCMEncoder",
+    "float_to_pcm16",
+    "float_to_wav_bytes",
+    "join_segments",
+    "to_discord_frames",
+    "trim_silence",
+    "wav_bytes_to_float",
+]
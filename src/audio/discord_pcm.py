@@ -0,0 +1,230 @@
+# coding=utf-8
+"""
+Discord の音声送信用 PCM（48 kHz・ステレオ・s16le・20 ms フレーム）への変換。
+
+discord.py の AudioSource.read() は 1 回に 20 ms 分（960 サンプル × 2 チャンネル × 2 バイト = 3840 バイト）の
+PCM を返す必要がある。モデル出力（24 kHz・モノラル・float32）からの変換を、
+キャッシュしたポリフェーズ FIR でのリサンプル → スケーリング・クリップ（その場で計算）→
+事前確保した int16 のインターリーブバッファへの書き込みの 1 パスで行う。
+
+使い方:
+    encoder = DiscordPCMEncoder(sample_rate)
+    for frame in encoder.frames(wav):   # 3840 バイトずつ
+        ...
+"""
+
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DISCORD_SAMPLE_RATE = 48000
+DISCORD_CHANNELS = 2
+FRAME_MS = 20
+FRAME_SAMPLES = DISCORD_SAMPLE_RATE * FRAME_MS // 1000
+FRAME_BYTES = FRAME_SAMPLES * DISCORD_CHANNELS * 2
+
+# リサンプルの FIR（片側の零交差数。大きいほど急峻で遅い）
+_ZERO_CROSSINGS = 8
+_KAISER_BETA = 8.0
+
+
+class PolyphaseResampler:
+    """整数比 up / down のポリフェーズ FIR リサンプラ（カイザー窓の sinc ローパス）。"""
+
+    def __init__(self, source_rate: int, target_rate: int) -> None:
+        """
+        Args:
+            source_rate: 入力のサンプリングレート
+            target_rate: 出力のサンプリングレート
+
+        Raises:
+            ValueError: サンプリングレートが正でない場合
+        """
+        if source_rate <= 0 or target_rate <= 0:
+            raise ValueError("サンプリングレートは正の整数を指定してください。")
+        g = math.gcd(source_rate, target_rate)
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.up = target_rate // g
+        self.down = source_rate // g
+        factor = max(self.up, self.down)
+        # アップサンプル後のレートで設計し、位相ごとの係数（K 本）に分ける
+        length = 2 * _ZERO_CROSSINGS * factor + 1
+        t = (np.arange(length) - (length - 1) / 2) / factor
+        h = np.sinc(t) * np.kaiser(length, _KAISER_BETA) * (self.up / factor)
+        self.taps = -(-length // self.up)
+        h = np.pad(h, (0, self.taps * self.up - length))
+        # bank[p, j] は入力 x[base - (K-1) + j] に掛かる係数（窓と内積を取れるよう逆順に並べる）
+        self._bank = np.ascontiguousarray(h.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+        self._delay = (length - 1) // 2
+
+    def output_length(self, n: int) -> int:
+        """入力 n サンプルに対する出力のサンプル数。"""
+        return -(-n * self.up // self.down)
+
+    def resample(self, x: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        1 次元 float32 の音声をリサンプルする。
+
+        Args:
+            x: 入力（float32, 1 次元）
+            out: 書き込み先（長さ output_length(len(x)) 以上の float32。None なら新しく確保）
+
+        Returns:
+            出力（out を渡した場合はその先頭のビュー）
+        """
+        n_out = self.output_length(len(x))
+        if out is None:
+            out = np.empty(n_out, dtype=np.float32)
+        out = out[:n_out]
+        if self.up == self.down:
+            np.copyto(out, x)
+            return out
+        k = self.taps
+        # 出力 n の位相と入力位置: m = n*down + delay, 位相 m % up, 基準 m // up
+        padded = np.zeros(len(x) + 2 * k, dtype=np.float32)
+        padded[k - 1:k - 1 + len(x)] = x
+        windows = sliding_window_view(padded, k)
+        inv_down = pow(self.down, -1, self.up) if self.up > 1 else 0
+        for p in range(self.up):
+            # 位相 p になる最初の出力（n*down + delay ≡ p mod up）
+            n0 = ((p - self._delay) * inv_down) % self.up
+            if n0 >= n_out:
+                continue
+            base0 = (n0 * self.down + self._delay) // self.up
+            count = len(range(n0, n_out, self.up))
+            np.einsum(
+                "ij,j->i",
+                windows[base0:base0 + count * self.down:self.down],
+                self._bank[p],
+                out=out[n0::self.up],
+            )
+        return out
+
+
+@lru_cache(maxsize=16)
+def get_resampler(source_rate: int, target_rate: int = DISCORD_SAMPLE_RATE) -> PolyphaseResampler:
+    """source_rate → target_rate のリサンプラ（フィルタ設計はレートの組ごとに 1 回）。"""
+    return PolyphaseResampler(source_rate, target_rate)
+
+
+class DiscordPCMEncoder:
+    """
+    モデル出力を 48 kHz・ステレオ・s16le の 20 ms フレームに変換する。
+
+    作業用バッファはエンコーダが持ち、必要な長さに伸ばしながら使い回す。
+    1 つのエンコーダは同時に 1 本の音声だけを扱う（スレッドセーフではない）。
+    """
+
+    def __init__(self, source_rate: int, *, volume: float = 1.0) -> None:
+        """
+        Args:
+            source_rate: モデル出力のサンプリングレート
+            volume: 音量の倍率（1.0 でそのまま）
+
+        Raises:
+            ValueError: source_rate が正でない、または volume が負の場合
+        """
+        if volume < 0:
+            raise ValueError("volume は 0 以上を指定してください。")
+        self._resampler = get_resampler(source_rate)
+        self._scale = np.float32(32767.0 * volume)
+        self._float_buf = np.empty(0, dtype=np.float32)
+        self._pcm_buf = np.empty((0, DISCORD_CHANNELS), dtype=np.int16)
+        # encode のたびに増やす（frames の途中でバッファが上書きされたことの検出用）
+        self._generation = 0
+
+    @property
+    def source_rate(self) -> int:
+        """入力のサンプリングレート。"""
+        return self._resampler.source_rate
+
+    def _reserve(self, n: int) -> None:
+        """作業用バッファを n サンプル以上にする（足りなければ 1.5 倍以上に伸ばす）。"""
+        if len(self._float_buf) < n:
+            size = max(n, int(len(self._float_buf) * 1.5))
+            self._float_buf = np.empty(size, dtype=np.float32)
+            self._pcm_buf = np.empty((size, DISCORD_CHANNELS), dtype=np.int16)
+
+    def encode(self, wav: np.ndarray, pad_to_frame: bool = True) -> memoryview:
+        """
+        音声全体を 48 kHz・ステレオ・s16le に変換する。
+
+        Args:
+            wav: モデル出力（float, -1.0～1.0。2 次元の場合は最後の軸をチャンネルとして平均する）
+            pad_to_frame: 末尾を無音で埋めてフレーム長（3840 バイト）の倍数にする
+
+        Returns:
+            変換結果のバイト列のビュー（次に encode を呼ぶまで有効）
+        """
+        x = np.asarray(wav, dtype=np.float32)
+        if x.ndim > 1:
+            x = x.mean(axis=-1, dtype=np.float32)
+        n = self._resampler.output_length(len(x))
+        total = -(-n // FRAME_SAMPLES) * FRAME_SAMPLES if pad_to_frame else n
+        self._reserve(total)
+        self._generation += 1
+
+        y = self._resampler.resample(x, out=self._float_buf)
+        np.multiply(y, self._scale, out=y)
+        np.clip(y, -32768.0, 32767.0, out=y)
+        np.rint(y, out=y)
+        pcm = self._pcm_buf[:total]
+        # 両チャンネルに同じ値を書き込む（インターリーブ済みの int16 バッファ）
+        np.copyto(pcm[:n], y[:, None], casting="unsafe")
+        pcm[n:] = 0
+        return memoryview(pcm).cast("B")
+
+    def frames(self, wav: np.ndarray) -> Iterator[bytes]:
+        """
+        音声を 3840 バイト（20 ms）ずつの bytes で返す（最後のフレームは無音で埋める）。
+
+        Raises:
+            RuntimeError: 途中で同じエンコーダの encode / frames が呼ばれてバッファが上書きされた場合
+        """
+        data = self.encode(wav)
+        generation = self._generation
+        for offset in range(0, len(data), FRAME_BYTES):
+            if generation != self._generation:
+                raise RuntimeError("フレームの読み出し中に同じエンコーダで別の音声が変換されました。")
+            yield data[offset:offset + FRAME_BYTES].tobytes()
+
+    def stream_frames(self, chunks: Iterable[Tuple[np.ndarray, int]]) -> Iterator[bytes]:
+        """
+        synthesize_stream の (chunk, sample_rate) を順に変換してフレームで返す。
+
+        チャンク末尾の 20 ms に満たない端数は次のチャンクの先頭とつなげ、最後だけ無音で埋める。
+
+        Raises:
+            ValueError: チャンクのサンプリングレートが source_rate と異なる場合
+        """
+        carry = b""
+        for chunk, sample_rate in chunks:
+            if sample_rate != self.source_rate:
+                raise ValueError(
+                    f"サンプリングレートが異なります（{sample_rate} Hz、エンコーダは {self.source_rate} Hz）。"
+                )
+            data = self.encode(chunk, pad_to_frame=False)
+            start = 0
+            if carry:
+                start = FRAME_BYTES - len(carry)
+                if len(data) < start:
+                    carry += data.tobytes()
+                    continue
+                yield carry + data[:start].tobytes()
+            end = start + (len(data) - start) // FRAME_BYTES * FRAME_BYTES
+            for offset in range(start, end, FRAME_BYTES):
+                yield data[offset:offset + FRAME_BYTES].tobytes()
+            carry = data[end:].tobytes()
+        if carry:
+            yield carry + bytes(FRAME_BYTES - len(carry))
+
+
+def to_discord_frames(wav: np.ndarray, sample_rate: int) -> Iterator[bytes]:
+    """モデル出力を 3840 バイトの Discord 用 PCM フレームで返す（DiscordPCMEncoder を都度作る簡易版）。"""
+    return DiscordPCMEncoder(sample_rate).frames(wav)
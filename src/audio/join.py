@@ -0,0 +1,83 @@
+# coding=utf-8
+"""
+セグメント単位で生成した音声の結合。
+
+各セグメントの前後の無音を取り除き、一定長の無音（gap_ms）を挟んで結合する。
+境界にはクロスフェード（crossfade_ms のフェードアウト/フェードイン）をかけ、
+gap_ms=0 の場合はセグメントどうしを crossfade_ms だけ重ねて加算する。
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+
+def trim_silence(wav: np.ndarray, threshold: float = 1e-3, pad: int = 0) -> np.ndarray:
+    """
+    前後の無音（絶対値が threshold 以下のサンプル）を取り除く。
+
+    Args:
+        wav: 1 次元の音声配列
+        threshold: 無音とみなす振幅
+        pad: 残す余白のサンプル数
+
+    Returns:
+        トリム後の配列（ビュー）。全体が無音なら長さ 0
+    """
+    voiced = np.flatnonzero(np.abs(wav) > threshold)
+    if voiced.size == 0:
+        return wav[:0]
+    start = max(0, int(voiced[0]) - pad)
+    end = min(len(wav), int(voiced[-1]) + 1 + pad)
+    return wav[start:end]
+
+
+def join_segments(
+    wavs: Sequence[np.ndarray],
+    sample_rate: int,
+    gap_ms: float = 120.0,
+    crossfade_ms: float = 10.0,
+    silence_threshold: float = 1e-3,
+) -> np.ndarray:
+    """
+    セグメントの音声を正規化した間隔とクロスフェードで結合する。
+
+    Args:
+        wavs: セグメントごとの音声（float32, 1 次元）
+        sample_rate: サンプリングレート
+        gap_ms: セグメント間に挟む無音の長さ（ミリ秒）
+        crossfade_ms: 境界のクロスフェード長（ミリ秒）
+        silence_threshold: 前後の無音を判定する振幅
+
+    Returns:
+        結合した float32 の音声配列
+    """
+    fade = int(sample_rate * crossfade_ms / 1000)
+    gap = int(sample_rate * gap_ms / 1000)
+    pad = fade  # フェード分の余白は残す
+    parts = [trim_silence(np.asarray(w, dtype=np.float32), silence_threshold, pad) for w in wavs]
+    parts = [p for p in parts if p.size]
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    if len(parts) == 1:
+        return parts[0].copy()
+
+    overlap = fade if gap == 0 else 0
+    total = sum(len(p) for p in parts) + gap * (len(parts) - 1) - overlap * (len(parts) - 1)
+    out = np.zeros(total, dtype=np.float32)
+    ramp_in = np.linspace(0.0, 1.0, fade, dtype=np.float32) if fade else None
+
+    pos = 0
+    for i, part in enumerate(parts):
+        seg = part.copy()
+        n = min(fade, len(seg))
+        if ramp_in is not None and n:
+            if i > 0:
+                seg[:n] *= ramp_in[:n]
+            if i < len(parts) - 1:
+                seg[-n:] *= ramp_in[:n][::-1]
+        out[pos:pos + len(seg)] += seg
+        pos += len(seg) + gap - overlap
+    return out
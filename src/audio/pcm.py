@@ -0,0 +1,75 @@
+# coding=utf-8
+"""
+PCM 変換。
+
+Qwen3TTSWrapper が返す float32（-1.0～1.0）の音声を、プレイヤーやパイプに渡せる
+符号付き 16bit リトルエンディアン（s16le）のバイト列に変換する。
+WAV（16bit PCM, モノラル）のバイト列との相互変換は標準ライブラリの wave で行う。
+"""
+
+from __future__ import annotations
+
+import io
+import wave
+from typing import Tuple
+
+import numpy as np
+
+
+def float_to_pcm16(wav: np.ndarray) -> bytes:
+    """
+    float 音声（-1.0～1.0）を s16le のバイト列に変換する（範囲外はクリップ）。
+
+    Args:
+        wav: 1 次元の音声配列
+
+    Returns:
+        s16le のバイト列（サンプル数 × 2 バイト）
+    """
+    scaled = np.clip(np.asarray(wav, dtype=np.float32), -1.0, 1.0) * 32767.0
+    return scaled.astype("<i2").tobytes()
+
+
+def float_to_wav_bytes(wav: np.ndarray, sample_rate: int) -> bytes:
+    """
+    float 音声（-1.0～1.0）を 16bit PCM・モノラルの WAV ファイルのバイト列に変換する。
+
+    Args:
+        wav: 1 次元の音声配列
+        sample_rate: サンプリングレート
+
+    Returns:
+        WAV ファイルのバイト列
+    """
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(int(sample_rate))
+        w.writeframes(float_to_pcm16(wav))
+    return buf.getvalue()
+
+
+def wav_bytes_to_float(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    16bit PCM の WAV ファイルのバイト列を float32（-1.0～1.0）のモノラル音声に変換する。
+
+    Returns:
+        (wav_array, sample_rate)
+
+    Raises:
+        ValueError: 16bit PCM の WAV でない場合
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError(f"16bit PCM の WAV のみ対応しています（{w.getsampwidth() * 8}bit）。")
+            channels = w.getnchannels()
+            sample_rate = w.getframerate()
+            frames = w.readframes(w.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"WAV を読み込めません: {e}") from e
+    pcm = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767.0
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    return pcm, sample_rate
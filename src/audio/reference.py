@@ -0,0 +1,129 @@
+# coding=utf-8
+"""
+参照音声の前処理（デコード → モノラル化 → モデルのレートへのリサンプル → 前後の無音除去 → 音量の正規化）。
+
+metadata.csv の参照音声は MP3・任意のサンプリングレート・ステレオ・前後の無音ありのことが多い。
+プロファイルの登録時に 1 回だけ前処理して正規形（REFERENCE_SAMPLE_RATE の float32 モノラル）にしておけば、
+合成時はデコードもリサンプルも不要になり、無音を除いた分だけプロンプト（参照音声コード）も短くなる。
+正規形の保存と読み込みは src.profile.reference_store.ReferenceStore が行う。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from src.audio.discord_pcm import get_resampler
+from src.audio.join import trim_silence
+
+# Qwen3-TTS の音声トークナイザ・話者エンコーダの入力レート
+REFERENCE_SAMPLE_RATE = 24000
+
+# 前処理の既定値（変えた場合は ReferenceStore の成果物が自動的に作り直される）
+SILENCE_DB = -40.0
+TARGET_DBFS = -20.0
+PEAK_DBFS = -1.0
+PAD_MS = 100.0
+
+_GATE_FRAME_MS = 20.0
+
+
+def decode_audio(path: str | Path) -> Tuple[np.ndarray, int]:
+    """
+    音声ファイルをデコードし、float32 のモノラル音声で返す。
+
+    soundfile（libsndfile。WAV / FLAC / OGG / MP3）で読み、読めない形式は torchaudio で読む。
+
+    Returns:
+        (wav_array, sample_rate)
+
+    Raises:
+        FileNotFoundError: ファイルが存在しない場合
+        ValueError: デコードできない場合
+    """
+    import soundfile as sf
+
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"参照音声ファイルが見つかりません: {path}")
+    try:
+        data, sample_rate = sf.read(str(path), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        import torchaudio
+
+        try:
+            waveform, sample_rate = torchaudio.load(str(path))
+        except Exception as e:
+            raise ValueError(f"参照音声をデコードできません: {path}: {e}") from e
+        # torchaudio は (チャンネル, サンプル) の float32 を返す
+        data = waveform.numpy().T
+    if data.shape[1] == 1:
+        return np.ascontiguousarray(data[:, 0]), int(sample_rate)
+    return data.mean(axis=1, dtype=np.float32), int(sample_rate)
+
+
+def rms_dbfs(wav: np.ndarray, sample_rate: int = REFERENCE_SAMPLE_RATE, silence_db: float = SILENCE_DB) -> float:
+    """
+    有音区間の音量（dBFS）。20 ms ごとの RMS が最大から silence_db 以内のフレームだけで求める。
+
+    全体が無音なら -inf。
+    """
+    frame = min(len(wav), max(1, int(sample_rate * _GATE_FRAME_MS / 1000)))
+    if frame == 0:
+        return float("-inf")
+    n = len(wav) // frame * frame
+    power = np.square(wav[:n], dtype=np.float64).reshape(-1, frame).mean(axis=1)
+    peak = power.max()
+    if peak <= 0:
+        return float("-inf")
+    gated = power[power >= peak * 10 ** (silence_db / 10)]
+    return float(10 * np.log10(gated.mean()))
+
+
+def preprocess_reference(
+    wav: np.ndarray,
+    sample_rate: int,
+    *,
+    target_rate: int = REFERENCE_SAMPLE_RATE,
+    silence_db: float = SILENCE_DB,
+    target_dbfs: float = TARGET_DBFS,
+    peak_dbfs: float = PEAK_DBFS,
+    pad_ms: float = PAD_MS,
+) -> np.ndarray:
+    """
+    参照音声を正規形（target_rate の float32 モノラル、前後の無音なし、音量正規化済み）にする。
+
+    Args:
+        wav: 音声（float, 1 次元。2 次元の場合は最後の軸をチャンネルとして平均する）
+        sample_rate: wav のサンプリングレート
+        target_rate: 出力のサンプリングレート
+        silence_db: 最大振幅からこの dB 以下を無音とみなして前後を除く
+        target_dbfs: 有音区間の RMS の目標（dBFS）
+        peak_dbfs: ピークの上限（dBFS）。目標音量にするとこれを超える場合は上限に合わせる
+        pad_ms: 無音除去で前後に残す余白（ミリ秒）
+
+    Returns:
+        前処理後の音声（新しい float32 配列）
+
+    Raises:
+        ValueError: 音声が空、または全体が無音の場合
+    """
+    x = np.asarray(wav, dtype=np.float32)
+    if x.ndim > 1:
+        x = x.mean(axis=-1, dtype=np.float32)
+    if x.size == 0:
+        raise ValueError("参照音声が空です。")
+
+    y = get_resampler(sample_rate, target_rate).resample(x)
+    peak = float(np.abs(y).max())
+    if peak <= 0:
+        raise ValueError("参照音声が無音です。")
+    y = trim_silence(y, peak * 10 ** (silence_db / 20), pad=int(target_rate * pad_ms / 1000)).copy()
+
+    gain = 10 ** ((target_dbfs - rms_dbfs(y, target_rate, silence_db)) / 20)
+    limit = 10 ** (peak_dbfs / 20)
+    gain = min(gain, limit / float(np.abs(y).max()))
+    np.multiply(y, np.float32(gain), out=y)
+    return y
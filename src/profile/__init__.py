@@ -1,6 +1,8 @@
 # coding=utf-8
 """声プロファイル管理モジュール。"""
 
-from src.profile.voice_profile_manager import VoiceProfileManager
+from src.profile.prompt_store import PromptArtifactStore
+from src.profile.reference_store import ReferenceStore
+from src.profile.voice_profile_manager import VoiceProfile, VoiceProfileManager
 
-__all__ = ["VoiceProfileManager"]
+__all__ = ["PromptArtifactStore", "ReferenceStore", "VoiceProfile", "VoiceProfileManager"]
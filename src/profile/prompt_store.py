@@ -0,0 +1,240 @@
+# coding=utf-8
+"""
+事前計算したボイスクローンプロンプトのディスク保存（models/prompts/<sample_id>.safetensors）。
+
+参照音声のデコードとプロンプト計算（ref_code・話者埋め込み）は起動ごとに同じ結果になるため、
+sample_id ごとに safetensors で保存し、次回以降はメモリマップで読み込む。
+ヘッダのメタデータに参照音声の内容ハッシュ・前処理の設定・corpus_text・モデル情報を持たせ、
+いずれかが変わった成果物は無効として扱う（自動的に再計算される）。
+
+ヘッダの検証は JSON を読むだけなので torch を import せずに行える。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from src.tts.qwen_wrapper import Qwen3TTSWrapper
+
+# 成果物フォーマットのバージョン（保存形式を変えたら上げる）
+PROMPT_FORMAT_VERSION = "1"
+DEFAULT_STORE_DIR = "models/prompts"
+
+
+def _qwen_tts_version() -> str:
+    """qwen-tts パッケージのバージョン（未インストール時は "unknown"）。"""
+    try:
+        return importlib_metadata.version("qwen-tts")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _file_sha256(path: Path) -> str:
+    """ファイル内容の SHA-256。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _check_sample_id(sample_id: str) -> str:
+    """
+    sample_id をファイル名に使えるか確認する（保存ディレクトリの外を指す id を拒否する）。
+
+    Raises:
+        ValueError: 空、パスの区切りや NUL を含む、または "." / ".." の場合
+    """
+    separators = {"/", "\\", "\0", os.sep} | ({os.altsep} if os.altsep else set())
+    if not sample_id or sample_id in (".", "..") or any(sep in sample_id for sep in separators):
+        raise ValueError(f"sample_id にパスの区切り・.. は使えません: {sample_id!r}")
+    return sample_id
+
+
+def _read_safetensors_metadata(path: Path) -> Optional[Dict[str, str]]:
+    """safetensors のヘッダから __metadata__ を読む（テンソル本体は読まない）。壊れていれば None。"""
+    try:
+        with open(path, "rb") as f:
+            header_len = struct.unpack("<Q", f.read(8))[0]
+            if header_len > os.fstat(f.fileno()).st_size - 8:
+                return None
+            header = json.loads(f.read(header_len))
+    except (OSError, struct.error, ValueError):
+        return None
+    meta = header.get("__metadata__")
+    return meta if isinstance(meta, dict) else None
+
+
+class PromptArtifactStore:
+    """sample_id ごとのボイスクローンプロンプト成果物を管理する。"""
+
+    def __init__(self, root: str | Path = DEFAULT_STORE_DIR) -> None:
+        """
+        Args:
+            root: 成果物の保存ディレクトリ（デフォルト: models/prompts）
+        """
+        self._root = Path(root)
+
+    @property
+    def root(self) -> Path:
+        """成果物の保存ディレクトリ。"""
+        return self._root
+
+    def path_for(self, sample_id: str) -> Path:
+        """
+        sample_id の成果物ファイルパス。
+
+        Raises:
+            ValueError: sample_id がパスの区切り・.. を含む場合
+        """
+        return self._root / f"{_check_sample_id(sample_id)}.safetensors"
+
+    def fingerprint(
+        self,
+        audio_path: str | Path,
+        corpus_text: str,
+        model_name: str,
+        dtype: Any,
+        reference: str = "raw",
+    ) -> Dict[str, str]:
+        """
+        成果物の有効性判定に使うフィンガープリントを作る。
+
+        Args:
+            audio_path: 参照音声ファイル（元ファイル）のパス
+            corpus_text: 参照音声の読み上げテキスト
+            model_name: モデル ID
+            dtype: モデルの dtype（文字列化して比較する）
+            reference: 参照音声の前処理（"raw" は元ファイルのまま、前処理した場合は reference_store.reference_id()）
+
+        Returns:
+            文字列値のみの辞書（safetensors のメタデータにそのまま格納できる）
+
+        Raises:
+            FileNotFoundError: audio_path が存在しない場合
+        """
+        path = Path(audio_path)
+        if not path.exists():
+            raise FileNotFoundError(f"参照音声ファイルが見つかりません: {audio_path}")
+        return {
+            "format_version": PROMPT_FORMAT_VERSION,
+            "audio_sha256": _file_sha256(path),
+            "corpus_sha256": hashlib.sha256(corpus_text.strip().encode("utf-8")).hexdigest(),
+            "model_name": model_name,
+            "dtype": str(dtype),
+            "qwen_tts_version": _qwen_tts_version(),
+            "reference": reference,
+        }
+
+    def is_valid(self, sample_id: str, fingerprint: Dict[str, str]) -> bool:
+        """成果物が存在し、フィンガープリントが一致するか（ヘッダのみ読む）。"""
+        meta = _read_safetensors_metadata(self.path_for(sample_id))
+        if meta is None:
+            return False
+        return all(meta.get(k) == v for k, v in fingerprint.items())
+
+    def save(self, sample_id: str, prompt: List[Any], fingerprint: Dict[str, str]) -> Path:
+        """
+        プロンプト（VoiceClonePromptItem のリスト）を保存する。書き込みは一時ファイル経由で原子的に行う。
+
+        Returns:
+            保存先のパス
+        """
+        from safetensors.torch import save_file
+
+        tensors = {}
+        items_meta = []
+        for i, item in enumerate(prompt):
+            if item.ref_code is not None:
+                tensors[f"{i}.ref_code"] = item.ref_code.detach().to("cpu").contiguous()
+            tensors[f"{i}.ref_spk_embedding"] = item.ref_spk_embedding.detach().to("cpu").contiguous()
+            items_meta.append(
+                {
+                    "x_vector_only_mode": bool(item.x_vector_only_mode),
+                    "icl_mode": bool(item.icl_mode),
+                    "ref_text": item.ref_text,
+                }
+            )
+
+        meta = dict(fingerprint)
+        meta["items"] = json.dumps(items_meta, ensure_ascii=False)
+
+        path = self.path_for(sample_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".safetensors.tmp")
+        save_file(tensors, str(tmp_path), metadata=meta)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(
+        self,
+        sample_id: str,
+        fingerprint: Dict[str, str],
+        device: str = "cpu",
+    ) -> Optional[List[Any]]:
+        """
+        有効な成果物をメモリマップで読み込み、VoiceClonePromptItem のリストで返す。
+
+        Returns:
+            プロンプト。成果物がない・無効な場合は None
+        """
+        if not self.is_valid(sample_id, fingerprint):
+            return None
+
+        from qwen_tts.inference.qwen3_tts_model import VoiceClonePromptItem
+        from safetensors import safe_open
+
+        path = self.path_for(sample_id)
+        items_meta = json.loads(_read_safetensors_metadata(path)["items"])
+        prompt = []
+        with safe_open(str(path), framework="pt", device="cpu") as f:
+            keys = set(f.keys())
+            for i, m in enumerate(items_meta):
+                code_key = f"{i}.ref_code"
+                ref_code = f.get_tensor(code_key).to(device) if code_key in keys else None
+                prompt.append(
+                    VoiceClonePromptItem(
+                        ref_code=ref_code,
+                        ref_spk_embedding=f.get_tensor(f"{i}.ref_spk_embedding").to(device),
+                        x_vector_only_mode=m["x_vector_only_mode"],
+                        icl_mode=m["icl_mode"],
+                        ref_text=m["ref_text"],
+                    )
+                )
+        return prompt
+
+    def ensure(
+        self,
+        wrapper: "Qwen3TTSWrapper",
+        sample_id: str,
+        audio_path: str | Path,
+        corpus_text: str,
+    ) -> bool:
+        """
+        sample_id のプロンプトを wrapper のプロンプトキャッシュに載せる。
+
+        有効な成果物があれば読み込んでキャッシュに登録し、なければ wrapper で計算して保存する。
+
+        Returns:
+            成果物を読み込めた場合 True、新たに計算・保存した場合 False
+
+        Raises:
+            FileNotFoundError: audio_path が存在しない場合
+            RuntimeError: プロンプトの作成に失敗した場合
+        """
+        fp = self.fingerprint(audio_path, corpus_text, wrapper.model_name, wrapper.dtype)
+        prompt = self.load(sample_id, fp, device=wrapper.device)
+        if prompt is not None:
+            wrapper.put_voice_clone_prompt(str(audio_path), corpus_text, prompt)
+            return True
+
+        prompt = wrapper.get_voice_clone_prompt(str(audio_path), corpus_text)
+        self.save(sample_id, prompt, fp)
+        return False
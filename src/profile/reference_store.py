@@ -0,0 +1,160 @@
+# coding=utf-8
+"""
+前処理済み参照音声の保存（models/references/<sample_id>.npy）。
+
+参照音声を src.audio.reference.preprocess_reference で正規形（24 kHz・float32・モノラル・無音除去・音量正規化）にし、
+sample_id ごとに .npy で保存する。合成時はメモリマップで読むだけなのでデコードの費用がかからない。
+横に置く <sample_id>.json に元ファイルの内容ハッシュと前処理の設定を持たせ、
+いずれかが変わった成果物は無効として扱う（自動的に作り直される）。
+
+このモジュールは torch を import しない。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.audio.reference import (
+    PAD_MS,
+    PEAK_DBFS,
+    REFERENCE_SAMPLE_RATE,
+    SILENCE_DB,
+    TARGET_DBFS,
+    decode_audio,
+    preprocess_reference,
+)
+from src.profile.prompt_store import _check_sample_id, _file_sha256
+
+# 成果物フォーマットのバージョン（保存形式・前処理の手順を変えたら上げる）
+REFERENCE_FORMAT_VERSION = "1"
+DEFAULT_REFERENCE_DIR = "models/references"
+
+
+def reference_id() -> str:
+    """前処理の設定を表す文字列（プロンプト成果物のフィンガープリントに含める）。"""
+    return (
+        f"v{REFERENCE_FORMAT_VERSION}-{REFERENCE_SAMPLE_RATE}hz-"
+        f"{SILENCE_DB:g}db-{TARGET_DBFS:g}dbfs-{PEAK_DBFS:g}peak-{PAD_MS:g}ms"
+    )
+
+
+def load_canonical_reference(path: str | Path) -> Tuple[np.ndarray, int]:
+    """
+    正規形の参照音声（.npy）をメモリマップで読む（書き込み不可の配列）。
+
+    Returns:
+        (wav_array, REFERENCE_SAMPLE_RATE)
+
+    Raises:
+        FileNotFoundError: ファイルが存在しない場合
+        ValueError: 1 次元の float32 でない場合
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"参照音声ファイルが見つかりません: {path}")
+    wav = np.load(path, mmap_mode="r", allow_pickle=False)
+    if wav.dtype != np.float32 or wav.ndim != 1:
+        raise ValueError(f"正規形の参照音声ではありません（{wav.dtype}, {wav.ndim} 次元）: {path}")
+    return wav, REFERENCE_SAMPLE_RATE
+
+
+class ReferenceStore:
+    """sample_id ごとの前処理済み参照音声を管理する。"""
+
+    def __init__(self, root: str | Path = DEFAULT_REFERENCE_DIR) -> None:
+        """
+        Args:
+            root: 成果物の保存ディレクトリ（デフォルト: models/references）
+        """
+        self._root = Path(root)
+
+    @property
+    def root(self) -> Path:
+        """成果物の保存ディレクトリ。"""
+        return self._root
+
+    def path_for(self, sample_id: str) -> Path:
+        """
+        sample_id の正規形ファイルのパス。
+
+        Raises:
+            ValueError: sample_id がパスの区切り・.. を含む場合
+        """
+        return self._root / f"{_check_sample_id(sample_id)}.npy"
+
+    def _meta_path(self, sample_id: str) -> Path:
+        return self._root / f"{_check_sample_id(sample_id)}.json"
+
+    def fingerprint(self, audio_path: str | Path) -> Dict[str, str]:
+        """
+        成果物の有効性判定に使うフィンガープリント（元ファイルの内容ハッシュと前処理の設定）。
+
+        Raises:
+            FileNotFoundError: audio_path が存在しない場合
+        """
+        path = Path(audio_path)
+        if not path.exists():
+            raise FileNotFoundError(f"参照音声ファイルが見つかりません: {audio_path}")
+        return {"reference_id": reference_id(), "source_sha256": _file_sha256(path)}
+
+    def is_valid(self, sample_id: str, fingerprint: Dict[str, str]) -> bool:
+        """成果物が存在し、フィンガープリントが一致するか。"""
+        try:
+            meta = json.loads(self._meta_path(sample_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        return self.path_for(sample_id).exists() and all(meta.get(k) == v for k, v in fingerprint.items())
+
+    def build(self, sample_id: str, audio_path: str | Path, fingerprint: Optional[Dict[str, str]] = None) -> Path:
+        """
+        参照音声を前処理して保存する。書き込みは一時ファイル経由で原子的に行う。
+
+        Returns:
+            正規形ファイルのパス
+
+        Raises:
+            FileNotFoundError: audio_path が存在しない場合
+            ValueError: デコードできない、または無音の場合
+        """
+        fp = fingerprint if fingerprint is not None else self.fingerprint(audio_path)
+        wav, sample_rate = decode_audio(audio_path)
+        canonical = preprocess_reference(wav, sample_rate)
+
+        path = self.path_for(sample_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, canonical, allow_pickle=False)
+        os.replace(tmp, path)
+        meta = dict(
+            fp,
+            source=str(audio_path),
+            sample_rate=REFERENCE_SAMPLE_RATE,
+            source_sec=round(len(wav) / sample_rate, 3),
+            duration_sec=round(len(canonical) / REFERENCE_SAMPLE_RATE, 3),
+        )
+        tmp = self._meta_path(sample_id).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._meta_path(sample_id))
+        return path
+
+    def ensure(self, sample_id: str, audio_path: str | Path) -> Path:
+        """
+        sample_id の有効な正規形ファイルを返す（なければ前処理して作る）。
+
+        Returns:
+            正規形ファイルのパス
+
+        Raises:
+            FileNotFoundError: audio_path が存在しない場合
+            ValueError: デコードできない、または無音の場合
+        """
+        fp = self.fingerprint(audio_path)
+        if self.is_valid(sample_id, fp):
+            return self.path_for(sample_id)
+        return self.build(sample_id, audio_path, fp)
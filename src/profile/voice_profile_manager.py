@@ -2,33 +2,114 @@
 """
 声プロファイル（ref_audio + ref_text）の管理。
 
-metadata.csv を読み込み、話者一覧・プロファイル取得を提供する。
+メタデータ（CSV / JSON / SQLite）を読み込み、話者一覧・プロファイル取得を提供する。
+プロファイルは不変のレコード（VoiceProfile）として 1 回だけ作り、話者名・sample_id の索引で引く
+（数万サンプルでも検索は O(1)、取得のたびに辞書を作らない）。
 """
 
 from __future__ import annotations
 
 import csv
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+if TYPE_CHECKING:
+    from src.profile.prompt_store import PromptArtifactStore
 
 # 必須カラム
 REQUIRED_COLUMNS = ("sample_id", "speaker_name", "audio_path", "corpus_text", "language")
 VALID_LANGUAGES = ("ja", "en")
+# SQLite のメタデータでプロファイルを読むテーブル
+SQLITE_TABLE = "profiles"
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# 音声ファイルの存在確認を並列に行うスレッド数の上限
+_STAT_WORKERS = 16
+
+
+@dataclass(frozen=True, slots=True)
+class VoiceProfile(Mapping):
+    """
+    声プロファイル 1 件（不変）。
+
+    従来の辞書と同じく profile["corpus_text"] のように読める（Mapping）。
+    """
+
+    sample_id: str
+    speaker_name: str
+    audio_path: str
+    corpus_text: str
+    language: str
+    description: str = ""
+
+    def __getitem__(self, key: str) -> str:
+        if key not in _PROFILE_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_PROFILE_KEYS)
+
+    def __len__(self) -> int:
+        return len(_PROFILE_KEYS)
+
+    def to_dict(self) -> Dict[str, str]:
+        """辞書に変換する（JSON 化などに使う）。"""
+        return {k: getattr(self, k) for k in _PROFILE_KEYS}
+
+
+_PROFILE_KEYS = tuple(f.name for f in fields(VoiceProfile))
+
+
+@dataclass(frozen=True)
+class ProfileChanges:
+    """メタデータの再読み込みで変わったサンプル（sample_id）と、その影響を受ける話者名。"""
+
+    added: Tuple[str, ...] = ()
+    removed: Tuple[str, ...] = ()
+    modified: Tuple[str, ...] = ()
+    speakers: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified or self.speakers)
+
+
+@dataclass(frozen=True, slots=True)
+class _ProfileIndex:
+    """ある時点のメタデータの索引（不変。再読み込みでは丸ごと差し替える）。"""
+
+    rows: Tuple[VoiceProfile, ...]
+    lines: Tuple[int, ...]
+    by_speaker: Dict[str, Tuple[VoiceProfile, ...]]
+    by_sample: Dict[str, VoiceProfile]
+    speakers: Tuple[str, ...]
 
 
 class VoiceProfileManager:
     """
     声プロファイル（ref_audio + ref_text）の管理。
+
+    watch() でメタデータファイルの変更（mtime・サイズ）を監視し、変わった行だけを検証・索引し直して
+    索引を原子的に差し替える。変更は add_listener で登録した関数に ProfileChanges で通知する。
     """
 
-    def __init__(self, metadata_path: str = "data/metadata.csv") -> None:
+    def __init__(self, metadata_path: str = "data/metadata.csv", *, validate_files: bool = True) -> None:
         """
         Args:
-            metadata_path: メタデータファイルのパス（CSV）
+            metadata_path: メタデータファイルのパス（.csv / .json / .db・.sqlite・.sqlite3）
+            validate_files: True の場合、音声ファイルの存在を並列に確認する（再読み込みでは変わった行のみ）。
+                False の場合は確認しない（存在しない音声は使うときに FileNotFoundError になる）
 
         Raises:
             FileNotFoundError: メタデータファイルが存在しない
-            ValueError: メタデータの形式が不正（必須カラムがない等）
+            ValueError: メタデータの形式が不正（必須カラムがない、sample_id の重複等）
         """
         path = Path(metadata_path).resolve()
         if not path.exists():
@@ -37,38 +118,187 @@ class VoiceProfileManager:
         # プロジェクトルート（data/metadata.csv なら data の親）
         self._root = path.parent.parent
         self._metadata_path = path
-        self._rows: List[Dict[str, str]] = []
+        self._validate_files = validate_files
+        self._stamp = _file_stamp(path)
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[ProfileChanges], None]] = []
+        self._watch_stop: threading.Event | None = None
+        self._watch_thread: threading.Thread | None = None
 
-        with open(path, encoding="utf-8", newline="") as f:
-            reader = csv.DictReader(f)
-            if reader.fieldnames is None:
-                raise ValueError("メタデータが空です")
-            missing = set(REQUIRED_COLUMNS) - set(reader.fieldnames)
-            if missing:
-                raise ValueError(f"必須カラムがありません: {missing}")
+        rows, lines = _parse_rows(path)
+        # 参照側は self._index を 1 回読んで使う（差し替えの途中の状態は見えない）
+        self._index = _build_index(rows, lines)
+        if validate_files:
+            self.validate_files()
+
+    @property
+    def metadata_path(self) -> Path:
+        """メタデータファイルの絶対パス。"""
+        return self._metadata_path
+
+    def validate_files(self) -> None:
+        """
+        全サンプルの音声ファイルが存在するか確認する（stat をスレッドで並列に行う）。
+
+        Raises:
+            ValueError: 存在しない音声ファイルがある場合（最初の 1 件を示す）
+        """
+        index = self._index
+        self._check_files(list(zip(index.rows, index.lines)))
 
-            for i, row in enumerate(reader):
-                # 空行スキップ
-                if not any(row.get(k, "").strip() for k in REQUIRED_COLUMNS):
+    def _check_files(self, targets: List[Tuple[VoiceProfile, int]]) -> None:
+        paths = [self._root / p.audio_path for p, _ in targets]
+        if len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=min(_STAT_WORKERS, len(paths))) as pool:
+                exists = list(pool.map(os.path.exists, paths))
+        else:
+            exists = [os.path.exists(p) for p in paths]
+        for (profile, line), ok in zip(targets, exists):
+            if not ok:
+                raise ValueError(f"行 {line}: 音声ファイルが存在しません: {profile.audio_path}")
+
+    def reload(self) -> ProfileChanges:
+        """
+        メタデータを読み直し、変わった行だけを反映する。
+
+        追加・変更された行だけ音声ファイルを確認し、変わらない行は既存の VoiceProfile をそのまま使う。
+        話者ごとの索引は影響を受ける話者の分だけ作り直し、索引全体を 1 回の代入で差し替える
+        （合成中の呼び出しは差し替え前の索引で最後まで進む）。変更があればリスナーに通知する。
+
+        Returns:
+            変更内容（変更がなければ偽になる ProfileChanges）
+
+        Raises:
+            FileNotFoundError: メタデータファイルが存在しない
+            ValueError: メタデータの形式が不正、または追加・変更された行の音声ファイルがない場合
+                （索引は差し替えない）
+        """
+        with self._reload_lock:
+            if not self._metadata_path.exists():
+                raise FileNotFoundError(f"メタデータファイルが存在しません: {self._metadata_path}")
+            # 読み込みに成功するまで記録しない（音声ファイルが後から届く場合も、次の check_for_updates で再試行する）
+            stamp = _file_stamp(self._metadata_path)
+            rows, lines = _parse_rows(self._metadata_path)
+            old = self._index
+
+            added: List[str] = []
+            modified: List[str] = []
+            targets: List[Tuple[VoiceProfile, int]] = []
+            speakers: Dict[str, None] = {}
+            for i, (profile, line) in enumerate(zip(rows, lines)):
+                previous = old.by_sample.get(profile.sample_id)
+                if previous == profile:
+                    rows[i] = previous
                     continue
-                # 必須フィールドの存在チェック
-                for col in REQUIRED_COLUMNS:
-                    if not (row.get(col) or "").strip():
-                        raise ValueError(
-                            f"行 {i + 2}: 必須カラム '{col}' が空です"
-                        )
-                lang = (row.get("language") or "").strip().lower()
-                if lang not in VALID_LANGUAGES:
-                    raise ValueError(
-                        f"行 {i + 2}: language は 'ja' または 'en' である必要があります: {lang!r}"
-                    )
-                audio_path = (row.get("audio_path") or "").strip()
-                full_audio = self._root / audio_path
-                if not full_audio.exists():
-                    raise ValueError(
-                        f"行 {i + 2}: 音声ファイルが存在しません: {audio_path}"
+                if previous is None:
+                    added.append(profile.sample_id)
+                else:
+                    modified.append(profile.sample_id)
+                    speakers[previous.speaker_name] = None
+                speakers[profile.speaker_name] = None
+                targets.append((profile, line))
+            current = {p.sample_id for p in rows}
+            removed = [sid for sid in old.by_sample if sid not in current]
+            for sid in removed:
+                speakers[old.by_sample[sid].speaker_name] = None
+
+            if self._validate_files and targets:
+                self._check_files(targets)
+
+            # 行の並べ替えだけでも話者の最初のサンプルが変わりうるので、残った行の順序も比べる
+            kept_new = [p.sample_id for p in rows if p.sample_id in old.by_sample]
+            kept_old = [p.sample_id for p in old.rows if p.sample_id in current]
+            if kept_new != kept_old:
+                index = _build_index(rows, lines)
+                speakers.update(
+                    dict.fromkeys(
+                        name
+                        for name in {*old.by_speaker, *index.by_speaker}
+                        if old.by_speaker.get(name) != index.by_speaker.get(name)
                     )
-                self._rows.append(row)
+                )
+            else:
+                index = _build_index(rows, lines, old, set(speakers))
+
+            self._index = index
+            self._stamp = stamp
+            changes = ProfileChanges(tuple(added), tuple(removed), tuple(modified), tuple(speakers))
+            if changes:
+                for listener in list(self._listeners):
+                    listener(changes)
+            return changes
+
+    def check_for_updates(self) -> ProfileChanges | None:
+        """
+        メタデータファイルの mtime・サイズが前回の読み込みから変わっていれば reload() する。
+
+        Returns:
+            reload() の結果。変わっていない（または書き換え中で読めない）場合は None
+
+        Raises:
+            ValueError: reload() と同じ（前回の reload() が失敗した内容は、ファイルが変わらなくても再試行する）
+        """
+        try:
+            stamp = _file_stamp(self._metadata_path)
+        except OSError:
+            return None
+        if stamp == self._stamp:
+            return None
+        return self.reload()
+
+    def add_listener(self, callback: Callable[[ProfileChanges], None]) -> None:
+        """再読み込みで変更があったときに呼ぶ関数を登録する（reload を呼んだスレッドで呼ばれる）。"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[ProfileChanges], None]) -> None:
+        """add_listener で登録した関数を解除する（未登録なら何もしない）。"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def watch(
+        self,
+        interval: float = 1.0,
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> None:
+        """
+        メタデータファイルの監視を始める（interval 秒ごとに check_for_updates を呼ぶデーモンスレッド）。
+
+        監視中に起きた例外（書きかけのメタデータ・音声ファイルがまだない行等）は on_error に渡し、索引は前のまま
+        監視を続ける（読み込みに成功するまで interval ごとに再試行する）。
+
+        Args:
+            interval: 確認の間隔（秒）
+            on_error: 例外を受け取る関数（None の場合は無視する）
+
+        Raises:
+            ValueError: interval が 0 以下の場合
+        """
+        if interval <= 0:
+            raise ValueError("interval は 0 より大きい値を指定してください。")
+        if self._watch_thread is not None:
+            return
+        stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.check_for_updates()
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+
+        self._watch_stop = stop
+        self._watch_thread = threading.Thread(target=run, name="profile-metadata-watcher", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """watch() で始めた監視を止める（監視していなければ何もしない）。"""
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
+        self._watch_stop = None
 
     def list_speakers(self) -> List[str]:
         """
@@ -77,10 +307,9 @@ class VoiceProfileManager:
         Returns:
             話者名のリスト（例: ["gohan", "friend_a"]）
         """
-        names = [r.get("speaker_name", "").strip() for r in self._rows]
-        return list(dict.fromkeys(n for n in names if n))
+        return list(self._index.speakers)
 
-    def get_profile(self, speaker_name: str) -> Dict[str, Any]:
+    def get_profile(self, speaker_name: str) -> VoiceProfile:
         """
         指定した話者の声プロファイルを取得（最初の1件）。
 
@@ -88,15 +317,15 @@ class VoiceProfileManager:
             speaker_name: 話者名
 
         Returns:
-            sample_id, speaker_name, audio_path, corpus_text, language, description を含む辞書
+            sample_id, speaker_name, audio_path, corpus_text, language, description を持つ VoiceProfile
+            （辞書と同じく profile["sample_id"] で読める）
 
         Raises:
             ValueError: 話者名が見つからない
         """
-        profiles = self.get_all_profiles(speaker_name)
-        return profiles[0]
+        return self._speaker_profiles(speaker_name)[0]
 
-    def get_all_profiles(self, speaker_name: str) -> List[Dict[str, Any]]:
+    def get_all_profiles(self, speaker_name: str) -> List[VoiceProfile]:
         """
         指定した話者の全サンプルを取得（複数音声サンプルがある場合）。
 
@@ -109,19 +338,205 @@ class VoiceProfileManager:
         Raises:
             ValueError: 話者名が見つからない
         """
-        name = speaker_name.strip()
-        profiles = [
-            {
-                "sample_id": r.get("sample_id", "").strip(),
-                "speaker_name": r.get("speaker_name", "").strip(),
-                "audio_path": r.get("audio_path", "").strip(),
-                "corpus_text": r.get("corpus_text", "").strip(),
-                "language": r.get("language", "").strip().lower(),
-                "description": (r.get("description") or "").strip(),
-            }
-            for r in self._rows
-            if (r.get("speaker_name") or "").strip() == name
-        ]
+        return list(self._speaker_profiles(speaker_name))
+
+    def get_sample(self, sample_id: str) -> VoiceProfile:
+        """
+        sample_id の声プロファイルを取得する。
+
+        Raises:
+            ValueError: sample_id が見つからない
+        """
+        profile = self._index.by_sample.get(sample_id.strip())
+        if profile is None:
+            raise ValueError(f"sample_id が見つかりません: {sample_id!r}")
+        return profile
+
+    def list_profiles(self) -> List[VoiceProfile]:
+        """
+        全話者の全サンプルをメタデータの行順で返す。
+
+        Returns:
+            声プロファイルのリスト（各要素は get_profile と同じ形式）
+        """
+        return list(self._index.rows)
+
+    def _speaker_profiles(self, speaker_name: str) -> Tuple[VoiceProfile, ...]:
+        profiles = self._index.by_speaker.get(speaker_name.strip())
         if not profiles:
             raise ValueError(f"話者名が見つかりません: {speaker_name!r}")
         return profiles
+
+    def resolve_audio_path(self, profile: Mapping[str, Any]) -> Path:
+        """
+        プロファイルの audio_path をプロジェクトルート基準の絶対パスに解決する。
+
+        Args:
+            profile: get_profile / get_all_profiles が返すプロファイル（または同じキーの辞書）
+
+        Returns:
+            参照音声ファイルの絶対パス
+        """
+        return self._root / profile["audio_path"]
+
+    def artifact_status(
+        self,
+        store: "PromptArtifactStore",
+        model_name: str,
+        dtype: Any,
+        reference: str = "raw",
+    ) -> Dict[str, bool]:
+        """
+        各プロファイルに有効な事前計算プロンプトがあるかを返す。
+
+        Args:
+            store: プロンプト成果物ストア
+            model_name: 成果物の作成に使うモデル ID
+            dtype: 成果物の作成に使うモデルの dtype
+            reference: 参照音声の前処理（PromptArtifactStore.fingerprint 参照）
+
+        Returns:
+            sample_id → 有効な成果物があれば True の辞書（メタデータの行順）
+        """
+        status: Dict[str, bool] = {}
+        for profile in self.list_profiles():
+            fp = store.fingerprint(
+                self.resolve_audio_path(profile),
+                profile["corpus_text"],
+                model_name,
+                dtype,
+                reference,
+            )
+            status[profile["sample_id"]] = store.is_valid(profile["sample_id"], fp)
+        return status
+
+
+def _file_stamp(path: Path) -> Tuple[int, int]:
+    """変更の検出に使う (mtime_ns, サイズ)。"""
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse_rows(path: Path) -> Tuple[List[VoiceProfile], List[int]]:
+    """
+    メタデータを読み、空行を除いた VoiceProfile と行番号のリストを返す。
+
+    Raises:
+        ValueError: メタデータの形式が不正、または sample_id が重複している場合
+    """
+    rows: List[VoiceProfile] = []
+    lines: List[int] = []
+    seen = set()
+    for line, row in _read_metadata(path):
+        # 空行スキップ
+        if not any(str(row.get(k) or "").strip() for k in REQUIRED_COLUMNS):
+            continue
+        profile = _row_to_profile(row, line)
+        if profile.sample_id in seen:
+            raise ValueError(f"行 {line}: sample_id が重複しています: {profile.sample_id!r}")
+        seen.add(profile.sample_id)
+        rows.append(profile)
+        lines.append(line)
+    return rows, lines
+
+
+def _build_index(
+    rows: List[VoiceProfile],
+    lines: List[int],
+    previous: _ProfileIndex | None = None,
+    speakers: Set[str] | None = None,
+) -> _ProfileIndex:
+    """
+    索引を作る。previous と speakers を指定した場合は speakers の分だけ話者の索引を作り直す。
+    """
+    if previous is None or speakers is None:
+        speakers = None
+        by_speaker: Dict[str, Tuple[VoiceProfile, ...]] = {}
+    else:
+        by_speaker = {name: group for name, group in previous.by_speaker.items() if name not in speakers}
+    grouped: Dict[str, List[VoiceProfile]] = {}
+    for profile in rows:
+        if speakers is None or profile.speaker_name in speakers:
+            grouped.setdefault(profile.speaker_name, []).append(profile)
+    by_speaker.update((name, tuple(group)) for name, group in grouped.items())
+    order = tuple(dict.fromkeys(p.speaker_name for p in rows))
+    return _ProfileIndex(
+        rows=tuple(rows),
+        lines=tuple(lines),
+        by_speaker={name: by_speaker[name] for name in order},
+        by_sample={p.sample_id: p for p in rows},
+        speakers=order,
+    )
+
+
+def _read_metadata(path: Path) -> Iterable[Tuple[int, Dict[str, Any]]]:
+    """
+    メタデータを (行番号, 行) の列として読む。拡張子で形式を判定する。
+
+    - .csv: ヘッダ付き CSV（行番号はファイルの行）
+    - .json: プロファイルの配列、または {"profiles": [...]}（行番号は 1 始まりの要素番号）
+    - .db / .sqlite / .sqlite3: profiles テーブル（行番号は rowid 順の 1 始まりの番号）
+
+    Raises:
+        ValueError: 形式が不正、または必須カラムがない場合
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError as e:
+            raise ValueError(f"メタデータの JSON が不正です: {e}") from e
+        if isinstance(data, dict):
+            data = data.get("profiles")
+        if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+            raise ValueError("メタデータの JSON はプロファイルの配列（または {\"profiles\": [...]}）である必要があります")
+        if data:
+            missing = set(REQUIRED_COLUMNS) - set().union(*data)
+            if missing:
+                raise ValueError(f"必須カラムがありません: {missing}")
+        return list(enumerate(data, start=1))
+
+    if suffix in SQLITE_SUFFIXES:
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            try:
+                cursor = conn.execute(f"SELECT * FROM {SQLITE_TABLE} ORDER BY rowid")
+            except sqlite3.DatabaseError as e:
+                raise ValueError(f"メタデータの SQLite を読めません: {e}") from e
+            columns = [c[0] for c in cursor.description]
+            missing = set(REQUIRED_COLUMNS) - set(columns)
+            if missing:
+                raise ValueError(f"必須カラムがありません: {missing}")
+            return [(i, dict(r)) for i, r in enumerate(cursor, start=1)]
+        finally:
+            conn.close()
+
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError("メタデータが空です")
+        missing = set(REQUIRED_COLUMNS) - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"必須カラムがありません: {missing}")
+        return [(i + 2, row) for i, row in enumerate(reader)]
+
+
+def _row_to_profile(row: Dict[str, Any], line: int) -> VoiceProfile:
+    """
+    メタデータの 1 行を検証して VoiceProfile に変換する。
+
+    Raises:
+        ValueError: 必須フィールドが空、または language が未対応の場合
+    """
+    values = {k: str(row.get(k) or "").strip() for k in _PROFILE_KEYS}
+    # 必須フィールドの存在チェック
+    for col in REQUIRED_COLUMNS:
+        if not values[col]:
+            raise ValueError(f"行 {line}: 必須カラム '{col}' が空です")
+    values["language"] = values["language"].lower()
+    if values["language"] not in VALID_LANGUAGES:
+        raise ValueError(
+            f"行 {line}: language は 'ja' または 'en' である必要があります: {values['language']!r}"
+        )
+    return VoiceProfile(**values)
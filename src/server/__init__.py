@@ -0,0 +1,8 @@
+# coding=utf-8
+"""常駐合成デーモンとクライアント（torch はデーモンがモデルを読み込むときだけ import する）。"""
+
+from src.server.client import SynthesisClient
+from src.server.daemon import SynthesisServer
+from src.server.protocol import ServerError, ServerUnavailableError, default_socket_path
+
+__all__ = ["ServerError", "ServerUnavailableError", "SynthesisClient", "SynthesisServer", "default_socket_path"]
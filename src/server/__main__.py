@@ -0,0 +1,6 @@
+# coding=utf-8
+"""python -m src.server で合成デーモンを起動する。"""
+
+from src.server.daemon import main
+
+main()
@@ -0,0 +1,207 @@
+# coding=utf-8
+"""
+常駐合成デーモンのクライアント。
+
+標準ライブラリの http.client だけを使い、torch を import しない（CLI の起動を速くするため）。
+synthesize() は MultiSpeakerSynthesizer.synthesize と同じ形で使える。
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from src.audio import wav_bytes_to_float
+from src.server.protocol import AUDIO_FORMATS, ServerError, ServerUnavailableError, default_socket_path
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """Unix ドメインソケットに接続する HTTPConnection。"""
+
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self._socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class SynthesisClient:
+    """合成デーモンに接続するクライアント（リクエストごとに接続する）。"""
+
+    def __init__(
+        self,
+        socket_path: str | Path | None = None,
+        *,
+        url: str | None = None,
+        timeout: float = 300.0,
+    ) -> None:
+        """
+        Args:
+            socket_path: デーモンの Unix ソケットのパス（None は default_socket_path()）。url 指定時は使わない
+            url: HTTP で待ち受けているデーモンの URL（例: "http://127.0.0.1:8765"）
+            timeout: 1 リクエストの最大待ち時間（秒）
+
+        Raises:
+            ValueError: url が http:// で始まらない場合
+        """
+        self._timeout = timeout
+        self._socket_path: str | None = None
+        self._host: str | None = None
+        self._port: int | None = None
+        if url is not None:
+            parts = urlsplit(url)
+            if parts.scheme != "http" or not parts.hostname:
+                raise ValueError(f"url は http://host:port の形式で指定してください: {url}")
+            self._host = parts.hostname
+            self._port = parts.port or 80
+        else:
+            self._socket_path = str(socket_path if socket_path is not None else default_socket_path())
+
+    @property
+    def address(self) -> str:
+        """接続先（Unix ソケットのパス、または http://host:port）。"""
+        if self._socket_path is not None:
+            return self._socket_path
+        return f"http://{self._host}:{self._port}"
+
+    def _connection(self, timeout: float) -> http.client.HTTPConnection:
+        if self._socket_path is not None:
+            return _UnixHTTPConnection(self._socket_path, timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        payload: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """
+        リクエストを送り、(ボディ, ヘッダ) を返す。
+
+        Raises:
+            ServerUnavailableError: 接続できない、または応答の途中で接続が切れた・タイムアウトした場合
+            ValueError: デーモンが 400 / 404 を返した場合（入力不正・未登録の話者）
+            ServerError: デーモンがその他のエラーを返した場合
+        """
+        conn = self._connection(self._timeout if timeout is None else timeout)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json; charset=utf-8"} if body is not None else {}
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+            except OSError as e:
+                raise ServerUnavailableError(f"合成デーモンに接続できません（{self.address}）: {e}") from None
+            try:
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                # 送信後に接続が切れた・応答がタイムアウトした（処理中にデーモンが止まった等）
+                raise ServerUnavailableError(f"合成デーモンの応答が途切れました（{self.address}）: {e!r}") from e
+            status = response.status
+            response_headers = {k: v for k, v in response.getheaders()}
+        finally:
+            conn.close()
+        if status != 200:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError, TypeError):
+                message = data.decode("utf-8", errors="replace")
+            if status in (400, 404):
+                raise ValueError(message)
+            raise ServerError(status, message)
+        return data, response_headers
+
+    def _get_json(self, path: str, timeout: float | None = None) -> Dict[str, Any]:
+        data, _ = self._request("GET", path, timeout=timeout)
+        return json.loads(data)
+
+    def health(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """GET /health（status, model, speakers, uptime_sec）。"""
+        return self._get_json("/health", timeout=timeout)
+
+    def is_available(self, timeout: float = 2.0) -> bool:
+        """デーモンが起動していて応答するか。"""
+        if self._socket_path is not None and not Path(self._socket_path).exists():
+            return False
+        try:
+            return self.health(timeout=timeout).get("status") == "ok"
+        except (ServerError, ValueError, OSError):
+            return False
+
+    def speakers(self) -> List[str]:
+        """デーモンに登録されている話者名の一覧。"""
+        return [entry["name"] for entry in self._get_json("/speakers")["speakers"]]
+
+    def stats(self, timeout: float | None = None) -> Dict[str, Any]:
+        """デーモンのバッチ処理の統計（BatchScheduler.stats）。"""
+        return self._get_json("/stats", timeout=timeout)
+
+    def synthesize_bytes(
+        self,
+        text: str,
+        speaker: str,
+        language: str | None = None,
+        audio_format: str = "wav",
+        *,
+        priority: str | None = None,
+        user: str | None = None,
+        guild: str | None = None,
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """
+        合成した音声をデーモンが返したバイト列のまま受け取る。
+
+        Args:
+            text: 読み上げるテキスト
+            speaker: デーモンに登録済みの話者名
+            language: 合成時の言語（None は話者の既定言語）
+            audio_format: "wav" または "pcm"（s16le, モノラル）
+            priority: 優先度（"system" / "interactive" / "bulk"。None は長さからデーモンが決める）
+            user: 公平に順番を回す単位のユーザー ID
+            guild: 公平に順番を回す単位のギルド ID
+
+        Returns:
+            (音声のバイト列, レスポンスヘッダ)
+
+        Raises:
+            ValueError: 入力が不正、または話者が登録されていない場合
+            ServerUnavailableError: デーモンに接続できない場合
+            ServerError: 生成に失敗した、またはキューが満杯の場合
+        """
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"audio_format は {', '.join(AUDIO_FORMATS)} のいずれかを指定してください。")
+        payload: Dict[str, Any] = {"text": text, "speaker": speaker, "format": audio_format}
+        if language is not None:
+            payload["language"] = language
+        for name, value in (("priority", priority), ("user", user), ("guild", guild)):
+            if value is not None:
+                payload[name] = value
+        return self._request("POST", "/synthesize", payload)
+
+    def synthesize(self, text: str, speaker: str, language: str | None = None) -> Tuple[np.ndarray, int]:
+        """
+        MultiSpeakerSynthesizer.synthesize と同じ形で合成する。
+
+        Returns:
+            (wav_array, sample_rate): 音声配列（float32, -1.0～1.0）とサンプリングレート
+
+        Raises:
+            ValueError: 入力が不正、または話者が登録されていない場合
+            ServerError: デーモンに接続できない、または生成に失敗した場合（RuntimeError のサブクラス）
+        """
+        data, _ = self.synthesize_bytes(text, speaker, language, audio_format="wav")
+        return wav_bytes_to_float(data)
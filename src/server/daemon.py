@@ -0,0 +1,533 @@
+# coding=utf-8
+"""
+常駐合成デーモン。
+
+モデルと話者ごとのプロンプトをメモリに載せたまま、Unix ドメインソケット（既定）または
+localhost の HTTP でリクエストを受け付ける。複数クライアントからの同時リクエストは
+BatchScheduler に集めてバッチ生成する。
+
+API:
+    GET  /health      -> {"status": "ok", "model": ..., "speakers": [...], "uptime_sec": ...}
+    GET  /speakers    -> {"speakers": [{"name", "language"}, ...]}
+    GET  /stats       -> BatchScheduler の統計（"memory" にメモリガバナーの統計）
+    POST /synthesize  {"text", "speaker", "language"?, "format"?: "wav" | "pcm",
+                       "priority"?: "system" | "interactive" | "bulk", "user"?, "guild"?}
+                      -> 音声のバイト列（X-Sample-Rate 等のヘッダ付き）
+
+待ちキューは優先度（省略時は短い発言を interactive、長文を bulk）と、ギルド・ユーザーごとの
+公平性で取り出す（fair_queue）。長文はセグメントの境界で他のリクエストに順番を譲る。
+
+使い方:
+    python -m src.server --metadata data/metadata.csv --warmup
+    python -m src.server --port 8765        # Unix ソケットの代わりに localhost の HTTP
+    python -m src.server --device cuda:1    # デバイスを指定（複数のデーモンを src.server.router でまとめる）
+    python -m src.server --cores 0-7 --threads 8   # CPU のコア集合に固定する
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+from src.audio import float_to_pcm16, float_to_wav_bytes
+from src.server.protocol import (
+    AUDIO_FORMATS,
+    CONTENT_TYPES,
+    DEFAULT_HOST,
+    HEADER_BATCH_SIZE,
+    HEADER_COMPUTE,
+    HEADER_QUEUE_WAIT,
+    HEADER_SAMPLE_RATE,
+    default_socket_path,
+    parse_cores,
+)
+
+if TYPE_CHECKING:
+    from src.tts import MultiSpeakerSynthesizer
+
+DEFAULT_MODEL_NAME = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
+# リクエストボディの上限（テキストだけなので十分に小さくてよい）
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix ドメインソケットで待ち受ける HTTP サーバ（接続ごとにスレッド）。"""
+
+    daemon_threads = True
+
+
+class SynthesisServer:
+    """MultiSpeakerSynthesizer を常駐させて合成リクエストを受け付けるサーバ。"""
+
+    def __init__(
+        self,
+        synthesizer: "MultiSpeakerSynthesizer",
+        *,
+        socket_path: str | Path | None = None,
+        host: str = DEFAULT_HOST,
+        port: int | None = None,
+        max_wait_ms: float = 20.0,
+        max_batch_size: int = 8,
+        max_queue_size: int = 64,
+        request_timeout: float = 300.0,
+    ) -> None:
+        """
+        Args:
+            synthesizer: 話者を登録済みの MultiSpeakerSynthesizer（close はしない）
+            socket_path: Unix ドメインソケットのパス（None は default_socket_path()）。port 指定時は使わない
+            host: HTTP の待ち受けアドレス（port 指定時のみ。既定はローカルのみ）
+            port: 指定すると Unix ソケットの代わりに HTTP で待ち受ける（0 で空きポート）
+            max_wait_ms: バッチを締め切るまでの最大待ち時間（BatchScheduler）
+            max_batch_size: 1 バッチの最大件数（BatchScheduler）
+            max_queue_size: 待ちキューの最大長（超えると 503）
+            request_timeout: 1 リクエストの合成を待つ最大秒数（過ぎたらキャンセルして 500 を返す）
+
+        Raises:
+            RuntimeError: 同じソケットで別のデーモンが動いている場合
+            OSError: 待ち受けに失敗した場合
+        """
+        from src.tts.scheduler import BatchScheduler, QueueFullError
+
+        self._synthesizer = synthesizer
+        self._request_timeout = request_timeout
+        self._started_at = time.monotonic()
+        self._httpd, self._socket_path = listen(make_handler(self, (QueueFullError,)), socket_path, host, port)
+        self._scheduler = BatchScheduler(
+            synthesizer.wrapper,
+            max_wait_ms=max_wait_ms,
+            max_batch_size=max_batch_size,
+            max_queue_size=max_queue_size,
+        )
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def address(self) -> str:
+        """待ち受けアドレス（Unix ソケットのパス、または http://host:port）。"""
+        if self._socket_path is not None:
+            return str(self._socket_path)
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def socket_path(self) -> Path | None:
+        """Unix ソケットのパス（HTTP で待ち受けている場合は None）。"""
+        return self._socket_path
+
+    @property
+    def port(self) -> int | None:
+        """HTTP の待ち受けポート（Unix ソケットの場合は None）。"""
+        return None if self._socket_path is not None else self._httpd.server_address[1]
+
+    def serve_forever(self) -> None:
+        """close() されるまでリクエストを処理する（呼び出したスレッドをブロックする）。"""
+        self._httpd.serve_forever(poll_interval=0.2)
+
+    def start(self) -> "SynthesisServer":
+        """別スレッドで serve_forever を始める。"""
+        self._thread = threading.Thread(target=self.serve_forever, name="tts-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """待ち受けを止め、処理中のリクエストを終えてからスケジューラを止める。2 回目以降は何もしない。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._scheduler.close()
+        if self._socket_path is not None:
+            try:
+                self._socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "SynthesisServer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def health(self) -> Dict[str, Any]:
+        """GET /health の内容。"""
+        return {
+            "status": "ok",
+            "model": self._synthesizer.wrapper.model_name,
+            "speakers": self._synthesizer.list_speakers(),
+            "uptime_sec": round(time.monotonic() - self._started_at, 3),
+        }
+
+    def speakers(self) -> Dict[str, Any]:
+        """GET /speakers の内容。"""
+        return {
+            "speakers": [
+                {"name": name, "language": self._synthesizer.get_speaker(name).language}
+                for name in self._synthesizer.list_speakers()
+            ]
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """GET /stats の内容。"""
+        return {**self._scheduler.stats(), "memory": self._synthesizer.wrapper.memory_stats()}
+
+    def synthesize(self, request: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+        """
+        POST /synthesize を処理する。
+
+        Args:
+            request: {"text", "speaker", "language"?, "format"?, "priority"?, "user"?, "guild"?}
+
+        Returns:
+            (音声のバイト列, レスポンスヘッダ)
+
+        Raises:
+            ValueError: 入力が不正な場合
+            LookupError: 話者が登録されていない場合
+            QueueFullError: 待ちキューが上限に達している場合
+            RuntimeError: 生成に失敗した場合
+        """
+        from src.tts.synthesizer import _validate_language
+
+        text = request.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("text を指定してください。")
+        speaker_name = request.get("speaker")
+        if not isinstance(speaker_name, str) or not speaker_name.strip():
+            raise ValueError("speaker を指定してください。")
+        fmt = request.get("format", "wav")
+        if fmt not in AUDIO_FORMATS:
+            raise ValueError(f"format は {', '.join(AUDIO_FORMATS)} のいずれかを指定してください。")
+        try:
+            speaker = self._synthesizer.get_speaker(speaker_name)
+        except ValueError as e:
+            raise LookupError(str(e)) from None
+        language = request.get("language")
+        language = _validate_language(language) if language else speaker.language
+        tenant = {}
+        for field_name in ("priority", "user", "guild"):
+            value = request.get(field_name)
+            if value is not None and not isinstance(value, (str, int)):
+                raise ValueError(f"{field_name} は文字列で指定してください。")
+            tenant[field_name] = str(value) if value is not None else None
+
+        prompt = self._synthesizer.get_speaker_prompt(speaker.name)
+        future = self._scheduler.submit(
+            text, speaker.ref_audio_path, speaker.ref_text, language, prompt, **tenant
+        )
+        try:
+            result = future.result(timeout=self._request_timeout)
+        except FutureTimeoutError:
+            # キューで待っているリクエストは生成しない（BatchScheduler はキャンセル済みの Future を飛ばす）
+            future.cancel()
+            raise TimeoutError(f"合成が {self._request_timeout} 秒以内に終わりませんでした。") from None
+        body = float_to_wav_bytes(result.wav, result.sample_rate) if fmt == "wav" else float_to_pcm16(result.wav)
+        content_type = CONTENT_TYPES[fmt]
+        if fmt == "pcm":
+            content_type += f";rate={result.sample_rate};channels=1"
+        headers = {
+            "Content-Type": content_type,
+            HEADER_SAMPLE_RATE: str(result.sample_rate),
+            HEADER_QUEUE_WAIT: f"{result.queue_wait_sec:.4f}",
+            HEADER_COMPUTE: f"{result.compute_sec:.4f}",
+            HEADER_BATCH_SIZE: str(result.batch_size),
+        }
+        return body, headers
+
+
+def listen(
+    handler: type, socket_path: str | Path | None, host: str, port: int | None
+) -> Tuple[socketserver.BaseServer, Path | None]:
+    """
+    Unix ドメインソケット（所有者のみ読み書き可）または HTTP で待ち受けるサーバを作る（SynthesisServer・RouterServer 共通）。
+
+    Returns:
+        (サーバ, Unix ソケットのパス。HTTP の場合は None)
+
+    Raises:
+        RuntimeError: 同じソケットで別のデーモンが動いている場合
+        OSError: 待ち受けに失敗した場合
+    """
+    if port is not None:
+        return ThreadingHTTPServer((host, port), handler), None
+    path = Path(socket_path) if socket_path is not None else default_socket_path()
+    _remove_stale_socket(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    httpd = _UnixHTTPServer(str(path), handler)
+    os.chmod(path, 0o600)
+    return httpd, path
+
+
+def _remove_stale_socket(path: Path) -> None:
+    """前回のデーモンが残したソケットファイルを消す。接続できる（動いている）場合は RuntimeError。"""
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+    else:
+        raise RuntimeError(f"合成デーモンは既に起動しています: {path}")
+    finally:
+        probe.close()
+
+
+def make_handler(server: Any, busy_errors: Tuple[type, ...]) -> type:
+    """
+    サーバ（health / speakers / stats / synthesize を持つ SynthesisServer・RouterServer）にリクエストを渡す
+    BaseHTTPRequestHandler を作る。busy_errors の例外は 503 で返す。
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802
+            path = self.path.split("?")[0]
+            routes = {"/health": server.health, "/speakers": server.speakers, "/stats": server.stats}
+            if path not in routes:
+                self._send_json(404, {"error": f"不明なパスです: {path}"})
+                return
+            self._send_json(200, routes[path]())
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path.split("?")[0] != "/synthesize":
+                self._send_json(404, {"error": f"不明なパスです: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                if length <= 0 or length > MAX_REQUEST_BYTES:
+                    raise ValueError("リクエストボディの長さが不正です。")
+                request = json.loads(self.rfile.read(length))
+                if not isinstance(request, dict):
+                    raise ValueError("リクエストは JSON オブジェクトで指定してください。")
+                body, headers = server.synthesize(request)
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except LookupError as e:
+                self._send_json(404, {"error": str(e)})
+                return
+            except busy_errors as e:
+                self._send_json(503, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": f"音声生成に失敗しました: {e}"})
+                return
+            self.send_response(200)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self) -> str:
+            # Unix ソケットでは client_address が空文字列
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def _pin_cores() -> None:
+    """
+    --cores のコア集合にプロセスを固定する。
+
+    torch 等を import してスレッドが作られる前に呼ぶ（後から作られるスレッドは固定を引き継ぐ）。
+    """
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--cores", type=str, default=None)
+    known, _ = pre.parse_known_args()
+    if known.cores is None:
+        return
+    try:
+        cores = parse_cores(known.cores)
+    except ValueError as e:
+        sys.exit(f"--cores: {e}")
+    if not hasattr(os, "sched_setaffinity"):
+        sys.exit("--cores: このプラットフォームではコアを固定できません。")
+    os.sched_setaffinity(0, cores)
+
+
+def main() -> None:
+    """デーモンのメイン処理（モデルと全話者のプロンプトを読み込んでから待ち受ける）。"""
+    _pin_cores()
+    from src.profile import PromptArtifactStore, ReferenceStore, VoiceProfileManager
+    from src.profile.prompt_store import DEFAULT_STORE_DIR
+    from src.profile.reference_store import DEFAULT_REFERENCE_DIR
+    from src.tts.startup import StartupReport, build_model_options, prepare_reference, start_model_load
+    from src.tts.speaker_embedding import CLONE_MODES
+    from src.tts.warmup import COMPILE_MODES
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.server", description="常駐合成デーモン（Unix ソケットまたは localhost の HTTP）"
+    )
+    parser.add_argument("--metadata", type=str, default="data/metadata.csv", help="メタデータ（CSV / JSON / SQLite）のパス")
+    parser.add_argument(
+        "--socket", type=str, default=None, help=f"Unix ソケットのパス（デフォルト: {default_socket_path()}）"
+    )
+    parser.add_argument("--port", type=int, default=None, help="指定すると localhost の HTTP で待ち受ける")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="HTTP の待ち受けアドレス")
+    parser.add_argument("--no-prompt-store", action="store_true", help=f"{DEFAULT_STORE_DIR} を読み書きしない")
+    parser.add_argument(
+        "--raw-reference", action="store_true", help=f"参照音声を前処理（{DEFAULT_REFERENCE_DIR}）せず元ファイルのまま使う"
+    )
+    parser.add_argument(
+        "--clone-mode",
+        type=str,
+        default="full",
+        choices=list(CLONE_MODES),
+        help="full: 参照音声コード + 参照テキスト（ICL）, xvector: 話者の全サンプルの話者埋め込みのみ（速い）",
+    )
+    parser.add_argument("--warmup", action="store_true", help="待ち受けの前に全話者でウォームアップする")
+    parser.add_argument("--compile", type=str, default=None, choices=list(COMPILE_MODES), help="torch.compile の mode")
+    parser.add_argument("--cpu-int8", action="store_true", help="CPU で動的 int8 量子化したモデルを使う")
+    parser.add_argument("--threads", type=int, default=None, help="CPU 推論の intra-op スレッド数")
+    parser.add_argument("--device", type=str, default=None, help="実行デバイス（例: cuda:1, cpu。未指定時は自動選択）")
+    parser.add_argument("--cores", type=str, default=None, help="プロセスを固定する CPU のコア集合（例: 0-7,16。Linux のみ）")
+    parser.add_argument(
+        "--backend", choices=["real", "fake"], default="real", help="real: 実モデル, fake: 偽モデル（ルーター等の動作確認用）"
+    )
+    parser.add_argument("--fake-latency-per-char", type=float, default=0.0, help="偽モデルの 1 文字あたりの生成時間（秒）")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="1 バッチの最大件数")
+    parser.add_argument("--max-wait-ms", type=float, default=20.0, help="バッチを締め切るまでの最大待ち時間（ミリ秒）")
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=2.0,
+        help="メタデータの変更を確認する間隔（秒）。変わった話者だけを再起動なしで反映する（0 で監視しない）",
+    )
+    args = parser.parse_args()
+
+    report = StartupReport()
+    root = Path(args.metadata).resolve().parent.parent
+    options = build_model_options(
+        compile_mode=args.compile, cpu_int8=args.cpu_int8, cpu_threads=args.threads, project_root=root
+    )
+    if args.device:
+        options["device"] = args.device
+    if args.backend == "fake":
+        from src.tts.fake_model import make_fake_loader
+
+        options["model_loader"] = make_fake_loader(latency_per_char_sec=args.fake_latency_per_char)
+    model_future = start_model_load(DEFAULT_MODEL_NAME, report=report, **options)
+
+    from src.tts import MultiSpeakerSynthesizer, get_registry
+
+    try:
+        with report.phase("metadata"):
+            profile_manager = VoiceProfileManager(args.metadata)
+        store = None if args.no_prompt_store else PromptArtifactStore(root / DEFAULT_STORE_DIR)
+        references = None if args.raw_reference else ReferenceStore(root / DEFAULT_REFERENCE_DIR)
+        prepared = {}
+        for name in profile_manager.list_speakers():
+            profile = profile_manager.get_profile(name)
+            prepared[name] = (
+                profile,
+                prepare_reference(
+                    str(profile_manager.resolve_audio_path(profile)),
+                    profile["corpus_text"],
+                    model_name=DEFAULT_MODEL_NAME,
+                    device=options.get("device"),
+                    store=store,
+                    sample_id=profile["sample_id"],
+                    report=report,
+                    reference_store=references,
+                ),
+            )
+        preloaded = model_future.result()
+        synthesizer = MultiSpeakerSynthesizer(
+            model_name=DEFAULT_MODEL_NAME,
+            device=options.get("device"),
+            reference_store=references,
+            clone_mode=args.clone_mode,
+        )
+        get_registry().release(preloaded)
+        with report.phase("prompt_install"):
+            for name, (profile, ref) in prepared.items():
+                samples = None
+                if args.clone_mode == "xvector":
+                    samples = [
+                        (p["sample_id"], str(profile_manager.resolve_audio_path(p)))
+                        for p in profile_manager.get_all_profiles(name)
+                    ]
+                synthesizer.register_speaker(
+                    name, ref.audio_path, profile["corpus_text"], profile["language"], samples=samples
+                )
+                # xvector では参照音声コードのプロンプトを使わない
+                if args.clone_mode == "full":
+                    ref.install(synthesizer.wrapper, store)
+        if args.warmup or args.compile:
+            with report.phase("warmup"):
+                synthesizer.warmup()
+        server = SynthesisServer(
+            synthesizer,
+            socket_path=args.socket,
+            host=args.host,
+            port=args.port,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+        )
+    except (FileNotFoundError, ValueError, RuntimeError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.watch_interval > 0:
+        last_error: Dict[str, str] = {}
+
+        def on_change(changes: Any) -> None:
+            last_error.clear()
+            result = synthesizer.reload_profiles(profile_manager, changes.speakers)
+            summary = ", ".join(f"{name}: {state}" for name, state in result.items())
+            print(f"メタデータを再読み込みしました（{summary or '変更なし'}）", file=sys.stderr)
+
+        def on_error(e: Exception) -> None:
+            # 読み込めるまで監視の間隔ごとに再試行するため、同じエラーは 1 回だけ表示する
+            if last_error.get("message") == str(e):
+                return
+            last_error["message"] = str(e)
+            print(f"メタデータの再読み込みに失敗しました（前の内容のまま続けます）: {e}", file=sys.stderr)
+
+        profile_manager.add_listener(on_change)
+        profile_manager.watch(args.watch_interval, on_error=on_error)
+
+    print(report.render(), file=sys.stderr)
+    print(f"待ち受け中: {server.address}（話者: {', '.join(synthesizer.list_speakers())}）", file=sys.stderr)
+
+    def stop(signum: int, frame: Any) -> None:
+        threading.Thread(target=server.close, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        profile_manager.stop_watching()
+        server.close()
+        synthesizer.close()
+
+
+if __name__ == "__main__":
+    main()
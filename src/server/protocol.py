@@ -0,0 +1,87 @@
+# coding=utf-8
+"""
+合成デーモンとクライアントで共有する接続先・形式・例外の定義。
+
+リクエストは JSON（POST /synthesize）、レスポンスは音声のバイト列（WAV または s16le の生 PCM）。
+サンプリングレート等はレスポンスヘッダで返す。エラーは {"error": メッセージ} の JSON と HTTP ステータスで返す。
+
+このモジュールは torch を import しない（クライアント側の起動を速くするため）。
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import List
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 環境変数でソケットのパスを上書きできる
+SOCKET_ENV = "TTS_SERVER_SOCKET"
+
+AUDIO_FORMATS = ("wav", "pcm")
+CONTENT_TYPES = {"wav": "audio/wav", "pcm": "audio/L16"}
+
+# レスポンスヘッダ
+HEADER_SAMPLE_RATE = "X-Sample-Rate"
+HEADER_QUEUE_WAIT = "X-Queue-Wait-Sec"
+HEADER_COMPUTE = "X-Compute-Sec"
+HEADER_BATCH_SIZE = "X-Batch-Size"
+# ルーター（src.server.router）が合成したレプリカの名前
+HEADER_REPLICA = "X-Replica"
+
+
+def default_socket_path() -> Path:
+    """
+    既定の Unix ドメインソケットのパス。
+
+    環境変数 TTS_SERVER_SOCKET があればそれ、なければ XDG_RUNTIME_DIR（なければ一時ディレクトリ）の
+    qwen3-tts-<uid>.sock。ソケットのパスは長さ制限（約 100 バイト）があるためプロジェクト内には置かない。
+    """
+    env = os.environ.get(SOCKET_ENV)
+    if env:
+        return Path(env)
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(base) / f"qwen3-tts-{uid}.sock"
+
+
+def parse_cores(spec: str) -> List[int]:
+    """
+    コア集合の指定（"0-3,8" の形式）を CPU 番号のリストにする。
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    cores: List[int] = []
+    try:
+        for part in spec.split(","):
+            part = part.strip()
+            if "-" in part:
+                first, last = (int(v) for v in part.split("-", 1))
+                if first > last:
+                    raise ValueError
+                cores.extend(range(first, last + 1))
+            elif part:
+                cores.append(int(part))
+    except ValueError:
+        raise ValueError(f"コア集合は 0-3,8 の形式で指定してください: {spec}") from None
+    if not cores or min(cores) < 0:
+        raise ValueError(f"コア集合は 0-3,8 の形式で指定してください: {spec}")
+    return sorted(set(cores))
+
+
+class ServerError(RuntimeError):
+    """デーモンがエラーを返した。"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ServerUnavailableError(ServerError):
+    """デーモンに接続できない（起動していない等）、または応答の途中で接続が切れた。"""
+
+    def __init__(self, message: str) -> None:
+        super().__init__(0, message)
@@ -0,0 +1,658 @@
+# coding=utf-8
+"""
+複数の合成エンジン（レプリカ）の前に立つルーター。
+
+1 プロセスの Qwen3TTSWrapper では、1 台のマシンで同時に進められる生成は 1 系統だけになる。
+ルーターは次のレプリカをまとめ、合成デーモンと同じ API（GET /health・/speakers・/stats、POST /synthesize）で
+受け付ける（SynthesisClient はそのまま使える）。
+- LocalWorker: 同じマシンで起動する合成デーモン（python -m src.server）のプロセス。
+  CPU のコア集合（デーモンの --cores。起動直後に sched_setaffinity）またはデバイス（CUDA_VISIBLE_DEVICES）に固定する
+- HTTP のレプリカ: 別のマシンで --port を付けて起動した合成デーモン
+
+振り分け:
+- 負荷: "least-loaded" はルーターが送って応答待ちの件数、"queue-depth" はそれにレプリカが報告した
+  待ちキューの長さ（/stats の queue_depth）を足した値が最小のレプリカに送る
+- 話者アフィニティ: 話者ごとにレプリカの優先順位を決め（rendezvous hashing）、負荷が最小から
+  affinity_slack 以内なら優先順位の高いレプリカに送る（話者のプロンプト・音声キャッシュが温まったまま使われる）
+- ヘルスチェック: health_interval 秒ごとに /health・/stats を確認し、応答しないレプリカを外す（応答すれば戻す）。
+  止まったローカルワーカーは起動し直す
+- フェイルオーバー: 接続できない・応答の途中で接続が切れた・5xx を返したレプリカに送ったリクエストは、
+  別のレプリカで送り直す
+
+使い方:
+    python -m src.server.router --local 2 --cores 0-7 --cores 8-15 --port 8765 -- --metadata data/metadata.csv
+    python -m src.server.router --local 2 --device cuda:0 --device cuda:1 -- --metadata data/metadata.csv --warmup
+    python -m src.server.router --remote http://10.0.0.2:8765 --remote http://10.0.0.3:8765 --port 8765
+
+このモジュールは torch を import しない（ルーターはモデルを読み込まない）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.server.client import SynthesisClient
+from src.server.daemon import listen, make_handler
+from src.server.protocol import (
+    DEFAULT_HOST,
+    HEADER_REPLICA,
+    ServerError,
+    ServerUnavailableError,
+    default_socket_path,
+    parse_cores,
+)
+
+# レプリカの負荷の数え方
+ROUTING_POLICIES = ("least-loaded", "queue-depth")
+# ローカルワーカーの作業ディレクトリ（python -m src.server を解決できる場所）
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+# ルーターの応答に引き継ぐレプリカのレスポンスヘッダ（Content-Length 等は作り直す）
+_FORWARDED_HEADERS = ("content-type", "x-")
+
+
+class LocalWorker:
+    """同じマシンで起動する合成デーモンのプロセス（CPU のコア集合・デバイスに固定する）。"""
+
+    def __init__(
+        self,
+        socket_path: str | Path,
+        daemon_args: Sequence[str] = (),
+        *,
+        cores: Sequence[int] | None = None,
+        device: str | None = None,
+        log_path: str | Path | None = None,
+        restart_backoff_sec: float = 10.0,
+        python: str = sys.executable,
+    ) -> None:
+        """
+        Args:
+            socket_path: デーモンの Unix ソケットのパス
+            daemon_args: python -m src.server に渡す引数（--metadata 等）
+            cores: 固定する CPU 番号（None は固定しない）。指定すると --threads の既定値もコア数にする
+            device: 固定するデバイス（"cuda:N" は CUDA_VISIBLE_DEVICES=N でその GPU だけを見せる）
+            log_path: デーモンの出力の書き込み先（None はルーターの出力に混ぜる）
+            restart_backoff_sec: 起動してからこの秒数は、止まっても起動し直さない（起動に失敗し続ける場合の連続起動を防ぐ）
+            python: デーモンを起動する Python
+
+        Raises:
+            ValueError: cores が空、またはこのプラットフォームでコアの固定ができない場合
+        """
+        if cores is not None:
+            if not cores:
+                raise ValueError("cores を指定してください。")
+            if not hasattr(os, "sched_setaffinity"):
+                raise ValueError("このプラットフォームではコアを固定できません。")
+        self.socket_path = Path(socket_path)
+        self.cores = sorted(set(cores)) if cores is not None else None
+        self.device = device
+        self.restarts = 0
+        self._daemon_args = list(daemon_args)
+        self._log_path = Path(log_path) if log_path is not None else None
+        self._backoff = restart_backoff_sec
+        self._python = python
+        self._process: Optional[subprocess.Popen] = None
+        self._started_at = float("-inf")
+        self.client = SynthesisClient(self.socket_path)
+
+    def command(self) -> List[str]:
+        """デーモンの起動コマンド。"""
+        args = [self._python, "-m", "src.server", "--socket", str(self.socket_path)]
+        if self.device is not None:
+            args += ["--device", "cuda:0" if self.device.startswith("cuda:") else self.device]
+        if self.cores is not None:
+            args += ["--cores", ",".join(str(c) for c in self.cores)]
+            if "--threads" not in self._daemon_args:
+                args += ["--threads", str(len(self.cores))]
+        return args + self._daemon_args
+
+    def start(self) -> None:
+        """デーモンのプロセスを起動する（待ち受けの開始は wait_ready で待つ）。"""
+        env = dict(os.environ)
+        if self.device is not None and self.device.startswith("cuda:"):
+            env["CUDA_VISIBLE_DEVICES"] = self.device.split(":", 1)[1]
+        if self.cores is not None:
+            env["OMP_NUM_THREADS"] = str(len(self.cores))
+        # コアの固定はデーモン自身が起動直後に行う（--cores。ルーターはスレッドを持つため preexec_fn は使わない）
+        output = open(self._log_path, "ab") if self._log_path is not None else None
+        try:
+            self._process = subprocess.Popen(
+                self.command(),
+                cwd=str(_PROJECT_ROOT),
+                env=env,
+                stdout=output,
+                stderr=subprocess.STDOUT if output is not None else None,
+            )
+        finally:
+            if output is not None:
+                output.close()
+        self._started_at = time.monotonic()
+
+    def wait_ready(self, timeout: float = 600.0) -> bool:
+        """
+        デーモンが待ち受けを始めるまで待つ。
+
+        Returns:
+            待ち受けを始めた場合 True（プロセスが終了した、または timeout を過ぎた場合 False）
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive:
+                return False
+            if self.client.is_available(timeout=1.0):
+                return True
+            time.sleep(0.1)
+        return False
+
+    @property
+    def alive(self) -> bool:
+        """プロセスが動いているか。"""
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def pid(self) -> int | None:
+        """プロセス ID（起動していなければ None）。"""
+        return self._process.pid if self._process is not None else None
+
+    def restart(self) -> bool:
+        """
+        止まったプロセスを起動し直す（動いている、または起動から restart_backoff_sec 以内なら何もしない）。
+
+        Returns:
+            起動し直した場合 True
+        """
+        if self.alive or time.monotonic() - self._started_at < self._backoff:
+            return False
+        self.start()
+        self.restarts += 1
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """プロセスを止める（SIGTERM で処理中のリクエストを終えさせ、timeout を過ぎたら強制終了する）。"""
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+
+class Replica:
+    """ルーターから見た 1 つのレプリカ（状態はルーターが更新する）。"""
+
+    def __init__(self, name: str, client: SynthesisClient, worker: LocalWorker | None = None) -> None:
+        """
+        Args:
+            name: レプリカの名前（応答の X-Replica ヘッダに入る）
+            client: レプリカの合成デーモンに接続するクライアント
+            worker: ローカルワーカーの場合はそのプロセス（止まったらルーターが起動し直す）
+        """
+        self.name = name
+        self.client = client
+        self.worker = worker
+        self.healthy = False
+        self.speakers: frozenset = frozenset()
+        # レプリカが報告した待ちキューの長さ / ルーターが送って応答待ちの件数
+        self.queue_depth = 0
+        self.inflight = 0
+        self.dispatched = 0
+        self.errors = 0
+        self.last_error: str | None = None
+
+    @classmethod
+    def remote(cls, url: str, name: str | None = None, timeout: float = 300.0) -> "Replica":
+        """HTTP で待ち受けている合成デーモン（例: "http://10.0.0.2:8765"）のレプリカ。"""
+        return cls(name or url, SynthesisClient(url=url, timeout=timeout))
+
+    @classmethod
+    def local(cls, worker: LocalWorker, name: str | None = None) -> "Replica":
+        """ローカルワーカーのレプリカ。"""
+        return cls(name or worker.socket_path.stem, worker.client, worker)
+
+    def load(self, policy: str) -> int:
+        """振り分けに使う負荷（ROUTING_POLICIES）。"""
+        return self.inflight + (self.queue_depth if policy == "queue-depth" else 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """統計用の状態。"""
+        state: Dict[str, Any] = {
+            "name": self.name,
+            "address": self.client.address,
+            "healthy": self.healthy,
+            "speakers": sorted(self.speakers),
+            "queue_depth": self.queue_depth,
+            "inflight": self.inflight,
+            "dispatched": self.dispatched,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+        if self.worker is not None:
+            state.update(pid=self.worker.pid, cores=self.worker.cores, device=self.worker.device, restarts=self.worker.restarts)
+        return state
+
+
+def _affinity_score(speaker: str, replica: str) -> int:
+    """話者とレプリカの組の優先度（rendezvous hashing。レプリカが増減しても他の話者の割り当ては変わらない）。"""
+    digest = hashlib.blake2b(f"{speaker}\0{replica}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class Router:
+    """レプリカへの振り分け・ヘルスチェック・フェイルオーバーを行う。"""
+
+    def __init__(
+        self,
+        replicas: Sequence[Replica],
+        *,
+        policy: str = "queue-depth",
+        affinity: bool = True,
+        affinity_slack: int = 1,
+        health_interval: float = 1.0,
+        health_timeout: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            replicas: レプリカ（名前は重複不可）
+            policy: 負荷の数え方（ROUTING_POLICIES）
+            affinity: 話者ごとに同じレプリカを優先する
+            affinity_slack: 優先するレプリカの負荷が最小からこの値以内なら、そのレプリカに送る
+            health_interval: ヘルスチェックの間隔（秒。0 で start() しても定期的には確認しない）
+            health_timeout: ヘルスチェック 1 回の最大待ち時間（秒）
+
+        Raises:
+            ValueError: replicas が空・名前が重複している、または設定値が不正な場合
+        """
+        if not replicas:
+            raise ValueError("replicas を指定してください。")
+        if len({r.name for r in replicas}) != len(replicas):
+            raise ValueError("レプリカの名前が重複しています。")
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"policy は {', '.join(ROUTING_POLICIES)} のいずれかを指定してください。")
+        if affinity_slack < 0 or health_interval < 0 or health_timeout <= 0:
+            raise ValueError("affinity_slack・health_interval は 0 以上、health_timeout は正の値を指定してください。")
+        self._replicas = list(replicas)
+        self._policy = policy
+        self._affinity = affinity
+        self._slack = affinity_slack
+        self._interval = health_interval
+        self._health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "failovers": 0, "failed": 0, "restarts": 0}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def replicas(self) -> List[Replica]:
+        """レプリカの一覧。"""
+        return list(self._replicas)
+
+    def start(self) -> "Router":
+        """全レプリカを 1 回確認し、定期的なヘルスチェックを別スレッドで始める。"""
+        self.check_health()
+        if self._interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tts-router-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, stop_workers: bool = True) -> None:
+        """ヘルスチェックを止める。stop_workers の場合はローカルワーカーのプロセスも止める。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if stop_workers:
+            for replica in self._replicas:
+                if replica.worker is not None:
+                    replica.worker.stop()
+
+    def __enter__(self) -> "Router":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def check_health(self) -> None:
+        """全レプリカの /health・/stats を確認し、状態を更新する。止まったローカルワーカーは起動し直す。"""
+        for replica in self._replicas:
+            self._probe(replica)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.check_health()
+
+    def _probe(self, replica: Replica) -> None:
+        worker = replica.worker
+        if worker is not None and not worker.alive:
+            self._mark_down(replica, "ワーカーのプロセスが終了しています。")
+            if worker.restart():
+                with self._lock:
+                    self._counts["restarts"] += 1
+            return
+        try:
+            health = replica.client.health(timeout=self._health_timeout)
+            stats = replica.client.stats(timeout=self._health_timeout)
+        except (ServerError, ValueError, OSError) as e:
+            self._mark_down(replica, str(e))
+            return
+        with self._lock:
+            replica.healthy = health.get("status") == "ok"
+            replica.speakers = frozenset(health.get("speakers", []))
+            replica.queue_depth = int(stats.get("queue_depth", 0))
+
+    def _mark_down(self, replica: Replica, error: str) -> None:
+        with self._lock:
+            if replica.healthy:
+                replica.errors += 1
+            replica.healthy = False
+            replica.last_error = error
+
+    def choose(self, speaker: str, exclude: Sequence[str] = ()) -> Replica:
+        """
+        リクエストを送るレプリカを選び、応答待ちの件数に数える（呼び出し側は終わったら _done で戻す）。
+
+        Raises:
+            ServerUnavailableError: 使えるレプリカがない、または話者がいるレプリカがすべて exclude にある場合
+            LookupError: 使えるレプリカのどれにも話者が登録されていない場合（exclude が空のとき）
+        """
+        with self._lock:
+            healthy = [r for r in self._replicas if r.healthy and r.name not in exclude]
+            if not healthy:
+                raise ServerUnavailableError("合成できるレプリカがありません。")
+            candidates = [r for r in healthy if speaker in r.speakers]
+            if not candidates:
+                if exclude:
+                    # 話者がいるレプリカは送り直しの対象から外れた（話者がいないのではなく、合成できない）
+                    raise ServerUnavailableError(f"話者 {speaker} を合成できるレプリカがありません。")
+                raise LookupError(f"話者が登録されていません: {speaker}")
+            best = min(r.load(self._policy) for r in candidates)
+            if self._affinity:
+                ranked = sorted(candidates, key=lambda r: _affinity_score(speaker, r.name), reverse=True)
+                chosen = next(r for r in ranked if r.load(self._policy) <= best + self._slack)
+            else:
+                chosen = min(candidates, key=lambda r: (r.load(self._policy), r.dispatched))
+            chosen.inflight += 1
+            chosen.dispatched += 1
+            return chosen
+
+    def _done(self, replica: Replica) -> None:
+        with self._lock:
+            replica.inflight -= 1
+
+    def synthesize_bytes(
+        self,
+        text: str,
+        speaker: str,
+        language: str | None = None,
+        audio_format: str = "wav",
+        *,
+        priority: str | None = None,
+        user: str | None = None,
+        guild: str | None = None,
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """
+        レプリカで合成する（SynthesisClient.synthesize_bytes と同じ形）。失敗したレプリカを除いて送り直す。
+
+        Returns:
+            (音声のバイト列, レスポンスヘッダ。X-Replica に合成したレプリカの名前)
+
+        Raises:
+            ValueError: 入力が不正な場合（レプリカが 400 / 404 を返した）
+            LookupError: 話者が登録されていない場合
+            ServerUnavailableError: 全レプリカが使えない・失敗した場合
+        """
+        with self._lock:
+            self._counts["requests"] += 1
+        tried: List[str] = []
+        last_error: ServerError | None = None
+        while True:
+            try:
+                replica = self.choose(speaker, tried)
+            except ServerUnavailableError as e:
+                with self._lock:
+                    self._counts["failed"] += 1
+                if last_error is not None:
+                    raise ServerUnavailableError(f"{e}（最後のエラー: {last_error}）") from last_error
+                raise
+            try:
+                # 処理中にレプリカが止まって接続が切れた場合も ServerUnavailableError になる
+                body, headers = replica.client.synthesize_bytes(
+                    text, speaker, language, audio_format, priority=priority, user=user, guild=guild
+                )
+            except ServerError as e:
+                # 接続できないレプリカは外す（キュー満杯・生成失敗は外さずに、このリクエストだけ別のレプリカへ）
+                if isinstance(e, ServerUnavailableError):
+                    self._mark_down(replica, str(e))
+                else:
+                    with self._lock:
+                        replica.errors += 1
+                        replica.last_error = str(e)
+                with self._lock:
+                    self._counts["failovers"] += 1
+                tried.append(replica.name)
+                last_error = e
+                continue
+            finally:
+                self._done(replica)
+            headers[HEADER_REPLICA] = replica.name
+            return body, headers
+
+    def health(self) -> Dict[str, Any]:
+        """GET /health の内容（使えるレプリカが 1 つでもあれば status は "ok"）。"""
+        with self._lock:
+            healthy = [r for r in self._replicas if r.healthy]
+            return {
+                "status": "ok" if healthy else "unavailable",
+                "replicas": {r.name: r.healthy for r in self._replicas},
+                "speakers": sorted(set().union(*(r.speakers for r in healthy))),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """GET /stats の内容（requests, failovers, failed, restarts, queue_depth, replicas）。"""
+        with self._lock:
+            return {
+                "policy": self._policy,
+                "affinity": self._affinity,
+                **self._counts,
+                "queue_depth": sum(r.queue_depth + r.inflight for r in self._replicas if r.healthy),
+                "replicas": [r.to_dict() for r in self._replicas],
+            }
+
+
+class RouterServer:
+    """Router を合成デーモンと同じ API で待ち受けるサーバ。"""
+
+    def __init__(
+        self,
+        router: Router,
+        *,
+        socket_path: str | Path | None = None,
+        host: str = DEFAULT_HOST,
+        port: int | None = None,
+    ) -> None:
+        """
+        Args:
+            router: 振り分けに使う Router（close はしない）
+            socket_path: Unix ドメインソケットのパス（None は default_socket_path()）。port 指定時は使わない
+            host: HTTP の待ち受けアドレス（port 指定時のみ）
+            port: 指定すると Unix ソケットの代わりに HTTP で待ち受ける（0 で空きポート）
+
+        Raises:
+            RuntimeError: 同じソケットで別のデーモンが動いている場合
+            OSError: 待ち受けに失敗した場合
+        """
+        self._router = router
+        self._httpd, self._socket_path = listen(
+            make_handler(self, (ServerUnavailableError,)), socket_path, host, port
+        )
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def address(self) -> str:
+        """待ち受けているアドレス（Unix ソケットのパス、または http://host:port）。"""
+        if self._socket_path is not None:
+            return str(self._socket_path)
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def port(self) -> int | None:
+        """HTTP で待ち受けている場合のポート番号。"""
+        return None if self._socket_path is not None else self._httpd.server_address[1]
+
+    def serve_forever(self) -> None:
+        """close() されるまでリクエストを処理する（呼び出したスレッドをブロックする）。"""
+        self._httpd.serve_forever(poll_interval=0.2)
+
+    def start(self) -> "RouterServer":
+        """別スレッドで serve_forever を始める。"""
+        self._thread = threading.Thread(target=self.serve_forever, name="tts-router", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """待ち受けを止める。2 回目以降は何もしない。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._socket_path is not None:
+            try:
+                self._socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "RouterServer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def health(self) -> Dict[str, Any]:
+        """GET /health の内容。"""
+        return self._router.health()
+
+    def speakers(self) -> Dict[str, Any]:
+        """GET /speakers の内容（使えるレプリカに登録されている話者）。"""
+        return {"speakers": [{"name": name} for name in self._router.health()["speakers"]]}
+
+    def stats(self) -> Dict[str, Any]:
+        """GET /stats の内容。"""
+        return self._router.stats()
+
+    def synthesize(self, request: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+        """
+        POST /synthesize を処理する（リクエストは合成デーモンと同じ）。
+
+        Raises:
+            ValueError: 入力が不正な場合
+            LookupError: 話者が登録されていない場合
+            ServerUnavailableError: 全レプリカが使えない場合
+        """
+        text = request.get("text")
+        speaker = request.get("speaker")
+        if not isinstance(text, str) or not isinstance(speaker, str):
+            raise ValueError("text と speaker を文字列で指定してください。")
+        body, headers = self._router.synthesize_bytes(
+            text,
+            speaker,
+            request.get("language"),
+            request.get("format", "wav"),
+            priority=request.get("priority"),
+            user=request.get("user"),
+            guild=request.get("guild"),
+        )
+        return body, {k: v for k, v in headers.items() if k.lower().startswith(_FORWARDED_HEADERS)}
+
+
+def main() -> None:
+    """ルーターのメイン処理（ローカルワーカーを起動し、リモートのレプリカとまとめて待ち受ける）。"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.server.router",
+        description="複数の合成デーモン（ローカルのワーカープロセス・リモートの HTTP）への振り分け",
+    )
+    parser.add_argument("--local", type=int, default=0, help="起動するローカルワーカーの数")
+    parser.add_argument(
+        "--cores", action="append", default=[], help="ワーカーに固定するコア集合（例: 0-7。ワーカーごとに繰り返し指定）"
+    )
+    parser.add_argument(
+        "--device", action="append", default=[], help="ワーカーに固定するデバイス（例: cuda:1。ワーカーごとに繰り返し指定）"
+    )
+    parser.add_argument("--remote", action="append", default=[], help="リモートの合成デーモンの URL（繰り返し指定）")
+    parser.add_argument(
+        "--socket", type=str, default=None, help=f"Unix ソケットのパス（デフォルト: {default_socket_path()}）"
+    )
+    parser.add_argument("--port", type=int, default=None, help="指定すると localhost の HTTP で待ち受ける")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="HTTP の待ち受けアドレス")
+    parser.add_argument("--policy", choices=list(ROUTING_POLICIES), default="queue-depth", help="負荷の数え方")
+    parser.add_argument("--no-affinity", action="store_true", help="話者ごとに同じレプリカを優先しない")
+    parser.add_argument("--health-interval", type=float, default=1.0, help="ヘルスチェックの間隔（秒）")
+    parser.add_argument("--log-dir", type=str, default=None, help="ワーカーの出力を <log-dir>/<名前>.log に書く")
+    parser.add_argument("daemon_args", nargs=argparse.REMAINDER, help="-- の後はワーカー（python -m src.server）に渡す引数")
+    args = parser.parse_args()
+
+    daemon_args = args.daemon_args[1:] if args.daemon_args[:1] == ["--"] else args.daemon_args
+    if args.local < 0 or (args.local == 0 and not args.remote):
+        parser.error("--local（1 以上）または --remote を指定してください。")
+    for name, values in (("--cores", args.cores), ("--device", args.device)):
+        if values and len(values) != args.local:
+            parser.error(f"{name} はワーカーの数（{args.local}）だけ指定してください。")
+
+    base = args.socket or str(default_socket_path())
+    replicas: List[Replica] = []
+    try:
+        for i in range(args.local):
+            name = f"worker{i}"
+            worker = LocalWorker(
+                Path(base).with_name(f"{Path(base).stem}-{name}.sock"),
+                daemon_args,
+                cores=parse_cores(args.cores[i]) if args.cores else None,
+                device=args.device[i] if args.device else None,
+                log_path=Path(args.log_dir) / f"{name}.log" if args.log_dir else None,
+            )
+            worker.start()
+            replicas.append(Replica.local(worker, name))
+        replicas += [Replica.remote(url) for url in args.remote]
+        for replica in replicas:
+            if replica.worker is not None and not replica.worker.wait_ready():
+                print(f"警告: {replica.name} が起動しませんでした（ヘルスチェックで起動し直します）", file=sys.stderr)
+        router = Router(
+            replicas, policy=args.policy, affinity=not args.no_affinity, health_interval=args.health_interval
+        ).start()
+        server = RouterServer(router, socket_path=args.socket, host=args.host, port=args.port)
+    except (ValueError, RuntimeError, OSError) as e:
+        for replica in replicas:
+            if replica.worker is not None:
+                replica.worker.stop()
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    healthy = [name for name, ok in router.health()["replicas"].items() if ok]
+    print(f"待ち受け中: {server.address}（レプリカ: {', '.join(healthy) or 'なし'}）", file=sys.stderr)
+
+    def stop(signum: int, frame: Any) -> None:
+        threading.Thread(target=server.close, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        router.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,951 @@
+# coding=utf-8
+"""
+TTS 性能計測CLIツール。
+
+使い方:
+    # 逐次生成とバッチ生成のスループット比較（CPU）
+    python -m src.tools.benchmark --device cpu batch --count 8 --batch-size 8
+
+    # TTS 経路の計測一式を JSON に保存（偽モデルなら GPU・モデルのダウンロード不要）
+    python -m src.tools.benchmark --device cpu suite --backend fake --output logs/bench.json
+
+    # 保存したベースラインと比較し、悪化した指標があれば終了コード 1
+    python -m src.tools.benchmark --device cpu suite --backend fake --compare logs/bench.json
+    python -m src.tools.benchmark compare logs/bench_new.json logs/bench.json
+
+    # 初回と定常の生成時間を、ウォームアップなし・あり・torch.compile で比較
+    python -m src.tools.benchmark warmup --modes none warmup compile
+
+    # CPU の float32 と動的 int8 量子化の RTF・メモリ・出力の類似度を比較
+    python -m src.tools.benchmark cpu --count 4 --threads 8
+
+    # 参照音声コード + 参照テキストのプロンプトと、話者埋め込みのみのプロンプトの速度・メモリを比較
+    python -m src.tools.benchmark clone-mode --count 8 --fusion mean
+
+    # モデル出力 → Discord 用 PCM フレーム（48 kHz・ステレオ・s16le）の変換を従来の経路と比較
+    python -m src.tools.benchmark pcm --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.profile import VoiceProfileManager
+from src.tts.cpu_mode import DEFAULT_QUANTIZED_DIR
+from src.tts.speaker_embedding import EMBEDDING_FUSIONS
+
+# 比較対象の指標と、良い方向（"lower" は小さいほど良い）
+METRIC_DIRECTIONS = {
+    "load_sec": "lower",
+    "ref_load_sec": "lower",
+    "ttfa_sec": "lower",
+    "rtf": "lower",
+    "wrapper_items_per_sec": "higher",
+    "batch_items_per_sec": "higher",
+    "manager_items_per_sec": "higher",
+    "peak_rss_mb": "lower",
+    "peak_vram_mb": "lower",
+}
+
+# 計測用の読み上げテキスト（長さをばらつかせる）
+SAMPLE_TEXTS = (
+    "おはようございます。",
+    "今日はいい天気ですね。",
+    "了解しました、すぐに向かいます。",
+    "このあと少し作業してから寝ます。",
+    "来週の予定について相談させてください。",
+    "ボイスクローンの性能を測定しています。",
+    "メッセージを読み上げるまでの時間を短くしたいです。",
+    "短い文と長い文を混ぜて、バッチ処理の効果を確認します。",
+)
+
+
+def _texts(count: int) -> List[str]:
+    """計測用テキストを count 件返す。"""
+    return [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(count)]
+
+
+def run_batch_benchmark(args: argparse.Namespace) -> dict:
+    """
+    同じテキスト群を逐次生成（generate_voice × N）とバッチ生成（generate_voice_batch）で比較する。
+
+    Returns:
+        計測結果の辞書
+    """
+    import torch
+
+    from src.tts import Qwen3TTSWrapper
+    from src.tts.voice_clone import _normalize_language, resolve_device_dtype
+
+    profile_manager = VoiceProfileManager(args.metadata)
+    profile = profile_manager.get_profile(args.speaker or profile_manager.list_speakers()[0])
+    ref_audio_path = str(profile_manager.resolve_audio_path(profile))
+    ref_text = profile["corpus_text"]
+    language = _normalize_language(profile["language"])
+
+    device, dtype = resolve_device_dtype(args.device, None)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"モデルをロード中: {args.model_name} ({device}, {dtype})")
+    wrapper = Qwen3TTSWrapper(model_name=args.model_name, device=device, dtype=dtype)
+    texts = _texts(args.count)
+
+    # ウォームアップ（プロンプト作成と初回カーネル選択を計測から除く）
+    wrapper.generate_voice(texts[0], ref_audio_path, ref_text, language, max_new_tokens=args.max_new_tokens)
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    seq_audio = 0.0
+    for text in texts:
+        wav, sr = wrapper.generate_voice(text, ref_audio_path, ref_text, language, max_new_tokens=args.max_new_tokens)
+        seq_audio += len(wav) / sr
+    seq_elapsed = time.perf_counter() - start
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    results = wrapper.generate_voice_batch(
+        texts,
+        [(ref_audio_path, ref_text)],
+        language,
+        max_new_tokens=args.max_new_tokens,
+        max_batch_size=args.batch_size,
+    )
+    batch_elapsed = time.perf_counter() - start
+    batch_audio = sum(len(wav) / sr for wav, sr in results)
+
+    return {
+        "count": len(texts),
+        "batch_size": args.batch_size,
+        "sequential_sec": seq_elapsed,
+        "sequential_items_per_sec": len(texts) / seq_elapsed,
+        "sequential_audio_sec": seq_audio,
+        "batch_sec": batch_elapsed,
+        "batch_items_per_sec": len(texts) / batch_elapsed,
+        "batch_audio_sec": batch_audio,
+        "speedup": seq_elapsed / batch_elapsed if batch_elapsed > 0 else 0.0,
+    }
+
+
+def _peak_rss_mb() -> float:
+    """プロセスの最大常駐メモリ（MB）。Linux の ru_maxrss は KB 単位。"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _current_rss_mb() -> float:
+    """現在の常駐メモリ（MB）。/proc がなければ最大常駐メモリで代用する。"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def run_suite(
+    *,
+    ref_audio_path: str,
+    ref_text: str,
+    language: str,
+    model_name: str,
+    device: str,
+    dtype: Any,
+    texts: List[str],
+    batch_size: int = 8,
+    max_new_tokens: int = 512,
+    model_loader: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Qwen3TTSWrapper と VoiceCloneManager の TTS 経路を一通り計測する。
+
+    - load_sec: モデルのロード時間
+    - ref_load_sec: 参照音声の読み込み + プロンプト作成（キャッシュなし）の時間
+    - ttfa_sec: generate_voice_stream で最初のチャンクが得られるまでの時間
+    - rtf: 逐次生成の所要時間 ÷ 生成した音声の長さ
+    - wrapper_items_per_sec / batch_items_per_sec / manager_items_per_sec:
+      generate_voice の逐次・generate_voice_batch・VoiceCloneManager.synthesize のスループット
+    - peak_rss_mb / peak_vram_mb: 最大常駐メモリ・最大 VRAM 使用量（CUDA 以外は None）
+
+    Args:
+        ref_audio_path: 参照音声のパス
+        ref_text: 参照音声の内容
+        language: 言語（"Japanese" 等）
+        model_name: モデル ID
+        device: 実行デバイス
+        dtype: dtype
+        texts: 計測に使うテキスト
+        batch_size: バッチ生成の最大件数
+        max_new_tokens: 生成トークン数の上限
+        model_loader: Qwen3TTSWrapper の model_loader（偽モデルを使う場合に指定）
+
+    Returns:
+        指標の辞書
+    """
+    import torch
+
+    from src.tts import ModelRegistry, VoiceCloneManager
+
+    cuda = device.startswith("cuda") and torch.cuda.is_available()
+    if cuda:
+        torch.cuda.reset_peak_memory_stats()
+
+    registry = ModelRegistry()
+    start = time.perf_counter()
+    wrapper = registry.acquire(model_name, device, dtype, model_loader=model_loader)
+    load_sec = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        wrapper.get_voice_clone_prompt(ref_audio_path, ref_text)
+        ref_load_sec = time.perf_counter() - start
+
+        # ウォームアップ（初回のカーネル選択等を計測から除く）
+        wrapper.generate_voice(texts[0], ref_audio_path, ref_text, language, max_new_tokens=max_new_tokens, seed=0)
+
+        start = time.perf_counter()
+        stream = wrapper.generate_voice_stream(
+            "。".join(texts[:2]) + "。", ref_audio_path, ref_text, language, max_new_tokens=max_new_tokens
+        )
+        next(stream)
+        ttfa_sec = time.perf_counter() - start
+        stream.close()
+
+        start = time.perf_counter()
+        audio_sec = 0.0
+        for text in texts:
+            wav, sr = wrapper.generate_voice(
+                text, ref_audio_path, ref_text, language, max_new_tokens=max_new_tokens, seed=0
+            )
+            audio_sec += len(wav) / sr
+        seq_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        wrapper.generate_voice_batch(
+            texts,
+            [(ref_audio_path, ref_text)],
+            language,
+            max_new_tokens=max_new_tokens,
+            max_batch_size=batch_size,
+            seed=0,
+        )
+        batch_sec = time.perf_counter() - start
+
+        with VoiceCloneManager(
+            ref_audio_path, ref_text, language, model_name=model_name, device=device, dtype=dtype,
+            registry=registry, seed=0,
+        ) as manager:
+            start = time.perf_counter()
+            for text in texts:
+                manager.synthesize(text, language=language)
+            manager_sec = time.perf_counter() - start
+    finally:
+        registry.release(wrapper)
+
+    return {
+        "load_sec": load_sec,
+        "ref_load_sec": ref_load_sec,
+        "ttfa_sec": ttfa_sec,
+        "rtf": seq_sec / audio_sec if audio_sec > 0 else 0.0,
+        "wrapper_items_per_sec": len(texts) / seq_sec if seq_sec > 0 else 0.0,
+        "batch_items_per_sec": len(texts) / batch_sec if batch_sec > 0 else 0.0,
+        "manager_items_per_sec": len(texts) / manager_sec if manager_sec > 0 else 0.0,
+        "audio_sec": audio_sec,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_vram_mb": torch.cuda.max_memory_allocated() / (1024 * 1024) if cuda else None,
+    }
+
+
+WARMUP_MODES = ("none", "warmup", "compile")
+
+
+def run_warmup_benchmark(
+    *,
+    ref_audio_path: str,
+    ref_text: str,
+    language: str,
+    model_name: str,
+    device: str,
+    dtype: Any,
+    text: str,
+    modes: Sequence[str] = WARMUP_MODES,
+    compile_mode: str = "default",
+    steady_calls: int = 3,
+    model_loader: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    ロード直後の最初の generate_voice と定常の generate_voice の時間を実行モードごとに計測する。
+
+    モードごとにモデルをロードし直す:
+    - none: ウォームアップなし（最初の呼び出しに参照音声のプロンプト作成も含まれる）
+    - warmup: Qwen3TTSWrapper.warmup() の後に計測
+    - compile: torch.compile（compile_mode）を適用し、warmup() の後に計測
+
+    Args:
+        ref_audio_path: 参照音声のパス
+        ref_text: 参照音声の内容
+        language: 言語（"Japanese" 等）
+        model_name: モデル ID
+        device: 実行デバイス
+        dtype: dtype
+        text: 計測に使うテキスト
+        modes: 計測するモード（WARMUP_MODES のいずれか）
+        compile_mode: compile モードで使う torch.compile の mode
+        steady_calls: 定常の時間（中央値）を取る呼び出し回数
+        model_loader: Qwen3TTSWrapper の model_loader（偽モデルを使う場合に指定）
+
+    Returns:
+        {モード: {load_sec, warmup_sec, first_call_sec, steady_sec, first_over_steady}}
+
+    Raises:
+        ValueError: modes に不正な値がある場合
+    """
+    import gc
+
+    import torch
+
+    from src.tts import Qwen3TTSWrapper
+
+    unknown = [m for m in modes if m not in WARMUP_MODES]
+    if unknown:
+        raise ValueError(f"modes は {', '.join(WARMUP_MODES)} から指定してください: {unknown}")
+
+    def generate(wrapper: Qwen3TTSWrapper) -> float:
+        start = time.perf_counter()
+        wrapper.generate_voice(text, ref_audio_path, ref_text, language, seed=0)
+        return time.perf_counter() - start
+
+    results: Dict[str, Dict[str, float]] = {}
+    for mode in modes:
+        start = time.perf_counter()
+        wrapper = Qwen3TTSWrapper(
+            model_name=model_name,
+            device=device,
+            dtype=dtype,
+            model_loader=model_loader,
+            compile_mode=compile_mode if mode == "compile" else None,
+        )
+        load_sec = time.perf_counter() - start
+        warmup_sec = sum(wrapper.warmup(ref_audio_path, ref_text, language)) if mode != "none" else 0.0
+        first_call_sec = generate(wrapper)
+        steady_sec = statistics.median(generate(wrapper) for _ in range(max(1, steady_calls)))
+        results[mode] = {
+            "load_sec": load_sec,
+            "warmup_sec": warmup_sec,
+            "first_call_sec": first_call_sec,
+            "steady_sec": steady_sec,
+            "first_over_steady": first_call_sec / steady_sec if steady_sec > 0 else 0.0,
+        }
+        del wrapper
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    return results
+
+
+def run_cpu_benchmark(
+    *,
+    ref_audio_path: str,
+    ref_text: str,
+    language: str,
+    model_name: str,
+    texts: List[str],
+    threads: Optional[int] = None,
+    quantized_dir: Optional[str] = None,
+    model_loader: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Any]:
+    """
+    CPU で float32 と動的 int8 量子化（Qwen3TTSWrapper(quantize_int8=True)）を比較する。
+
+    構成ごとにモデルをロードし直し、同じシードで texts を逐次生成する。
+    - load_sec: ロード（+ 量子化または量子化済み重みの読み込み）の時間
+    - rss_mb: ロードによる常駐メモリの増分（同じプロセスで続けて計測するため目安）
+    - rtf: 生成の所要時間 ÷ 生成した音声の長さ
+    - similarity: テキストごとの float32 と int8 の出力の声質の近さ（cpu_mode.output_similarity）
+
+    Args:
+        ref_audio_path: 参照音声のパス
+        ref_text: 参照音声の内容
+        language: 言語（"Japanese" 等）
+        model_name: モデル ID
+        texts: 計測に使うテキスト
+        threads: intra-op スレッド数（None は自動）
+        quantized_dir: 量子化済み重みの保存先のルート（None で保存しない）
+        model_loader: Qwen3TTSWrapper の model_loader（偽モデルを使う場合に指定）
+
+    Returns:
+        {"float32": {...}, "int8": {...}, "similarity": [...], "mean_similarity": float}
+    """
+    import gc
+
+    import torch
+
+    from src.tts import Qwen3TTSWrapper
+    from src.tts.cpu_mode import configure_cpu_threads, output_similarity
+
+    configure_cpu_threads(threads)
+    results: Dict[str, Any] = {}
+    outputs: Dict[str, List[Any]] = {}
+    for name, quantize in (("float32", False), ("int8", True)):
+        gc.collect()
+        rss_before = _current_rss_mb()
+        start = time.perf_counter()
+        wrapper = Qwen3TTSWrapper(
+            model_name=model_name,
+            device="cpu",
+            dtype=torch.float32,
+            model_loader=model_loader,
+            quantize_int8=quantize,
+            cpu_threads=threads,
+            quantized_dir=quantized_dir if quantize else None,
+        )
+        load_sec = time.perf_counter() - start
+        rss_mb = _current_rss_mb() - rss_before
+
+        # ウォームアップ（プロンプト作成と初回の遅れを計測から除く）
+        wrapper.warmup(ref_audio_path, ref_text, language, texts[:1])
+        wavs = []
+        audio_sec = 0.0
+        start = time.perf_counter()
+        for text in texts:
+            wav, sr = wrapper.generate_voice(text, ref_audio_path, ref_text, language, seed=0)
+            wavs.append((wav, sr))
+            audio_sec += len(wav) / sr
+        gen_sec = time.perf_counter() - start
+
+        results[name] = {
+            "load_sec": load_sec,
+            "rss_mb": rss_mb,
+            "rtf": gen_sec / audio_sec if audio_sec > 0 else 0.0,
+            "quantized_linears": wrapper.quantization["linears"],
+            "loaded_quantized": wrapper.quantization["loaded"],
+        }
+        outputs[name] = wavs
+        del wrapper
+        gc.collect()
+
+    similarity = [
+        output_similarity(a, b, sr) for (a, sr), (b, _) in zip(outputs["float32"], outputs["int8"])
+    ]
+    results["similarity"] = similarity
+    results["mean_similarity"] = sum(similarity) / len(similarity) if similarity else 0.0
+    return results
+
+
+def _prompt_nbytes(prompt: List[Any]) -> int:
+    """プロンプト（VoiceClonePromptItem のリスト）が持つテンソルのバイト数。"""
+    total = 0
+    for item in prompt:
+        for tensor in (item.ref_code, item.ref_spk_embedding):
+            if tensor is not None:
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def run_clone_mode_benchmark(
+    *,
+    samples: Sequence[tuple],
+    language: str,
+    model_name: str,
+    device: str,
+    dtype: Any,
+    texts: List[str],
+    fusion: str = "mean",
+    max_new_tokens: int = 512,
+    model_loader: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    ボイスクローンのプロンプトの種類（speaker_embedding.CLONE_MODES）ごとに速度とメモリを計測する。
+
+    - full: 先頭サンプルの参照音声コード + ref_text（get_voice_clone_prompt）
+    - xvector: 全サンプルの話者埋め込みを融合したもの（get_speaker_embedding_prompt）
+
+    1 つのモデルで両方を計測する。指標:
+    - prompt_sec: プロンプトの作成時間（キャッシュなし）
+    - prompt_kb: プロンプトが持つテンソルの大きさ
+    - ref_code_frames: 生成時のプロンプトに入る参照音声コードのフレーム数（xvector は 0）
+    - first_call_sec / steady_sec: 最初の生成と、以降の生成 1 件の時間の中央値
+    - rtf: 生成の所要時間 ÷ 生成した音声の長さ
+    - peak_vram_mb: 生成中の最大 VRAM 使用量（CUDA 以外は None）
+
+    Args:
+        samples: 話者のサンプル（(参照音声のパス, 参照テキスト) のリスト。full は先頭だけを使う）
+        language: 言語（"Japanese" 等）
+        model_name: モデル ID
+        device: 実行デバイス
+        dtype: dtype
+        texts: 計測に使うテキスト
+        fusion: xvector の埋め込みの融合方法
+        max_new_tokens: 生成トークン数の上限
+        model_loader: Qwen3TTSWrapper の model_loader（偽モデルを使う場合に指定）
+
+    Returns:
+        {"full": {...}, "xvector": {...}}
+
+    Raises:
+        ValueError: samples または texts が空の場合
+    """
+    import torch
+
+    from src.tts import ModelRegistry
+    from src.tts.speaker_embedding import CLONE_MODES
+
+    if not samples or not texts:
+        raise ValueError("samples と texts を指定してください。")
+    cuda = device.startswith("cuda") and torch.cuda.is_available()
+    ref_audio_path, ref_text = samples[0]
+
+    registry = ModelRegistry()
+    wrapper = registry.acquire(model_name, device, dtype, model_loader=model_loader)
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for mode in CLONE_MODES:
+            start = time.perf_counter()
+            if mode == "full":
+                prompt = wrapper.get_voice_clone_prompt(ref_audio_path, ref_text)
+            else:
+                prompt = wrapper.get_speaker_embedding_prompt([path for path, _ in samples], fusion)
+            prompt_sec = time.perf_counter() - start
+
+            if cuda:
+                torch.cuda.reset_peak_memory_stats()
+            durations = []
+            audio_sec = 0.0
+            for text in texts:
+                start = time.perf_counter()
+                wav, sr = wrapper.generate_voice(
+                    text, ref_audio_path, ref_text, language,
+                    max_new_tokens=max_new_tokens, seed=0, voice_clone_prompt=prompt,
+                )
+                durations.append(time.perf_counter() - start)
+                audio_sec += len(wav) / sr
+
+            code = prompt[0].ref_code
+            results[mode] = {
+                "prompt_sec": prompt_sec,
+                "prompt_kb": _prompt_nbytes(prompt) / 1024,
+                "ref_code_frames": 0 if code is None else int(code.shape[0]),
+                "first_call_sec": durations[0],
+                "steady_sec": statistics.median(durations[1:]) if len(durations) > 1 else durations[0],
+                "rtf": sum(durations) / audio_sec if audio_sec > 0 else 0.0,
+                "peak_vram_mb": torch.cuda.max_memory_allocated() / (1024 * 1024) if cuda else None,
+            }
+    finally:
+        registry.release(wrapper)
+    return results
+
+
+def _baseline_discord_frames(wav: Any, sample_rate: int) -> List[bytes]:
+    """従来の経路（_postprocess_wav → リサンプル → int16 化 → ステレオ化 → バイト列の切り出し）。"""
+    import numpy as np
+
+    from src.audio.discord_pcm import FRAME_BYTES, get_resampler
+    from src.tts.qwen_wrapper import _postprocess_wav
+
+    x = _postprocess_wav(wav)
+    y = get_resampler(sample_rate).resample(x)
+    pcm = np.clip(y * 32767.0, -32768, 32767).round().astype(np.int16)
+    data = np.repeat(pcm, 2).tobytes()
+    data += bytes(-len(data) % FRAME_BYTES)
+    return [data[i:i + FRAME_BYTES] for i in range(0, len(data), FRAME_BYTES)]
+
+
+def run_pcm_benchmark(seconds: float = 10.0, sample_rate: int = 24000, repeats: int = 20) -> Dict[str, Any]:
+    """
+    モデル出力（float32・モノラル）から Discord 用の 3840 バイトのフレーム列を作る時間と一時メモリを、
+    従来の経路と DiscordPCMEncoder で比較する（同じリサンプルフィルタを使うので出力は一致する）。
+
+    Args:
+        seconds: 音声の長さ（秒）
+        sample_rate: モデル出力のサンプリングレート
+        repeats: 計測の繰り返し回数（中央値を取る）
+
+    Returns:
+        baseline_ms, encoder_ms, speedup, baseline_peak_mb, encoder_peak_mb, frames, max_abs_diff を含む辞書
+    """
+    import tracemalloc
+
+    import numpy as np
+
+    from src.audio.discord_pcm import DiscordPCMEncoder
+
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    wav = (0.6 * np.sin(2 * np.pi * 220 * t) + 0.3 * np.sin(2 * np.pi * 3100 * t)).astype(np.float32)
+    encoder = DiscordPCMEncoder(sample_rate)
+
+    def measure(fn: Callable[[], List[bytes]]) -> tuple:
+        fn()  # バッファの確保・フィルタ設計を計測から除く
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        frames = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return statistics.median(times) * 1000, peak / (1024 * 1024), frames
+
+    baseline_ms, baseline_peak, baseline_frames = measure(lambda: _baseline_discord_frames(wav, sample_rate))
+    encoder_ms, encoder_peak, encoder_frames = measure(lambda: list(encoder.frames(wav)))
+    a = np.frombuffer(b"".join(baseline_frames), dtype=np.int16)
+    b = np.frombuffer(b"".join(encoder_frames), dtype=np.int16)
+    return {
+        "seconds": seconds,
+        "frames": len(encoder_frames),
+        "baseline_ms": baseline_ms,
+        "encoder_ms": encoder_ms,
+        "speedup": baseline_ms / encoder_ms if encoder_ms > 0 else 0.0,
+        "baseline_peak_mb": baseline_peak,
+        "encoder_peak_mb": encoder_peak,
+        "max_abs_diff": int(np.abs(a.astype(np.int32) - b).max()) if len(a) == len(b) else -1,
+    }
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.1,
+) -> List[str]:
+    """
+    計測結果をベースラインと比較し、tolerance（割合）を超えて悪化した指標を返す。
+
+    Args:
+        current: 今回の結果（run_suite の戻り値、または JSON の "metrics"）
+        baseline: ベースラインの結果
+        tolerance: 許容する悪化の割合（0.1 なら 10%）
+
+    Returns:
+        悪化した指標の説明のリスト（空なら悪化なし）
+    """
+    regressions: List[str] = []
+    for name, direction in METRIC_DIRECTIONS.items():
+        now = current.get(name)
+        base = baseline.get(name)
+        if now is None or base is None or base <= 0:
+            continue
+        change = (now - base) / base
+        worse = change > tolerance if direction == "lower" else change < -tolerance
+        if worse:
+            regressions.append(f"{name}: {base:.4g} -> {now:.4g} ({change:+.1%})")
+    return regressions
+
+
+def _load_metrics(path: str) -> Dict[str, Any]:
+    """保存した計測結果（JSON）の metrics を読む。"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("metrics", data)
+
+
+def _run_suite_command(args: argparse.Namespace) -> int:
+    """suite サブコマンド。悪化があれば 1 を返す。"""
+    from src.tts.fake_model import make_fake_loader
+    from src.tts.voice_clone import _normalize_language, resolve_device_dtype
+
+    profile_manager = VoiceProfileManager(args.metadata)
+    profile = profile_manager.get_profile(args.speaker or profile_manager.list_speakers()[0])
+    device, dtype = resolve_device_dtype(args.device, None)
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    model_loader = None
+    if args.backend == "fake":
+        model_loader = make_fake_loader(
+            load_latency_sec=args.fake_load_latency,
+            prompt_latency_sec=args.fake_prompt_latency,
+            generate_latency_sec=args.fake_generate_latency,
+            latency_per_char_sec=args.fake_latency_per_char,
+        )
+
+    print(f"計測中: {args.model_name} ({args.backend}, {device}, {dtype})", file=sys.stderr)
+    metrics = run_suite(
+        ref_audio_path=str(profile_manager.resolve_audio_path(profile)),
+        ref_text=profile["corpus_text"],
+        language=_normalize_language(profile["language"]),
+        model_name=args.model_name,
+        device=device,
+        dtype=dtype,
+        texts=_texts(args.count),
+        batch_size=args.batch_size,
+        max_new_tokens=args.max_new_tokens,
+        model_loader=model_loader,
+    )
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "model_name": args.model_name,
+            "device": device,
+            "dtype": str(dtype),
+            "count": args.count,
+            "batch_size": args.batch_size,
+            "python": platform.python_version(),
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"結果を保存しました: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        return _report_comparison(metrics, _load_metrics(args.compare), args.tolerance)
+    return 0
+
+
+def _run_warmup_command(args: argparse.Namespace) -> None:
+    """warmup サブコマンド。"""
+    from src.tts.fake_model import make_fake_loader
+    from src.tts.voice_clone import _normalize_language, resolve_device_dtype
+
+    profile_manager = VoiceProfileManager(args.metadata)
+    profile = profile_manager.get_profile(args.speaker or profile_manager.list_speakers()[0])
+    device, dtype = resolve_device_dtype(args.device, None)
+    model_loader = None
+    if args.backend == "fake":
+        model_loader = make_fake_loader(
+            generate_latency_sec=args.fake_generate_latency,
+            first_call_latency_sec=args.fake_first_call_latency,
+        )
+
+    results = run_warmup_benchmark(
+        ref_audio_path=str(profile_manager.resolve_audio_path(profile)),
+        ref_text=profile["corpus_text"],
+        language=_normalize_language(profile["language"]),
+        model_name=args.model_name,
+        device=device,
+        dtype=dtype,
+        text=_texts(1)[0],
+        modes=args.modes,
+        compile_mode=args.compile_mode,
+        steady_calls=args.steady_calls,
+        model_loader=model_loader,
+    )
+    print(f"初回と定常の生成時間（{args.backend}, {device}, {dtype}）:")
+    for mode, r in results.items():
+        print(
+            f"  {mode:<8} ロード {r['load_sec']:.2f} 秒, ウォームアップ {r['warmup_sec']:.2f} 秒, "
+            f"初回 {r['first_call_sec']:.3f} 秒, 定常 {r['steady_sec']:.3f} 秒 "
+            f"(初回/定常 {r['first_over_steady']:.2f}x)"
+        )
+
+
+def _run_cpu_command(args: argparse.Namespace) -> None:
+    """cpu サブコマンド。"""
+    from src.tts.fake_model import make_fake_loader
+    from src.tts.voice_clone import _normalize_language
+
+    profile_manager = VoiceProfileManager(args.metadata)
+    profile = profile_manager.get_profile(args.speaker or profile_manager.list_speakers()[0])
+    model_loader = None
+    if args.backend == "fake":
+        model_loader = make_fake_loader(latency_per_char_sec=args.fake_latency_per_char)
+
+    result = run_cpu_benchmark(
+        ref_audio_path=str(profile_manager.resolve_audio_path(profile)),
+        ref_text=profile["corpus_text"],
+        language=_normalize_language(profile["language"]),
+        model_name=args.model_name,
+        texts=_texts(args.count),
+        threads=args.threads or None,
+        quantized_dir=None if args.no_save else args.quantized_dir,
+        model_loader=model_loader,
+    )
+    print(f"CPU 推論の比較（{args.backend}, {args.count} 件）:")
+    for name in ("float32", "int8"):
+        r = result[name]
+        print(
+            f"  {name:<8} ロード {r['load_sec']:.2f} 秒, メモリ +{r['rss_mb']:.0f} MB, RTF {r['rtf']:.2f}"
+            + (f"（量子化 {r['quantized_linears']} 層{'、保存済みを読み込み' if r['loaded_quantized'] else ''}）" if name == "int8" else "")
+        )
+    print(f"  出力の類似度（声質、1.0 が同一）: 平均 {result['mean_similarity']:.3f}, 最小 {min(result['similarity']):.3f}")
+
+
+def _run_clone_mode_command(args: argparse.Namespace) -> None:
+    """clone-mode サブコマンド。"""
+    from src.tts.fake_model import make_fake_loader
+    from src.tts.voice_clone import _normalize_language, resolve_device_dtype
+
+    profile_manager = VoiceProfileManager(args.metadata)
+    profiles = profile_manager.get_all_profiles(args.speaker or profile_manager.list_speakers()[0])
+    device, dtype = resolve_device_dtype(args.device, None)
+    model_loader = None
+    if args.backend == "fake":
+        model_loader = make_fake_loader(
+            prompt_latency_sec=args.fake_prompt_latency, latency_per_char_sec=args.fake_latency_per_char
+        )
+
+    results = run_clone_mode_benchmark(
+        samples=[(str(profile_manager.resolve_audio_path(p)), p["corpus_text"]) for p in profiles],
+        language=_normalize_language(profiles[0]["language"]),
+        model_name=args.model_name,
+        device=device,
+        dtype=dtype,
+        texts=_texts(args.count),
+        fusion=args.fusion,
+        max_new_tokens=args.max_new_tokens,
+        model_loader=model_loader,
+    )
+    print(f"ボイスクローンのプロンプトの比較（{args.backend}, {device}, サンプル {len(profiles)} 件, {args.count} 件）:")
+    for mode, r in results.items():
+        vram = f", VRAM 最大 {r['peak_vram_mb']:.0f} MB" if r["peak_vram_mb"] is not None else ""
+        print(
+            f"  {mode:<8} プロンプト作成 {r['prompt_sec']:.3f} 秒 / {r['prompt_kb']:.1f} KB"
+            f"（参照音声コード {r['ref_code_frames']} フレーム）, 初回 {r['first_call_sec']:.3f} 秒, "
+            f"定常 {r['steady_sec']:.3f} 秒, RTF {r['rtf']:.2f}{vram}"
+        )
+
+
+def _run_pcm_command(args: argparse.Namespace) -> None:
+    """pcm サブコマンド。"""
+    r = run_pcm_benchmark(seconds=args.seconds, sample_rate=args.sample_rate, repeats=args.repeats)
+    print(f"Discord 用 PCM フレームへの変換（{r['seconds']:.1f} 秒, {args.sample_rate} Hz → 48 kHz ステレオ, {r['frames']} フレーム）:")
+    print(f"  従来の経路:        {r['baseline_ms']:.2f} ms, 一時メモリ最大 {r['baseline_peak_mb']:.1f} MB")
+    print(f"  DiscordPCMEncoder: {r['encoder_ms']:.2f} ms, 一時メモリ最大 {r['encoder_peak_mb']:.1f} MB")
+    print(f"  高速化率: {r['speedup']:.2f}x（出力の最大差 {r['max_abs_diff']}）")
+
+
+def _report_comparison(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> int:
+    """比較結果を表示し、悪化があれば 1 を返す。"""
+    regressions = compare_results(current, baseline, tolerance)
+    if not regressions:
+        print(f"ベースラインからの悪化なし（許容 {tolerance:.0%}）", file=sys.stderr)
+        return 0
+    print(f"ベースラインから悪化した指標（許容 {tolerance:.0%}）:", file=sys.stderr)
+    for line in regressions:
+        print(f"  {line}", file=sys.stderr)
+    return 1
+
+
+def main() -> None:
+    """CLIツールのメイン処理。"""
+    parser = argparse.ArgumentParser(description="TTS 性能計測CLIツール")
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        default="data/metadata.csv",
+        help="メタデータ（CSV / JSON / SQLite）のパス（デフォルト: data/metadata.csv）",
+    )
+    parser.add_argument("--speaker", type=str, default=None, help="話者名（デフォルト: 先頭の話者）")
+    parser.add_argument(
+        "--model-name",
+        type=str,
+        default="Qwen/Qwen3-TTS-12Hz-1.7B-Base",
+        help="モデル ID（デフォルト: Qwen/Qwen3-TTS-12Hz-1.7B-Base）",
+    )
+    parser.add_argument("--device", type=str, default=None, help="実行デバイス（例: cuda:0, cpu）")
+    parser.add_argument("--threads", type=int, default=0, help="CPU スレッド数（0 は torch の既定値）")
+    parser.add_argument("--max-new-tokens", type=int, default=512, help="生成トークン数の上限")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_batch = sub.add_parser("batch", help="逐次生成とバッチ生成のスループット比較")
+    p_batch.add_argument("--count", type=int, default=8, help="生成するテキスト数")
+    p_batch.add_argument("--batch-size", type=int, default=8, help="1 回の生成にまとめる最大件数")
+
+    p_suite = sub.add_parser("suite", help="ロード時間・TTFA・RTF・メモリ・スループットの計測一式")
+    p_suite.add_argument("--backend", choices=["real", "fake"], default="real", help="real: 実モデル, fake: 偽モデル")
+    p_suite.add_argument("--count", type=int, default=8, help="生成するテキスト数")
+    p_suite.add_argument("--batch-size", type=int, default=8, help="バッチ生成の最大件数")
+    p_suite.add_argument("--output", type=str, default=None, help="結果の JSON の保存先（省略時は標準出力）")
+    p_suite.add_argument("--compare", type=str, default=None, help="比較するベースラインの JSON")
+    p_suite.add_argument("--tolerance", type=float, default=0.1, help="悪化とみなす変化の割合（デフォルト: 0.1）")
+    p_suite.add_argument("--fake-load-latency", type=float, default=0.0, help="偽モデルのロード時間（秒）")
+    p_suite.add_argument("--fake-prompt-latency", type=float, default=0.0, help="偽モデルのプロンプト作成時間（秒）")
+    p_suite.add_argument("--fake-generate-latency", type=float, default=0.01, help="偽モデルの生成 1 回の固定時間（秒）")
+    p_suite.add_argument("--fake-latency-per-char", type=float, default=0.002, help="偽モデルの 1 文字あたりの生成時間（秒）")
+
+    p_compare = sub.add_parser("compare", help="保存した 2 つの計測結果を比較")
+    p_compare.add_argument("current", type=str, help="今回の結果の JSON")
+    p_compare.add_argument("baseline", type=str, help="ベースラインの JSON")
+    p_compare.add_argument("--tolerance", type=float, default=0.1, help="悪化とみなす変化の割合（デフォルト: 0.1）")
+
+    p_warmup = sub.add_parser("warmup", help="初回と定常の生成時間をウォームアップ・torch.compile の有無で比較")
+    p_warmup.add_argument("--backend", choices=["real", "fake"], default="real", help="real: 実モデル, fake: 偽モデル")
+    p_warmup.add_argument(
+        "--modes", nargs="+", choices=list(WARMUP_MODES), default=list(WARMUP_MODES), help="計測するモード"
+    )
+    p_warmup.add_argument(
+        "--compile-mode", type=str, default="default", help="compile モードの torch.compile の mode（デフォルト: default）"
+    )
+    p_warmup.add_argument("--steady-calls", type=int, default=3, help="定常の時間を取る呼び出し回数")
+    p_warmup.add_argument("--fake-generate-latency", type=float, default=0.01, help="偽モデルの生成 1 回の固定時間（秒）")
+    p_warmup.add_argument("--fake-first-call-latency", type=float, default=0.2, help="偽モデルの初回だけの追加時間（秒）")
+
+    p_cpu = sub.add_parser("cpu", help="CPU の float32 と動的 int8 量子化の RTF・メモリ・出力の類似度を比較")
+    p_cpu.add_argument("--backend", choices=["real", "fake"], default="real", help="real: 実モデル, fake: 偽モデル")
+    p_cpu.add_argument("--count", type=int, default=4, help="生成するテキスト数")
+    p_cpu.add_argument(
+        "--quantized-dir", type=str, default=DEFAULT_QUANTIZED_DIR, help=f"量子化済み重みの保存先（デフォルト: {DEFAULT_QUANTIZED_DIR}）"
+    )
+    p_cpu.add_argument("--no-save", action="store_true", help="量子化済み重みを保存・読み込みしない")
+    p_cpu.add_argument("--fake-latency-per-char", type=float, default=0.002, help="偽モデルの 1 文字あたりの生成時間（秒）")
+
+    p_clone = sub.add_parser(
+        "clone-mode", help="参照音声コード + 参照テキストのプロンプトと話者埋め込みのみのプロンプトを比較"
+    )
+    p_clone.add_argument("--backend", choices=["real", "fake"], default="real", help="real: 実モデル, fake: 偽モデル")
+    p_clone.add_argument("--count", type=int, default=8, help="生成するテキスト数")
+    p_clone.add_argument(
+        "--fusion", choices=list(EMBEDDING_FUSIONS), default="mean", help="話者埋め込みの融合方法（デフォルト: mean）"
+    )
+    p_clone.add_argument("--fake-prompt-latency", type=float, default=0.0, help="偽モデルのプロンプト作成時間（秒）")
+    p_clone.add_argument("--fake-latency-per-char", type=float, default=0.002, help="偽モデルの 1 文字あたりの生成時間（秒）")
+
+    p_pcm = sub.add_parser("pcm", help="モデル出力から Discord 用 PCM フレームへの変換を従来の経路と比較")
+    p_pcm.add_argument("--seconds", type=float, default=10.0, help="音声の長さ（秒）")
+    p_pcm.add_argument("--sample-rate", type=int, default=24000, help="モデル出力のサンプリングレート")
+    p_pcm.add_argument("--repeats", type=int, default=20, help="計測の繰り返し回数")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "pcm":
+            _run_pcm_command(args)
+            return
+        if args.command == "suite":
+            sys.exit(_run_suite_command(args))
+        if args.command == "cpu":
+            _run_cpu_command(args)
+            return
+        if args.command == "clone-mode":
+            _run_clone_mode_command(args)
+            return
+        if args.command == "warmup":
+            _run_warmup_command(args)
+            return
+        if args.command == "compare":
+            sys.exit(_report_comparison(_load_metrics(args.current), _load_metrics(args.baseline), args.tolerance))
+        if args.command == "batch":
+            result = run_batch_benchmark(args)
+            print(f"テキスト数: {result['count']}（バッチサイズ {result['batch_size']}）")
+            print(
+                f"  逐次:   {result['sequential_sec']:.2f} 秒, "
+                f"{result['sequential_items_per_sec']:.2f} items/s"
+            )
+            print(
+                f"  バッチ: {result['batch_sec']:.2f} 秒, "
+                f"{result['batch_items_per_sec']:.2f} items/s"
+            )
+            print(f"  高速化率: {result['speedup']:.2f}x")
+    except (FileNotFoundError, ValueError, RuntimeError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
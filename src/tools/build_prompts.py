@@ -0,0 +1,145 @@
+# coding=utf-8
+"""
+ボイスクローンプロンプト事前計算CLIツール。
+
+metadata.csv の全サンプルについて有効なプロンプト成果物（models/prompts/<sample_id>.safetensors）の
+有無を確認し、ないもの（参照音声・corpus_text・モデルが変わったものを含む）をまとめて作成する。
+参照音声は前処理した正規形（models/references/<sample_id>.npy）から作る（--raw-reference で元ファイルのまま）。
+作成が必要なサンプルがなければモデルはロードしない。
+
+使い方:
+    python -m src.tools.build_prompts            # 不足分を作成
+    python -m src.tools.build_prompts --status   # 状態の表示のみ
+    python -m src.tools.build_prompts --force    # 全サンプルを作り直す
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from src.profile import PromptArtifactStore, ReferenceStore, VoiceProfileManager
+from src.profile.prompt_store import DEFAULT_STORE_DIR
+from src.profile.reference_store import DEFAULT_REFERENCE_DIR, reference_id
+
+_DTYPE_NAMES = ("auto", "bfloat16", "float16", "float32")
+
+
+def main() -> None:
+    """
+    CLIツールのメイン処理。
+
+    argparseで以下の引数を処理：
+    - --metadata: メタデータファイルパス（デフォルト: data/metadata.csv）
+    - --store: 成果物の保存ディレクトリ（デフォルト: <プロジェクトルート>/models/prompts）
+    - --model-name: モデル ID
+    - --device: 実行デバイス（デフォルト: cuda が使えれば cuda、なければ cpu）
+    - --dtype: dtype（デフォルト: auto）
+    - --status: 状態を表示して終了（モデルをロードしない）
+    - --force: 有効な成果物があっても作り直す
+    - --raw-reference: 参照音声を前処理せず元ファイルのまま使う
+    """
+    parser = argparse.ArgumentParser(
+        description="ボイスクローンプロンプトの事前計算（不足分を一括作成）"
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        default="data/metadata.csv",
+        help="メタデータ（CSV / JSON / SQLite）のパス（デフォルト: data/metadata.csv）",
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help=f"成果物の保存ディレクトリ（デフォルト: <プロジェクトルート>/{DEFAULT_STORE_DIR}）",
+    )
+    parser.add_argument(
+        "--model-name",
+        type=str,
+        default="Qwen/Qwen3-TTS-12Hz-1.7B-Base",
+        help="モデル ID（デフォルト: Qwen/Qwen3-TTS-12Hz-1.7B-Base）",
+    )
+    parser.add_argument("--device", type=str, default=None, help="実行デバイス（例: cuda:0, cpu）")
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="auto",
+        choices=_DTYPE_NAMES,
+        help="dtype（デフォルト: auto = CUDA では bfloat16、CPU では float32）",
+    )
+    parser.add_argument("--status", action="store_true", help="成果物の状態を表示して終了")
+    parser.add_argument("--force", action="store_true", help="有効な成果物があっても作り直す")
+    parser.add_argument(
+        "--raw-reference",
+        action="store_true",
+        help=f"参照音声を前処理（{DEFAULT_REFERENCE_DIR}）せず元ファイルのまま使う（test_synthesis の --raw-reference 用）",
+    )
+    args = parser.parse_args()
+
+    try:
+        profile_manager = VoiceProfileManager(args.metadata)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    import torch
+
+    from src.tts import Qwen3TTSWrapper
+    from src.tts.voice_clone import resolve_device_dtype
+
+    device, dtype = resolve_device_dtype(
+        args.device,
+        None if args.dtype == "auto" else getattr(torch, args.dtype),
+    )
+    root = Path(args.metadata).resolve().parent.parent
+    store = PromptArtifactStore(args.store or root / DEFAULT_STORE_DIR)
+    references = None if args.raw_reference else ReferenceStore(root / DEFAULT_REFERENCE_DIR)
+    reference = "raw" if references is None else reference_id()
+
+    status = profile_manager.artifact_status(store, args.model_name, dtype, reference)
+    print(f"成果物ディレクトリ: {store.root}")
+    for sample_id, valid in status.items():
+        print(f"  {sample_id}: {'有効' if valid else '未作成/無効'}")
+    if args.status:
+        return
+
+    targets = [
+        p for p in profile_manager.list_profiles()
+        if args.force or not status[p["sample_id"]]
+    ]
+    if not targets:
+        print("作成が必要なプロンプトはありません。")
+        return
+
+    print(f"\nモデルをロード中: {args.model_name} ({device}, {dtype})")
+    try:
+        wrapper = Qwen3TTSWrapper(model_name=args.model_name, device=device, dtype=dtype)
+    except (ValueError, RuntimeError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    for profile in targets:
+        audio_path = profile_manager.resolve_audio_path(profile)
+        start = time.perf_counter()
+        try:
+            source = audio_path if references is None else references.ensure(profile["sample_id"], audio_path)
+            prompt = wrapper.get_voice_clone_prompt(str(source), profile["corpus_text"])
+            fp = store.fingerprint(audio_path, profile["corpus_text"], wrapper.model_name, wrapper.dtype, reference)
+            path = store.save(profile["sample_id"], prompt, fp)
+        except (FileNotFoundError, ValueError, RuntimeError) as e:
+            print(f"  [NG] {profile['sample_id']}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"  [OK] {profile['sample_id']} → {path}（{time.perf_counter() - start:.2f} 秒）")
+
+    print(f"\n作成: {len(targets) - failed} 件, 失敗: {failed} 件")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
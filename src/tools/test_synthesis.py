@@ -3,19 +3,44 @@
 音声合成CLIツール。
 
 話者一覧の表示、指定話者でのテキスト音声合成、出力ファイル保存を行う。
+--input でテキストファイル / JSONL を渡すと、モデルを 1 回だけロードしてまとめて合成する（バルクモード）。
+合成デーモン（python -m src.server）が起動していれば、モデルをロードせずにデーモンに依頼する。
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
+import json
+import queue
 import sys
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import soundfile as sf
 
-from src.profile import VoiceProfileManager
-from src.tts import VoiceCloneManager
+from src.audio import float_to_pcm16
+from src.profile import PromptArtifactStore, ReferenceStore, VoiceProfileManager
+from src.profile.prompt_store import DEFAULT_STORE_DIR
+from src.profile.reference_store import DEFAULT_REFERENCE_DIR
+from src.server.client import SynthesisClient
+from src.server.protocol import default_socket_path
+from src.tts.metrics import DEFAULT_JSONL_PATH, InMemoryMetrics, JsonlMetrics, MultiMetrics, set_metrics
+from src.tts.startup import StartupReport, build_model_options, prepare_reference, start_model_load
+from src.tts.cpu_mode import DEFAULT_QUANTIZED_DIR
+from src.tts.speaker_embedding import CLONE_MODES
+from src.tts.warmup import COMPILE_MODES, DEFAULT_COMPILE_CACHE_DIR
+
+# torch / qwen_tts を読み込むモジュールは合成する経路でだけ import する（--list-speakers を速くするため）
+if TYPE_CHECKING:
+    from src.tts import MultiSpeakerSynthesizer, VoiceCloneManager
+
+DEFAULT_MODEL_NAME = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
 
 
 def _default_output_path() -> str:
@@ -24,6 +49,348 @@ def _default_output_path() -> str:
     return f"outputs/synthesis_{timestamp}.wav"
 
 
+def _default_output_dir() -> str:
+    """バルクモードのデフォルト出力ディレクトリ: outputs/bulk_YYYYMMDD_HHMMSS"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"outputs/bulk_{timestamp}"
+
+
+@dataclass(frozen=True)
+class BulkItem:
+    """バルクモードの 1 件分の合成指示。"""
+
+    speaker: str
+    text: str
+    language: str
+    output: Path
+
+
+def load_bulk_items(
+    input_path: str | Path,
+    default_speaker: Optional[str],
+    default_language: str,
+    output_dir: str | Path,
+) -> List[BulkItem]:
+    """
+    バルクモードの入力を読み込む。
+
+    拡張子が .jsonl の場合は 1 行 1 オブジェクト（"text" 必須、"speaker" / "language" / "output" は省略可）、
+    それ以外は 1 行 1 テキストとして読む（空行は無視）。
+    省略した話者・言語は default_speaker / default_language、出力先は output_dir/<連番>.wav になる。
+
+    Args:
+        input_path: 入力ファイルのパス
+        default_speaker: 話者を省略した行に使う話者名
+        default_language: 言語を省略した行に使う言語（"ja" / "en"）
+        output_dir: 出力先を省略した行の保存ディレクトリ
+
+    Returns:
+        BulkItem のリスト（入力順）
+
+    Raises:
+        FileNotFoundError: 入力ファイルが存在しない場合
+        ValueError: 行の形式が不正、または話者を決められない場合
+    """
+    path = Path(input_path)
+    if not path.exists():
+        raise FileNotFoundError(f"入力ファイルが見つかりません: {input_path}")
+
+    is_jsonl = path.suffix.lower() == ".jsonl"
+    items: List[BulkItem] = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            if is_jsonl:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_no}: JSON として読めません: {e}") from None
+                if not isinstance(row, dict):
+                    raise ValueError(f"{path}:{line_no}: オブジェクトを指定してください。")
+            else:
+                row = {"text": line}
+
+            text = str(row.get("text") or "").strip()
+            if not text:
+                raise ValueError(f"{path}:{line_no}: text が空です。")
+            speaker = str(row.get("speaker") or default_speaker or "").strip()
+            if not speaker:
+                raise ValueError(f"{path}:{line_no}: 話者を指定してください（行の speaker または --speaker）。")
+            language = str(row.get("language") or default_language).strip()
+            if language not in ("ja", "en"):
+                raise ValueError(f"{path}:{line_no}: language は ja / en のいずれかを指定してください。")
+            output = row.get("output")
+            output_path = Path(output) if output else Path(output_dir) / f"{len(items) + 1:04d}.wav"
+            items.append(BulkItem(speaker=speaker, text=text, language=language, output=output_path))
+    return items
+
+
+class _BackgroundWriter:
+    """生成済みの音声を別スレッドでファイルに書き出す（書き込み中に次の生成を進める）。"""
+
+    def __init__(self, max_pending: int = 8) -> None:
+        self._queue: "queue.Queue[Optional[Tuple[Path, np.ndarray, int]]]" = queue.Queue(maxsize=max_pending)
+        self.errors: List[str] = []
+        self._thread = threading.Thread(target=self._run, name="bulk-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path: Path, wav: np.ndarray, sample_rate: int) -> None:
+        """書き込みを予約する（未処理が max_pending 件あれば空くまで待つ）。"""
+        self._queue.put((path, wav, sample_rate))
+
+    def close(self) -> List[str]:
+        """残りを書き出して終了し、失敗したファイルのエラーメッセージを返す。"""
+        self._queue.put(None)
+        self._thread.join()
+        return self.errors
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            path, wav, sample_rate = job
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                sf.write(str(path), wav, sample_rate)
+            except (OSError, RuntimeError) as e:
+                self.errors.append(f"{path}: {e}")
+
+
+def run_bulk(items: List[BulkItem], synthesizer: "MultiSpeakerSynthesizer | SynthesisClient") -> Dict[str, Any]:
+    """
+    BulkItem を順に合成し、ファイル書き出しはバックグラウンドで行う。
+
+    合成に失敗した行は標準エラーに出力して次の行に進む。
+
+    Args:
+        items: 合成指示のリスト（話者は synthesizer に登録済みであること）
+        synthesizer: 合成に使う MultiSpeakerSynthesizer（または同じ形の SynthesisClient）
+
+    Returns:
+        items, completed, failed, wall_sec, audio_sec, items_per_sec,
+        audio_sec_per_wall_sec, rtf（生成時間 ÷ 音声長）を含む辞書
+    """
+    writer = _BackgroundWriter()
+    completed = 0
+    failed = 0
+    audio_sec = 0.0
+    start = time.perf_counter()
+    for i, item in enumerate(items, start=1):
+        try:
+            wav, sample_rate = synthesizer.synthesize(item.text, speaker=item.speaker, language=item.language)
+        except (ValueError, RuntimeError) as e:
+            failed += 1
+            print(f"エラー: [{i}/{len(items)}] {item.output}: {e}", file=sys.stderr)
+            continue
+        writer.write(item.output, wav, sample_rate)
+        completed += 1
+        audio_sec += len(wav) / sample_rate
+    write_errors = writer.close()
+    wall_sec = time.perf_counter() - start
+    for message in write_errors:
+        print(f"エラー: 書き込みに失敗しました: {message}", file=sys.stderr)
+
+    return {
+        "items": len(items),
+        "completed": completed - len(write_errors),
+        "failed": failed + len(write_errors),
+        "wall_sec": wall_sec,
+        "audio_sec": audio_sec,
+        "items_per_sec": completed / wall_sec if wall_sec > 0 else 0.0,
+        "audio_sec_per_wall_sec": audio_sec / wall_sec if wall_sec > 0 else 0.0,
+        "rtf": wall_sec / audio_sec if audio_sec > 0 else 0.0,
+    }
+
+
+def _run_bulk_mode(args: argparse.Namespace, report: StartupReport) -> None:
+    """--input 指定時の処理（モデルのロードは 1 回、プロンプトは話者ごとに 1 回）。"""
+    # デーモンが起動していればモデルをロードせずに依頼する
+    client = _server_client(args)
+    if client is not None:
+        try:
+            items = load_bulk_items(args.input, args.speaker, args.language, args.output or _default_output_dir())
+        except (FileNotFoundError, ValueError) as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not items:
+            print("エラー: 入力にテキストがありません。", file=sys.stderr)
+            sys.exit(1)
+        _print_bulk_result(run_bulk(items, client))
+        return
+
+    # モデルのロードを先に始め、入力・メタデータの読み込みと参照音声の準備を並行して行う
+    options = _model_options(args)
+    model_future = start_model_load(DEFAULT_MODEL_NAME, report=report, **options)
+    output_dir = args.output or _default_output_dir()
+    try:
+        with report.phase("metadata"):
+            profile_manager = VoiceProfileManager(args.metadata)
+            items = load_bulk_items(args.input, args.speaker, args.language, output_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not items:
+        print("エラー: 入力にテキストがありません。", file=sys.stderr)
+        sys.exit(1)
+
+    # 成果物はメタデータの親の親（プロジェクトルート）基準
+    root = Path(args.metadata).resolve().parent.parent
+    store = None if args.no_prompt_store else PromptArtifactStore(root / DEFAULT_STORE_DIR)
+    references = None if args.raw_reference else ReferenceStore(root / DEFAULT_REFERENCE_DIR)
+    speakers = []
+    for speaker in sorted({item.speaker for item in items}):
+        try:
+            profile = profile_manager.get_profile(speaker)
+            ref_audio_path = str(profile_manager.resolve_audio_path(profile))
+            prepared = prepare_reference(
+                ref_audio_path,
+                profile["corpus_text"],
+                model_name=DEFAULT_MODEL_NAME,
+                device=options.get("device"),
+                store=store,
+                sample_id=profile["sample_id"],
+                report=report,
+                reference_store=references,
+            )
+        except (FileNotFoundError, ValueError) as e:
+            print(f"エラー: 話者 '{speaker}': {e}", file=sys.stderr)
+            sys.exit(1)
+        speakers.append((speaker, profile, prepared))
+
+    from src.tts import MultiSpeakerSynthesizer, get_registry
+
+    try:
+        preloaded = model_future.result()
+        # レジストリからロード済みのモデルを受け取る（先読みの参照は返却する）
+        synthesizer = MultiSpeakerSynthesizer(
+            model_name=DEFAULT_MODEL_NAME, device=options.get("device"), clone_mode=args.clone_mode
+        )
+        get_registry().release(preloaded)
+    except RuntimeError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with synthesizer:
+        for speaker, profile, prepared in speakers:
+            try:
+                with report.phase("prompt_install"):
+                    samples = None
+                    if args.clone_mode == "xvector":
+                        samples = [
+                            (p["sample_id"], str(profile_manager.resolve_audio_path(p)))
+                            for p in profile_manager.get_all_profiles(speaker)
+                        ]
+                    synthesizer.register_speaker(
+                        speaker, prepared.audio_path, profile["corpus_text"], profile["language"], samples=samples
+                    )
+                    # xvector では参照音声コードのプロンプトを使わない
+                    if args.clone_mode == "full":
+                        prepared.install(synthesizer.wrapper, store)
+            except (FileNotFoundError, ValueError, RuntimeError) as e:
+                print(f"エラー: 話者 '{speaker}': {e}", file=sys.stderr)
+                sys.exit(1)
+        if args.warmup or args.compile:
+            try:
+                with report.phase("warmup"):
+                    synthesizer.warmup()
+            except (FileNotFoundError, ValueError, RuntimeError) as e:
+                print(f"エラー: ウォームアップに失敗しました: {e}", file=sys.stderr)
+                sys.exit(1)
+        if args.startup_report:
+            print(report.render(), file=sys.stderr)
+
+        result = run_bulk(items, synthesizer)
+    _print_bulk_result(result)
+
+
+def _print_bulk_result(result: Dict[str, Any]) -> None:
+    """run_bulk の結果を表示し、失敗があれば終了コード 1 で終了する。"""
+    print(f"合成: {result['completed']}/{result['items']} 件（失敗 {result['failed']} 件）")
+    print(f"  所要時間: {result['wall_sec']:.2f} 秒, 音声: {result['audio_sec']:.2f} 秒")
+    print(
+        f"  スループット: {result['items_per_sec']:.2f} items/s, "
+        f"{result['audio_sec_per_wall_sec']:.2f} 音声秒/秒, RTF {result['rtf']:.2f}"
+    )
+    if result["failed"]:
+        sys.exit(1)
+
+
+def _model_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """CLI 引数から start_model_load に渡すモデルのロード設定（device と Qwen3TTSWrapper の追加引数）を作る。"""
+    return build_model_options(
+        compile_mode=args.compile,
+        cpu_int8=args.cpu_int8,
+        cpu_threads=args.threads,
+        project_root=Path(args.metadata).resolve().parent.parent,
+    )
+
+
+def _server_client(args: argparse.Namespace) -> Optional[SynthesisClient]:
+    """合成デーモンが応答すればそのクライアントを返す（--no-server 指定時・未起動なら None）。"""
+    if args.no_server:
+        return None
+    client = SynthesisClient(args.socket)
+    return client if client.is_available() else None
+
+
+def _save_wav(output: Optional[str], wav_array: np.ndarray, sample_rate: int) -> None:
+    """音声を保存して保存先を表示する（output が None なら outputs/synthesis_<timestamp>.wav）。"""
+    output_path = Path(output or _default_output_path()).resolve()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(output_path), wav_array, sample_rate)
+    print(f"音声を保存しました: {output_path}")
+
+
+def _enable_metrics() -> None:
+    """処理段階の計測を logs/metrics.jsonl に記録し、終了時に段階ごとの集計を標準エラーに出力する。"""
+    memory = InMemoryMetrics()
+    set_metrics(MultiMetrics(memory, JsonlMetrics(DEFAULT_JSONL_PATH)))
+
+    def report() -> None:
+        summary = memory.summary()
+        if not summary:
+            return
+        print("処理段階ごとの所要時間:", file=sys.stderr)
+        for name, entry in sorted(summary.items()):
+            print(
+                f"  {name}: {entry['count']} 回, 平均 {entry['mean'] * 1000:.1f} ms, "
+                f"合計 {entry['sum']:.2f} 秒",
+                file=sys.stderr,
+            )
+
+    atexit.register(report)
+
+
+def _stream_to_stdout(voice_manager: "VoiceCloneManager", text: str, language: str) -> None:
+    """
+    文ごとに生成できた音声を s16le の生 PCM で標準出力に書き出す（プレイヤーへのパイプ用）。
+    最初のチャンクまでの時間と合計時間は標準エラーに出力する。
+    """
+    out = sys.stdout.buffer
+    start = time.perf_counter()
+    total_samples = 0
+    sample_rate = 0
+    try:
+        for chunk, sample_rate in voice_manager.synthesize_stream(text, language=language):
+            if total_samples == 0:
+                print(
+                    f"最初のチャンクまで: {time.perf_counter() - start:.2f} 秒"
+                    f"（PCM s16le, モノラル, {sample_rate} Hz）",
+                    file=sys.stderr,
+                )
+            out.write(float_to_pcm16(chunk))
+            out.flush()
+            total_samples += len(chunk)
+    except BrokenPipeError:
+        # 再生側が先に終了した
+        return
+    elapsed = time.perf_counter() - start
+    duration = total_samples / sample_rate if sample_rate else 0.0
+    print(f"ストリーミング完了: 音声 {duration:.2f} 秒 / 所要 {elapsed:.2f} 秒", file=sys.stderr)
+
+
 def main() -> None:
     """
     CLIツールのメイン処理。
@@ -35,7 +402,21 @@ def main() -> None:
     - --output: 出力ファイルパス（デフォルト: outputs/synthesis_<timestamp>.wav）
     - --language: 言語（デフォルト: ja、選択肢: ja/en）
     - --metadata: メタデータファイルパス（デフォルト: data/metadata.csv）
+    - --no-prompt-store: 事前計算プロンプト（models/prompts）を使わない
+    - --raw-reference: 参照音声を前処理せず元ファイルのまま使う（前処理済みは models/references）
+    - --clone-mode: --input 使用時のボイスクローン方式（full / xvector）
+    - --stream: 文ごとに生成できた音声を生 PCM（s16le）で標準出力に書き出す
+    - --input: テキストファイル / JSONL をまとめて合成する（--output は出力ディレクトリ）
+    - --metrics: 処理段階ごとの所要時間を logs/metrics.jsonl に記録し、集計を表示する
+    - --startup-report: 起動処理（import・モデルロード・参照音声の準備）の内訳を表示する
+    - --warmup: 合成の前にダミー文を生成し、初回の遅れを起動時に済ませる
+    - --compile: 生成ループに torch.compile を適用する（ウォームアップも行う）
+    - --cpu-int8: CPU で動的 int8 量子化したモデルを使う（量子化済み重みは models/quantized に保存）
+    - --threads: CPU 推論の intra-op スレッド数
+    - --socket: 合成デーモンの Unix ソケットのパス（デーモンが応答すればモデルをロードせずに依頼する）
+    - --no-server: 合成デーモンを使わず、このプロセスでモデルをロードする
     """
+    report = StartupReport()
     parser = argparse.ArgumentParser(
         description="音声合成CLIツール（話者一覧表示・テキスト音声合成）"
     )
@@ -50,7 +431,8 @@ def main() -> None:
         "--output",
         type=str,
         default=None,
-        help="出力WAVファイルパス（デフォルト: outputs/synthesis_YYYYMMDD_HHMMSS.wav）",
+        help="出力WAVファイルパス（デフォルト: outputs/synthesis_YYYYMMDD_HHMMSS.wav）。"
+        "--input 指定時は出力ディレクトリ（デフォルト: outputs/bulk_YYYYMMDD_HHMMSS）",
     )
     parser.add_argument(
         "--language",
@@ -63,14 +445,92 @@ def main() -> None:
         "--metadata",
         type=str,
         default="data/metadata.csv",
-        help="メタデータCSVのパス（デフォルト: data/metadata.csv）",
+        help="メタデータ（CSV / JSON / SQLite）のパス（デフォルト: data/metadata.csv）",
+    )
+    parser.add_argument(
+        "--no-prompt-store",
+        action="store_true",
+        help=f"事前計算プロンプト（{DEFAULT_STORE_DIR}）を読み書きしない",
+    )
+    parser.add_argument(
+        "--raw-reference",
+        action="store_true",
+        help=f"参照音声を前処理（無音除去・音量正規化・24 kHz 化。結果は {DEFAULT_REFERENCE_DIR}）せず元ファイルのまま使う",
+    )
+    parser.add_argument(
+        "--clone-mode",
+        type=str,
+        default="full",
+        choices=list(CLONE_MODES),
+        help="--input 使用時のボイスクローン方式。full: 参照音声コード + 参照テキスト（ICL）, "
+        "xvector: 話者の全サンプルの話者埋め込みのみ（速い）",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="文ごとに生成できた音声を生 PCM（s16le, モノラル）で標準出力に書き出す（--output は無視）",
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default=None,
+        help="まとめて合成する入力（1 行 1 テキストのファイル、または speaker/text/language/output の JSONL）",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=f"処理段階ごとの所要時間を {DEFAULT_JSONL_PATH} に記録し、終了時に集計を表示する",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="起動処理（import・モデルロード・参照音声の準備）の段階ごとの所要時間を標準エラーに表示する",
+    )
+    parser.add_argument(
+        "--warmup",
+        action="store_true",
+        help="合成の前に話者ごとにダミー文を生成し、初回の遅れ（カーネル選択・メモリ確保）を起動時に済ませる",
+    )
+    parser.add_argument(
+        "--compile",
+        type=str,
+        default=None,
+        choices=list(COMPILE_MODES),
+        help=f"生成ループに torch.compile を適用する mode（ウォームアップも行う。結果は {DEFAULT_COMPILE_CACHE_DIR} にキャッシュ）",
+    )
+    parser.add_argument(
+        "--cpu-int8",
+        action="store_true",
+        help=f"CPU で talker を動的 int8 量子化して使う（量子化済み重みは {DEFAULT_QUANTIZED_DIR} に保存して再利用）",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="CPU 推論の intra-op スレッド数（省略時、--cpu-int8 では物理コア数相当）",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help=f"合成デーモン（python -m src.server）のソケット（デフォルト: {default_socket_path()}）。"
+        "デーモンが応答すれば --stream 以外はデーモンで合成する",
+    )
+    parser.add_argument(
+        "--no-server",
+        action="store_true",
+        help="合成デーモンを使わず、このプロセスでモデルをロードして合成する",
     )
     args = parser.parse_args()
 
+    if args.metrics:
+        _enable_metrics()
+
     # 話者一覧表示モード
     if args.list_speakers:
         try:
-            profile_manager = VoiceProfileManager(args.metadata)
+            # 一覧表示では音声ファイルを使わないので存在確認を省く
+            profile_manager = VoiceProfileManager(args.metadata, validate_files=False)
         except FileNotFoundError as e:
             print(f"エラー: {e}", file=sys.stderr)
             sys.exit(1)
@@ -83,6 +543,11 @@ def main() -> None:
             print(f"  - {name}")
         return
 
+    # バルクモード
+    if args.input:
+        _run_bulk_mode(args, report)
+        return
+
     # 音声合成モード: 必須引数チェック
     if not args.speaker or not args.speaker.strip():
         print("エラー: 音声合成には --speaker を指定してください。", file=sys.stderr)
@@ -92,9 +557,30 @@ def main() -> None:
         print("エラー: 音声合成には --text を指定してください。", file=sys.stderr)
         sys.exit(1)
 
+    # デーモンが起動していればモデルをロードせずに依頼する（ストリーミングはこのプロセスで行う）
+    client = None if args.stream else _server_client(args)
+    if client is not None:
+        try:
+            wav_array, sample_rate = client.synthesize(
+                args.text.strip(), speaker=args.speaker.strip(), language=args.language
+            )
+        except ValueError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            sys.exit(1)
+        except RuntimeError as e:
+            print(f"エラー: 音声生成に失敗しました: {e}", file=sys.stderr)
+            sys.exit(1)
+        _save_wav(args.output, wav_array, sample_rate)
+        return
+
+    # モデルのロードを先に始め、メタデータの読み込みと参照音声の準備を並行して行う
+    options = _model_options(args)
+    model_future = start_model_load(DEFAULT_MODEL_NAME, report=report, **options)
+
     # メタデータ・プロファイル取得
     try:
-        profile_manager = VoiceProfileManager(args.metadata)
+        with report.phase("metadata"):
+            profile_manager = VoiceProfileManager(args.metadata)
     except FileNotFoundError as e:
         print(f"エラー: {e}", file=sys.stderr)
         sys.exit(1)
@@ -114,17 +600,69 @@ def main() -> None:
     root = metadata_path.parent.parent
     ref_audio_path = str(root / profile["audio_path"])
 
-    # VoiceCloneManager で音声合成
+    # 参照音声の前処理と事前計算プロンプトの読み込み（なければ参照音声の読み込み）をロード中に済ませる
+    store = None if args.no_prompt_store else PromptArtifactStore(root / DEFAULT_STORE_DIR)
+    references = None if args.raw_reference else ReferenceStore(root / DEFAULT_REFERENCE_DIR)
     try:
+        prepared = prepare_reference(
+            ref_audio_path,
+            profile["corpus_text"],
+            model_name=DEFAULT_MODEL_NAME,
+            device=options.get("device"),
+            store=store,
+            sample_id=profile["sample_id"],
+            report=report,
+            reference_store=references,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    from src.tts import VoiceCloneManager, get_registry
+
+    # VoiceCloneManager で音声合成（モデルはレジストリにロード済み）
+    try:
+        preloaded = model_future.result()
         voice_manager = VoiceCloneManager(
-            ref_audio_path=ref_audio_path,
+            ref_audio_path=prepared.audio_path,
             ref_text=profile["corpus_text"],
             language=profile["language"],
+            model_name=DEFAULT_MODEL_NAME,
+            device=options.get("device"),
         )
+        get_registry().release(preloaded)
     except (FileNotFoundError, ValueError, RuntimeError) as e:
         print(f"エラー: {e}", file=sys.stderr)
         sys.exit(1)
 
+    # 事前計算プロンプトを載せる（なければ計算して保存）
+    try:
+        with report.phase("prompt_install"):
+            prepared.install(voice_manager.wrapper, store)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.warmup or args.compile:
+        try:
+            with report.phase("warmup"):
+                voice_manager.warmup()
+        except (FileNotFoundError, ValueError, RuntimeError) as e:
+            print(f"エラー: ウォームアップに失敗しました: {e}", file=sys.stderr)
+            sys.exit(1)
+    if args.startup_report:
+        print(report.render(), file=sys.stderr)
+
+    if args.stream:
+        try:
+            _stream_to_stdout(voice_manager, args.text.strip(), args.language)
+        except ValueError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            sys.exit(1)
+        except RuntimeError as e:
+            print(f"エラー: 音声生成に失敗しました: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
     try:
         wav_array, sample_rate = voice_manager.synthesize(
             args.text.strip(),
@@ -138,11 +676,7 @@ def main() -> None:
         sys.exit(1)
 
     # 出力ファイル保存
-    output_path = Path(args.output or _default_output_path())
-    output_path = output_path.resolve()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    sf.write(str(output_path), wav_array, sample_rate)
-    print(f"音声を保存しました: {output_path}")
+    _save_wav(args.output, wav_array, sample_rate)
 
 
 if __name__ == "__main__":
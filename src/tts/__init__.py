@@ -1,6 +1,50 @@
 # TTS モジュール: Qwen3-TTS ラッパーとボイスクローン管理
+#
+# torch / torchaudio / qwen_tts の import は数秒かかるため、公開名は初回アクセス時に読み込む
+# （メタデータだけを扱う経路では torch を import しない）。
 
-from src.tts.qwen_wrapper import Qwen3TTSWrapper
-from src.tts.voice_clone import VoiceCloneManager
+from __future__ import annotations
 
-__all__ = ["Qwen3TTSWrapper", "VoiceCloneManager"]
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from src.tts.async_manager import AsyncVoiceCloneManager
+    from src.tts.audio_cache import AudioCache
+    from src.tts.model_registry import ModelRegistry, get_registry
+    from src.tts.prompt_cache import PromptCache
+    from src.tts.qwen_wrapper import Qwen3TTSWrapper
+    from src.tts.scheduler import BatchScheduler, QueueFullError, SynthesisResult
+    from src.tts.synthesizer import MultiSpeakerSynthesizer, SpeakerProfile
+    from src.tts.voice_clone import VoiceCloneManager
+
+# 公開名 -> 定義しているモジュール
+_EXPORTS = {
+    "AsyncVoiceCloneManager": "src.tts.async_manager",
+    "AudioCache": "src.tts.audio_cache",
+    "BatchScheduler": "src.tts.scheduler",
+    "ModelRegistry": "src.tts.model_registry",
+    "MultiSpeakerSynthesizer": "src.tts.synthesizer",
+    "PromptCache": "src.tts.prompt_cache",
+    "QueueFullError": "src.tts.scheduler",
+    "Qwen3TTSWrapper": "src.tts.qwen_wrapper",
+    "SpeakerProfile": "src.tts.synthesizer",
+    "SynthesisResult": "src.tts.scheduler",
+    "VoiceCloneManager": "src.tts.voice_clone",
+    "get_registry": "src.tts.model_registry",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,275 @@
+# coding=utf-8
+"""
+asyncio から使うボイスクローン合成の窓口。
+
+VoiceCloneManager.synthesize は生成が終わるまでブロックするため、discord.py のイベントループから
+直接呼ぶと生成中はハートビートも止まる。AsyncVoiceCloneManager はモデル呼び出しと後処理
+（PCM 変換等）を専用のワーカースレッド 1 本で実行し、イベントループには awaitable を返す。
+
+- 受け付け中（実行中 + 待ち）のリクエスト数は max_pending で制限する。上限に達すると
+  次の呼び出しは空きが出るまで await で待つ（バックプレッシャー）。
+- timeout を指定すると、待ち時間を含めてその秒数で asyncio.TimeoutError を送出する。
+  まだ実行が始まっていないリクエストは取り消され、実行中の生成は完了まで枠を占有する。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from src.audio.pcm import float_to_pcm16
+from src.tts.voice_clone import VoiceCloneManager
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class AsyncVoiceCloneManager:
+    """VoiceCloneManager を専用スレッドで実行する asyncio 向けの窓口。"""
+
+    def __init__(
+        self,
+        manager: VoiceCloneManager,
+        *,
+        max_pending: int = 16,
+        timeout: float | None = None,
+        executor: concurrent.futures.ThreadPoolExecutor | None = None,
+    ) -> None:
+        """
+        Args:
+            manager: 合成に使う VoiceCloneManager（以後このクラスのワーカースレッドからのみ呼ぶ）
+            max_pending: 受け付け中（実行中 + 待ち）のリクエスト数の上限
+            timeout: 既定のタイムアウト秒数（None は無制限）
+            executor: 推論に使うエグゼキュータ。None の場合はワーカー 1 本の専用エグゼキュータを作る
+
+        Raises:
+            ValueError: max_pending が 1 未満、または timeout が 0 以下の場合
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending は 1 以上を指定してください。")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout は正の値を指定してください。")
+
+        self._manager = manager
+        self._max_pending = max_pending
+        self._timeout = timeout
+        self._owns_executor = executor is None
+        self._executor = executor or concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="tts-inference"
+        )
+        # イベントループごとに作る（asyncio.Semaphore はループに結び付くため）
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._closed = False
+
+    @classmethod
+    async def open(
+        cls,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "ja",
+        *,
+        max_pending: int = 16,
+        timeout: float | None = None,
+        **manager_kwargs: Any,
+    ) -> "AsyncVoiceCloneManager":
+        """
+        VoiceCloneManager をワーカースレッドで作成して返す（モデルのロード中もイベントループは止まらない）。
+
+        Args:
+            ref_audio_path: 参照音声ファイルのパス
+            ref_text: 参照音声の読み上げテキスト
+            language: 参照音声の言語
+            max_pending: 受け付け中のリクエスト数の上限
+            timeout: 既定のタイムアウト秒数
+            **manager_kwargs: VoiceCloneManager に渡すその他の引数（model_name, device 等）
+
+        Returns:
+            AsyncVoiceCloneManager
+
+        Raises:
+            FileNotFoundError / ValueError / RuntimeError: VoiceCloneManager の作成に失敗した場合
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-inference")
+        loop = asyncio.get_running_loop()
+        try:
+            manager = await loop.run_in_executor(
+                executor,
+                lambda: VoiceCloneManager(ref_audio_path, ref_text, language, **manager_kwargs),
+            )
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        self = cls(manager, max_pending=max_pending, timeout=timeout, executor=executor)
+        self._owns_executor = True
+        return self
+
+    @property
+    def manager(self) -> VoiceCloneManager:
+        """内部の VoiceCloneManager。"""
+        return self._manager
+
+    @property
+    def pending(self) -> int:
+        """受け付け中（実行中 + 待ち）のリクエスト数。"""
+        return self._pending
+
+    async def synthesize(
+        self,
+        text: str,
+        language: str = "ja",
+        *,
+        timeout: float | None = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        テキストを合成する（VoiceCloneManager.synthesize をワーカースレッドで実行）。
+
+        Args:
+            text: 読み上げるテキスト
+            language: 合成時の言語
+            timeout: タイムアウト秒数（None の場合はコンストラクタの既定値）
+
+        Returns:
+            (wav_array, sample_rate)
+
+        Raises:
+            ValueError: text が空、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合、または close() 済みの場合
+            asyncio.TimeoutError: タイムアウトした場合
+        """
+        return await self._submit(lambda: self._manager.synthesize(text, language=language), timeout)
+
+    async def synthesize_pcm(
+        self,
+        text: str,
+        language: str = "ja",
+        *,
+        timeout: float | None = None,
+    ) -> Tuple[bytes, int]:
+        """
+        テキストを合成し、s16le PCM に変換して返す（変換もワーカースレッドで行う）。
+
+        Returns:
+            (pcm_bytes, sample_rate)
+
+        Raises:
+            synthesize と同じ
+        """
+
+        def run() -> Tuple[bytes, int]:
+            wav, sample_rate = self._manager.synthesize(text, language=language)
+            return float_to_pcm16(wav), sample_rate
+
+        return await self._submit(run, timeout)
+
+    async def synthesize_stream(
+        self,
+        text: str,
+        language: str = "ja",
+        chunk_ms: int = 200,
+    ) -> AsyncIterator[Tuple[np.ndarray, int]]:
+        """
+        テキストを合成し、生成できた順にチャンクを返す（各チャンクの取得をワーカースレッドで行う）。
+
+        ストリーム全体で受け付け枠を 1 つ占有する。
+
+        Args:
+            text: 読み上げるテキスト
+            language: 合成時の言語
+            chunk_ms: 1 チャンクの長さ（ミリ秒）
+
+        Returns:
+            (chunk, sample_rate) を順に返す非同期イテレータ
+
+        Raises:
+            ValueError: text が空、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合、または close() 済みの場合
+        """
+        loop = asyncio.get_running_loop()
+        await self._acquire(None)
+        try:
+            stream = await loop.run_in_executor(
+                self._executor,
+                lambda: self._manager.synthesize_stream(text, language=language, chunk_ms=chunk_ms),
+            )
+            while True:
+                item = await loop.run_in_executor(self._executor, next, stream, _END)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        状態を返す。
+
+        Returns:
+            pending, max_pending, closed を含む辞書
+        """
+        return {"pending": self._pending, "max_pending": self._max_pending, "closed": self._closed}
+
+    async def aclose(self) -> None:
+        """新規受け付けを止め、実行中の処理の完了を待ってから VoiceCloneManager を閉じる。"""
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._manager.close)
+        if self._owns_executor:
+            await loop.run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self) -> "AsyncVoiceCloneManager":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def _submit(self, fn: Callable[[], T], timeout: float | None) -> T:
+        timeout = timeout if timeout is not None else self._timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        await self._acquire(timeout)
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._release()
+            raise
+        # 枠は asyncio 側の待ちではなくワーカーでの処理が終わった時点で返す
+        future.add_done_callback(lambda _: _call_soon_threadsafe(loop, self._release))
+
+        remaining = None if deadline is None else max(0.0, deadline - loop.time())
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _acquire(self, timeout: float | None) -> None:
+        if self._closed:
+            raise RuntimeError("AsyncVoiceCloneManager は close() 済みです。")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_pending)
+        if timeout is None:
+            await self._slots.acquire()
+        else:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        self._pending += 1
+
+    def _release(self) -> None:
+        self._pending -= 1
+        assert self._slots is not None
+        self._slots.release()
+
+
+def _call_soon_threadsafe(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+    """ループが既に閉じていれば何もしない（タイムアウト後にループを終了した場合）。"""
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass
@@ -0,0 +1,400 @@
+# coding=utf-8
+"""
+合成済み音声のキャッシュ（メモリ LRU + ディスク）。
+
+Discord では「おはよう」「草」「了解」や入退室の読み上げ等、同じ短い文が繰り返し合成される。
+(話者の同一性, 正規化したテキスト, 言語, 生成パラメータ, モデルのバージョン) の SHA-256 をキーに
+合成結果を保持し、2 回目以降はモデルを呼ばずに返す。
+
+- メモリ層: float32 の波形を件数・バイト数の上限付き LRU で保持する。
+- ディスク層: 16bit FLAC（soundfile）で <root>/<キー先頭2文字>/<キー>.flac に保存し、
+  合計サイズが上限を超えたら最終アクセスの古いものから削除する。
+
+キャッシュした音声が正しいのは生成が決定的な場合に限られるため、キーには乱数シードを含める。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from src.tts.prompt_cache import make_prompt_key
+
+# キーの計算方法・保存形式を変えたら上げる
+AUDIO_CACHE_FORMAT_VERSION = "1"
+DEFAULT_CACHE_DIR = "models/audio_cache"
+# キャッシュを使うときに seed 未指定なら使うシード
+DEFAULT_SEED = 0
+
+
+def _qwen_tts_version() -> str:
+    """qwen-tts パッケージのバージョン（未インストール時は "unknown"）。"""
+    try:
+        return importlib_metadata.version("qwen-tts")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_text(text: str) -> str:
+    """
+    キャッシュキー用にテキストを正規化する。
+
+    NFKC 正規化（全角英数・半角カナの統一）と、前後の空白の除去・連続する空白の 1 文字化を行う。
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+@dataclass(frozen=True)
+class AudioCacheKey:
+    """合成音声キャッシュのキー（digest が実際の検索キー）。"""
+
+    speaker: str
+    text: str
+    language: str
+    params: str
+    model: str
+
+    @property
+    def digest(self) -> str:
+        """キーの SHA-256（16 進）。"""
+        payload = json.dumps(asdict(self), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_audio_cache_key(
+    ref_audio_path: str,
+    ref_text: str,
+    text: str,
+    language: str,
+    model_name: str,
+    dtype: Any,
+    **params: Any,
+) -> AudioCacheKey:
+    """
+    合成条件からキャッシュキーを作る。
+
+    話者の同一性は参照音声ファイル（パス + サイズ + mtime）と ref_text で判定する
+    （make_prompt_key と同じ。参照音声を差し替えると別のキーになる）。
+
+    Args:
+        ref_audio_path: 参照音声のパス
+        ref_text: 参照音声の内容
+        text: 読み上げるテキスト（normalize_text で正規化してからキーに使う）
+        language: 言語
+        model_name: モデル ID
+        dtype: モデルの dtype
+        **params: 出力に影響する生成パラメータ（seed, max_chars 等。JSON 化できる値）
+
+    Returns:
+        AudioCacheKey
+
+    Raises:
+        FileNotFoundError: 参照音声が存在しない場合
+    """
+    prompt_key = make_prompt_key(ref_audio_path, ref_text, model_name, dtype)
+    speaker = f"{prompt_key.source}|{prompt_key.size}|{prompt_key.mtime_ns}|{prompt_key.ref_text}"
+    return AudioCacheKey(
+        speaker=speaker,
+        text=normalize_text(text),
+        language=language,
+        params=json.dumps(params, sort_keys=True),
+        model=f"{model_name}|{dtype}|qwen-tts {_qwen_tts_version()}|v{AUDIO_CACHE_FORMAT_VERSION}",
+    )
+
+
+class AudioCache:
+    """
+    合成済み音声のキャッシュ（メモリ LRU + ディスク）。
+
+    スレッドセーフ。stats() でヒット率と、キャッシュから返した音声のバイト数（生成を省けた量）を参照できる。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: str | Path | None = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ) -> None:
+        """
+        Args:
+            max_entries: メモリ層の件数上限（0 でメモリ層を使わない）
+            max_bytes: メモリ層の合計サイズ上限（バイト）
+            disk_dir: ディスク層の保存ディレクトリ（None でディスク層を使わない）
+            disk_max_bytes: ディスク層の合計サイズ上限（バイト）
+
+        Raises:
+            ValueError: 上限値が負の場合
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries は 0 以上を指定してください。")
+        if max_bytes < 0:
+            raise ValueError("max_bytes は 0 以上を指定してください。")
+        if disk_max_bytes < 0:
+            raise ValueError("disk_max_bytes は 0 以上を指定してください。")
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self._disk_max_bytes = disk_max_bytes
+        # digest -> ファイルサイズ（最終アクセスの古い順）
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.audio_sec_saved = 0.0
+        # 話者ごとの digest（discard_speaker で話者の音声だけを破棄するため。このプロセスで登録したもののみ）
+        self._speakers: Dict[str, Set[str]] = {}
+        self._speaker_of: Dict[str, str] = {}
+        if self._disk_dir is not None:
+            self._scan_disk()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def get(self, key: AudioCacheKey) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        キャッシュ済みの音声を返す（なければ None）。
+
+        メモリ層になければディスク層を探し、見つかればメモリ層にも載せる。
+        返す配列は書き込み不可（呼び出し側で加工する場合はコピーする）。
+        """
+        digest = key.digest
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                self._memory.move_to_end(digest)
+                self.memory_hits += 1
+                self._record_saved(entry)
+                return entry
+
+        entry = self._read_disk(digest)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._record_saved(entry)
+            self._put_memory(digest, entry)
+            return entry
+
+    def put(self, key: AudioCacheKey, wav: np.ndarray, sample_rate: int, speaker: str | None = None) -> None:
+        """
+        合成結果を登録する（メモリ層とディスク層の両方）。
+
+        speaker を指定すると discard_speaker(speaker) でまとめて破棄できる。
+        """
+        array = np.ascontiguousarray(wav, dtype=np.float32)
+        array.setflags(write=False)
+        entry = (array, int(sample_rate))
+        digest = key.digest
+        with self._lock:
+            if speaker is not None and self._speaker_of.get(digest) != speaker:
+                self._forget_speaker(digest, force=True)
+                self._speakers.setdefault(speaker, set()).add(digest)
+                self._speaker_of[digest] = speaker
+            self._put_memory(digest, entry)
+        self._write_disk(digest, entry)
+
+    def get_or_create(
+        self,
+        key: AudioCacheKey,
+        generate: Callable[[], Tuple[np.ndarray, int]],
+        speaker: str | None = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        キャッシュにあればそれを返し、なければ generate() で合成して登録する。
+
+        Args:
+            key: キャッシュキー
+            generate: 合成を行う関数（(wav, sample_rate) を返す）
+            speaker: 登録する音声の話者名（put 参照）
+
+        Returns:
+            (wav_array, sample_rate)。wav_array は書き込み不可
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        wav, sample_rate = generate()
+        array = np.ascontiguousarray(wav, dtype=np.float32)
+        array.setflags(write=False)
+        self.put(key, array, sample_rate, speaker)
+        return array, int(sample_rate)
+
+    def discard_speaker(self, speaker: str) -> int:
+        """
+        put / get_or_create で speaker を指定して登録した音声を、メモリ層とディスク層から破棄する。
+
+        話者の参照音声・参照テキストを差し替えたときに呼ぶ（キーが変わるため古い音声が返ることはないが、
+        使われなくなった分の容量をすぐに空ける）。
+
+        Returns:
+            破棄したエントリ数
+        """
+        with self._lock:
+            digests = self._speakers.pop(speaker, set())
+            victims = []
+            for digest in digests:
+                self._speaker_of.pop(digest, None)
+                entry = self._memory.pop(digest, None)
+                if entry is not None:
+                    self._memory_bytes -= int(entry[0].nbytes)
+                size = self._disk.pop(digest, None)
+                if size is not None:
+                    self._disk_bytes -= size
+                    victims.append(digest)
+        for victim in victims:
+            self._path_for(victim).unlink(missing_ok=True)
+        return len(digests)
+
+    def clear(self) -> None:
+        """メモリ層を空にする（ディスク層と統計値は保持する）。"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        キャッシュの統計値を返す。
+
+        Returns:
+            memory_hits, disk_hits, misses, hit_rate, bytes_saved（キャッシュから返した float32 音声のバイト数）,
+            audio_sec_saved, evictions, entries, bytes, disk_entries, disk_bytes を含む辞書
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "audio_sec_saved": self.audio_sec_saved,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _record_saved(self, entry: Tuple[np.ndarray, int]) -> None:
+        wav, sample_rate = entry
+        self.bytes_saved += int(wav.nbytes)
+        self.audio_sec_saved += len(wav) / sample_rate
+
+    def _put_memory(self, digest: str, entry: Tuple[np.ndarray, int]) -> None:
+        """メモリ層に登録する（ロック内で呼ぶ）。"""
+        nbytes = int(entry[0].nbytes)
+        if digest in self._memory:
+            self._memory_bytes -= int(self._memory.pop(digest)[0].nbytes)
+        if self._max_entries == 0 or nbytes > self._max_bytes:
+            return
+        self._memory[digest] = entry
+        self._memory_bytes += nbytes
+        while len(self._memory) > self._max_entries or self._memory_bytes > self._max_bytes:
+            evicted_digest, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= int(evicted.nbytes)
+            self.evictions += 1
+            self._forget_speaker(evicted_digest)
+
+    def _forget_speaker(self, digest: str, force: bool = False) -> None:
+        """どちらの層からも消えた（force の場合は無条件に）digest を話者の索引から外す（ロック内で呼ぶ）。"""
+        if not force and (digest in self._memory or digest in self._disk):
+            return
+        speaker = self._speaker_of.pop(digest, None)
+        if speaker is not None:
+            digests = self._speakers.get(speaker)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._speakers[speaker]
+
+    def _path_for(self, digest: str) -> Path:
+        assert self._disk_dir is not None
+        return self._disk_dir / digest[:2] / f"{digest}.flac"
+
+    def _scan_disk(self) -> None:
+        """既存のディスク層を読み、最終アクセスの古い順に索引を作る。"""
+        assert self._disk_dir is not None
+        found = []
+        for path in self._disk_dir.glob("*/*.flac"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            found.append((st.st_mtime_ns, path.stem, int(st.st_size)))
+        for _, digest, size in sorted(found):
+            self._disk[digest] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, digest: str) -> Optional[Tuple[np.ndarray, int]]:
+        if self._disk_dir is None:
+            return None
+        with self._lock:
+            if digest not in self._disk:
+                return None
+        path = self._path_for(digest)
+        try:
+            wav, sample_rate = sf.read(str(path), dtype="float32")
+            os.utime(path)
+        except (OSError, RuntimeError):
+            # 別プロセスに削除された・壊れている場合は索引から外す
+            with self._lock:
+                size = self._disk.pop(digest, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        with self._lock:
+            if digest in self._disk:
+                self._disk.move_to_end(digest)
+        wav.setflags(write=False)
+        return wav, int(sample_rate)
+
+    def _write_disk(self, digest: str, entry: Tuple[np.ndarray, int]) -> None:
+        if self._disk_dir is None or self._disk_max_bytes == 0:
+            return
+        wav, sample_rate = entry
+        path = self._path_for(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            sf.write(str(tmp), np.clip(wav, -1.0, 1.0), sample_rate, format="FLAC", subtype="PCM_16")
+            os.replace(tmp, path)
+            size = path.stat().st_size
+        except (OSError, RuntimeError):
+            tmp.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            if digest in self._disk:
+                self._disk_bytes -= self._disk.pop(digest)
+            self._disk[digest] = size
+            self._disk_bytes += size
+            victims = []
+            while self._disk_bytes > self._disk_max_bytes and len(self._disk) > 1:
+                victim, victim_size = self._disk.popitem(last=False)
+                self._disk_bytes -= victim_size
+                self.evictions += 1
+                victims.append(victim)
+                self._forget_speaker(victim)
+        for victim in victims:
+            self._path_for(victim).unlink(missing_ok=True)
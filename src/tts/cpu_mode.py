@@ -0,0 +1,334 @@
+# coding=utf-8
+"""
+GPU のない環境向けの CPU 推論モード（動的 int8 量子化とスレッド数の設定）。
+
+talker（テキスト → 音声コードの Transformer と code_predictor）の nn.Linear を
+torch.ao の動的量子化で int8 に置き換える。重みは int8 で保持し、活性は実行時に量子化するため
+較正データは不要で、float32 と比べて重みのメモリが約 1/4 になり行列積も速くなる。
+出力ヘッド（codec_head / lm_head）と話者エンコーダ・音声トークナイザは音質への影響が大きいため量子化しない。
+
+量子化した重みは models/quantized/<モデル>/ に保存でき、次回は量子化の計算を省いて読み込む
+（float32 のモデル本体のロードは構造と残りのモジュールのために必要）。保存した重みは torch・qwen-tts の
+バージョンに加えてチェックポイントのリビジョン（checkpoint_id）が一致する場合だけ使う。
+
+CLI の引数定義から定数を参照できるよう、torch は各関数の中で import する。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
+
+if TYPE_CHECKING:
+    import torch
+
+DEFAULT_QUANTIZED_DIR = "models/quantized"
+# 保存形式のバージョン（形式を変えたら上げる）
+QUANTIZED_FORMAT_VERSION = "1"
+
+# Qwen3TTSModel.model からの相対パス
+QUANTIZE_TARGETS = ("talker",)
+# 量子化しない nn.Linear（名前に含まれる場合）
+QUANTIZE_SKIP = ("codec_head", "lm_head")
+
+# チェックポイントの同一性の判定に使うファイル（設定・重み）
+_CHECKPOINT_FILES = ("*.json", "*.safetensors", "*.bin")
+_WEIGHTS_FILE = "talker_int8.pt"
+_META_FILE = "meta.json"
+
+
+def configure_cpu_threads(intra_op_threads: int | None = None, inter_op_threads: int | None = None) -> Dict[str, int]:
+    """
+    CPU 推論のスレッド数を設定する。
+
+    intra-op（1 演算内の並列）は既定で物理コア数相当（論理 CPU 数の半分）にする。
+    ハイパースレッドまで使うと行列積が遅くなることが多いため。
+    inter-op はプロセスで並列処理が始まる前にしか変更できないので、変更できなければ現状のままにする。
+
+    Args:
+        intra_op_threads: intra-op スレッド数（None は自動）
+        inter_op_threads: inter-op スレッド数（None は変更しない）
+
+    Returns:
+        {"intra_op": 設定後の値, "inter_op": 設定後の値}
+
+    Raises:
+        ValueError: スレッド数が 1 未満の場合
+    """
+    import torch
+
+    if intra_op_threads is None:
+        available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        intra_op_threads = max(1, available // 2)
+    if intra_op_threads < 1 or (inter_op_threads is not None and inter_op_threads < 1):
+        raise ValueError("スレッド数は 1 以上を指定してください。")
+    torch.set_num_threads(intra_op_threads)
+    if inter_op_threads is not None and inter_op_threads != torch.get_num_interop_threads():
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # 既に並列処理が始まっている（プロセスの最初に設定する必要がある）
+            pass
+    return {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def _target_modules(model: Any, targets: Sequence[str]) -> Dict[str, torch.nn.Module]:
+    """model.model から targets のモジュールを取り出す（存在しないものは除く）。"""
+    import torch
+
+    root = getattr(model, "model", None)
+    found = {}
+    for target in targets:
+        module = root
+        for name in target.split("."):
+            module = getattr(module, name, None)
+        if isinstance(module, torch.nn.Module):
+            found[target] = module
+    return found
+
+
+def _linear_names(module: torch.nn.Module) -> List[str]:
+    """量子化対象の nn.Linear の名前（QUANTIZE_SKIP を除く）。"""
+    import torch
+
+    return [
+        name
+        for name, child in module.named_modules()
+        if type(child) is torch.nn.Linear and not any(skip in name for skip in QUANTIZE_SKIP)
+    ]
+
+
+def quantize_model(model: Any, targets: Sequence[str] = QUANTIZE_TARGETS) -> int:
+    """
+    Qwen3TTSModel の targets 以下の nn.Linear を動的 int8 量子化に置き換える（その場で変更する）。
+
+    Args:
+        model: float32 でロードした Qwen3TTSModel（.model を持つもの）
+        targets: model.model からの相対パス
+
+    Returns:
+        置き換えた nn.Linear の数（対象のモジュールがなければ 0）
+    """
+    import torch
+    from torch.ao.quantization import default_dynamic_qconfig, quantize_dynamic
+
+    count = 0
+    for module in _target_modules(model, targets).values():
+        names = _linear_names(module)
+        quantize_dynamic(module, {name: default_dynamic_qconfig for name in names}, dtype=torch.qint8, inplace=True)
+        count += len(names)
+    return count
+
+
+def _checkpoint_dir(model_name: str) -> Path | None:
+    """model_name のチェックポイントのローカルのディレクトリ（ローカルのパス、または Hugging Face のキャッシュのスナップショット）。"""
+    path = Path(model_name)
+    if path.is_dir():
+        return path
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    try:
+        cached = try_to_load_from_cache(model_name, "config.json")
+    except (ValueError, OSError):
+        return None
+    return Path(cached).parent if isinstance(cached, str) else None
+
+
+def checkpoint_id(model_name: str, model: Any = None) -> str:
+    """
+    チェックポイント（float のモデル本体の設定・重み）の識別子。
+
+    Hugging Face Hub からロードしたモデルは設定の _commit_hash（スナップショットのリビジョン）、
+    それ以外はローカルのディレクトリの設定・重みファイルの名前・実体（キャッシュのシンボリックリンク先）・
+    サイズ・mtime から作る。同じモデル ID のチェックポイントが更新されると別の値になる。
+
+    Args:
+        model_name: モデル ID またはローカルのパス
+        model: ロード済みの Qwen3TTSModel（.model.config を持つもの。None の場合はファイルだけで判定する）
+
+    Returns:
+        "revision:<コミットハッシュ>"・"files:<ハッシュ>"、どちらも分からなければ "unknown"
+    """
+    config = getattr(getattr(model, "model", None), "config", None)
+    commit = getattr(config, "_commit_hash", None)
+    if isinstance(commit, str) and commit:
+        return f"revision:{commit}"
+    directory = _checkpoint_dir(model_name)
+    if directory is None:
+        return "unknown"
+    digest = hashlib.sha256()
+    for path in sorted({p for pattern in _CHECKPOINT_FILES for p in directory.glob(pattern)}):
+        st = path.stat()
+        digest.update(f"{path.name}\0{Path(os.path.realpath(path)).name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return f"files:{digest.hexdigest()[:16]}"
+
+
+def quantized_fingerprint(model_name: str, model: Any = None) -> Dict[str, str]:
+    """
+    保存した量子化済み重みの有効性判定に使う情報。
+
+    Args:
+        model_name: モデル ID またはローカルのパス
+        model: ロード済みの Qwen3TTSModel（チェックポイントのリビジョンの判定に使う。checkpoint_id）
+    """
+    import torch
+
+    try:
+        qwen_tts_version = importlib_metadata.version("qwen-tts")
+    except importlib_metadata.PackageNotFoundError:
+        qwen_tts_version = "unknown"
+    return {
+        "format_version": QUANTIZED_FORMAT_VERSION,
+        "model_name": model_name,
+        "checkpoint": checkpoint_id(model_name, model),
+        "torch_version": torch.__version__,
+        "qwen_tts_version": qwen_tts_version,
+        "targets": ",".join(QUANTIZE_TARGETS),
+    }
+
+
+def quantized_path(model_name: str, root: str | Path = DEFAULT_QUANTIZED_DIR) -> Path:
+    """model_name の量子化済み重みの保存ディレクトリ。"""
+    return Path(root) / model_name.replace("/", "--")
+
+
+def save_quantized(model: Any, directory: str | Path, fingerprint: Dict[str, str]) -> Path:
+    """
+    quantize_model 済みのモデルの量子化対象モジュールの重みを保存する（一時ファイル経由で原子的に置き換える）。
+
+    Returns:
+        保存先のディレクトリ
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    state = {}
+    linears = {}
+    for target, module in _target_modules(model, QUANTIZE_TARGETS).items():
+        quantized = [
+            (name, child)
+            for name, child in module.named_modules()
+            if isinstance(child, DynamicLinear)
+        ]
+        # 量子化した Linear の重みだけを保存する（それ以外は float32 のモデル本体から読まれる）
+        for name, child in quantized:
+            weight, bias = child._weight_bias()
+            state[f"{target}.{name}.weight"] = weight
+            if bias is not None:
+                state[f"{target}.{name}.bias"] = bias
+        linears[target] = [
+            [name, child.in_features, child.out_features, child.bias() is not None] for name, child in quantized
+        ]
+    tmp = directory / f"{_WEIGHTS_FILE}.tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, directory / _WEIGHTS_FILE)
+    meta = dict(fingerprint, linears=linears)
+    tmp = directory / f"{_META_FILE}.tmp"
+    tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, directory / _META_FILE)
+    return directory
+
+
+def load_quantized(model: Any, directory: str | Path, fingerprint: Dict[str, str]) -> int:
+    """
+    保存した量子化済み重みを読み込む。nn.Linear を空の動的量子化 Linear に差し替えてから重みを入れるため、
+    量子化の計算は行わない。
+
+    Returns:
+        差し替えた nn.Linear の数。保存がない・フィンガープリントが一致しない場合は 0（モデルは変更しない）
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    directory = Path(directory)
+    try:
+        meta = json.loads((directory / _META_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return 0
+    if any(meta.get(k) != v for k, v in fingerprint.items()) or not (directory / _WEIGHTS_FILE).exists():
+        return 0
+
+    state = torch.load(directory / _WEIGHTS_FILE, map_location="cpu", weights_only=True, mmap=True)
+    modules = _target_modules(model, QUANTIZE_TARGETS)
+    missing = [
+        f"{target}.{entry[0]}"
+        for target in modules
+        for entry in meta["linears"].get(target, [])
+        if f"{target}.{entry[0]}.weight" not in state
+    ]
+    if missing:
+        raise RuntimeError(f"量子化済み重みが不足しています: {missing[:3]}")
+
+    count = 0
+    for target, module in modules.items():
+        for name, in_features, out_features, bias in meta["linears"].get(target, []):
+            key = f"{target}.{name}"
+            linear = DynamicLinear(in_features, out_features, bias_=bias, dtype=torch.qint8)
+            linear.set_weight_bias(state[f"{key}.weight"], state.get(f"{key}.bias"))
+            parent_name, _, attr = name.rpartition(".")
+            parent = module.get_submodule(parent_name) if parent_name else module
+            setattr(parent, attr, linear)
+            count += 1
+    return count
+
+
+def apply_int8(model: Any, model_name: str, quantized_dir: str | Path | None = None) -> Dict[str, Any]:
+    """
+    モデルに動的 int8 量子化を適用する。quantized_dir を指定した場合は保存済みの重みを優先して読み込み、
+    なければ量子化して保存する。
+
+    Args:
+        model: float32 でロードした Qwen3TTSModel
+        model_name: モデル ID（保存先とフィンガープリントに使う）
+        quantized_dir: 量子化済み重みの保存先のルート（None で保存しない）
+
+    Returns:
+        {"linears": 置き換えた nn.Linear の数, "loaded": 保存済みの重みを読み込んだか}
+    """
+    if quantized_dir is None:
+        return {"linears": quantize_model(model), "loaded": False}
+    directory = quantized_path(model_name, quantized_dir)
+    fingerprint = quantized_fingerprint(model_name, model)
+    count = load_quantized(model, directory, fingerprint)
+    if count:
+        return {"linears": count, "loaded": True}
+    count = quantize_model(model)
+    if count:
+        save_quantized(model, directory, fingerprint)
+    return {"linears": count, "loaded": False}
+
+
+def output_similarity(a: Any, b: Any, sample_rate: int, n_fft: int = 1024, n_bands: int = 64) -> float:
+    """
+    2 つの音声の声質の近さ（平均対数スペクトル包絡のコサイン類似度、-1.0～1.0）。
+
+    量子化前後では生成されるトークン列がわずかに変わるため、波形どうしではなく
+    時間方向に平均した帯域ごとのエネルギーで比べる（話者・声質が保たれているかの目安）。
+    """
+    import numpy as np
+
+    def envelope(wav: Any) -> np.ndarray:
+        x = np.asarray(wav, dtype=np.float32)
+        if len(x) < n_fft:
+            x = np.pad(x, (0, n_fft - len(x)))
+        hop = n_fft // 4
+        frames = np.lib.stride_tricks.sliding_window_view(x, n_fft)[::hop] * np.hanning(n_fft)
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        # 8 kHz までを等間隔の帯域にまとめる（サンプリングレートによらず比較できるように）
+        limit = min(power.shape[1], int(8000 * n_fft / sample_rate))
+        bands = np.array_split(power[:, :limit], n_bands, axis=1)
+        energy = np.stack([band.mean(axis=1) for band in bands], axis=1)
+        log_energy = np.log(energy + 1e-10).mean(axis=0)
+        return log_energy - log_energy.mean()
+
+    ea, eb = envelope(a), envelope(b)
+    denom = float(np.linalg.norm(ea) * np.linalg.norm(eb))
+    return float(ea @ eb / denom) if denom > 0 else 0.0
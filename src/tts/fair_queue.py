@@ -0,0 +1,232 @@
+# coding=utf-8
+"""
+優先度と利用者ごとの公平性を持つ合成リクエストのキュー。
+
+モデルを 1 つ常駐させて全員で共有すると、1 人が長文を貼り付けただけで他の人の短い発言が
+その後ろで待たされる。FairQueue は取り出す順番を次のように決める。
+
+- 優先度（PRIORITIES）: "system"（システムの読み上げ）> "interactive"（短い発言）> "bulk"（長文）。
+  高い優先度のリクエストがあれば先に取り出す。ただし低い優先度のリクエストが starvation_sec 秒以上
+  1 件も取り出されずに待っていれば、その優先度から 1 件取り出す（飢餓を防ぐ。高い優先度が詰まっていても、
+  低い優先度は starvation_sec ごとに少なくとも 1 件進む）
+- 公平性: 同じ優先度の中では、ギルド → ユーザーの 2 段の Deficit Round Robin で取り出す。
+  各利用者は 1 巡ごとに quantum（文字数）の持ち分を受け取り、持ち分がある間だけ取り出せる。
+  持ち分を超えた分は次の巡で差し引く（Surplus Round Robin。取り出す前に次の要素の重さを知らなくてよいため、
+  2 段に重ねられる）
+
+長文のセグメントを 1 つずつ入れ直す（BatchScheduler）と、セグメントの境界で他の利用者・高い優先度の
+リクエストに順番を譲る（プリエンプション）ことになる。
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+# 優先度（先頭ほど高い）
+PRIORITIES = ("system", "interactive", "bulk")
+
+
+@dataclass
+class _Entry:
+    item: Any
+    cost: float
+    enqueued_at: float
+
+
+class _DrrNode:
+    """子（利用者またはその下の段）を Surplus Round Robin で巡回する。葉では要素を FIFO で持つ。"""
+
+    def __init__(self, quantum: float, leaf: bool) -> None:
+        self._quantum = quantum
+        self._leaf = leaf
+        self._items: Deque[_Entry] = deque()
+        self._ring: Deque[str] = deque()
+        self._children: Dict[str, "_DrrNode"] = {}
+        self._deficit: Dict[str, float] = {}
+        # 先頭の子に今の巡の持ち分を渡したか
+        self._granted = False
+        self.size = 0
+
+    def push(self, path: Sequence[str], entry: _Entry) -> None:
+        self.size += 1
+        if self._leaf:
+            self._items.append(entry)
+            return
+        key = path[0]
+        child = self._children.get(key)
+        if child is None:
+            child = _DrrNode(self._quantum, leaf=len(path) == 1)
+            self._children[key] = child
+            self._deficit[key] = 0.0
+            self._ring.append(key)
+        child.push(path[1:], entry)
+
+    def pop(self) -> _Entry:
+        self.size -= 1
+        if self._leaf:
+            return self._items.popleft()
+        while True:
+            key = self._ring[0]
+            if not self._granted:
+                self._deficit[key] += self._quantum
+                self._granted = True
+            if self._deficit[key] <= 0:
+                self._next_turn()
+                continue
+            child = self._children[key]
+            entry = child.pop()
+            self._deficit[key] -= entry.cost
+            if child.size == 0:
+                # 空になった利用者の持ち分は持ち越さない
+                self._ring.popleft()
+                del self._children[key]
+                del self._deficit[key]
+                self._granted = False
+            elif self._deficit[key] <= 0:
+                self._next_turn()
+            return entry
+
+    def _next_turn(self) -> None:
+        self._ring.rotate(-1)
+        self._granted = False
+
+    def oldest(self) -> float:
+        """持っている要素のうち最も古い投入時刻（空なら inf）。"""
+        if self._leaf:
+            return self._items[0].enqueued_at if self._items else float("inf")
+        return min((c.oldest() for c in self._children.values()), default=float("inf"))
+
+
+class FairQueue:
+    """優先度 + 2 段の Deficit Round Robin のスレッドセーフなキュー。"""
+
+    def __init__(
+        self,
+        maxsize: int = 64,
+        *,
+        quantum: float = 80.0,
+        starvation_sec: float = 2.0,
+        levels: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            maxsize: 最大の要素数（put(force=False) で超えると queue.Full）
+            quantum: 利用者が 1 巡で受け取る持ち分（put の cost と同じ単位。文字数なら 1 セグメント程度）
+            starvation_sec: 低い優先度の要素がこの秒数以上 1 件も取り出されずに待っていたら、高い優先度より先に 1 件取り出す
+            levels: 公平性の段数（put の key の長さ。デフォルト 2 = ギルド・ユーザー）
+            clock: 待ち時間の計測に使う時計（シミュレーションでは仮想時刻を渡す）
+
+        Raises:
+            ValueError: 設定値が不正な場合
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize は 1 以上を指定してください。")
+        if quantum <= 0 or starvation_sec <= 0 or levels < 1:
+            raise ValueError("quantum・starvation_sec は正、levels は 1 以上を指定してください。")
+        self.maxsize = maxsize
+        self._levels = levels
+        self._starvation = starvation_sec
+        self._clock = clock
+        self._roots = [_DrrNode(quantum, leaf=False) for _ in PRIORITIES]
+        # 優先度ごとに最後に取り出した時刻
+        self._served_at = [float("-inf")] * len(PRIORITIES)
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(
+        self,
+        item: Any,
+        *,
+        priority: str = "interactive",
+        key: Tuple[str, ...] = (),
+        cost: float = 1.0,
+        force: bool = False,
+    ) -> None:
+        """
+        要素を入れる。
+
+        Args:
+            item: 要素
+            priority: 優先度（PRIORITIES のいずれか）
+            key: 公平性の単位（(ギルド, ユーザー) 等。levels より短い場合は空文字で補う）
+            cost: 要素の重さ（文字数等。持ち分から差し引く）
+            force: maxsize を超えても入れる（取り出し済みのジョブの続きを入れ直す場合）
+
+        Raises:
+            ValueError: priority が未対応、または key が levels より長い場合
+            queue.Full: 要素数が maxsize に達している場合（force=False）
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority は {', '.join(PRIORITIES)} のいずれかを指定してください。")
+        if len(key) > self._levels:
+            raise ValueError(f"key は {self._levels} 要素以下で指定してください。")
+        path = tuple(key) + ("",) * (self._levels - len(key))
+        with self._cond:
+            if not force and self._size() >= self.maxsize:
+                raise queue.Full
+            self._roots[PRIORITIES.index(priority)].push(path, _Entry(item, max(float(cost), 1e-6), self._clock()))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        次の要素を取り出す（要素が入るまで待つ）。
+
+        Args:
+            timeout: 待つ最大秒数（None は無制限、0 は待たない）
+
+        Returns:
+            要素。close() 済みで空の場合は None
+
+        Raises:
+            queue.Empty: timeout までに要素が入らなかった場合
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._size() == 0:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            level = self._select()
+            self._served_at[level] = self._clock()
+            return self._roots[level].pop().item
+
+    def qsize(self) -> int:
+        """入っている要素数。"""
+        with self._cond:
+            return self._size()
+
+    def close(self) -> None:
+        """以降、空になった get() は待たずに None を返す（残っている要素は取り出せる）。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _size(self) -> int:
+        return sum(root.size for root in self._roots)
+
+    def _select(self) -> int:
+        """取り出す優先度を選ぶ。starvation_sec 以上取り出されずに待っている優先度を最優先する。"""
+        nonempty = [level for level, root in enumerate(self._roots) if root.size]
+        now = self._clock()
+        waiting = {level: max(self._roots[level].oldest(), self._served_at[level]) for level in nonempty[1:]}
+        starved = [level for level, since in waiting.items() if now - since >= self._starvation]
+        if starved:
+            return min(starved, key=waiting.__getitem__)
+        return nonempty[0]
+
+
+def classify_priority(text: str, short_chars: int = 40) -> str:
+    """
+    優先度を指定しないリクエストの優先度（short_chars 文字以下は "interactive"、それより長ければ "bulk"）。
+    """
+    return "interactive" if len(text.strip()) <= short_chars else "bulk"
+
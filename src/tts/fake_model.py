@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+Qwen3TTSModel の代替（GPU・モデルダウンロード不要）。
+
+Qwen3TTSWrapper が使う create_voice_clone_prompt / generate_voice_clone と同じシグネチャを持ち、
+テキスト長に比例した長さの正弦波を返す。呼び出しは記録される。
+ロード・プロンプト作成・生成の所要時間を設定でき、性能計測（src.tools.benchmark --backend fake）と
+単体テストで使う。出力は入力だけで決まる（決定的）。
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import torch
+
+
+@dataclass
+class FakePromptItem:
+    """VoiceClonePromptItem 相当。"""
+
+    ref_code: Optional[torch.Tensor]
+    ref_spk_embedding: torch.Tensor
+    x_vector_only_mode: bool
+    icl_mode: bool
+    ref_text: Optional[str] = None
+
+
+class FakeQwen3TTSModel:
+    """Qwen3TTSModel の代替。テキスト長に比例した長さの正弦波を返す。"""
+
+    SAMPLE_RATE = 24000
+    SAMPLES_PER_CHAR = 2400
+
+    def __init__(
+        self,
+        *,
+        prompt_latency_sec: float = 0.0,
+        generate_latency_sec: float = 0.0,
+        latency_per_char_sec: float = 0.0,
+        samples_per_char: int | None = None,
+        first_call_latency_sec: float = 0.0,
+        oom_batch_size: int | None = None,
+    ) -> None:
+        """
+        Args:
+            prompt_latency_sec: create_voice_clone_prompt 1 回の所要時間（秒）
+            generate_latency_sec: generate_voice_clone 1 回の固定の所要時間（秒）
+            latency_per_char_sec: 1 文字あたりの生成時間（秒）。バッチ内では最長のテキストで決まる
+                （バッチ内の系列は並列に生成される想定）
+            samples_per_char: 1 文字あたりの出力サンプル数（None の場合は SAMPLES_PER_CHAR）
+            first_call_latency_sec: 最初の generate_voice_clone だけに加わる時間（秒）。
+                実モデルのカーネル選択・コンパイル等による初回の遅れを模す
+            oom_batch_size: この件数を超えるバッチの generate_voice_clone は torch.cuda.OutOfMemoryError
+                （メモリ不足からの回復のテスト用。None は発生させない）
+        """
+        self.prompt_latency_sec = prompt_latency_sec
+        self.generate_latency_sec = generate_latency_sec
+        self.latency_per_char_sec = latency_per_char_sec
+        self.samples_per_char = samples_per_char if samples_per_char is not None else self.SAMPLES_PER_CHAR
+        self.first_call_latency_sec = first_call_latency_sec
+        self.oom_batch_size = oom_batch_size
+        self.prompt_calls: List[Any] = []
+        self.generate_calls: List[dict] = []
+
+    @classmethod
+    def from_pretrained(cls, pretrained_model_name_or_path: str, **kwargs: Any) -> "FakeQwen3TTSModel":
+        return cls()
+
+    def create_voice_clone_prompt(
+        self,
+        ref_audio: Any,
+        ref_text: Any = None,
+        x_vector_only_mode: bool = False,
+    ) -> List[FakePromptItem]:
+        self.prompt_calls.append(ref_audio)
+        if self.prompt_latency_sec > 0:
+            time.sleep(self.prompt_latency_sec)
+        return [
+            FakePromptItem(
+                ref_code=None if x_vector_only_mode else torch.zeros((50, 16), dtype=torch.long),
+                ref_spk_embedding=torch.ones(1024),
+                x_vector_only_mode=x_vector_only_mode,
+                icl_mode=not x_vector_only_mode,
+                ref_text=ref_text,
+            )
+        ]
+
+    def generate_voice_clone(
+        self,
+        text: Any,
+        language: Any = None,
+        ref_audio: Any = None,
+        ref_text: Any = None,
+        x_vector_only_mode: bool = False,
+        voice_clone_prompt: Any = None,
+        non_streaming_mode: bool = False,
+        **kwargs: Any,
+    ) -> tuple[List[np.ndarray], int]:
+        texts = text if isinstance(text, list) else [text]
+        self.generate_calls.append(
+            {"text": texts, "language": language, "voice_clone_prompt": voice_clone_prompt, **kwargs}
+        )
+        if self.oom_batch_size is not None and len(texts) > self.oom_batch_size:
+            raise torch.cuda.OutOfMemoryError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        latency = self.generate_latency_sec + self.latency_per_char_sec * max(len(t) for t in texts)
+        if len(self.generate_calls) == 1:
+            latency += self.first_call_latency_sec
+        if latency > 0:
+            time.sleep(latency)
+        wavs = []
+        for t in texts:
+            n = len(t) * self.samples_per_char
+            wavs.append(0.5 * np.sin(np.arange(n, dtype=np.float32) * 0.05))
+        return wavs, self.SAMPLE_RATE
+
+
+def make_fake_loader(load_latency_sec: float = 0.0, **model_kwargs: Any) -> Callable[..., FakeQwen3TTSModel]:
+    """
+    Qwen3TTSWrapper の model_loader に渡すローダーを作る。
+
+    Args:
+        load_latency_sec: ロード 1 回の所要時間（秒）
+        **model_kwargs: FakeQwen3TTSModel に渡す引数（prompt_latency_sec 等）
+
+    Returns:
+        (model_name, **load_kwargs) を受け取り FakeQwen3TTSModel を返す関数
+    """
+
+    def load(pretrained_model_name_or_path: str, **kwargs: Any) -> FakeQwen3TTSModel:
+        if load_latency_sec > 0:
+            time.sleep(load_latency_sec)
+        return FakeQwen3TTSModel(**model_kwargs)
+
+    return load
@@ -0,0 +1,179 @@
+# coding=utf-8
+"""
+暴走した生成（EOS が出ないまま続く無音・同じコードの繰り返し）の早期打ち切り。
+
+Qwen3-TTS の talker はコーデックのフレーム（12Hz モデルは 1 秒 12 フレーム）を 1 つずつ生成し、
+EOS が出るまで max_new_tokens まで続ける。EOS が出ない場合、末尾に長い無音や雑音のループが付き、
+その分だけ生成と音声デコードの時間を使う。
+
+RunawayGuard は先頭コードブックのトークン列の末尾を見て、
+- 同じトークンが silence_sec 秒以上続く（無音は同じコードの連続として現れる）
+- 周期 max_period フレーム以下の同じパターンが loop_sec 秒以上繰り返す
+のどちらかになった系列を、生成中（StoppingCriteria）に止める。生成後は繰り返しの始まりに EOS を置き、
+ループ部分をデコードしない（Qwen3TTSForConditionalGeneration.generate は EOS の位置で系列を切る）。
+
+install_runaway_guard() は Qwen3TTSModel 内部の talker.generate を包んで、この 2 つを差し込む。
+"""
+
+from __future__ import annotations
+
+import functools
+from typing import Any, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# 生成中の判定の間隔（フレーム）。毎ステップの小さなカーネル起動を減らす（検出の遅れは最大 0.25 秒）
+_CHECK_EVERY = 3
+
+
+def find_runaway(tokens: Sequence[int], silence_frames: int, loop_frames: int, max_period: int) -> Optional[int]:
+    """
+    トークン列の末尾が無音・ループになっていれば、その始まりの位置を返す。
+
+    Args:
+        tokens: 先頭コードブックのトークン列
+        silence_frames: 同じトークンがこのフレーム数以上続いたら無音とみなす
+        loop_frames: 周期 2 以上のパターンがこのフレーム数以上繰り返したらループとみなす
+        max_period: ループとみなす最大の周期（フレーム）
+
+    Returns:
+        残す長さ（繰り返しの最初の 1 周期までを残す）。末尾が無音・ループでなければ None
+    """
+    seq = list(tokens)
+    n = len(seq)
+    for period in range(1, max_period + 1):
+        threshold = silence_frames if period == 1 else loop_frames
+        if n < threshold:
+            continue
+        run = 0
+        while run < n - period and seq[n - 1 - run] == seq[n - 1 - run - period]:
+            run += 1
+        if run >= period and run + period >= threshold:
+            return n - run
+    return None
+
+
+class RunawayGuard:
+    """暴走した生成の検出条件と、打ち切った回数。"""
+
+    def __init__(
+        self,
+        codec_hz: float = 12.0,
+        silence_sec: float = 2.0,
+        loop_sec: float = 3.0,
+        max_period: int = 12,
+    ) -> None:
+        """
+        Args:
+            codec_hz: コーデックのフレームレート（12Hz モデルは 12）
+            silence_sec: この秒数以上、同じトークンが続いたら止める
+            loop_sec: この秒数以上、同じパターンが繰り返したら止める（silence_sec 以上）
+            max_period: ループとみなす最大の周期（フレーム。デフォルト 12 = 1 秒）
+
+        Raises:
+            ValueError: 値が正でない、または loop_sec が silence_sec より短い場合
+        """
+        if codec_hz <= 0 or silence_sec <= 0 or max_period < 2:
+            raise ValueError("codec_hz・silence_sec は正、max_period は 2 以上を指定してください。")
+        if loop_sec < silence_sec:
+            raise ValueError("loop_sec は silence_sec 以上を指定してください。")
+        self.silence_frames = max(2, int(round(silence_sec * codec_hz)))
+        self.loop_frames = max(self.silence_frames, int(round(loop_sec * codec_hz)))
+        self.max_period = max_period
+        # 末尾の無音・繰り返しを切り詰めた系列の数（生成中に止めた系列もここで数える）
+        self.stops = 0
+
+    def detect(self, input_ids: torch.Tensor) -> torch.Tensor:
+        """
+        生成中の系列（batch, 生成済みフレーム数）ごとに、末尾が無音・ループかを判定する。
+
+        Returns:
+            (batch,) の bool テンソル
+        """
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        if input_ids.shape[1] < self.silence_frames or input_ids.shape[1] % _CHECK_EVERY:
+            return done
+        tail = input_ids[:, -(self.loop_frames + self.max_period) :]
+        for period in range(1, self.max_period + 1):
+            if tail.shape[1] <= period:
+                break
+            threshold = self.silence_frames if period == 1 else self.loop_frames
+            same = tail[:, period:] == tail[:, :-period]
+            run = same.flip(1).int().cumprod(dim=1).sum(dim=1)
+            done |= (run >= period) & (run + period >= threshold)
+        return done
+
+    def trim(self, codes: Sequence[Optional[torch.Tensor]], eos_token_id: int) -> int:
+        """
+        talker の生成結果（ステップごとの (batch, コードブック数) のコード）で、末尾が無音・ループの系列の
+        繰り返しの始まりに EOS を書き込む（その場で書き換える）。
+
+        Args:
+            codes: talker.generate の hidden_states の各ステップの最後の要素（None は読み飛ばす）
+            eos_token_id: コーデックの EOS
+
+        Returns:
+            切り詰めた系列の数
+        """
+        steps = [c for c in codes if c is not None]
+        if not steps:
+            return 0
+        first = torch.stack([c[:, 0] for c in steps], dim=1).tolist()
+        trimmed = 0
+        for row, tokens in enumerate(first):
+            if eos_token_id in tokens:
+                tokens = tokens[: tokens.index(eos_token_id)]
+            # 止めた後のパディングが同じトークンの連続になる場合もあるため、末尾から続く繰り返しをすべて除く
+            cut = None
+            while True:
+                found = find_runaway(tokens[:cut], self.silence_frames, self.loop_frames, self.max_period)
+                if found is None:
+                    break
+                cut = found
+            if cut is not None:
+                steps[cut][row, 0] = eos_token_id
+                trimmed += 1
+        self.stops += trimmed
+        return trimmed
+
+
+class RunawayStoppingCriteria(StoppingCriteria):
+    """RunawayGuard の判定で系列ごとに生成を止める StoppingCriteria。"""
+
+    def __init__(self, guard: RunawayGuard) -> None:
+        self._guard = guard
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor, **kwargs: Any) -> torch.Tensor:
+        return self._guard.detect(input_ids)
+
+
+def install_runaway_guard(model: Any, guard: RunawayGuard) -> bool:
+    """
+    Qwen3TTSModel の talker.generate を包み、生成中の打ち切りと生成後の切り詰めを差し込む。
+
+    Args:
+        model: Qwen3TTSModel（.model.talker を持つもの）
+        guard: 検出条件
+
+    Returns:
+        差し込めた場合 True（talker がないモデルでは何もせず False）
+    """
+    talker = getattr(getattr(model, "model", None), "talker", None)
+    if talker is None or not callable(getattr(talker, "generate", None)):
+        return False
+    generate = talker.generate
+
+    @functools.wraps(generate)
+    def guarded_generate(*args: Any, **kwargs: Any) -> Any:
+        criteria = StoppingCriteriaList(kwargs.pop("stopping_criteria", None) or [])
+        criteria.append(RunawayStoppingCriteria(guard))
+        result = generate(*args, stopping_criteria=criteria, **kwargs)
+        eos_token_id = kwargs.get("eos_token_id")
+        hidden_states = getattr(result, "hidden_states", None)
+        if isinstance(eos_token_id, int) and hidden_states:
+            guard.trim([hid[-1] for hid in hidden_states], eos_token_id)
+        return result
+
+    talker.generate = guarded_generate
+    return True
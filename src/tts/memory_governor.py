@@ -0,0 +1,279 @@
+# coding=utf-8
+"""
+生成のメモリ管理（メモリガバナー）。
+
+生成 1 回のメモリ使用量は、主に talker の KV キャッシュ（バッチ件数 × 系列長 × 1 トークンあたりのバイト数）で
+決まる。MemoryGovernor は
+- RAM・VRAM の空き（CUDA では PyTorch のキャッシュ内の未使用分を含む）から reserve_mb を引いた余裕を測り、
+- リクエストのメモリ使用量を、テキストの長さから見積もった生成トークン数とバッチ件数から見積もり、
+- 余裕に収まる件数だけバッチにまとめさせる（BatchScheduler の受け付け・Qwen3TTSWrapper のバケット分割）。
+
+1 トークンあたりのバイト数は、最初はモデル設定の KV キャッシュのサイズから見積もり、CUDA では生成ごとの
+ピーク使用量、メモリ不足（OOM）が起きた場合はその時の余裕から補正する。OOM が起きたバッチは
+キャッシュを解放してから半分に分けて生成し直す（Qwen3TTSWrapper.generate_voice_batch）。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import gc
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import torch
+
+# 見積もりに足すプロンプト（参照音声コード・参照テキスト・指示）のトークン数の目安
+PROMPT_TOKENS = 256
+# モデル設定から求められない場合の 1 トークンあたりのバイト数
+DEFAULT_BYTES_PER_TOKEN = 256 * 1024
+# KV キャッシュ以外（活性・コードプレディクタ・音声デコード）の分として、KV キャッシュのサイズに掛ける係数
+_OVERHEAD_FACTOR = 2.0
+# 計測値・OOM から求めた値に掛ける安全係数
+_SAFETY = 1.2
+_MB = 1024 * 1024
+
+
+def is_oom_error(exc: Optional[BaseException]) -> bool:
+    """
+    例外がメモリ不足によるものかを判定する（__cause__ / __context__ をたどる）。
+
+    qwen_tts や Qwen3TTSWrapper が RuntimeError で包んだ OOM も、元の例外から判定できる。
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (MemoryError, torch.cuda.OutOfMemoryError)):
+            return True
+        message = str(exc).lower()
+        if isinstance(exc, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def read_ram() -> Tuple[int, int]:
+    """物理メモリの (空き, 合計) バイト（Linux は /proc/meminfo の MemAvailable）。"""
+    try:
+        info = {}
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                info[name] = int(value.split()[0]) * 1024
+        return info["MemAvailable"], info["MemTotal"]
+    except (OSError, KeyError, ValueError, IndexError):
+        page = os.sysconf("SC_PAGE_SIZE")
+        return os.sysconf("SC_AVPHYS_PAGES") * page, os.sysconf("SC_PHYS_PAGES") * page
+
+
+def read_memory(device: str) -> Tuple[int, int]:
+    """
+    生成に使うメモリの (空き, 合計) バイト。
+
+    CUDA デバイスは VRAM（PyTorch が確保済みで未使用の分も空きに数える）、それ以外は物理メモリ。
+    """
+    if device.startswith("cuda") and torch.cuda.is_available():
+        dev = torch.device(device)
+        free, total = torch.cuda.mem_get_info(dev)
+        cached = torch.cuda.memory_reserved(dev) - torch.cuda.memory_allocated(dev)
+        return int(free + cached), int(total)
+    return read_ram()
+
+
+def estimate_bytes_per_token(model: Any, dtype: torch.dtype) -> int:
+    """
+    モデル設定（talker の層数・KV ヘッド数・ヘッド次元）から 1 トークンあたりのメモリ使用量を見積もる。
+
+    Args:
+        model: Qwen3TTSModel（.model.talker.config を持つもの）
+        dtype: 計算に使う dtype
+
+    Returns:
+        1 系列・1 トークンあたりのバイト数（設定がないモデルでは DEFAULT_BYTES_PER_TOKEN）
+    """
+    config = getattr(getattr(getattr(model, "model", None), "talker", None), "config", None)
+    layers = getattr(config, "num_hidden_layers", None)
+    heads = getattr(config, "num_key_value_heads", None) or getattr(config, "num_attention_heads", None)
+    head_dim = getattr(config, "head_dim", None)
+    if head_dim is None and getattr(config, "hidden_size", None) and getattr(config, "num_attention_heads", None):
+        head_dim = config.hidden_size // config.num_attention_heads
+    if not (isinstance(layers, int) and isinstance(heads, int) and isinstance(head_dim, int)):
+        return DEFAULT_BYTES_PER_TOKEN
+    element_size = torch.empty((), dtype=dtype).element_size()
+    return int(2 * layers * heads * head_dim * element_size * _OVERHEAD_FACTOR)
+
+
+class MemoryGovernor:
+    """メモリの余裕に収まるバッチ件数を決め、生成ごとの使用量と OOM を記録する。"""
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        *,
+        bytes_per_token: int = DEFAULT_BYTES_PER_TOKEN,
+        reserve_mb: float = 512.0,
+        memory_info: Callable[[], Tuple[int, int]] | None = None,
+    ) -> None:
+        """
+        Args:
+            device: 生成に使うデバイス（"cuda:0" 等は VRAM、それ以外は物理メモリを見る）
+            bytes_per_token: 1 系列・1 トークンあたりのメモリ使用量の初期値（estimate_bytes_per_token）
+            reserve_mb: 空きから差し引いて残しておく量（MB。他のプロセス・断片化の分）
+            memory_info: (空き, 合計) バイトを返す関数（None の場合は read_memory(device)。テストで差し替える）
+
+        Raises:
+            ValueError: bytes_per_token が正でない、または reserve_mb が負の場合
+        """
+        if bytes_per_token <= 0:
+            raise ValueError("bytes_per_token は正の値を指定してください。")
+        if reserve_mb < 0:
+            raise ValueError("reserve_mb は 0 以上を指定してください。")
+        self._device = device
+        self._cuda = device.startswith("cuda") and torch.cuda.is_available()
+        self._memory_info = memory_info or functools.partial(read_memory, device)
+        self._reserve = int(reserve_mb * _MB)
+        self._initial_bytes_per_token = int(bytes_per_token)
+        self._bytes_per_token = int(bytes_per_token)
+        # 計測したピークから求めた 1 トークンあたりの最大値 / OOM から求めた下限
+        self._observed = 0
+        self._oom_floor = 0
+        self._lock = threading.Lock()
+        self._counts = {"batches": 0, "ooms": 0, "splits": 0, "retries": 0}
+        self._peak_bytes = 0
+
+    @property
+    def bytes_per_token(self) -> int:
+        """現在の 1 系列・1 トークンあたりのメモリ使用量の見積もり（バイト）。"""
+        return self._bytes_per_token
+
+    def headroom(self) -> int:
+        """いま使える量（空き − reserve_mb。バイト、0 以上）。"""
+        free, _ = self._memory_info()
+        return max(0, free - self._reserve)
+
+    def estimate_bytes(self, budgets: Sequence[int]) -> int:
+        """
+        バッチ 1 回のメモリ使用量を見積もる（系列は最も長い生成トークン数までパディングされる）。
+
+        Args:
+            budgets: バッチ内の各リクエストの生成トークン数の上限（estimate_max_new_tokens）
+
+        Returns:
+            見積もったバイト数
+        """
+        if not budgets:
+            return 0
+        return len(budgets) * (max(budgets) + PROMPT_TOKENS) * self._bytes_per_token
+
+    def max_batch_size(self, budget: int, limit: int, headroom: int | None = None) -> int:
+        """
+        生成トークン数の上限が budget のリクエストを、余裕に収まる範囲で何件まとめられるか。
+
+        Args:
+            budget: 1 リクエストの生成トークン数の上限
+            limit: 件数の上限
+            headroom: 使える量（None の場合は headroom() を測る）
+
+        Returns:
+            1 以上 limit 以下の件数（1 件でも収まらない場合も 1。その場合は OOM からの回復に任せる）
+        """
+        room = self.headroom() if headroom is None else headroom
+        per_request = self.estimate_bytes([budget])
+        return max(1, min(limit, room // per_request))
+
+    @contextlib.contextmanager
+    def track(self, batch_size: int, budget: int) -> Iterator[None]:
+        """
+        生成 1 回を囲み、使用量（CUDA ではピーク）を記録する。OOM の場合は見積もりを補正し、キャッシュを解放する。
+
+        Args:
+            batch_size: バッチ件数
+            budget: 生成トークン数の上限
+        """
+        room = self.headroom()
+        base = 0
+        if self._cuda:
+            dev = torch.device(self._device)
+            torch.cuda.reset_peak_memory_stats(dev)
+            base = torch.cuda.memory_allocated(dev)
+        try:
+            yield
+        except Exception as e:
+            if is_oom_error(e):
+                self._record_oom(batch_size, budget, room)
+                self.release()
+            raise
+        peak = torch.cuda.max_memory_allocated(torch.device(self._device)) - base if self._cuda else None
+        self._record(batch_size, budget, peak)
+
+    def record_split(self) -> None:
+        """OOM のバッチを半分に分けて生成し直したことを記録する。"""
+        with self._lock:
+            self._counts["splits"] += 1
+
+    def record_retry(self) -> None:
+        """OOM の 1 件を、キャッシュを解放してから生成し直したことを記録する。"""
+        with self._lock:
+            self._counts["retries"] += 1
+
+    def release(self) -> None:
+        """Python のガベージと PyTorch のキャッシュ（CUDA）を解放する。"""
+        gc.collect()
+        if self._cuda:
+            torch.cuda.empty_cache()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        メモリの統計値を返す。
+
+        Returns:
+            device, ram_free_mb, ram_total_mb, vram_free_mb, vram_total_mb（CUDA 以外は None）,
+            headroom_mb, reserve_mb, bytes_per_token, peak_batch_mb（CUDA の生成 1 回の最大ピーク）,
+            batches, ooms, splits, retries, max_batch_size（生成トークン数の上限ごとの、いま収まる件数）を含む辞書
+        """
+        ram_free, ram_total = read_ram()
+        vram_free = vram_total = None
+        if self._cuda:
+            vram_free, vram_total = (v / _MB for v in self._memory_info())
+        headroom = self.headroom()
+        with self._lock:
+            counts = dict(self._counts)
+            peak = self._peak_bytes
+        return {
+            "device": self._device,
+            "ram_free_mb": ram_free / _MB,
+            "ram_total_mb": ram_total / _MB,
+            "vram_free_mb": vram_free,
+            "vram_total_mb": vram_total,
+            "headroom_mb": headroom / _MB,
+            "reserve_mb": self._reserve / _MB,
+            "bytes_per_token": self._bytes_per_token,
+            "peak_batch_mb": peak / _MB if self._cuda else None,
+            **counts,
+            "max_batch_size": {
+                str(budget): self.max_batch_size(budget, 64, headroom) for budget in (128, 512, 2048)
+            },
+        }
+
+    def _record(self, batch_size: int, budget: int, peak: int | None) -> None:
+        with self._lock:
+            self._counts["batches"] += 1
+            if peak is None or peak <= 0:
+                return
+            self._peak_bytes = max(self._peak_bytes, peak)
+            self._observed = max(self._observed, peak // (batch_size * (budget + PROMPT_TOKENS)))
+            self._update()
+
+    def _record_oom(self, batch_size: int, budget: int, headroom: int) -> None:
+        with self._lock:
+            self._counts["ooms"] += 1
+            # 収まらなかったので、1 トークンあたりは少なくとも「余裕 / トークン数」より大きい
+            tokens = batch_size * (budget + PROMPT_TOKENS)
+            self._oom_floor = max(self._oom_floor, int(headroom / tokens * _SAFETY) + 1)
+            self._update()
+
+    def _update(self) -> None:
+        """計測値があればそれを、なければ初期値を使い、OOM から求めた下限を下回らないようにする。"""
+        base = int(self._observed * _SAFETY) if self._observed else self._initial_bytes_per_token
+        self._bytes_per_token = max(base, self._oom_floor)
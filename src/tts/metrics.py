@@ -0,0 +1,368 @@
+# coding=utf-8
+"""
+TTS の処理段階ごとの計測（スパン）と、その出力先。
+
+Qwen3TTSWrapper / VoiceCloneManager は span("tts.generate", text_chars=...) のように
+各段階（参照音声の読み込み・プロンプト作成・generate_voice_clone・後処理）を囲み、
+所要時間とテキスト長・生成した音声の秒数・トークン数を出力先（MetricsSink）に渡す。
+
+出力先:
+- NullMetrics: 何もしない（既定）。span() は共有の空オブジェクトを返すだけなので負荷はほぼない。
+- InMemoryMetrics: スパン名ごとのヒストグラムをメモリに集計する（summary() で平均・分位点）。
+- PrometheusMetrics: InMemoryMetrics を Prometheus のテキスト形式で出力する（serve() で HTTP 公開）。
+- JsonlMetrics: 1 スパン 1 行の JSON を logs/ 以下のファイルに追記する。
+- MultiMetrics: 複数の出力先に同時に渡す。
+
+set_metrics() でプロセス全体の出力先を切り替える。
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+# ヒストグラムのバケット境界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_JSONL_PATH = "logs/metrics.jsonl"
+
+
+class MetricsSink:
+    """スパンの出力先の基底クラス。"""
+
+    # False の出力先では span() が計測自体を省く
+    enabled = True
+
+    def record(self, name: str, duration_sec: float, attrs: Dict[str, Any]) -> None:
+        """スパン 1 件を記録する。"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """出力先を閉じる（必要なものだけ実装する）。"""
+
+
+class NullMetrics(MetricsSink):
+    """何も記録しない出力先。"""
+
+    enabled = False
+
+    def record(self, name: str, duration_sec: float, attrs: Dict[str, Any]) -> None:
+        pass
+
+
+class _Histogram:
+    """1 スパン名分の集計。"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max", "totals")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        # 数値の属性（text_chars, audio_sec, tokens 等）の合計
+        self.totals: Dict[str, float] = {}
+
+    def add(self, value: float, attrs: Dict[str, Any]) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for key, v in attrs.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                self.totals[key] = self.totals.get(key, 0.0) + v
+
+    def quantile(self, q: float) -> float:
+        """バケット境界で近似した分位点（該当バケットの上限。最後のバケットは最大値）。"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class InMemoryMetrics(MetricsSink):
+    """スパン名ごとのヒストグラムをメモリに集計する。スレッドセーフ。"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Args:
+            buckets: ヒストグラムのバケット境界（秒、昇順）
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._histograms: Dict[str, _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration_sec: float, attrs: Dict[str, Any]) -> None:
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = _Histogram(self._buckets)
+            hist.add(duration_sec, attrs)
+
+    def names(self) -> List[str]:
+        """記録されたスパン名の一覧。"""
+        with self._lock:
+            return sorted(self._histograms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        スパン名ごとの集計を返す。
+
+        Returns:
+            {スパン名: {count, sum, mean, min, max, p50, p95, p99, <属性名>_total ...}}
+        """
+        with self._lock:
+            result = {}
+            for name, h in self._histograms.items():
+                entry = {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                    "min": h.min if h.count else 0.0,
+                    "max": h.max,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "p99": h.quantile(0.99),
+                }
+                for key, total in h.totals.items():
+                    entry[f"{key}_total"] = total
+                result[name] = entry
+            return result
+
+    def reset(self) -> None:
+        """集計を破棄する。"""
+        with self._lock:
+            self._histograms.clear()
+
+
+class PrometheusMetrics(InMemoryMetrics):
+    """InMemoryMetrics の集計を Prometheus のテキスト形式で出力する。"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, prefix: str = "tts") -> None:
+        """
+        Args:
+            buckets: ヒストグラムのバケット境界（秒、昇順）
+            prefix: メトリクス名の接頭辞
+        """
+        super().__init__(buckets)
+        self._prefix = prefix
+        self._server: ThreadingHTTPServer | None = None
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式（text/plain; version=0.0.4）で集計を返す。"""
+        p = self._prefix
+        lines = [
+            f"# HELP {p}_span_duration_seconds TTS の処理段階ごとの所要時間",
+            f"# TYPE {p}_span_duration_seconds histogram",
+        ]
+        totals: Dict[str, List[str]] = {}
+        with self._lock:
+            for name in sorted(self._histograms):
+                h = self._histograms[name]
+                label = f'span="{name}"'
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="+Inf"}} {h.count}')
+                lines.append(f"{p}_span_duration_seconds_sum{{{label}}} {h.sum}")
+                lines.append(f"{p}_span_duration_seconds_count{{{label}}} {h.count}")
+                for key, total in sorted(h.totals.items()):
+                    totals.setdefault(key, []).append(f"{p}_span_{key}_total{{{label}}} {total}")
+        for key, samples in sorted(totals.items()):
+            lines.append(f"# TYPE {p}_span_{key}_total counter")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        GET /metrics で render() の内容を返す HTTP サーバをデーモンスレッドで起動する。
+
+        Args:
+            port: 待ち受けポート（0 で空きポート）
+            host: 待ち受けアドレス（既定はローカルのみ）
+
+        Returns:
+            起動したサーバ（server_address で実際のポートを確認できる）
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class JsonlMetrics(MetricsSink):
+    """スパンを 1 行 1 件の JSON でファイルに追記する。"""
+
+    def __init__(self, path: str | Path = DEFAULT_JSONL_PATH) -> None:
+        """
+        Args:
+            path: 出力ファイル（デフォルト: logs/metrics.jsonl。親ディレクトリは作成する）
+        """
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """出力ファイルのパス。"""
+        return self._path
+
+    def record(self, name: str, duration_sec: float, attrs: Dict[str, Any]) -> None:
+        line = json.dumps(
+            {
+                "ts": datetime.now().isoformat(timespec="milliseconds"),
+                "span": name,
+                "duration_sec": round(duration_sec, 6),
+                **attrs,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class MultiMetrics(MetricsSink):
+    """複数の出力先に同じスパンを渡す。"""
+
+    def __init__(self, *sinks: MetricsSink) -> None:
+        self._sinks = [s for s in sinks if s.enabled]
+        self.enabled = bool(self._sinks)
+
+    def record(self, name: str, duration_sec: float, attrs: Dict[str, Any]) -> None:
+        for sink in self._sinks:
+            sink.record(name, duration_sec, attrs)
+
+    def close(self) -> None:
+        for sink in self._sinks:
+            sink.close()
+
+
+class Span:
+    """計測中のスパン。with 文で使い、set() で属性を追加する。"""
+
+    __slots__ = ("_sink", "_name", "_attrs", "_start")
+
+    def __init__(self, sink: MetricsSink, name: str, attrs: Dict[str, Any]) -> None:
+        self._sink = sink
+        self._name = name
+        self._attrs = attrs
+        self._start = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        """属性を追加・上書きする。"""
+        self._attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self._attrs["error"] = exc_type.__name__
+        try:
+            self._sink.record(self._name, duration, self._attrs)
+        except Exception:
+            # 計測の失敗で合成を失敗させない
+            pass
+
+
+class _NullSpan:
+    """計測無効時の span() の戻り値（共有）。"""
+
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_sink: MetricsSink = NullMetrics()
+
+
+def set_metrics(sink: MetricsSink | None) -> MetricsSink:
+    """
+    プロセス全体のスパンの出力先を設定する。
+
+    Args:
+        sink: 出力先（None で無効化）
+
+    Returns:
+        それまでの出力先
+    """
+    global _sink
+    previous = _sink
+    _sink = sink if sink is not None else NullMetrics()
+    return previous
+
+
+def get_metrics() -> MetricsSink:
+    """現在の出力先。"""
+    return _sink
+
+
+def span(name: str, **attrs: Any) -> Span | _NullSpan:
+    """
+    処理段階を計測するスパンを作る（with 文で使う）。
+
+    出力先が無効（NullMetrics）の場合は共有の空オブジェクトを返し、時刻も取得しない。
+
+    Args:
+        name: スパン名（"tts.generate" 等）
+        **attrs: 属性（text_chars, audio_sec, tokens 等）
+    """
+    sink = _sink
+    if not sink.enabled:
+        return _NULL_SPAN
+    return Span(sink, name, attrs)
@@ -0,0 +1,127 @@
+# coding=utf-8
+"""
+プロセス全体で共有する Qwen3TTSWrapper のレジストリ。
+
+(model_name, device, dtype) ごとにモデルを 1 つだけロードし、参照カウントで管理する。
+話者ごとに VoiceCloneManager を作っても 1.7B モデルが複数ロードされないようにする。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import torch
+
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+
+RegistryKey = Tuple[str, str, str]
+
+
+@dataclass
+class _Entry:
+    wrapper: Qwen3TTSWrapper
+    refcount: int
+
+
+class ModelRegistry:
+    """Qwen3TTSWrapper を (model_name, device, dtype) 単位で共有する参照カウント付きレジストリ。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[RegistryKey, _Entry] = {}
+
+    @staticmethod
+    def make_key(model_name: str, device: str, dtype: torch.dtype) -> RegistryKey:
+        """レジストリのキーを作る。"""
+        return (model_name.strip(), device.strip(), str(dtype))
+
+    def acquire(
+        self,
+        model_name: str,
+        device: str,
+        dtype: torch.dtype,
+        **wrapper_kwargs: Any,
+    ) -> Qwen3TTSWrapper:
+        """
+        モデルを取得する。未ロードならロードし、参照カウントを 1 増やす。
+
+        Args:
+            model_name: モデル ID
+            device: 実行デバイス
+            dtype: dtype
+            **wrapper_kwargs: 初回ロード時に Qwen3TTSWrapper に渡す追加引数（2 回目以降は無視）
+
+        Returns:
+            共有の Qwen3TTSWrapper
+
+        Raises:
+            ValueError: model_name または device が不正な場合
+            RuntimeError: モデルのロードに失敗した場合
+        """
+        if not model_name or not model_name.strip():
+            raise ValueError("model_name を指定してください。")
+        if not device or not device.strip():
+            raise ValueError("device を指定してください。")
+
+        key = self.make_key(model_name, device, dtype)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # ロード中は他のスレッドの acquire を待たせる（同じモデルの二重ロードを防ぐ）
+                wrapper = Qwen3TTSWrapper(
+                    model_name=model_name,
+                    device=device,
+                    dtype=dtype,
+                    **wrapper_kwargs,
+                )
+                entry = _Entry(wrapper=wrapper, refcount=0)
+                self._entries[key] = entry
+            entry.refcount += 1
+            return entry.wrapper
+
+    def release(self, wrapper: Qwen3TTSWrapper) -> bool:
+        """
+        参照カウントを 1 減らし、0 になったらモデルを解放する。
+
+        Args:
+            wrapper: acquire で取得した Qwen3TTSWrapper
+
+        Returns:
+            モデルを解放した場合 True
+
+        Raises:
+            ValueError: レジストリが管理していない wrapper の場合
+        """
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.wrapper is wrapper:
+                    entry.refcount -= 1
+                    if entry.refcount > 0:
+                        return False
+                    del self._entries[key]
+                    break
+            else:
+                raise ValueError("レジストリが管理していないモデルです。")
+        wrapper.unload()
+        return True
+
+    def refcount(self, model_name: str, device: str, dtype: torch.dtype) -> int:
+        """指定モデルの参照カウント（未ロードなら 0）。"""
+        with self._lock:
+            entry = self._entries.get(self.make_key(model_name, device, dtype))
+            return entry.refcount if entry is not None else 0
+
+    def loaded(self) -> List[RegistryKey]:
+        """ロード済みモデルのキー一覧。"""
+        with self._lock:
+            return list(self._entries)
+
+
+_default_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """プロセス全体で共有する既定のレジストリを返す。"""
+    return _default_registry
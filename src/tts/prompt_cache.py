@@ -0,0 +1,226 @@
+# coding=utf-8
+"""
+参照音声プロンプト（ボイスクローンプロンプト）のメモリ内キャッシュ。
+
+create_voice_clone_prompt の結果（ref_code・話者埋め込み・ref_text）を
+参照音声ファイルの同一性 + ref_text + モデル/dtype をキーに保持し、
+同じ話者での 2 回目以降の生成で参照音声のデコードとプロンプト再計算を省く。
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class PromptKey:
+    """プロンプトキャッシュのキー。"""
+
+    source: str
+    size: int
+    mtime_ns: int
+    ref_text: str
+    model_name: str
+    dtype: str
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        """キーが依存する参照音声（discard_source 用）。"""
+        return (self.source,)
+
+
+@dataclass(frozen=True)
+class EmbeddingKey:
+    """複数サンプルの話者埋め込みを融合した x-vector のみプロンプトのキャッシュキー。"""
+
+    samples: Tuple[PromptKey, ...]
+    fusion: str
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        """キーが依存する参照音声（discard_source 用）。"""
+        return tuple(k.source for k in self.samples)
+
+
+def make_prompt_key(
+    ref_audio_path: str,
+    ref_text: str,
+    model_name: str,
+    dtype: Any,
+) -> PromptKey:
+    """
+    参照音声・参照テキスト・モデル設定からキャッシュキーを作る。
+
+    ローカルファイルは絶対パス + サイズ + mtime でファイルの同一性を判定する
+    （ファイルを差し替えるとキーが変わり、古いプロンプトは使われない）。
+    URL はファイル情報を取得できないため URL 文字列そのものをキーにする。
+
+    Args:
+        ref_audio_path: 参照音声のパスまたは http(s) URL
+        ref_text: 参照音声の読み上げテキスト
+        model_name: モデル ID
+        dtype: モデルの dtype
+
+    Returns:
+        PromptKey
+
+    Raises:
+        FileNotFoundError: ローカルファイルが存在しない場合
+    """
+    source = ref_audio_path.strip()
+    if source.startswith(("http://", "https://")):
+        return PromptKey(source, -1, -1, ref_text.strip(), model_name, str(dtype))
+
+    path = Path(source)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"参照音声ファイルが見つかりません: {ref_audio_path}") from None
+    return PromptKey(
+        str(path.resolve()),
+        int(st.st_size),
+        int(st.st_mtime_ns),
+        ref_text.strip(),
+        model_name,
+        str(dtype),
+    )
+
+
+def prompt_source(ref_audio_path: str) -> str:
+    """PromptKey.source と同じ形式の参照音声の識別子（ローカルファイルは絶対パス、URL はそのまま）。"""
+    source = ref_audio_path.strip()
+    if source.startswith(("http://", "https://")):
+        return source
+    return str(Path(source).resolve())
+
+
+def estimate_prompt_nbytes(items: List[Any]) -> int:
+    """
+    プロンプト（VoiceClonePromptItem のリスト）のおおよそのメモリ使用量（バイト）を返す。
+
+    テンソル属性（ref_code, ref_spk_embedding）の要素数 × 要素サイズと ref_text の長さを合計する。
+    """
+    total = 0
+    for item in items:
+        for attr in ("ref_code", "ref_spk_embedding"):
+            tensor = getattr(item, attr, None)
+            if tensor is None:
+                continue
+            try:
+                total += int(tensor.element_size()) * int(tensor.nelement())
+            except AttributeError:
+                total += int(getattr(tensor, "nbytes", 0))
+        ref_text = getattr(item, "ref_text", None)
+        if ref_text:
+            total += len(ref_text.encode("utf-8"))
+    return total
+
+
+class PromptCache:
+    """
+    ボイスクローンプロンプトの LRU キャッシュ（エントリ数上限 + メモリ上限付き）。
+
+    スレッドセーフ。hits / misses / evictions を集計し、stats() で参照できる。
+    """
+
+    def __init__(self, max_entries: int = 16, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """
+        Args:
+            max_entries: 保持するプロンプト数の上限（0 でキャッシュ無効）
+            max_bytes: 保持するプロンプトの合計サイズ上限（バイト）
+
+        Raises:
+            ValueError: 上限値が負の場合
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries は 0 以上を指定してください。")
+        if max_bytes < 0:
+            raise ValueError("max_bytes は 0 以上を指定してください。")
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[PromptKey | EmbeddingKey, tuple[List[Any], int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: PromptKey | EmbeddingKey) -> bool:
+        return key in self._entries
+
+    def get(self, key: PromptKey | EmbeddingKey) -> Optional[List[Any]]:
+        """キャッシュ済みプロンプトを返す（なければ None）。ヒット時は LRU 順を更新する。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: PromptKey | EmbeddingKey, items: List[Any]) -> None:
+        """
+        プロンプトを登録する。上限を超える場合は古いものから破棄する。
+        単体でメモリ上限を超えるプロンプトは保持しない。
+        """
+        nbytes = estimate_prompt_nbytes(items)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            if self._max_entries == 0 or nbytes > self._max_bytes:
+                return
+            self._entries[key] = (items, nbytes)
+            self._total_bytes += nbytes
+            while len(self._entries) > self._max_entries or self._total_bytes > self._max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def discard_source(self, source: str) -> int:
+        """
+        参照音声 source（PromptKey.source と同じ形式）を使うエントリをすべて破棄する。
+
+        ファイルの内容・ref_text・モデルによらず破棄するので、差し替えた参照音声の古いプロンプトも消える。
+        source を含む融合埋め込み（EmbeddingKey）も破棄する。
+
+        Returns:
+            破棄したエントリ数
+        """
+        with self._lock:
+            keys = [k for k in self._entries if source in k.sources]
+            for key in keys:
+                self._total_bytes -= self._entries.pop(key)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        """全エントリを破棄する（統計値は保持する）。"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計値を返す。
+
+        Returns:
+            hits, misses, evictions, entries, bytes, max_entries, max_bytes を含む辞書
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self._max_entries,
+                "max_bytes": self._max_bytes,
+            }
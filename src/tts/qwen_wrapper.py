@@ -4,15 +4,36 @@ Qwen3-TTS のラッパークラス。
 モデルのロードと音声生成（ボイスクローン）を担当する。
 """
 
+import contextlib
+import dataclasses
+import gc
+import threading
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
 
 import numpy as np
 import torch
-import torchaudio
 
 from qwen_tts import Qwen3TTSModel
 
+from src.audio.discord_pcm import get_resampler
+from src.audio.join import join_segments
+from src.audio.reference import decode_audio
+from src.profile.reference_store import load_canonical_reference
+from src.tts.cpu_mode import apply_int8, configure_cpu_threads
+from src.tts.generation_guard import RunawayGuard, install_runaway_guard
+from src.tts.memory_governor import MemoryGovernor, estimate_bytes_per_token, is_oom_error
+from src.tts.metrics import span
+from src.tts.prompt_cache import EmbeddingKey, PromptCache, make_prompt_key, prompt_source
+from src.tts.speaker_embedding import EMBEDDING_FUSIONS, fuse_speaker_embeddings
+from src.tts.text_segmenter import estimate_max_new_tokens, segment_text
+from src.tts.warmup import COMPILE_MODES, compile_model, warmup_texts
+
+
+# 音声コーデックのフレームレート（12Hz モデル）。計測でのトークン数の換算に使う
+CODEC_HZ = 12
+
 
 class Qwen3TTSWrapper:
     """Qwen3-TTS のラッパークラス。"""
@@ -26,6 +47,15 @@ class Qwen3TTSWrapper:
         device: str = "cuda:0",
         dtype: torch.dtype = torch.bfloat16,
         attn_implementation: str | None = None,
+        prompt_cache_size: int = 16,
+        prompt_cache_max_bytes: int = 256 * 1024 * 1024,
+        model_loader: Callable[..., Any] | None = None,
+        compile_mode: str | None = None,
+        quantize_int8: bool = False,
+        cpu_threads: int | None = None,
+        quantized_dir: str | Path | None = None,
+        runaway_guard: bool = True,
+        memory_governor: bool = True,
     ) -> None:
         """
         モデルを初期化する。
@@ -35,19 +65,46 @@ class Qwen3TTSWrapper:
             device: 実行デバイス（"cuda:0", "cuda", "cpu" 等）
             dtype: 計算に使う torch の dtype（例: torch.float16, torch.bfloat16）
             attn_implementation: 注意力実装（"flash_attention_2" 等）。未指定時は PyTorch 標準。
+            prompt_cache_size: 参照音声プロンプトのキャッシュ件数上限（0 でキャッシュ無効）
+            prompt_cache_max_bytes: 参照音声プロンプトのキャッシュのメモリ上限（バイト）
+            model_loader: モデルのロード関数（model_name, **load_kwargs を受け取る）。
+                None の場合は Qwen3TTSModel.from_pretrained。性能計測で偽モデルを使う場合に指定する
+            compile_mode: 生成ループのモジュールに torch.compile を適用する場合の mode
+                （"default" / "reduce-overhead" / "max-autotune"）。None の場合は適用しない。
+                コンパイルは最初の生成時に行われるため、warmup() と組み合わせて使う
+            quantize_int8: talker の nn.Linear を動的 int8 量子化する（CPU・float32 のみ）
+            cpu_threads: CPU 推論の intra-op スレッド数（None の場合、quantize_int8 時は物理コア数相当、
+                それ以外は torch の既定のまま）
+            quantized_dir: 量子化済み重みの保存先のルート（例: models/quantized）。
+                指定すると保存済みの重みを読み込み、なければ量子化して保存する
+            runaway_guard: 生成の末尾が長い無音・同じコードの繰り返しになったら打ち切る（generation_guard）
+            memory_governor: メモリの余裕に収まる件数ずつ生成し、メモリ不足の場合はバッチを分けて生成し直す
+                （memory_governor）
 
         Raises:
             RuntimeError: モデルのロードに失敗した場合
-            ValueError: model_name または device が不正な場合
+            ValueError: model_name・device・compile_mode が不正な場合
         """
         if not model_name or not model_name.strip():
             raise ValueError("model_name を指定してください。")
         if not device or not device.strip():
             raise ValueError("device を指定してください。")
+        if compile_mode is not None and compile_mode not in COMPILE_MODES:
+            raise ValueError(f"compile_mode は {', '.join(COMPILE_MODES)} のいずれかを指定してください: {compile_mode}")
+        if quantize_int8 and (not device.strip().startswith("cpu") or dtype != torch.float32):
+            raise ValueError("quantize_int8 は device='cpu'・dtype=torch.float32 でのみ使えます。")
+        if cpu_threads is not None or quantize_int8:
+            configure_cpu_threads(cpu_threads)
 
         self._model_name = model_name.strip()
         self._device = device.strip()
         self._dtype = dtype
+        self._prompt_cache = PromptCache(
+            max_entries=prompt_cache_size,
+            max_bytes=prompt_cache_max_bytes,
+        )
+        # 複数の話者・スレッドから共有されるため、モデル呼び出しは直列化する
+        self._model_lock = threading.RLock()
 
         load_kwargs: dict = {
             "device_map": self._device,
@@ -56,14 +113,107 @@ class Qwen3TTSWrapper:
         if attn_implementation is not None:
             load_kwargs["attn_implementation"] = attn_implementation
 
+        loader = model_loader if model_loader is not None else Qwen3TTSModel.from_pretrained
         try:
-            self._model = Qwen3TTSModel.from_pretrained(
+            self._model = loader(
                 self._model_name,
                 **load_kwargs,
             )
         except Exception as e:
             raise RuntimeError(f"モデルのロードに失敗しました: {e}") from e
 
+        self._quantization: Dict[str, Any] = {"linears": 0, "loaded": False}
+        if quantize_int8:
+            try:
+                self._quantization = apply_int8(self._model, self._model_name, quantized_dir)
+            except Exception as e:
+                raise RuntimeError(f"int8 量子化に失敗しました: {e}") from e
+
+        self._compile_mode = compile_mode
+        self._compiled_modules: List[str] = []
+        if compile_mode is not None:
+            try:
+                self._compiled_modules = compile_model(self._model, compile_mode)
+            except Exception as e:
+                raise RuntimeError(f"torch.compile の適用に失敗しました: {e}") from e
+
+        # talker を持たないモデル（偽モデル等）には差し込まない
+        self._runaway_guard: RunawayGuard | None = None
+        if runaway_guard:
+            guard = RunawayGuard()
+            if install_runaway_guard(self._model, guard):
+                self._runaway_guard = guard
+
+        self._memory: MemoryGovernor | None = None
+        if memory_governor:
+            self._memory = MemoryGovernor(
+                self._device, bytes_per_token=estimate_bytes_per_token(self._model, self._dtype)
+            )
+
+    def warmup(
+        self,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "Japanese",
+        texts: Sequence[str] | None = None,
+        voice_clone_prompt: List[Any] | None = None,
+    ) -> List[float]:
+        """
+        ダミー文を生成して、カーネル選択・アロケータの確保・（compile 時は）コンパイルを済ませる。
+
+        参照音声のプロンプトもここで作成・キャッシュされるため、話者ごとに 1 回呼ぶ。
+
+        Args:
+            ref_audio_path: 参照音声のパス
+            ref_text: 参照音声の内容
+            language: 言語
+            texts: ウォームアップに使う文（None の場合は長さの異なる既定の文）
+            voice_clone_prompt: 使うプロンプト（generate_voice 参照）
+
+        Returns:
+            各文の生成にかかった時間（秒）
+
+        Raises:
+            ValueError / FileNotFoundError / RuntimeError: generate_voice と同じ
+        """
+        latencies = []
+        for text in warmup_texts(language, texts):
+            start = time.perf_counter()
+            self.generate_voice(text, ref_audio_path, ref_text, language, voice_clone_prompt=voice_clone_prompt)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    @property
+    def quantization(self) -> Dict[str, Any]:
+        """int8 量子化の状態（{"linears": 置き換えた nn.Linear の数, "loaded": 保存済みの重みを読み込んだか}）。"""
+        return dict(self._quantization)
+
+    @property
+    def compile_mode(self) -> str | None:
+        """torch.compile の mode（適用していなければ None）。"""
+        return self._compile_mode
+
+    @property
+    def runaway_stops(self) -> int:
+        """末尾の無音・繰り返しで打ち切った系列の数（打ち切りが無効・未対応のモデルでは 0）。"""
+        return self._runaway_guard.stops if self._runaway_guard is not None else 0
+
+    @property
+    def memory_governor(self) -> MemoryGovernor | None:
+        """メモリガバナー（無効の場合は None）。"""
+        return self._memory
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        メモリの統計値（MemoryGovernor.stats。無効の場合は空の辞書）を返す。
+        """
+        return self._memory.stats() if self._memory is not None else {}
+
+    @property
+    def compiled_modules(self) -> List[str]:
+        """torch.compile を適用したモジュールのパス。"""
+        return list(self._compiled_modules)
+
     def generate_voice(
         self,
         text: str,
@@ -71,6 +221,8 @@ class Qwen3TTSWrapper:
         ref_text: str,
         language: str = "Japanese",
         max_new_tokens: int = 2048,
+        seed: int | None = None,
+        voice_clone_prompt: List[Any] | None = None,
     ) -> Tuple[np.ndarray, int]:
         """
         テキストから音声を生成する（ボイスクローン）。
@@ -80,7 +232,11 @@ class Qwen3TTSWrapper:
             ref_audio_path: 参照音声のパス（ローカルパスまたは http(s) URL。Qwen3-TTS が対応する形式）
             ref_text: 参照音声の内容（ref_audio の読み上げテキスト。完全一致が望ましい）
             language: 言語。"Japanese", "English", "Auto" のいずれか
-            max_new_tokens: 生成トークン数の上限（デフォルト 2048）
+            max_new_tokens: 生成トークン数の上限（デフォルト 2048。実際にはテキストの長さから見積もった値
+                （estimate_max_new_tokens）との小さい方）
+            seed: 乱数シード。指定すると同じ入力から同じ音声を生成する（None はシードを設定しない）
+            voice_clone_prompt: 使うプロンプト（get_speaker_embedding_prompt の x-vector のみプロンプト等）。
+                None の場合は ref_audio_path / ref_text から作る（get_voice_clone_prompt）
 
         Returns:
             (wav_array, sample_rate): 音声配列（float, -1.0～1.0）とサンプリングレート（int）
@@ -88,64 +244,602 @@ class Qwen3TTSWrapper:
         Raises:
             FileNotFoundError: ref_audio_path が存在しない場合
             ValueError: text が空、または language が未対応の場合
-            RuntimeError: モデル推論に失敗した場合（VRAM 不足等）
+            RuntimeError: モデル推論に失敗した場合（メモリ不足は、キャッシュを解放して 1 回だけ生成し直してから）
         """
         if not text or not text.strip():
             raise ValueError("text を指定してください。")
-        if not ref_text or not ref_text.strip():
+        if voice_clone_prompt is None and (not ref_text or not ref_text.strip()):
             raise ValueError("ref_text を指定してください。")
         if language not in self.SUPPORTED_LANGUAGES:
             raise ValueError(
                 f"language は {self.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
             )
 
+        text_chars = len(text.strip())
+        with span("tts.generate_voice", text_chars=text_chars, language=language) as total:
+            if voice_clone_prompt is None:
+                voice_clone_prompt = self.get_voice_clone_prompt(ref_audio_path, ref_text)
+
+            budget = min(max_new_tokens, estimate_max_new_tokens(text, language))
+            for retry in (True, False):
+                try:
+                    wavs, sample_rate = self._generate(text.strip(), language, voice_clone_prompt, budget, seed, 1)
+                    break
+                except Exception as e:
+                    if retry and self._memory is not None and is_oom_error(e):
+                        self._memory.record_retry()
+                        continue
+                    raise RuntimeError(_generation_error(e)) from e
+
+            if not wavs or len(wavs) == 0:
+                raise RuntimeError("音声が生成されませんでした。")
+
+            with span("tts.postprocess"):
+                wav = _postprocess_wav(wavs[0])
+            total.set(**_audio_attrs([wav], sample_rate))
+        return wav, int(sample_rate)
+
+    def generate_voice_stream(
+        self,
+        text: str,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "Japanese",
+        max_new_tokens: int = 2048,
+        chunk_ms: int = 200,
+        max_chars: int = 80,
+        voice_clone_prompt: List[Any] | None = None,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        テキストを文ごとに生成し、生成できた文から順にチャンクで返す（ストリーミング）。
+
+        Qwen3TTSModel は生成途中のコーデックフレームを取り出す手段を持たないため、
+        文単位で生成・デコードし、文の音声を chunk_ms ごとに区切って返す。
+        最初のチャンクまでの時間はテキスト全体ではなく最初の文の長さに比例する。
+
+        入力の検証は呼び出し時に行い、生成はイテレーション時に行う。
+
+        Args:
+            text: 読み上げるテキスト
+            ref_audio_path: 参照音声のパス
+            ref_text: 参照音声の内容
+            language: 言語。"Japanese", "English", "Auto" のいずれか
+            max_new_tokens: 1 文あたりの生成トークン数の上限（実際には文の長さから見積もった値との小さい方）
+            chunk_ms: 1 チャンクの長さ（ミリ秒）
+            max_chars: 1 回の生成に渡す最大文字数（長い文はさらに分割する）
+            voice_clone_prompt: 使うプロンプト（generate_voice 参照）
+
+        Returns:
+            (chunk, sample_rate) を順に返すイテレータ。chunk は float32（-1.0～1.0）の 1 次元配列
+
+        Raises:
+            FileNotFoundError: ref_audio_path が存在しない場合
+            ValueError: text が空、language が未対応、または chunk_ms が 0 以下の場合
+            RuntimeError: モデル推論に失敗した場合（イテレーション時）
+        """
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+        if voice_clone_prompt is None and (not ref_text or not ref_text.strip()):
+            raise ValueError("ref_text を指定してください。")
+        if language not in self.SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"language は {self.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+            )
+        if chunk_ms <= 0:
+            raise ValueError("chunk_ms は 1 以上を指定してください。")
+
+        # 参照音声の存在確認とプロンプト作成を先に済ませる（エラーを呼び出し時に返す）
+        if voice_clone_prompt is None:
+            voice_clone_prompt = self.get_voice_clone_prompt(ref_audio_path, ref_text)
+        # 最初のチャンクを早く返すため、短い文はまとめない
+        sentences = segment_text(text, max_chars=max_chars, min_chars=0) or [text.strip()]
+        return self._stream_sentences(
+            sentences, ref_audio_path, ref_text, language, max_new_tokens, chunk_ms, voice_clone_prompt
+        )
+
+    def _stream_sentences(
+        self,
+        sentences: List[str],
+        ref_audio_path: str,
+        ref_text: str,
+        language: str,
+        max_new_tokens: int,
+        chunk_ms: int,
+        voice_clone_prompt: List[Any] | None = None,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        for sentence in sentences:
+            budget = min(max_new_tokens, estimate_max_new_tokens(sentence, language))
+            wav, sample_rate = self.generate_voice(
+                sentence, ref_audio_path, ref_text, language, budget, voice_clone_prompt=voice_clone_prompt
+            )
+            step = max(1, sample_rate * chunk_ms // 1000)
+            for start in range(0, len(wav), step):
+                yield wav[start:start + step], sample_rate
+
+    def generate_voice_long(
+        self,
+        text: str,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "Japanese",
+        max_chars: int = 80,
+        max_batch_size: int = 8,
+        gap_ms: float = 120.0,
+        crossfade_ms: float = 10.0,
+        seed: int | None = None,
+        voice_clone_prompt: List[Any] | None = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        長いテキストを文単位のセグメントに分けて生成し、1 つの音声に結合する。
+
+        各セグメントの生成トークン数上限はセグメントの長さから見積もり
+        （テキスト全体に 2048 トークンを割り当てない）、セグメントは長さの近いものどうしで
+        バッチ生成する。1 回の生成の系列長が max_chars で抑えられるため、
+        処理時間とメモリはテキスト長に対してほぼ線形に増える。
+
+        Args:
+            text: 読み上げるテキスト
+            ref_audio_path: 参照音声のパス
+            ref_text: 参照音声の内容
+            language: 言語。"Japanese", "English", "Auto" のいずれか
+            max_chars: 1 セグメントの最大文字数
+            max_batch_size: 1 回の生成にまとめる最大セグメント数
+            gap_ms: セグメント間の無音の長さ（ミリ秒）
+            crossfade_ms: セグメント境界のクロスフェード長（ミリ秒）
+            seed: 乱数シード（各バッチの生成前に設定する）
+            voice_clone_prompt: 使うプロンプト（generate_voice 参照）
+
+        Returns:
+            (wav_array, sample_rate): 音声配列（float, -1.0～1.0）とサンプリングレート（int）
+
+        Raises:
+            FileNotFoundError: ref_audio_path が存在しない場合
+            ValueError: text が空、または language が未対応の場合
+            RuntimeError: モデル推論に失敗した場合
+        """
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+        if language not in self.SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"language は {self.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+            )
+
+        segments = segment_text(text, max_chars=max_chars) or [text.strip()]
+        if len(segments) == 1:
+            budget = estimate_max_new_tokens(segments[0], language)
+            return self.generate_voice(
+                segments[0], ref_audio_path, ref_text, language, budget, seed=seed, voice_clone_prompt=voice_clone_prompt
+            )
+
+        results: List[Tuple[np.ndarray, int] | None] = [None] * len(segments)
+        for bucket in bucket_by_length(segments, max_batch_size):
+            budget = max(estimate_max_new_tokens(segments[i], language) for i in bucket)
+            outputs = self.generate_voice_batch(
+                [segments[i] for i in bucket],
+                [(ref_audio_path, ref_text)],
+                language,
+                max_new_tokens=budget,
+                max_batch_size=len(bucket),
+                seed=seed,
+                prompts=[voice_clone_prompt],
+            )
+            for i, out in zip(bucket, outputs):
+                results[i] = out
+
+        sample_rate = results[0][1]  # type: ignore[index]
+        wav = join_segments(
+            [w for w, _ in results],  # type: ignore[misc]
+            sample_rate,
+            gap_ms=gap_ms,
+            crossfade_ms=crossfade_ms,
+        )
+        return wav, sample_rate
+
+    def generate_voice_batch(
+        self,
+        texts: Sequence[str],
+        profiles: Sequence[Tuple[str, str]],
+        languages: Sequence[str] | str = "Japanese",
+        max_new_tokens: int = 2048,
+        max_batch_size: int = 8,
+        seed: int | None = None,
+        prompts: Sequence[List[Any] | None] | None = None,
+    ) -> List[Tuple[np.ndarray, int]]:
+        """
+        複数のテキストをまとめて生成する（話者の混在可）。
+
+        テキスト長でソートして max_batch_size 件ずつのバケットに分け、
+        バケットごとに 1 回の generate_voice_clone で生成する（長さが近いものを同じバッチにして
+        パディングの無駄を減らす）。結果は入力順で返す。
+        メモリガバナーが有効な場合、バケットはメモリの余裕に収まる件数に分け、メモリ不足になったバッチは
+        キャッシュを解放してから半分に分けて生成し直す（1 件でも足りない場合は 1 回だけ生成し直す）。
+
+        Args:
+            texts: 読み上げるテキストのリスト
+            profiles: (ref_audio_path, ref_text) のリスト。texts と同じ長さ、または 1 件（全テキストで共通）
+            languages: 言語のリスト（texts と同じ長さ）、または全テキスト共通の言語
+            max_new_tokens: 生成トークン数の上限（実際にはバケット内で最も長いテキストから見積もった値との小さい方）
+            max_batch_size: 1 回の生成にまとめる最大件数
+            seed: 乱数シード（各バケットの生成前に設定する）
+            prompts: 使うプロンプトのリスト（profiles と同じ長さ、または 1 件）。None の要素・引数は
+                profiles から作る（generate_voice の voice_clone_prompt 参照）
+
+        Returns:
+            (wav_array, sample_rate) のリスト（texts と同じ順序）
+
+        Raises:
+            FileNotFoundError: 参照音声が存在しない場合
+            ValueError: 入力が空・長さ不一致、または language が未対応の場合
+            RuntimeError: モデル推論に失敗した場合
+        """
+        if not texts:
+            raise ValueError("texts を指定してください。")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size は 1 以上を指定してください。")
+        if any(not t or not t.strip() for t in texts):
+            raise ValueError("text を指定してください。")
+
+        n = len(texts)
+        if len(profiles) == 1:
+            profiles = list(profiles) * n
+        if len(profiles) != n:
+            raise ValueError(f"profiles の件数が texts と一致しません: {len(profiles)} != {n}")
+        prompt_list = list(prompts) if prompts is not None else [None]
+        if len(prompt_list) == 1:
+            prompt_list = prompt_list * n
+        if len(prompt_list) != n:
+            raise ValueError(f"prompts の件数が texts と一致しません: {len(prompt_list)} != {n}")
+        lang_list = [languages] * n if isinstance(languages, str) else list(languages)
+        if len(lang_list) != n:
+            raise ValueError(f"languages の件数が texts と一致しません: {len(lang_list)} != {n}")
+        for language in lang_list:
+            if language not in self.SUPPORTED_LANGUAGES:
+                raise ValueError(
+                    f"language は {self.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+                )
+
+        # プロンプトは話者ごとにキャッシュから取得（同じ話者なら同じオブジェクト）
+        batch_prompts = [
+            prompt if prompt is not None else self.get_voice_clone_prompt(path, ref_text)
+            for (path, ref_text), prompt in zip(profiles, prompt_list)
+        ]
+
+        budgets = [min(max_new_tokens, estimate_max_new_tokens(t, lang)) for t, lang in zip(texts, lang_list)]
+        results: List[Tuple[np.ndarray, int] | None] = [None] * n
+        for bucket in bucket_by_length(texts, max_batch_size):
+            size = len(bucket)
+            if self._memory is not None:
+                size = self._memory.max_batch_size(max(budgets[i] for i in bucket), size)
+            for start in range(0, len(bucket), size):
+                self._generate_bucket(
+                    bucket[start:start + size], texts, lang_list, batch_prompts, budgets, seed, results
+                )
+
+        return results  # type: ignore[return-value]
+
+    def _generate_bucket(
+        self,
+        bucket: List[int],
+        texts: Sequence[str],
+        languages: List[str],
+        prompts: List[List[Any]],
+        budgets: List[int],
+        seed: int | None,
+        results: List[Tuple[np.ndarray, int] | None],
+        retry: bool = True,
+    ) -> None:
+        """バケット（texts のインデックス）を 1 回で生成して results に入れる。メモリ不足なら分けて生成し直す。"""
+        items = [item for i in bucket for item in prompts[i]]
+        budget = max(budgets[i] for i in bucket)
+        try:
+            wavs, sample_rate = self._generate(
+                [texts[i].strip() for i in bucket], [languages[i] for i in bucket], items, budget, seed, len(bucket)
+            )
+        except Exception as e:
+            if self._memory is None or not is_oom_error(e) or (len(bucket) == 1 and not retry):
+                raise RuntimeError(_generation_error(e)) from e
+            if len(bucket) == 1:
+                self._memory.record_retry()
+                self._generate_bucket(bucket, texts, languages, prompts, budgets, seed, results, retry=False)
+                return
+            self._memory.record_split()
+            half = (len(bucket) + 1) // 2
+            for part in (bucket[:half], bucket[half:]):
+                self._generate_bucket(part, texts, languages, prompts, budgets, seed, results)
+            return
+        if not wavs or len(wavs) != len(bucket):
+            raise RuntimeError("音声が生成されませんでした。")
+        with span("tts.postprocess", batch_size=len(bucket)):
+            for i, wav in zip(bucket, wavs):
+                results[i] = (_postprocess_wav(wav), int(sample_rate))
+
+    def _generate(
+        self,
+        text: str | List[str],
+        language: str | List[str],
+        voice_clone_prompt: List[Any],
+        budget: int,
+        seed: int | None,
+        batch_size: int,
+    ) -> Tuple[List[Any], int]:
+        """generate_voice_clone を 1 回呼ぶ（例外はそのまま送出。メモリガバナーが使用量と OOM を記録する）。"""
+        text_chars = len(text) if isinstance(text, str) else sum(len(t) for t in text)
+        tracker = self._memory.track(batch_size, budget) if self._memory is not None else contextlib.nullcontext()
+        with self._model_lock, span("tts.generate", text_chars=text_chars, batch_size=batch_size) as stage:
+            with tracker:
+                _set_seed(seed)
+                wavs, sample_rate = self._model.generate_voice_clone(
+                    text=text,
+                    language=language,
+                    voice_clone_prompt=voice_clone_prompt,
+                    non_streaming_mode=True,
+                    max_new_tokens=budget,
+                )
+            stage.set(**_audio_attrs(wavs, sample_rate))
+        return wavs, sample_rate
+
+    def get_voice_clone_prompt(
+        self,
+        ref_audio_path: str,
+        ref_text: str,
+        ref_audio: Tuple[np.ndarray, int] | None = None,
+    ) -> List[Any]:
+        """
+        参照音声と参照テキストからボイスクローンプロンプトを取得する（キャッシュ付き）。
+
+        キャッシュキーは参照音声ファイルの同一性（パス + サイズ + mtime）+ ref_text + モデル/dtype。
+        ヒット時は参照音声のデコードとプロンプト計算（ref_code・話者埋め込み）を行わない。
+
+        Args:
+            ref_audio_path: 参照音声のパス（ローカルパスまたは http(s) URL）
+            ref_text: 参照音声の内容
+            ref_audio: デコード済みの参照音声（load_ref_audio の戻り値）。None の場合はここで読み込む
+
+        Returns:
+            generate_voice_clone の voice_clone_prompt に渡せるプロンプト（VoiceClonePromptItem のリスト）
+
+        Raises:
+            FileNotFoundError: ref_audio_path が存在しない場合
+            ValueError: ref_text が空の場合
+            RuntimeError: プロンプトの作成に失敗した場合
+        """
+        if not ref_text or not ref_text.strip():
+            raise ValueError("ref_text を指定してください。")
+
+        key = make_prompt_key(ref_audio_path, ref_text, self._model_name, self._dtype)
+        cached = self._prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
         # URL の場合はモデルに直接渡す（Qwen3TTSModel が URL をサポート）
-        is_url = ref_audio_path.strip().startswith(("http://", "https://"))
-        if is_url:
-            ref_audio_input: str | Tuple[np.ndarray, int] = ref_audio_path.strip()
+        if key.size < 0:
+            ref_audio_input: str | Tuple[np.ndarray, int] = key.source
+        elif ref_audio is not None:
+            ref_audio_input = ref_audio
         else:
-            path = Path(ref_audio_path)
-            if not path.exists():
-                raise FileNotFoundError(f"参照音声ファイルが見つかりません: {ref_audio_path}")
-            ref_audio_input = self._load_ref_audio(str(path))
+            with span("tts.ref_load") as stage:
+                ref_audio_input = self._load_ref_audio(key.source)
+                stage.set(audio_sec=len(ref_audio_input[0]) / ref_audio_input[1])
 
         try:
-            wavs, sample_rate = self._model.generate_voice_clone(
-                text=text.strip(),
-                language=language,
-                ref_audio=ref_audio_input,
-                ref_text=ref_text.strip(),
-                x_vector_only_mode=False,
-                non_streaming_mode=True,
-                max_new_tokens=max_new_tokens,
-            )
+            with self._model_lock, span("tts.prompt_build", text_chars=len(ref_text.strip())):
+                prompt = self._model.create_voice_clone_prompt(
+                    ref_audio=ref_audio_input,
+                    ref_text=ref_text.strip(),
+                    x_vector_only_mode=False,
+                )
         except Exception as e:
-            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+            raise RuntimeError(f"参照音声プロンプトの作成に失敗しました: {e}") from e
 
-        if not wavs or len(wavs) == 0:
-            raise RuntimeError("音声が生成されませんでした。")
+        self._prompt_cache.put(key, prompt)
+        return prompt
+
+    def get_speaker_embedding_prompt(
+        self,
+        ref_audio_paths: Sequence[str],
+        fusion: str = "mean",
+    ) -> List[Any]:
+        """
+        話者の全サンプルの話者埋め込みを融合した x-vector のみプロンプトを取得する（キャッシュ付き）。
 
-        wav = np.asarray(wavs[0], dtype=np.float32)
-        # 1次元に揃える（複数チャンネルの場合はモノラル化）
-        if wav.ndim > 1:
-            wav = np.mean(wav, axis=-1)
-        # -1.0～1.0 にクリップ
-        wav = np.clip(wav, -1.0, 1.0)
+        参照音声コードと ref_text を含まないため、生成時のプロンプトが短く（ICL の参照部分がない）、
+        プロンプトの作成も話者エンコーダだけで済む（音声トークナイザを通さない）。
+        声の再現度は ICL（get_voice_clone_prompt）より下がることがある。
 
-        return wav, int(sample_rate)
+        キャッシュキーは全サンプルのファイルの同一性（パス + サイズ + mtime）+ 融合方法 + モデル/dtype。
+
+        Args:
+            ref_audio_paths: 話者のサンプルの参照音声（ローカルパスまたは http(s) URL）
+            fusion: 埋め込みの融合方法（speaker_embedding.EMBEDDING_FUSIONS。"mean" はサンプルの秒数で重み付け）
+
+        Returns:
+            generate_voice の voice_clone_prompt に渡せるプロンプト（x_vector_only_mode=True の 1 件のリスト）
+
+        Raises:
+            FileNotFoundError: 参照音声が存在しない場合
+            ValueError: ref_audio_paths が空、または fusion が未対応の場合
+            RuntimeError: 話者埋め込みの計算に失敗した場合
+        """
+        if not ref_audio_paths:
+            raise ValueError("ref_audio_paths を指定してください。")
+        if fusion not in EMBEDDING_FUSIONS:
+            raise ValueError(f"fusion は {EMBEDDING_FUSIONS} のいずれかを指定してください。")
+
+        key = EmbeddingKey(
+            tuple(make_prompt_key(path, "", self._model_name, self._dtype) for path in ref_audio_paths),
+            fusion,
+        )
+        cached = self._prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        items = []
+        weights = []
+        with span("tts.prompt_build", samples=len(key.samples), x_vector_only=True):
+            for sample in key.samples:
+                if sample.size < 0:
+                    ref_audio: str | Tuple[np.ndarray, int] = sample.source
+                    weights.append(1.0)
+                else:
+                    ref_audio = self._load_ref_audio(sample.source)
+                    weights.append(len(ref_audio[0]) / ref_audio[1])
+                items.append(self._speaker_embedding_item(ref_audio))
+            try:
+                fused = fuse_speaker_embeddings([it.ref_spk_embedding for it in items], weights, fusion)
+            except ValueError as e:
+                raise RuntimeError(f"話者埋め込みの融合に失敗しました: {e}") from e
+        prompt = [dataclasses.replace(items[0], ref_spk_embedding=fused)]
+        self._prompt_cache.put(key, prompt)
+        return prompt
+
+    def _speaker_embedding_item(self, ref_audio: str | Tuple[np.ndarray, int]) -> Any:
+        """1 サンプルの x-vector のみプロンプト項目を作る。"""
+        inner = getattr(self._model, "model", None)
+        try:
+            if isinstance(ref_audio, tuple) and hasattr(inner, "extract_speaker_embedding"):
+                # Qwen3TTSModel.create_voice_clone_prompt は x-vector のみでも音声トークナイザを通すため、
+                # 話者エンコーダだけを直接呼ぶ
+                from qwen_tts.inference.qwen3_tts_model import VoiceClonePromptItem
+
+                wav, sample_rate = ref_audio
+                target = int(inner.speaker_encoder_sample_rate)
+                if sample_rate != target:
+                    wav = get_resampler(sample_rate, target).resample(np.asarray(wav, dtype=np.float32))
+                else:
+                    wav = np.array(wav, dtype=np.float32)
+                with self._model_lock:
+                    embedding = inner.extract_speaker_embedding(audio=wav, sr=target)
+                return VoiceClonePromptItem(
+                    ref_code=None,
+                    ref_spk_embedding=embedding,
+                    x_vector_only_mode=True,
+                    icl_mode=False,
+                )
+            with self._model_lock:
+                return self._model.create_voice_clone_prompt(ref_audio=ref_audio, x_vector_only_mode=True)[0]
+        except Exception as e:
+            raise RuntimeError(f"話者埋め込みの計算に失敗しました: {e}") from e
+
+    def put_voice_clone_prompt(self, ref_audio_path: str, ref_text: str, prompt: List[Any]) -> None:
+        """
+        事前計算済みのプロンプト（ディスクから読み込んだもの等）をキャッシュに登録する。
+
+        Raises:
+            FileNotFoundError: ref_audio_path が存在しない場合
+        """
+        key = make_prompt_key(ref_audio_path, ref_text, self._model_name, self._dtype)
+        self._prompt_cache.put(key, prompt)
+
+    def invalidate_voice_clone_prompt(self, ref_audio_path: str) -> int:
+        """
+        参照音声 ref_audio_path から作ったプロンプトをキャッシュからすべて破棄する（ファイルがなくてもよい）。
+
+        Returns:
+            破棄したエントリ数
+        """
+        return self._prompt_cache.discard_source(prompt_source(ref_audio_path))
+
+    @property
+    def model_name(self) -> str:
+        """モデル ID。"""
+        return self._model_name
+
+    @property
+    def device(self) -> str:
+        """実行デバイス。"""
+        return self._device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        """モデルの dtype。"""
+        return self._dtype
+
+    @property
+    def prompt_cache(self) -> PromptCache:
+        """参照音声プロンプトのキャッシュ。"""
+        return self._prompt_cache
+
+    def prompt_cache_stats(self) -> Dict[str, int]:
+        """
+        参照音声プロンプトキャッシュの統計値（hits / misses / evictions / entries / bytes 等）を返す。
+        """
+        return self._prompt_cache.stats()
+
+    def unload(self) -> None:
+        """
+        モデルとプロンプトキャッシュを解放する。以降このインスタンスでは生成できない。
+
+        通常は ModelRegistry.release が参照カウント 0 で呼び出す。
+        """
+        with self._model_lock:
+            self._model = None
+            self._prompt_cache.clear()
+        gc.collect()
+        if self._device.startswith("cuda") and torch.cuda.is_available():
+            torch.cuda.empty_cache()
 
     def _load_ref_audio(self, path: str) -> Tuple[np.ndarray, int]:
         """
         参照音声ファイルを読み込み、(wav_array, sample_rate) のタプルで返す。
-        WAV/MP3 等は torchaudio で読み、float32 の -1.0～1.0 に正規化する。
-        """
-        waveform, sample_rate = torchaudio.load(path)
-        # モノラル化
-        if waveform.shape[0] > 1:
-            waveform = waveform.mean(dim=0, keepdim=True)
-        # float32 に変換し、-1.0～1.0 に正規化（整数入力の場合）
-        wav = waveform.squeeze(0).numpy()
-        if wav.dtype != np.float32:
-            wav = wav.astype(np.float32) / np.iinfo(wav.dtype).max
-        wav = np.clip(wav, -1.0, 1.0)
-        return (wav, int(sample_rate))
+        前処理済みの正規形（.npy）はメモリマップで読み、それ以外はデコードしてモノラル化する。
+        """
+        return load_ref_audio(path)
+
+
+def load_ref_audio(path: str) -> Tuple[np.ndarray, int]:
+    """
+    参照音声ファイルを読み込み、(wav_array, sample_rate) のタプルで返す（モデル不要）。
+
+    ReferenceStore が作った正規形（.npy）はデコードせずにメモリマップで読む。
+    それ以外の形式は soundfile（読めなければ torchaudio）でデコードする。どちらも float32（-1.0～1.0）で返る。
+    起動時にモデルのロードと並行してデコードしておき、get_voice_clone_prompt の ref_audio に渡せる。
+    """
+    if Path(path).suffix == ".npy":
+        return load_canonical_reference(path)
+    return decode_audio(path)
+
+
+def bucket_by_length(texts: Sequence[str], max_batch_size: int) -> List[List[int]]:
+    """
+    テキストを長さ順に並べ、max_batch_size 件ずつのバケット（元のインデックスのリスト）に分ける。
+
+    Args:
+        texts: テキストのリスト
+        max_batch_size: 1 バケットの最大件数
+
+    Returns:
+        バケットのリスト。各バケットは texts のインデックスのリスト
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[i:i + max_batch_size] for i in range(0, len(order), max_batch_size)]
+
+
+def _audio_attrs(wavs: Sequence[Any], sample_rate: int) -> Dict[str, Any]:
+    """計測用の属性（生成した音声の合計秒数と、コーデックのフレームレートで換算したトークン数）。"""
+    audio_sec = sum(len(w) for w in wavs) / sample_rate if sample_rate else 0.0
+    return {"audio_sec": audio_sec, "tokens": int(audio_sec * CODEC_HZ)}
+
+
+def _generation_error(e: Exception) -> str:
+    """生成失敗のメッセージ（メモリ不足の場合はそれと分かるようにする）。"""
+    if is_oom_error(e):
+        return f"音声生成に失敗しました（メモリ不足）: {e}"
+    return f"音声生成に失敗しました: {e}"
+
+
+def _set_seed(seed: int | None) -> None:
+    """生成前に乱数シードを設定する（None の場合は何もしない）。モデルのロック内で呼ぶ。"""
+    if seed is not None:
+        torch.manual_seed(seed)
+
+
+def _postprocess_wav(wav: Any) -> np.ndarray:
+    """モデル出力を 1 次元 float32（-1.0～1.0）の配列に揃える（float32 の出力はコピーせずその場でクリップする）。"""
+    wav = np.asarray(wav, dtype=np.float32)
+    # 1次元に揃える（複数チャンネルの場合はモノラル化）
+    if wav.ndim > 1:
+        wav = wav.mean(axis=-1, dtype=np.float32)
+    # -1.0～1.0 にクリップ（モデルが返した配列は呼び出し元のものなので書き換えてよい）
+    if not wav.flags.writeable:
+        return np.clip(wav, -1.0, 1.0)
+    return np.clip(wav, -1.0, 1.0, out=wav)
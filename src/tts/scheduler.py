@@ -0,0 +1,509 @@
+# coding=utf-8
+"""
+動的マイクロバッチングによる合成リクエストスケジューラ。
+
+短時間に届いた複数の合成リクエスト（同じ VC で続けて発言された等）を、
+待ち時間の上限（max_wait_ms）・件数の上限（max_batch_size）・テキスト長の合計上限（max_batch_tokens）
+のいずれかに達するまで集め、Qwen3TTSWrapper.generate_voice_batch で 1 回にまとめて生成する。
+ラッパーのメモリガバナーが有効な場合は、見積もったメモリ使用量が余裕に収まる件数までしかまとめない。
+各リクエストの Future には自分の音声と、キュー待ち時間・生成時間が設定される。
+失敗は原因のリクエストの Future だけに設定する（バッチの他のリクエストは 1 件ずつ生成し直す）。
+
+待ちキューは FairQueue（優先度 + ギルド・ユーザーごとの Deficit Round Robin）で、
+短い発言・システムの読み上げを先に、利用者どうしは公平に取り出す。
+segment_chars を超える長文はセグメントに分け、segment_window 件ずつキューに入れ直す。
+セグメントの境界ごとに他のリクエストに順番を譲り（プリエンプション）、全セグメントの生成後に結合して返す。
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.audio.join import join_segments
+from src.tts.fair_queue import PRIORITIES, FairQueue, classify_priority
+from src.tts.memory_governor import is_oom_error
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.text_segmenter import estimate_max_new_tokens, segment_text
+
+
+class QueueFullError(RuntimeError):
+    """スケジューラのキューが上限に達している。"""
+
+
+@dataclass(frozen=True)
+class SynthesisResult:
+    """スケジューラ経由の合成結果。"""
+
+    wav: np.ndarray
+    sample_rate: int
+    queue_wait_sec: float
+    compute_sec: float
+    batch_size: int
+    segments: int = 1
+
+
+@dataclass
+class _Job:
+    """セグメントに分けた長文の合成。"""
+
+    segments: List[str]
+    future: "Future[SynthesisResult]"
+    priority: str
+    key: Tuple[str, ...]
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    wavs: Dict[int, np.ndarray] = field(default_factory=dict)
+    next_index: int = 0
+    queue_wait_sec: Optional[float] = None
+    compute_sec: float = 0.0
+    # 最後にセグメントを生成したバッチの開始時刻（同じバッチの生成時間を二重に数えない）
+    last_dispatched_at: Optional[float] = None
+    batch_size: int = 0
+    # Future を実行中にしたか / 結果・例外を設定したか（キャンセル時も True）
+    started: bool = False
+    done: bool = False
+
+
+@dataclass
+class _Request:
+    text: str
+    ref_audio_path: str
+    ref_text: str
+    language: str
+    tokens: int
+    future: "Future[SynthesisResult]"
+    prompt: Optional[List[Any]] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    # 長文のセグメントの場合、属するジョブとセグメントの番号
+    job: Optional[_Job] = None
+    index: int = 0
+
+
+def estimate_text_tokens(text: str) -> int:
+    """バッチの予算計算に使うテキストの重み（文字数で近似）。"""
+    return max(1, len(text.strip()))
+
+
+class BatchScheduler:
+    """合成リクエストを集めてバッチ生成するスケジューラ（専用ワーカースレッド 1 本）。"""
+
+    def __init__(
+        self,
+        wrapper: Qwen3TTSWrapper,
+        *,
+        max_wait_ms: float = 20.0,
+        max_batch_size: int = 8,
+        max_batch_tokens: int = 1024,
+        max_queue_size: int = 64,
+        max_new_tokens: int = 2048,
+        short_chars: int = 40,
+        segment_chars: int = 80,
+        segment_window: int = 2,
+        quantum: float = 80.0,
+        starvation_sec: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            wrapper: 生成に使う Qwen3TTSWrapper
+            max_wait_ms: 最初のリクエストが届いてからバッチを締め切るまでの最大待ち時間（ミリ秒）
+            max_batch_size: 1 バッチの最大件数
+            max_batch_tokens: 1 バッチのテキスト長（estimate_text_tokens）の合計上限
+            max_queue_size: 受け付け待ちキューの最大長（超えると submit が QueueFullError）
+            max_new_tokens: 生成トークン数の上限
+            short_chars: 優先度を指定しないリクエストのうち、この文字数以下を "interactive"、
+                それより長いものを "bulk" として扱う
+            segment_chars: この文字数を超えるテキストはセグメントに分けて生成する（1 セグメントの最大文字数）
+            segment_window: 1 つの長文で同時にキューに入れておくセグメント数（少ないほど細かく順番を譲る）
+            quantum: 利用者が 1 巡で取り出せる文字数（FairQueue）
+            starvation_sec: 低い優先度のリクエストがこの秒数以上待っていたら先に取り出す（FairQueue）
+
+        Raises:
+            ValueError: 設定値が不正な場合
+        """
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms は 0 以上を指定してください。")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size は 1 以上を指定してください。")
+        if max_batch_tokens < 1:
+            raise ValueError("max_batch_tokens は 1 以上を指定してください。")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size は 1 以上を指定してください。")
+        if segment_chars < 1 or segment_window < 1:
+            raise ValueError("segment_chars・segment_window は 1 以上を指定してください。")
+
+        self._wrapper = wrapper
+        self._max_wait = max_wait_ms / 1000.0
+        self._max_batch_size = max_batch_size
+        self._max_batch_tokens = max_batch_tokens
+        self._max_new_tokens = max_new_tokens
+        self._short_chars = short_chars
+        self._segment_chars = segment_chars
+        self._segment_window = segment_window
+        self._queue = FairQueue(max_queue_size, quantum=quantum, starvation_sec=starvation_sec)
+        # トークン予算を超えたため次のバッチに回したリクエスト
+        self._carry: Optional[_Request] = None
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "segmented": 0,
+            "memory_limited": 0,
+            "queue_wait_sec_total": 0.0,
+            "compute_sec_total": 0.0,
+        }
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="tts-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        text: str,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "Japanese",
+        voice_clone_prompt: Optional[List[Any]] = None,
+        *,
+        priority: Optional[str] = None,
+        user: Optional[str] = None,
+        guild: Optional[str] = None,
+    ) -> "Future[SynthesisResult]":
+        """
+        合成リクエストをキューに入れる。
+
+        Args:
+            text: 読み上げるテキスト
+            ref_audio_path: 参照音声のパス
+            ref_text: 参照音声の内容
+            language: 言語。"Japanese", "English", "Auto" のいずれか
+            voice_clone_prompt: 使うプロンプト（Qwen3TTSWrapper.generate_voice 参照。x-vector のみモード等）
+            priority: 優先度（fair_queue.PRIORITIES）。None の場合はテキストの長さで決める（short_chars）
+            user: 公平に取り出す単位のユーザー（None は匿名として 1 人扱い）
+            guild: 公平に取り出す単位のギルド（None は匿名として 1 つ扱い）
+
+        Returns:
+            SynthesisResult が設定される Future（長文はセグメントを結合した音声）
+
+        Raises:
+            ValueError: text / ref_text が空、または language・priority が未対応の場合
+            QueueFullError: キューが上限に達している場合
+            RuntimeError: close() 済みの場合
+        """
+        if self._closed:
+            raise RuntimeError("スケジューラは停止しています。")
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+        if voice_clone_prompt is None and (not ref_text or not ref_text.strip()):
+            raise ValueError("ref_text を指定してください。")
+        if language not in Qwen3TTSWrapper.SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"language は {Qwen3TTSWrapper.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+            )
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(f"priority は {', '.join(PRIORITIES)} のいずれかを指定してください。")
+
+        text = text.strip()
+        priority = priority or classify_priority(text, self._short_chars)
+        key = (guild or "", user or "")
+        future: "Future[SynthesisResult]" = Future()
+        segments = segment_text(text, max_chars=self._segment_chars) if len(text) > self._segment_chars else []
+        job = _Job(segments, future, priority, key) if len(segments) > 1 else None
+        if job is not None:
+            request = self._segment_request(job, 0, ref_audio_path, ref_text, language, voice_clone_prompt)
+        else:
+            request = _Request(
+                text=text,
+                ref_audio_path=ref_audio_path,
+                ref_text=ref_text.strip(),
+                language=language,
+                tokens=estimate_text_tokens(text),
+                future=future,
+                prompt=voice_clone_prompt,
+            )
+        try:
+            self._queue.put(request, priority=priority, key=key, cost=request.tokens)
+        except queue.Full:
+            raise QueueFullError(
+                f"合成キューが上限（{self._queue.maxsize} 件）に達しています。"
+            ) from None
+        if job is not None:
+            # 残りの窓の分は上限を数えずに入れる（受け付けはジョブ単位で判定する）
+            for _ in range(1, min(self._segment_window, len(segments))):
+                self._enqueue_next(request)
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+            self._stats["segmented"] += 1 if job is not None else 0
+        return future
+
+    def _segment_request(
+        self,
+        job: _Job,
+        index: int,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str,
+        prompt: Optional[List[Any]],
+    ) -> _Request:
+        text = job.segments[index]
+        job.next_index = index + 1
+        return _Request(
+            text=text,
+            ref_audio_path=ref_audio_path,
+            ref_text=ref_text.strip(),
+            language=language,
+            tokens=estimate_text_tokens(text),
+            future=job.future,
+            prompt=prompt,
+            job=job,
+            index=index,
+        )
+
+    def _enqueue_next(self, previous: _Request) -> None:
+        """ジョブの次のセグメントをキューに入れる（残っていなければ何もしない）。"""
+        job = previous.job
+        if job is None or job.done or job.next_index >= len(job.segments):
+            return
+        request = self._segment_request(
+            job, job.next_index, previous.ref_audio_path, previous.ref_text, previous.language, previous.prompt
+        )
+        self._queue.put(request, priority=job.priority, key=job.key, cost=request.tokens, force=True)
+
+    def queue_depth(self) -> int:
+        """現在キューで待っているリクエスト数（長文はセグメント単位）。"""
+        return self._queue.qsize() + (1 if self._carry is not None else 0)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        統計値を返す。
+
+        Returns:
+            submitted, completed, failed, batches, segmented, memory_limited（メモリの余裕でバッチを締め切った回数）,
+            queue_depth, avg_batch_size, avg_queue_wait_sec, avg_compute_sec を含む辞書
+        """
+        with self._stats_lock:
+            s = dict(self._stats)
+        done = s["completed"] + s["failed"]
+        return {
+            "submitted": int(s["submitted"]),
+            "completed": int(s["completed"]),
+            "failed": int(s["failed"]),
+            "batches": int(s["batches"]),
+            "segmented": int(s["segmented"]),
+            "memory_limited": int(s["memory_limited"]),
+            "queue_depth": self.queue_depth(),
+            "avg_batch_size": s["batched_requests"] / s["batches"] if s["batches"] else 0.0,
+            "avg_queue_wait_sec": s["queue_wait_sec_total"] / done if done else 0.0,
+            "avg_compute_sec": s["compute_sec_total"] / done if done else 0.0,
+        }
+
+    def close(self, wait: bool = True) -> None:
+        """
+        新規受け付けを止める。キューに残っているリクエスト（長文の残りのセグメントを含む）は処理してから終了する。
+
+        Args:
+            wait: ワーカースレッドの終了を待つ場合 True
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.close()
+        if wait:
+            self._thread.join()
+
+    def __enter__(self) -> "BatchScheduler":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _collect(self) -> Optional[List[_Request]]:
+        """次のバッチを集める。停止後にキューが空になったら None。"""
+        first = self._carry
+        self._carry = None
+        if first is None:
+            first = self._queue.get()
+            if first is None:
+                return None
+
+        batch = [first]
+        tokens = first.tokens
+        memory = self._wrapper.memory_governor
+        headroom = memory.headroom() if memory is not None else 0
+        budgets = [self._budget(first)]
+        deadline = first.enqueued_at + self._max_wait
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            if tokens + item.tokens > self._max_batch_tokens:
+                self._carry = item
+                break
+            budget = self._budget(item)
+            if memory is not None and memory.estimate_bytes(budgets + [budget]) > headroom:
+                self._carry = item
+                with self._stats_lock:
+                    self._stats["memory_limited"] += 1
+                break
+            batch.append(item)
+            tokens += item.tokens
+            budgets.append(budget)
+        return batch
+
+    def _budget(self, request: _Request) -> int:
+        """リクエストの生成トークン数の上限（メモリ使用量の見積もりに使う）。"""
+        return min(self._max_new_tokens, estimate_max_new_tokens(request.text, request.language))
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [r for r in batch if self._start(r)]
+            if batch:
+                self._dispatch(batch)
+
+    @staticmethod
+    def _start(request: _Request) -> bool:
+        """Future を実行中にする。キャンセル済み・失敗済みのジョブのセグメントは False。"""
+        job = request.job
+        if job is None:
+            return request.future.set_running_or_notify_cancel()
+        if not job.started:
+            job.started = True
+            job.done = not job.future.set_running_or_notify_cancel()
+        return not job.done
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        """
+        バッチを生成して各 Future に結果を設定する。
+
+        プロンプトは生成の前にリクエストごとに取得し、取得できなかったリクエストだけを失敗にする
+        （参照音声が見つからない等で、同じバッチの他のリクエストを巻き込まない）。
+        """
+        dispatched_at = time.perf_counter()
+        ready = []
+        for r in batch:
+            if r.prompt is None:
+                try:
+                    # 長文の続きのセグメントは、このプロンプトを引き継ぐ（_enqueue_next）
+                    r.prompt = self._wrapper.get_voice_clone_prompt(r.ref_audio_path, r.ref_text)
+                except Exception as e:
+                    self._fail(r, e, dispatched_at, time.perf_counter() - dispatched_at)
+                    continue
+            ready.append(r)
+        if ready:
+            self._generate_batch(ready, dispatched_at)
+
+    def _generate_batch(self, batch: List[_Request], dispatched_at: float) -> None:
+        """
+        バッチを 1 回で生成する。メモリ不足以外で失敗した複数件のバッチは 1 件ずつ生成し直し、
+        失敗の原因のリクエストだけを失敗にする（メモリ不足はラッパーが分けて生成し直し済み）。
+        """
+        try:
+            results = self._wrapper.generate_voice_batch(
+                [r.text for r in batch],
+                [(r.ref_audio_path, r.ref_text) for r in batch],
+                [r.language for r in batch],
+                max_new_tokens=self._max_new_tokens,
+                max_batch_size=len(batch),
+                prompts=[r.prompt for r in batch],
+            )
+        except Exception as e:
+            self._record_batch(batch)
+            if len(batch) > 1 and not is_oom_error(e):
+                for r in batch:
+                    self._generate_batch([r], dispatched_at)
+                return
+            compute_sec = time.perf_counter() - dispatched_at
+            for r in batch:
+                self._fail(r, e, dispatched_at, compute_sec)
+            return
+
+        finished_at = time.perf_counter()
+        self._record_batch(batch)
+        for r, (wav, sample_rate) in zip(batch, results):
+            if r.job is None:
+                self._record_result(dispatched_at - r.enqueued_at, finished_at - dispatched_at, failed=False)
+                r.future.set_result(
+                    SynthesisResult(
+                        wav=wav,
+                        sample_rate=sample_rate,
+                        queue_wait_sec=dispatched_at - r.enqueued_at,
+                        compute_sec=finished_at - dispatched_at,
+                        batch_size=len(batch),
+                    )
+                )
+            else:
+                self._segment_done(r.job, r, wav, sample_rate, dispatched_at, finished_at, len(batch))
+
+    def _fail(self, request: _Request, error: Exception, dispatched_at: float, compute_sec: float) -> None:
+        """リクエストを失敗にする（長文のセグメントはジョブ全体を失敗にし、残りのセグメントは生成しない）。"""
+        if request.job is not None:
+            if request.job.done:
+                return
+            request.job.done = True
+        enqueued_at = request.enqueued_at if request.job is None else request.job.enqueued_at
+        self._record_result(dispatched_at - enqueued_at, compute_sec, failed=True)
+        request.future.set_exception(error)
+
+    def _segment_done(
+        self,
+        job: _Job,
+        request: _Request,
+        wav: np.ndarray,
+        sample_rate: int,
+        dispatched_at: float,
+        finished_at: float,
+        batch_size: int,
+    ) -> None:
+        """ジョブのセグメントの結果を記録し、次のセグメントを入れるか、全部そろったら結合して返す。"""
+        job.wavs[request.index] = wav
+        if job.last_dispatched_at != dispatched_at:
+            job.compute_sec += finished_at - dispatched_at
+            job.last_dispatched_at = dispatched_at
+        job.batch_size = max(job.batch_size, batch_size)
+        if job.queue_wait_sec is None:
+            job.queue_wait_sec = dispatched_at - job.enqueued_at
+        if len(job.wavs) < len(job.segments):
+            self._enqueue_next(request)
+            return
+        job.done = True
+        self._record_result(job.queue_wait_sec, job.compute_sec, failed=False)
+        try:
+            joined = join_segments([job.wavs[i] for i in range(len(job.segments))], sample_rate)
+        except Exception as e:
+            job.future.set_exception(e)
+            return
+        job.future.set_result(
+            SynthesisResult(
+                wav=joined,
+                sample_rate=sample_rate,
+                queue_wait_sec=job.queue_wait_sec,
+                compute_sec=job.compute_sec,
+                batch_size=job.batch_size,
+                segments=len(job.segments),
+            )
+        )
+
+    def _record_batch(self, batch: List[_Request]) -> None:
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["batched_requests"] += len(batch)
+
+    def _record_result(self, queue_wait_sec: float, compute_sec: float, failed: bool) -> None:
+        with self._stats_lock:
+            self._stats["failed" if failed else "completed"] += 1
+            self._stats["queue_wait_sec_total"] += queue_wait_sec
+            self._stats["compute_sec_total"] += compute_sec
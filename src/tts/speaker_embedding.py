@@ -0,0 +1,70 @@
+# coding=utf-8
+"""
+話者埋め込み（x-vector）の融合。
+
+x-vector のみモード（x_vector_only_mode=True）では参照音声コードと ref_text をプロンプトに含めず、
+話者埋め込み 1 本だけで声を指定する。1 サンプルの埋め込みは録音条件の影響を受けやすいため、
+話者の全サンプルの埋め込みを 1 本にまとめて使う（Qwen3TTSWrapper.get_speaker_embedding_prompt）。
+
+CLI の引数定義から参照できるよう、torch は fuse_speaker_embeddings() の中でだけ import する。
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    import torch
+
+# ボイスクローンのプロンプトの種類（"full": 参照音声コード + ref_text の ICL、"xvector": 融合した話者埋め込みのみ）
+CLONE_MODES = ("full", "xvector")
+# 話者埋め込みの融合の方法
+EMBEDDING_FUSIONS = ("mean", "median")
+
+
+def fuse_speaker_embeddings(
+    embeddings: Sequence["torch.Tensor"],
+    weights: Sequence[float] | None = None,
+    method: str = "mean",
+) -> "torch.Tensor":
+    """
+    複数サンプルの話者埋め込みを 1 本にまとめる。
+
+    - "mean": 重み付き平均。平均するとノルムが縮むため、各埋め込みのノルムの重み付き平均に合わせる
+    - "median": 要素ごとの中央値（他と大きく異なるサンプルの影響を受けにくい。weights は使わない）
+
+    Args:
+        embeddings: 話者埋め込み（同じ形の 1 次元テンソル）
+        weights: 各埋め込みの重み（サンプルの秒数等）。None の場合は等しい重み
+        method: 融合の方法（EMBEDDING_FUSIONS）
+
+    Returns:
+        融合した埋め込み（先頭の埋め込みと同じ dtype・device）
+
+    Raises:
+        ValueError: embeddings が空、形・件数が一致しない、method が未対応、または重みが不正な場合
+    """
+    import torch
+
+    if not embeddings:
+        raise ValueError("embeddings を指定してください。")
+    if method not in EMBEDDING_FUSIONS:
+        raise ValueError(f"method は {EMBEDDING_FUSIONS} のいずれかを指定してください。")
+    shape = embeddings[0].shape
+    if any(e.shape != shape for e in embeddings):
+        raise ValueError("話者埋め込みの形が一致しません。")
+    if len(embeddings) == 1:
+        return embeddings[0]
+
+    stacked = torch.stack([e.detach().to("cpu", torch.float32) for e in embeddings])
+    if method == "median":
+        fused = stacked.median(dim=0).values
+    else:
+        w = torch.ones(len(embeddings)) if weights is None else torch.tensor(list(weights), dtype=torch.float32)
+        if w.shape != (len(embeddings),) or bool((w < 0).any()) or float(w.sum()) <= 0:
+            raise ValueError("weights は embeddings と同じ件数の 0 以上の値（合計が正）を指定してください。")
+        w = w / w.sum()
+        mean = (w[:, None] * stacked).sum(dim=0)
+        norm = float((w * stacked.norm(dim=1)).sum())
+        fused = mean * (norm / max(float(mean.norm()), 1e-12))
+    return fused.to(embeddings[0].device, embeddings[0].dtype)
@@ -0,0 +1,278 @@
+# coding=utf-8
+"""
+起動処理の並行化と所要時間の内訳。
+
+モデルの重みのロードは起動時間の大半を占めるが、メタデータの読み込みや参照音声の準備
+（プロンプト成果物の検証・読み込み、参照音声のデコード）とは独立している。
+start_model_load() でロードを別スレッドで始め、その間に prepare_reference() 等で残りの準備を進める。
+StartupReport は各段階の開始・終了時刻とスレッドを記録し、重なりを含めた内訳を表示する。
+
+このモジュールは torch を import しない（import 自体もロード用スレッドで行う）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from src.profile.prompt_store import PromptArtifactStore
+    from src.profile.reference_store import ReferenceStore
+    from src.tts.model_registry import ModelRegistry
+    from src.tts.qwen_wrapper import Qwen3TTSWrapper
+
+
+@dataclass(frozen=True)
+class StartupPhase:
+    """起動処理の 1 段階（時刻は StartupReport 作成時からの秒数）。"""
+
+    name: str
+    start: float
+    end: float
+    thread: str
+
+    @property
+    def duration(self) -> float:
+        """所要時間（秒）。"""
+        return self.end - self.start
+
+
+class StartupReport:
+    """起動処理の段階ごとの所要時間を記録する。スレッドセーフ。"""
+
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+        self._phases: List[StartupPhase] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """with 文で囲んだ処理を 1 段階として記録する（例外で抜けた場合も記録する）。"""
+        start = time.perf_counter() - self._t0
+        try:
+            yield
+        finally:
+            end = time.perf_counter() - self._t0
+            with self._lock:
+                self._phases.append(StartupPhase(name, start, end, threading.current_thread().name))
+
+    def phases(self) -> List[StartupPhase]:
+        """記録した段階（開始時刻順）。"""
+        with self._lock:
+            return sorted(self._phases, key=lambda p: p.start)
+
+    def elapsed(self) -> float:
+        """作成時からの経過秒数。"""
+        return time.perf_counter() - self._t0
+
+    def render(self) -> str:
+        """段階ごとの内訳（開始・終了・所要時間・スレッド）と、並行化で短縮できた時間を表示用に整形する。"""
+        phases = self.phases()
+        lines = ["起動処理の内訳:"]
+        for p in phases:
+            lines.append(
+                f"  {p.name:<20} {p.start:7.2f} - {p.end:7.2f} 秒  ({p.duration:6.2f} 秒)  [{p.thread}]"
+            )
+        wall = max((p.end for p in phases), default=0.0)
+        serial = sum(p.duration for p in phases)
+        lines.append(f"  合計 {wall:.2f} 秒（各段階の和 {serial:.2f} 秒、並行化による短縮 {serial - wall:.2f} 秒）")
+        return "\n".join(lines)
+
+
+def start_model_load(
+    model_name: str,
+    device: str | None = None,
+    dtype: Any = None,
+    *,
+    registry: "ModelRegistry | None" = None,
+    report: StartupReport | None = None,
+    **wrapper_kwargs: Any,
+) -> "Future[Qwen3TTSWrapper]":
+    """
+    モデルのロード（torch / qwen_tts の import を含む）を別スレッドで始める。
+
+    ロードしたモデルはレジストリに登録されるため、後から同じ (model_name, device, dtype) で
+    VoiceCloneManager 等を作るとロード済みのモデルを共有する。
+    戻り値の Future の結果（Qwen3TTSWrapper）は参照を 1 つ持っているので、不要になったら
+    registry.release() で返却する。
+
+    Args:
+        model_name: モデル ID
+        device: 実行デバイス（None は自動選択）
+        dtype: dtype（None は自動選択）
+        registry: 登録先のレジストリ（None はプロセス共有の既定レジストリ）
+        report: 段階を記録する StartupReport（"import" と "model_load"）
+        **wrapper_kwargs: Qwen3TTSWrapper に渡す追加引数（model_loader 等）
+
+    Returns:
+        ロード済みの Qwen3TTSWrapper が設定される Future（ロード失敗時は例外が設定される）
+    """
+    future: "Future[Qwen3TTSWrapper]" = Future()
+
+    def phase(name: str) -> Any:
+        return report.phase(name) if report is not None else _nullcontext()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with phase("import"):
+                from src.tts.model_registry import get_registry
+                from src.tts.voice_clone import resolve_device_dtype
+
+                _device, _dtype = resolve_device_dtype(device, dtype)
+            with phase("model_load"):
+                target = registry if registry is not None else get_registry()
+                wrapper = target.acquire(model_name=model_name, device=_device, dtype=_dtype, **wrapper_kwargs)
+        except Exception as e:
+            error = RuntimeError(f"モデルのロードに失敗しました: {e}")
+            error.__cause__ = e
+            future.set_exception(error)
+        else:
+            future.set_result(wrapper)
+
+    threading.Thread(target=run, name="model-load", daemon=True).start()
+    return future
+
+
+def build_model_options(
+    *,
+    compile_mode: str | None = None,
+    cpu_int8: bool = False,
+    cpu_threads: int | None = None,
+    project_root: str | Path = ".",
+) -> Dict[str, Any]:
+    """
+    CLI の実行モードの指定から start_model_load に渡す引数（device と Qwen3TTSWrapper の追加引数）を作る。
+
+    Args:
+        compile_mode: torch.compile の mode（None で適用しない）
+        cpu_int8: CPU で動的 int8 量子化したモデルを使う（device は "cpu" になる）
+        cpu_threads: CPU 推論の intra-op スレッド数
+        project_root: 量子化済み重み（models/quantized）の基準ディレクトリ
+
+    Returns:
+        start_model_load のキーワード引数（"device" は MultiSpeakerSynthesizer 等にも同じ値を渡す）
+    """
+    from src.tts.cpu_mode import DEFAULT_QUANTIZED_DIR
+
+    options: Dict[str, Any] = {"compile_mode": compile_mode}
+    if cpu_int8:
+        options.update(device="cpu", quantize_int8=True, quantized_dir=str(Path(project_root) / DEFAULT_QUANTIZED_DIR))
+    if cpu_threads:
+        options["cpu_threads"] = cpu_threads
+    return options
+
+
+@dataclass
+class PreparedReference:
+    """
+    モデルなしで準備できた参照音声（prepare_reference の戻り値）。
+
+    prompt（成果物から読み込んだプロンプト）か audio（デコード済みの参照音声）のどちらかを持つ。
+    """
+
+    audio_path: str
+    corpus_text: str
+    sample_id: str | None = None
+    fingerprint: Optional[Dict[str, str]] = None
+    prompt: Optional[List[Any]] = None
+    audio: Optional[Tuple["np.ndarray", int]] = None
+
+    def install(self, wrapper: "Qwen3TTSWrapper", store: "PromptArtifactStore | None" = None) -> bool:
+        """
+        wrapper のプロンプトキャッシュに載せる。成果物がなければここでプロンプトを計算し、store に保存する。
+
+        Returns:
+            成果物を読み込めていた場合 True、新たに計算した場合 False
+
+        Raises:
+            RuntimeError: プロンプトの作成に失敗した場合
+        """
+        if self.prompt is not None:
+            wrapper.put_voice_clone_prompt(self.audio_path, self.corpus_text, self.prompt)
+            return True
+        prompt = wrapper.get_voice_clone_prompt(self.audio_path, self.corpus_text, ref_audio=self.audio)
+        if store is not None and self.sample_id is not None and self.fingerprint is not None:
+            store.save(self.sample_id, prompt, self.fingerprint)
+        return False
+
+
+def prepare_reference(
+    audio_path: str | Path,
+    corpus_text: str,
+    *,
+    model_name: str,
+    device: str | None = None,
+    dtype: Any = None,
+    store: "PromptArtifactStore | None" = None,
+    sample_id: str | None = None,
+    report: StartupReport | None = None,
+    reference_store: "ReferenceStore | None" = None,
+) -> PreparedReference:
+    """
+    モデルのロードを待たずにできる参照音声の準備を行う（start_model_load と並行して呼ぶ）。
+
+    reference_store と sample_id を指定した場合は参照音声を前処理済みの正規形に置き換える
+    （初回のみ前処理して保存し、以降はメモリマップで読むだけ）。
+    store と sample_id を指定した場合はフィンガープリントを計算して有効な成果物を読み込む。
+    成果物がない（または store を使わない）場合は参照音声を読み込んでおく。
+
+    Args:
+        audio_path: 参照音声ファイルのパス
+        corpus_text: 参照音声の読み上げテキスト
+        model_name: モデル ID（フィンガープリント用）
+        device: 実行デバイス（None は自動選択）
+        dtype: dtype（None は自動選択）
+        store: 事前計算プロンプトの保存先（None で使わない）
+        sample_id: 成果物の ID
+        report: 段階を記録する StartupReport（"ref_preprocess" / "prompt_artifact" / "ref_decode"）
+        reference_store: 前処理済み参照音声の保存先（None で元ファイルをそのまま使う）
+
+    Returns:
+        PreparedReference（モデルのロード後に install() で wrapper に載せる）。
+        前処理した場合 audio_path は正規形ファイルのパス
+
+    Raises:
+        FileNotFoundError: audio_path が存在しない場合
+        ValueError: 参照音声をデコードできない、または無音の場合
+    """
+    from src.tts.qwen_wrapper import load_ref_audio
+    from src.tts.voice_clone import resolve_device_dtype
+
+    def phase(name: str) -> Any:
+        return report.phase(name) if report is not None else _nullcontext()
+
+    path = str(audio_path)
+    if not Path(path).exists():
+        raise FileNotFoundError(f"参照音声ファイルが見つかりません: {path}")
+    reference = "raw"
+    prepared = PreparedReference(audio_path=path, corpus_text=corpus_text, sample_id=sample_id)
+    if reference_store is not None and sample_id is not None:
+        from src.profile.reference_store import reference_id
+
+        with phase("ref_preprocess"):
+            prepared.audio_path = str(reference_store.ensure(sample_id, path))
+        reference = reference_id()
+    _device, _dtype = resolve_device_dtype(device, dtype)
+    if store is not None and sample_id is not None:
+        with phase("prompt_artifact"):
+            prepared.fingerprint = store.fingerprint(path, corpus_text, model_name, _dtype, reference)
+            prepared.prompt = store.load(sample_id, prepared.fingerprint, device=_device)
+        if prepared.prompt is not None:
+            return prepared
+    with phase("ref_decode"):
+        prepared.audio = load_ref_audio(prepared.audio_path)
+    return prepared
+
+
+@contextmanager
+def _nullcontext() -> Iterator[None]:
+    yield
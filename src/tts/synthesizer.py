@@ -0,0 +1,487 @@
+# coding=utf-8
+"""
+複数話者の音声合成窓口。
+
+1 つの共有モデル（ModelRegistry 経由）に複数の話者（参照音声 + 参照テキスト）を登録し、
+呼び出しごとに話者を指定して合成する。話者の切り替えでモデルは再ロードされず、
+参照音声プロンプトは Qwen3TTSWrapper のキャッシュで話者ごとに再利用される。
+
+clone_mode="xvector" では話者の全サンプルの話者埋め込みを融合した x-vector のみプロンプトで生成する
+（参照音声コードと ref_text をプロンプトに含めないため速いが、声の再現度は "full" より下がることがある）。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from src.profile.reference_store import ReferenceStore
+from src.tts.audio_cache import DEFAULT_SEED, AudioCache, make_audio_cache_key
+from src.tts.model_registry import ModelRegistry, get_registry
+from src.tts.prompt_cache import make_prompt_key
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.speaker_embedding import CLONE_MODES, EMBEDDING_FUSIONS
+from src.tts.voice_clone import _normalize_language, resolve_device_dtype
+
+
+@dataclass(frozen=True)
+class SpeakerProfile:
+    """登録済み話者の参照情報。"""
+
+    name: str
+    ref_audio_path: str
+    ref_text: str
+    language: str
+    # 話者埋め込みを融合するサンプルの参照音声（clone_mode="xvector" 用。空なら ref_audio_path のみ）
+    embedding_paths: Tuple[str, ...] = ()
+
+
+class MultiSpeakerSynthesizer:
+    """1 つの共有モデルで複数話者を合成する。"""
+
+    def __init__(
+        self,
+        *,
+        model_name: str = "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
+        device: str | None = None,
+        dtype: torch.dtype | None = None,
+        registry: ModelRegistry | None = None,
+        audio_cache: AudioCache | None = None,
+        seed: int | None = None,
+        compile_mode: str | None = None,
+        reference_store: ReferenceStore | None = None,
+        clone_mode: str = "full",
+        embedding_fusion: str = "mean",
+    ) -> None:
+        """
+        共有の Qwen3TTSWrapper を取得する（話者は register_speaker で登録する）。
+
+        Args:
+            model_name: Qwen3-TTS のモデル ID
+            device: 実行デバイス。None の場合は "cuda" または "cpu"
+            dtype: 計算に使う dtype。None の場合は torch.bfloat16（CUDA 時）または torch.float32
+            registry: モデルを取得するレジストリ。None の場合はプロセス共有の既定レジストリ
+            audio_cache: 合成済み音声のキャッシュ。指定すると synthesize の結果を再利用する
+            seed: 生成の乱数シード。audio_cache 指定時に None なら DEFAULT_SEED を使う
+            compile_mode: torch.compile の mode（Qwen3TTSWrapper 参照）。モデルを初めてロードする場合のみ有効
+            reference_store: 指定すると register_speaker で参照音声を前処理済みの正規形に置き換える
+            clone_mode: ボイスクローンのプロンプトの種類（CLONE_MODES）
+            embedding_fusion: clone_mode="xvector" での話者埋め込みの融合方法（EMBEDDING_FUSIONS）
+
+        Raises:
+            ValueError: clone_mode / embedding_fusion が未対応の場合
+            RuntimeError: モデルのロードに失敗した場合
+        """
+        if clone_mode not in CLONE_MODES:
+            raise ValueError(f"clone_mode は {CLONE_MODES} のいずれかを指定してください。")
+        if embedding_fusion not in EMBEDDING_FUSIONS:
+            raise ValueError(f"embedding_fusion は {EMBEDDING_FUSIONS} のいずれかを指定してください。")
+        self._clone_mode = clone_mode
+        self._embedding_fusion = embedding_fusion
+        self._audio_cache = audio_cache
+        self._seed = seed if seed is not None or audio_cache is None else DEFAULT_SEED
+        _device, _dtype = resolve_device_dtype(device, dtype)
+        self._registry = registry if registry is not None else get_registry()
+        try:
+            self._wrapper: Qwen3TTSWrapper | None = self._registry.acquire(
+                model_name=model_name,
+                device=_device,
+                dtype=_dtype,
+                compile_mode=compile_mode,
+            )
+        except Exception as e:
+            raise RuntimeError(f"モデルのロードに失敗しました: {e}") from e
+        self._reference_store = reference_store
+        self._speakers: Dict[str, SpeakerProfile] = {}
+
+    def register_speaker(
+        self,
+        name: str,
+        ref_audio_path: str,
+        ref_text: str,
+        language: str = "ja",
+        sample_id: str | None = None,
+        samples: Sequence[Tuple[str, str]] | None = None,
+    ) -> SpeakerProfile:
+        """
+        話者を登録する（同名の話者は上書き）。
+
+        reference_store を指定している場合、ローカルの参照音声はここで 1 回だけ前処理し
+        （デコード・モノラル化・24 kHz へのリサンプル・無音除去・音量正規化）、以降の合成は正規形を使う。
+
+        Args:
+            name: 話者名
+            ref_audio_path: 参照音声ファイルのパスまたは http(s) URL
+            ref_text: 参照音声の読み上げテキスト
+            language: 話者の既定言語。"ja" / "en" または "Japanese" / "English"
+            sample_id: 前処理済み参照音声の保存名（None の場合は話者名）
+            samples: clone_mode="xvector" で話者埋め込みを融合するサンプルの (sample_id, 参照音声パス)。
+                None の場合は ref_audio_path のみ（clone_mode="full" では使わない）
+
+        Returns:
+            登録した SpeakerProfile
+
+        Raises:
+            FileNotFoundError: ref_audio_path が存在しない場合
+            ValueError: name / ref_text が空、language が未対応、または参照音声をデコードできない場合
+        """
+        if not name or not name.strip():
+            raise ValueError("name を指定してください。")
+        if not ref_text or not ref_text.strip():
+            raise ValueError("ref_text を指定してください。")
+        norm_lang = _validate_language(language)
+
+        path_str = self._prepare_reference(ref_audio_path, sample_id or name.strip())
+        embedding_paths: Tuple[str, ...] = ()
+        if self._clone_mode == "xvector" and samples:
+            embedding_paths = tuple(self._prepare_reference(path, sid) for sid, path in samples)
+
+        profile = SpeakerProfile(name.strip(), path_str, ref_text.strip(), norm_lang, embedding_paths)
+        self._speakers[profile.name] = profile
+        return profile
+
+    def _prepare_reference(self, ref_audio_path: str, sample_id: str) -> str:
+        """参照音声の存在を確認し、reference_store があれば正規形のパスに置き換える。"""
+        path_str = ref_audio_path.strip()
+        if path_str.startswith(("http://", "https://")):
+            return path_str
+        if not Path(path_str).exists():
+            raise FileNotFoundError(f"参照音声ファイルが見つかりません: {ref_audio_path}")
+        if self._reference_store is not None and Path(path_str).suffix != ".npy":
+            path_str = str(self._reference_store.ensure(sample_id, path_str))
+        return path_str
+
+    def _register_profile(self, profile_manager: Any, speaker: str) -> SpeakerProfile:
+        """VoiceProfileManager の話者を最初のサンプルで登録する（xvector では全サンプルを融合に使う）。"""
+        profile = profile_manager.get_profile(speaker)
+        samples = None
+        if self._clone_mode == "xvector":
+            samples = [
+                (p["sample_id"], str(profile_manager.resolve_audio_path(p)))
+                for p in profile_manager.get_all_profiles(speaker)
+            ]
+        return self.register_speaker(
+            speaker,
+            str(profile_manager.resolve_audio_path(profile)),
+            profile["corpus_text"],
+            profile["language"],
+            sample_id=profile["sample_id"],
+            samples=samples,
+        )
+
+    def register_profiles(self, profile_manager: Any) -> List[str]:
+        """
+        VoiceProfileManager の全話者を登録する（各話者の最初のサンプルを使用。
+        clone_mode="xvector" では話者の全サンプルの話者埋め込みを融合する）。
+
+        Args:
+            profile_manager: VoiceProfileManager
+
+        Returns:
+            登録した話者名のリスト
+        """
+        names = []
+        for speaker in profile_manager.list_speakers():
+            self._register_profile(profile_manager, speaker)
+            names.append(speaker)
+        return names
+
+    def reload_profiles(self, profile_manager: Any, speakers: Iterable[str]) -> Dict[str, str]:
+        """
+        VoiceProfileManager の再読み込みで変わった話者だけを登録し直す（ProfileChanges.speakers を渡す）。
+
+        メタデータから消えた話者は登録を解除し、残っている話者は新しい最初のサンプルで登録し直す。
+        どちらの場合も古い参照音声のプロンプトと合成済み音声をキャッシュから破棄する（他の話者のものは残す）。
+        話者の差し替えは 1 回の代入なので、合成中の呼び出しは古いプロファイルのまま最後まで進む。
+
+        Args:
+            profile_manager: VoiceProfileManager
+            speakers: 影響を受けた話者名
+
+        Returns:
+            {話者名: "added" / "updated" / "removed"}
+
+        Raises:
+            FileNotFoundError: 新しい参照音声が存在しない場合（その話者は古いプロファイルのまま）
+            ValueError: 新しい参照音声をデコードできない等の場合（同上）
+        """
+        result: Dict[str, str] = {}
+        current = set(profile_manager.list_speakers())
+        for name in speakers:
+            old = self._speakers.get(name)
+            if name not in current:
+                if old is None:
+                    continue
+                self.unregister_speaker(name)
+                result[name] = "removed"
+            else:
+                self._register_profile(profile_manager, name)
+                result[name] = "added" if old is None else "updated"
+            if old is not None:
+                self._discard_cached(old)
+        return result
+
+    def _discard_cached(self, profile: SpeakerProfile) -> None:
+        """話者 profile の参照音声から作ったプロンプトと合成済み音声をキャッシュから破棄する。"""
+        if self._wrapper is not None:
+            for path in {profile.ref_audio_path, *profile.embedding_paths}:
+                self._wrapper.invalidate_voice_clone_prompt(path)
+        if self._audio_cache is not None:
+            self._audio_cache.discard_speaker(profile.name)
+
+    def unregister_speaker(self, name: str) -> None:
+        """話者の登録を解除する（未登録なら何もしない）。"""
+        self._speakers.pop(name.strip(), None)
+
+    def list_speakers(self) -> List[str]:
+        """登録済み話者名の一覧（登録順）。"""
+        return list(self._speakers)
+
+    def get_speaker(self, name: str) -> SpeakerProfile:
+        """
+        登録済み話者を返す。
+
+        Raises:
+            ValueError: 話者が登録されていない場合
+        """
+        profile = self._speakers.get(name.strip() if name else "")
+        if profile is None:
+            raise ValueError(f"話者が登録されていません: {name!r}")
+        return profile
+
+    def warmup(self, texts: Sequence[str] | None = None) -> Dict[str, List[float]]:
+        """
+        登録済みの全話者でダミー文を生成し、最初のリクエストの遅延をなくす（Qwen3TTSWrapper.warmup）。
+
+        話者ごとの参照音声プロンプトの作成もここで済む。
+
+        Args:
+            texts: ウォームアップに使う文（None の場合は話者の言語ごとの既定の文）
+
+        Returns:
+            {話者名: 各文の生成にかかった時間（秒）のリスト}
+        """
+        return {
+            name: self.wrapper.warmup(p.ref_audio_path, p.ref_text, p.language, texts, self._speaker_prompt(p))
+            for name, p in self._speakers.items()
+        }
+
+    @property
+    def clone_mode(self) -> str:
+        """ボイスクローンのプロンプトの種類（"full" / "xvector"）。"""
+        return self._clone_mode
+
+    def get_speaker_prompt(self, name: str) -> List[Any] | None:
+        """
+        話者の生成に使うプロンプトを返す。clone_mode="full" では None（Qwen3TTSWrapper が参照音声から作る）。
+
+        Raises:
+            ValueError: 話者が登録されていない場合
+            FileNotFoundError / RuntimeError: Qwen3TTSWrapper.get_speaker_embedding_prompt と同じ
+        """
+        return self._speaker_prompt(self.get_speaker(name))
+
+    def _speaker_prompt(self, profile: SpeakerProfile) -> List[Any] | None:
+        """clone_mode="xvector" では融合した話者埋め込みのプロンプト（キャッシュ付き）、"full" では None。"""
+        if self._clone_mode == "full":
+            return None
+        return self.wrapper.get_speaker_embedding_prompt(
+            profile.embedding_paths or (profile.ref_audio_path,), self._embedding_fusion
+        )
+
+    @property
+    def wrapper(self) -> Qwen3TTSWrapper:
+        """共有の Qwen3TTSWrapper。
+
+        Raises:
+            RuntimeError: close() 済みの場合
+        """
+        if self._wrapper is None:
+            raise RuntimeError("MultiSpeakerSynthesizer は close() 済みです。")
+        return self._wrapper
+
+    def synthesize(
+        self,
+        text: str,
+        speaker: str,
+        language: str | None = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        指定した話者の声でテキストを合成する（長いテキストは文単位に分けて生成・結合する）。
+
+        audio_cache を指定している場合、同じ条件で合成済みの音声はキャッシュから返す（書き込み不可の配列）。
+
+        Args:
+            text: 読み上げるテキスト
+            speaker: 登録済みの話者名
+            language: 合成時の言語。None の場合は話者の既定言語
+
+        Returns:
+            (wav_array, sample_rate): 音声配列（float, -1.0～1.0）とサンプリングレート（int）
+
+        Raises:
+            ValueError: text が空、話者が未登録、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合
+        """
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+        profile = self.get_speaker(speaker)
+        norm_lang = _validate_language(language) if language is not None else profile.language
+
+        def generate() -> Tuple[np.ndarray, int]:
+            return self.wrapper.generate_voice_long(
+                text=text.strip(),
+                ref_audio_path=profile.ref_audio_path,
+                ref_text=profile.ref_text,
+                language=norm_lang,
+                seed=self._seed,
+                voice_clone_prompt=self._speaker_prompt(profile),
+            )
+
+        try:
+            if self._audio_cache is None:
+                return generate()
+            # xvector のときだけモードと融合したサンプルをキーに加える（full のキーは従来のまま）。
+            # サンプルは参照音声と同じくパス + サイズ + mtime で識別する（撮り直すと別のキーになる）
+            mode_params: Dict[str, Any] = {}
+            if self._clone_mode == "xvector":
+                sample_keys = [make_prompt_key(path, "", "", "") for path in profile.embedding_paths]
+                mode_params = {
+                    "clone_mode": self._clone_mode,
+                    "fusion": self._embedding_fusion,
+                    "samples": [[k.source, k.size, k.mtime_ns] for k in sample_keys],
+                }
+            key = make_audio_cache_key(
+                profile.ref_audio_path,
+                profile.ref_text,
+                text,
+                norm_lang,
+                self.wrapper.model_name,
+                self.wrapper.dtype,
+                seed=self._seed,
+                **mode_params,
+            )
+            return self._audio_cache.get_or_create(key, generate, speaker=profile.name)
+        except (FileNotFoundError, ValueError):
+            raise
+        except Exception as e:
+            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+
+    def synthesize_stream(
+        self,
+        text: str,
+        speaker: str,
+        language: str | None = None,
+        chunk_ms: int = 200,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        指定した話者の声でテキストを合成し、文ごとに生成できた順にチャンクで返す。
+
+        Args:
+            text: 読み上げるテキスト
+            speaker: 登録済みの話者名
+            language: 合成時の言語。None の場合は話者の既定言語
+            chunk_ms: 1 チャンクの長さ（ミリ秒）
+
+        Returns:
+            (chunk, sample_rate) を順に返すイテレータ
+
+        Raises:
+            ValueError: text が空、話者が未登録、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合（イテレーション時を含む）
+        """
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+        profile = self.get_speaker(speaker)
+        norm_lang = _validate_language(language) if language is not None else profile.language
+
+        try:
+            return self.wrapper.generate_voice_stream(
+                text=text.strip(),
+                ref_audio_path=profile.ref_audio_path,
+                ref_text=profile.ref_text,
+                language=norm_lang,
+                chunk_ms=chunk_ms,
+                voice_clone_prompt=self._speaker_prompt(profile),
+            )
+        except (FileNotFoundError, ValueError):
+            raise
+        except Exception as e:
+            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+
+    def synthesize_many(
+        self,
+        texts: Sequence[str],
+        speakers: Sequence[str],
+        languages: Sequence[str | None] | None = None,
+        max_batch_size: int = 8,
+    ) -> List[Tuple[np.ndarray, int]]:
+        """
+        複数のテキストを話者混在のままバッチ合成する。
+
+        Args:
+            texts: 読み上げるテキストのリスト
+            speakers: 話者名のリスト（texts と同じ長さ）
+            languages: 言語のリスト（None の要素・引数は話者の既定言語）
+            max_batch_size: 1 回の生成にまとめる最大件数
+
+        Returns:
+            (wav_array, sample_rate) のリスト（texts と同じ順序）
+
+        Raises:
+            ValueError: 入力が空・長さ不一致、話者が未登録、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合
+        """
+        if not texts or any(not t or not t.strip() for t in texts):
+            raise ValueError("text を指定してください。")
+        if len(speakers) != len(texts):
+            raise ValueError(f"speakers の件数が texts と一致しません: {len(speakers)} != {len(texts)}")
+        if languages is None:
+            languages = [None] * len(texts)
+        if len(languages) != len(texts):
+            raise ValueError(f"languages の件数が texts と一致しません: {len(languages)} != {len(texts)}")
+
+        profiles = [self.get_speaker(s) for s in speakers]
+        langs = [
+            _validate_language(lang) if lang is not None else p.language
+            for p, lang in zip(profiles, languages)
+        ]
+        try:
+            return self.wrapper.generate_voice_batch(
+                [t.strip() for t in texts],
+                [(p.ref_audio_path, p.ref_text) for p in profiles],
+                langs,
+                max_batch_size=max_batch_size,
+                seed=self._seed,
+                prompts=[self._speaker_prompt(p) for p in profiles],
+            )
+        except (FileNotFoundError, ValueError):
+            raise
+        except Exception as e:
+            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+
+    def close(self) -> None:
+        """共有モデルの参照を返却する。2 回目以降は何もしない。"""
+        if self._wrapper is not None:
+            self._registry.release(self._wrapper)
+            self._wrapper = None
+
+    def __enter__(self) -> "MultiSpeakerSynthesizer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _validate_language(language: str) -> str:
+    """言語を正規化し、未対応なら ValueError を送出する。"""
+    norm_lang = _normalize_language(language)
+    if norm_lang not in Qwen3TTSWrapper.SUPPORTED_LANGUAGES:
+        raise ValueError(
+            f"language は 'ja' / 'en' または {Qwen3TTSWrapper.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+        )
+    return norm_lang
@@ -0,0 +1,210 @@
+# coding=utf-8
+"""
+読み上げテキストの文分割。
+
+日本語（。！？）と英語（. ! ?）の文末、および改行で区切る。
+文末記号の直後の閉じ括弧（」』）等）は前の文に含める。
+英語のピリオドは直後が空白・行末の場合のみ文末とみなす（"3.14" 等を分割しない）。
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+# 文末記号（連続していれば 1 つの文末として扱う）
+_SENTENCE_END = "。！？!?"
+# 文末記号の直後に続いても前の文に含める閉じ括弧類
+_CLOSING = "」』）)]】〉》\"'”’"
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    テキストを文単位に分割する。
+
+    Args:
+        text: 読み上げるテキスト
+
+    Returns:
+        前後の空白を除いた文のリスト（空の文は含まない）
+    """
+    sentences: List[str] = []
+    buf: List[str] = []
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\n":
+            _flush(buf, sentences)
+            i += 1
+            continue
+        buf.append(ch)
+        i += 1
+        is_end = ch in _SENTENCE_END or (ch == "." and (i >= n or text[i].isspace()))
+        if is_end:
+            while i < n and (text[i] in _SENTENCE_END or text[i] in _CLOSING):
+                buf.append(text[i])
+                i += 1
+            _flush(buf, sentences)
+    _flush(buf, sentences)
+    return sentences
+
+
+def _flush(buf: List[str], sentences: List[str]) -> None:
+    sentence = "".join(buf).strip()
+    if sentence:
+        sentences.append(sentence)
+    buf.clear()
+
+
+def segment_text(text: str, max_chars: int = 80, min_chars: int = 8) -> List[str]:
+    """
+    テキストを合成単位（セグメント）に分割する。
+
+    文単位に分割したうえで、max_chars を超える文は読点・カンマ・空白の位置で、
+    それでも長い場合は max_chars ごとに区切る。min_chars 未満の短い文（「うん！」等）は
+    max_chars を超えない範囲で次の文とまとめ、生成呼び出しの回数を抑える。
+
+    Args:
+        text: 読み上げるテキスト
+        max_chars: 1 セグメントの最大文字数
+        min_chars: これより短い文は隣の文とまとめる
+
+    Returns:
+        セグメントのリスト（空のテキストでは空リスト）
+
+    Raises:
+        ValueError: max_chars が 1 未満の場合
+    """
+    if max_chars < 1:
+        raise ValueError("max_chars は 1 以上を指定してください。")
+
+    pieces: List[str] = []
+    for sentence in split_sentences(text):
+        pieces.extend(_split_long(sentence, max_chars))
+
+    segments: List[str] = []
+    for piece in pieces:
+        if segments and len(segments[-1]) < min_chars and len(segments[-1]) + len(piece) + 1 <= max_chars:
+            sep = " " if segments[-1][-1].isascii() and piece[0].isascii() else ""
+            segments[-1] = segments[-1] + sep + piece
+        else:
+            segments.append(piece)
+    return segments
+
+
+# 長い文を区切る位置の候補（読点・カンマ・セミコロン・コロン）
+_CLAUSE_END = "、，,;；:："
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """max_chars を超える文を節の区切り → 空白 → 固定長の順に分割する。"""
+    parts: List[str] = []
+    rest = sentence
+    while len(rest) > max_chars:
+        window = rest[:max_chars]
+        cut = max(window.rfind(ch) for ch in _CLAUSE_END)
+        if cut <= 0:
+            cut = window.rfind(" ")
+        cut = cut + 1 if cut > 0 else max_chars
+        head = rest[:cut].strip()
+        if head:
+            parts.append(head)
+        rest = rest[cut:].strip()
+    if rest:
+        parts.append(rest)
+    return parts
+
+
+# 英語の 1 秒あたりの読み上げ文字数の目安（空白・記号を含む）
+_CHARS_PER_SEC = {"English": 14.0}
+# 日本語の 1 秒あたりのモーラ数の目安（ふつうの話速）
+_MORA_PER_SEC = 7.0
+
+# 直前のかなと 1 モーラになる小書き文字（促音の「っ」「ッ」は 1 モーラとして数える）
+_SMALL_KANA = set("ぁぃぅぇぉゃゅょゎゕゖァィゥェォャュョヮヵヶ")
+# 息継ぎの間が入る記号（間を 2 モーラ分として数える）
+_PAUSE = _SENTENCE_END + _CLAUSE_END + "."
+
+
+def count_morae(text: str) -> float:
+    """
+    読み上げのモーラ数を見積もる（読みの辞書は使わない概算）。
+
+    - かな・長音符・促音: 1、拗音などの小書き文字: 0
+    - 漢字: 2（音読みの平均的な長さ）
+    - 数字: 2（「に」「さん」「じゅう」等の平均）
+    - ラテン文字: 0.5（英単語は 1 秒あたり約 14 文字）
+    - 文末・読点などの記号: 2（息継ぎの間）
+
+    Args:
+        text: 読み上げるテキスト
+
+    Returns:
+        モーラ数の見積もり
+    """
+    morae = 0.0
+    for ch in text:
+        if ch in _SMALL_KANA:
+            continue
+        if "\u3041" <= ch <= "\u30fa" or ch == "ー":
+            morae += 1
+        elif "\u4e00" <= ch <= "\u9fff" or ch == "々":
+            morae += 2
+        elif ch.isdigit():
+            morae += 2
+        elif ch.isalpha():
+            morae += 0.5
+        elif ch in _PAUSE:
+            morae += 2
+    return morae
+
+
+def _is_japanese_script(ch: str) -> bool:
+    """かな・漢字・全角の記号（CJK の記号と句読点・全角形）か。"""
+    return "\u3000" <= ch <= "\u30ff" or "\u4e00" <= ch <= "\u9fff" or "\uff00" <= ch <= "\uffef"
+
+
+def estimate_speech_seconds(text: str, language: str = "Japanese") -> float:
+    """
+    テキストの読み上げ時間（秒）を見積もる。
+
+    かな・漢字（と全角の記号）は language にかかわらずモーラ数 ÷ 1 秒あたりのモーラ数で数える
+    （language="English" で日本語の文を渡しても短く見積もらない）。それ以外のラテン文字・数字・半角の記号・空白は、
+    英語では文字数 ÷ 1 秒あたりの文字数、日本語（と "Auto"）ではモーラ数（count_morae）で数える。
+    """
+    rate = _CHARS_PER_SEC.get(language)
+    if rate is None:
+        return count_morae(text) / _MORA_PER_SEC
+    text = text.strip()
+    japanese = "".join(ch for ch in text if _is_japanese_script(ch))
+    return count_morae(japanese) / _MORA_PER_SEC + (len(text) - len(japanese)) / rate
+
+
+def estimate_max_new_tokens(
+    text: str,
+    language: str = "Japanese",
+    codec_hz: float = 12.0,
+    margin: float = 2.0,
+    min_tokens: int = 48,
+    max_tokens: int = 2048,
+) -> int:
+    """
+    テキストの長さから生成トークン数の上限を見積もる。
+
+    読み上げ時間（estimate_speech_seconds）× コーデックのフレームレート × 安全係数。
+    EOS が出ないまま生成が続いた場合の最悪の所要時間を、テキストの長さに比例させるために使う。
+
+    Args:
+        text: 読み上げるテキスト
+        language: "Japanese" / "English" / "Auto"（Auto は日本語の目安を使う。かな・漢字はどの言語でもモーラ数で数える）
+        codec_hz: コーデックのフレームレート（12Hz モデルは 12）
+        margin: 安全係数
+        min_tokens: 下限（ごく短いテキストでも途切れないようにする）
+        max_tokens: 上限
+
+    Returns:
+        max_new_tokens に渡す値
+    """
+    seconds = estimate_speech_seconds(text, language)
+    tokens = int(seconds * codec_hz * margin + 0.5)
+    return max(min_tokens, min(max_tokens, tokens))
@@ -5,11 +5,14 @@
 """
 
 from pathlib import Path
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, Iterator, List, Sequence, Tuple
 
 import numpy as np
 import torch
 
+from src.tts.audio_cache import DEFAULT_SEED, AudioCache, make_audio_cache_key
+from src.tts.metrics import span
+from src.tts.model_registry import ModelRegistry, get_registry
 from src.tts.qwen_wrapper import Qwen3TTSWrapper
 
 if TYPE_CHECKING:
@@ -37,9 +40,17 @@ class VoiceCloneManager:
         model_name: str = "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
         device: str | None = None,
         dtype: torch.dtype | None = None,
+        registry: ModelRegistry | None = None,
+        audio_cache: AudioCache | None = None,
+        seed: int | None = None,
+        compile_mode: str | None = None,
     ) -> None:
         """
-        参照音声とコーパステキストを登録し、Qwen3TTSWrapper を初期化する。
+        参照音声とコーパステキストを登録し、共有の Qwen3TTSWrapper を取得する。
+
+        同じ (model_name, device, dtype) の VoiceCloneManager どうしは
+        ModelRegistry 経由で 1 つのモデルを共有する（話者を増やしてもモデルは再ロードされない）。
+        不要になったら close() でモデルの参照を返却する。
 
         Args:
             ref_audio_path: 参照音声ファイルのパス（WAV/MP3 等）
@@ -48,6 +59,11 @@ class VoiceCloneManager:
             model_name: Qwen3-TTS のモデル ID（オプション）
             device: 実行デバイス。None の場合は "cuda" または "cpu"
             dtype: 計算に使う dtype。None の場合は torch.bfloat16（CUDA 時）または torch.float32
+            registry: モデルを取得するレジストリ。None の場合はプロセス共有の既定レジストリ
+            audio_cache: 合成済み音声のキャッシュ。指定すると synthesize の結果を再利用する
+            seed: 生成の乱数シード。audio_cache 指定時に None なら DEFAULT_SEED を使う
+                （キャッシュした音声と同じ結果になるよう生成を決定的にする）
+            compile_mode: torch.compile の mode（Qwen3TTSWrapper 参照）。モデルを初めてロードする場合のみ有効
 
         Raises:
             FileNotFoundError: ref_audio_path が存在しない場合
@@ -73,23 +89,64 @@ class VoiceCloneManager:
         self._ref_audio_path = path_str
         self._ref_text = ref_text.strip()
         self._language = norm_lang
+        self._audio_cache = audio_cache
+        self._seed = seed if seed is not None or audio_cache is None else DEFAULT_SEED
 
-        _device = device if device is not None else ("cuda" if torch.cuda.is_available() else "cpu")
-        _dtype = dtype if dtype is not None else (torch.bfloat16 if _device.startswith("cuda") else torch.float32)
+        _device, _dtype = resolve_device_dtype(device, dtype)
 
+        self._registry = registry if registry is not None else get_registry()
         try:
-            self._wrapper = Qwen3TTSWrapper(
+            self._wrapper: Qwen3TTSWrapper | None = self._registry.acquire(
                 model_name=model_name,
                 device=_device,
                 dtype=_dtype,
+                compile_mode=compile_mode,
             )
         except Exception as e:
             raise RuntimeError(f"モデルのロードに失敗しました: {e}") from e
 
+    def close(self) -> None:
+        """共有モデルの参照を返却する（最後の参照ならモデルを解放する）。2 回目以降は何もしない。"""
+        if self._wrapper is not None:
+            self._registry.release(self._wrapper)
+            self._wrapper = None
+
+    def __enter__(self) -> "VoiceCloneManager":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def wrapper(self) -> Qwen3TTSWrapper:
+        """内部で使用している Qwen3TTSWrapper。
+
+        Raises:
+            RuntimeError: close() 済みの場合
+        """
+        if self._wrapper is None:
+            raise RuntimeError("VoiceCloneManager は close() 済みです。")
+        return self._wrapper
+
+    def warmup(self, texts: Sequence[str] | None = None) -> List[float]:
+        """
+        登録した参照音声でダミー文を生成し、最初のリクエストの遅延をなくす（Qwen3TTSWrapper.warmup）。
+
+        Args:
+            texts: ウォームアップに使う文（None の場合は既定の文）
+
+        Returns:
+            各文の生成にかかった時間（秒）
+        """
+        return self.wrapper.warmup(self._ref_audio_path, self._ref_text, self._language, texts)
+
     def synthesize(self, text: str, language: str = "ja") -> Tuple[np.ndarray, int]:
         """
         登録した参照音声でテキストを合成する。
 
+        長いテキストは文単位に分けて生成し、結合する（Qwen3TTSWrapper.generate_voice_long）。
+        audio_cache を指定している場合、同じ条件で合成済みの音声はキャッシュから返す（書き込み不可の配列）。
+
         Args:
             text: 読み上げるテキスト
             language: 合成時の言語。"ja" / "en" または "Japanese" / "English"
@@ -110,13 +167,31 @@ class VoiceCloneManager:
                 f"language は 'ja' / 'en' または {Qwen3TTSWrapper.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
             )
 
-        try:
-            wav_array, sample_rate = self._wrapper.generate_voice(
+        def generate() -> Tuple[np.ndarray, int]:
+            return self.wrapper.generate_voice_long(
                 text=text.strip(),
                 ref_audio_path=self._ref_audio_path,
                 ref_text=self._ref_text,
                 language=norm_lang,
+                seed=self._seed,
             )
+
+        try:
+            with span("manager.synthesize", text_chars=len(text.strip()), language=norm_lang) as stage:
+                if self._audio_cache is None:
+                    wav_array, sample_rate = generate()
+                else:
+                    key = make_audio_cache_key(
+                        self._ref_audio_path,
+                        self._ref_text,
+                        text,
+                        norm_lang,
+                        self.wrapper.model_name,
+                        self.wrapper.dtype,
+                        seed=self._seed,
+                    )
+                    wav_array, sample_rate = self._audio_cache.get_or_create(key, generate)
+                stage.set(audio_sec=len(wav_array) / sample_rate)
         except FileNotFoundError:
             raise
         except ValueError:
@@ -126,6 +201,111 @@ class VoiceCloneManager:
 
         return wav_array, sample_rate
 
+    def synthesize_stream(
+        self,
+        text: str,
+        language: str = "ja",
+        chunk_ms: int = 200,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        登録した参照音声でテキストを合成し、文ごとに生成できた順にチャンクで返す。
+
+        Args:
+            text: 読み上げるテキスト
+            language: 合成時の言語。"ja" / "en" または "Japanese" / "English"
+            chunk_ms: 1 チャンクの長さ（ミリ秒）
+
+        Returns:
+            (chunk, sample_rate) を順に返すイテレータ
+
+        Raises:
+            ValueError: text が空、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合（イテレーション時を含む）
+        """
+        if not text or not text.strip():
+            raise ValueError("text を指定してください。")
+
+        norm_lang = _normalize_language(language)
+        if norm_lang not in Qwen3TTSWrapper.SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"language は 'ja' / 'en' または {Qwen3TTSWrapper.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+            )
+
+        try:
+            return self.wrapper.generate_voice_stream(
+                text=text.strip(),
+                ref_audio_path=self._ref_audio_path,
+                ref_text=self._ref_text,
+                language=norm_lang,
+                chunk_ms=chunk_ms,
+            )
+        except FileNotFoundError:
+            raise
+        except ValueError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+
+    def synthesize_many(
+        self,
+        texts: Sequence[str],
+        language: str = "ja",
+        max_batch_size: int = 8,
+    ) -> List[Tuple[np.ndarray, int]]:
+        """
+        登録した参照音声で複数のテキストをバッチ合成する。
+
+        Args:
+            texts: 読み上げるテキストのリスト
+            language: 合成時の言語。"ja" / "en" または "Japanese" / "English"
+            max_batch_size: 1 回の生成にまとめる最大件数
+
+        Returns:
+            (wav_array, sample_rate) のリスト（texts と同じ順序）
+
+        Raises:
+            ValueError: texts が空、または language が未対応の場合
+            RuntimeError: TTS 生成に失敗した場合
+        """
+        if not texts or any(not t or not t.strip() for t in texts):
+            raise ValueError("text を指定してください。")
+
+        norm_lang = _normalize_language(language)
+        if norm_lang not in Qwen3TTSWrapper.SUPPORTED_LANGUAGES:
+            raise ValueError(
+                f"language は 'ja' / 'en' または {Qwen3TTSWrapper.SUPPORTED_LANGUAGES} のいずれかを指定してください。"
+            )
+
+        try:
+            return self.wrapper.generate_voice_batch(
+                [t.strip() for t in texts],
+                [(self._ref_audio_path, self._ref_text)],
+                norm_lang,
+                max_batch_size=max_batch_size,
+                seed=self._seed,
+            )
+        except FileNotFoundError:
+            raise
+        except ValueError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"音声生成に失敗しました: {e}") from e
+
+
+def resolve_device_dtype(
+    device: str | None = None,
+    dtype: torch.dtype | None = None,
+) -> Tuple[str, torch.dtype]:
+    """
+    未指定のデバイス・dtype を既定値で埋める。
+
+    device が None の場合は "cuda"（利用可能時）または "cpu"。
+    dtype が None の場合は CUDA では torch.bfloat16、それ以外では torch.float32。
+    """
+    _device = device if device is not None else ("cuda" if torch.cuda.is_available() else "cpu")
+    _dtype = dtype if dtype is not None else (torch.bfloat16 if _device.startswith("cuda") else torch.float32)
+    return _device, _dtype
+
 
 def _normalize_language(lang: str) -> str:
     """言語コードを Qwen3TTSWrapper の language に正規化する。"""
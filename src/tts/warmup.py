@@ -0,0 +1,101 @@
+# coding=utf-8
+"""
+起動時のウォームアップと torch.compile による実行モード。
+
+ロード直後の最初の generate_voice は、カーネルの選択・CUDA アロケータの確保・（compile 時は）
+グラフのコンパイルが重なって以降の呼び出しより大幅に遅い。
+起動時に長さの異なるダミー文を話者ごとに生成しておくと、最初の実リクエストから定常の速さで応答できる。
+
+torch.compile はモデルのうち生成ループで毎ステップ呼ばれるモジュール（COMPILE_TARGETS）だけに適用する。
+コンパイル結果は Inductor のキャッシュ（models/compile_cache）に保存し、次回の起動で再利用する。
+
+CLI の引数定義から参照できるよう、torch は compile_model() の中でだけ import する。
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+DEFAULT_COMPILE_CACHE_DIR = "models/compile_cache"
+COMPILE_MODES = ("default", "reduce-overhead", "max-autotune")
+
+# Qwen3TTSModel.model（Qwen3TTSForConditionalGeneration）からの相対パス。
+# talker の Transformer 本体と、各ステップで残りのコードブックを予測する code_predictor。
+COMPILE_TARGETS = ("talker.model", "talker.code_predictor.model")
+
+# ウォームアップ用の文（短い文と長めの文で、長さの異なる形状を一通り通す）
+WARMUP_TEXTS: Dict[str, Sequence[str]] = {
+    "Japanese": ("こんにちは。", "今日はいい天気ですね、少し散歩に出かけてきます。"),
+    "English": ("Hello.", "It is a nice day today, so I am going out for a short walk."),
+}
+
+
+def configure_compile_cache(cache_dir: str | Path = DEFAULT_COMPILE_CACHE_DIR) -> Path:
+    """
+    Inductor のコンパイル結果をディスクにキャッシュする設定にする。
+
+    環境変数 TORCHINDUCTOR_CACHE_DIR が設定済みの場合はそちらを優先する。
+
+    Args:
+        cache_dir: キャッシュディレクトリ（デフォルト: models/compile_cache）
+
+    Returns:
+        実際に使うキャッシュディレクトリ
+    """
+    path = Path(os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", str(Path(cache_dir).resolve())))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def compile_model(
+    model: Any,
+    mode: str = "default",
+    cache_dir: str | Path = DEFAULT_COMPILE_CACHE_DIR,
+    targets: Sequence[str] = COMPILE_TARGETS,
+) -> List[str]:
+    """
+    Qwen3TTSModel の生成ループのモジュールに torch.compile を適用する（その場で置き換える）。
+
+    コンパイル自体は最初の呼び出し時に行われるため、適用後にウォームアップすること。
+    生成中は系列長が伸び続けるので dynamic=True でコンパイルする。
+
+    Args:
+        model: Qwen3TTSModel（.model を持つもの）
+        mode: torch.compile の mode（COMPILE_MODES のいずれか）
+        cache_dir: コンパイル結果のキャッシュディレクトリ
+        targets: model.model からの相対パス
+
+    Returns:
+        コンパイルを適用したモジュールのパス（該当するモジュールがなければ空）
+
+    Raises:
+        ValueError: mode が不正な場合
+    """
+    import torch
+
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"compile_mode は {', '.join(COMPILE_MODES)} のいずれかを指定してください: {mode}")
+    configure_compile_cache(cache_dir)
+
+    root = getattr(model, "model", None)
+    compiled = []
+    for target in targets:
+        module = root
+        for name in target.split("."):
+            module = getattr(module, name, None)
+        if isinstance(module, torch.nn.Module):
+            module.compile(mode=mode, dynamic=True)
+            compiled.append(target)
+    return compiled
+
+
+def warmup_texts(language: str, texts: Sequence[str] | None = None) -> List[str]:
+    """ウォームアップに使う文（texts 指定時はそれ、なければ言語ごとの既定の文）。"""
+    if texts:
+        return list(texts)
+    return list(WARMUP_TEXTS.get(language, WARMUP_TEXTS["English"]))
+
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""
+テスト用の Qwen3TTSModel 代替（GPU・モデルダウンロード不要）。
+
+偽モデル本体は src.tts.fake_model にあり、ここでは参照音声のデコードを省く差し替えと、
+応答せずに接続を閉じるソケット（DroppingSocket）を提供する。
+"""
+
+from __future__ import annotations
+
+import socket
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# 偽モデル本体は性能計測（src.tools.benchmark --backend fake）と共用
+from src.tts.fake_model import FakePromptItem, FakeQwen3TTSModel
+
+__all__ = ["DroppingSocket", "FakePromptItem", "FakeQwen3TTSModel", "fake_ref_audio", "use_fake_model"]
+
+
+def fake_ref_audio(path: str) -> tuple[np.ndarray, int]:
+    """_load_ref_audio の代替（torchaudio のデコードを行わない）。"""
+    return np.zeros(16000, dtype=np.float32), 16000
+
+
+def use_fake_model(monkeypatch: Any) -> None:
+    """Qwen3TTSWrapper が FakeQwen3TTSModel を使い、参照音声をデコードしないようにする。"""
+    from src.tts import qwen_wrapper
+
+    monkeypatch.setattr(qwen_wrapper, "Qwen3TTSModel", FakeQwen3TTSModel)
+    monkeypatch.setattr(
+        qwen_wrapper.Qwen3TTSWrapper,
+        "_load_ref_audio",
+        lambda self, path: fake_ref_audio(path),
+    )
+    monkeypatch.setattr(qwen_wrapper, "load_ref_audio", fake_ref_audio)
+
+
+class DroppingSocket:
+    """リクエストを受け取ってから応答せずに接続を閉じる Unix ソケット（処理中に止まったデーモン・レプリカの代わり）。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.received = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(str(path))
+        self._sock.listen()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rb") as f:
+                length = 0
+                while (line := f.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                f.read(length)
+                self.received += 1
+
+    def close(self) -> None:
+        self._sock.close()
@@ -0,0 +1,174 @@
+# coding=utf-8
+"""
+asyncio 向け合成窓口（AsyncVoiceCloneManager）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_async_manager.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+
+from src.tts import ModelRegistry
+from src.tts.async_manager import AsyncVoiceCloneManager
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def _slow_generation(monkeypatch: pytest.MonkeyPatch, seconds: float, gate: threading.Event | None = None) -> list:
+    """偽モデルの生成を遅くする（gate 指定時は gate がセットされるまで止める）。生成したスレッド名を返すリスト。"""
+    threads: list = []
+    original = FakeQwen3TTSModel.generate_voice_clone
+
+    def slow(self, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        if gate is not None:
+            gate.wait(timeout=5)
+        time.sleep(seconds)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(FakeQwen3TTSModel, "generate_voice_clone", slow)
+    return threads
+
+
+async def _open(ref: str, **kwargs) -> AsyncVoiceCloneManager:
+    return await AsyncVoiceCloneManager.open(ref, "参照", device="cpu", registry=ModelRegistry(), **kwargs)
+
+
+def test_event_loop_stays_responsive(monkeypatch: pytest.MonkeyPatch, ref):
+    """生成中もイベントループは止まらず、生成は専用スレッドで行われる"""
+    use_fake_model(monkeypatch)
+    threads = _slow_generation(monkeypatch, 0.5)
+
+    async def main():
+        ticks = 0
+        manager = await _open(ref)
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        async with manager:
+            wav, sr = await manager.synthesize("テスト")
+        task.cancel()
+        return ticks, wav, sr
+
+    ticks, wav, sr = asyncio.run(main())
+    assert len(wav) == 3 * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+    # 0.5 秒の生成中に 10ms ごとのティックが進んでいる
+    assert ticks >= 20
+    assert threads and all(name.startswith("tts-inference") for name in threads)
+
+
+def test_synthesize_pcm(monkeypatch: pytest.MonkeyPatch, ref):
+    """PCM 変換済みのバイト列を返す"""
+    use_fake_model(monkeypatch)
+
+    async def main():
+        async with await _open(ref) as manager:
+            return await manager.synthesize_pcm("あいう")
+
+    pcm, sr = asyncio.run(main())
+    assert len(pcm) == 3 * FakeQwen3TTSModel.SAMPLES_PER_CHAR * 2
+    assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+
+
+def test_timeout(monkeypatch: pytest.MonkeyPatch, ref):
+    """タイムアウトすると TimeoutError。未実行のリクエストは取り消される"""
+    use_fake_model(monkeypatch)
+    gate = threading.Event()
+    threads = _slow_generation(monkeypatch, 0.0, gate)
+
+    async def main():
+        manager = await _open(ref)
+        running = asyncio.create_task(manager.synthesize("一"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await manager.synthesize("二", timeout=0.1)
+        gate.set()
+        await running
+        await manager.aclose()
+        return manager
+
+    manager = asyncio.run(main())
+    assert len(threads) == 1
+    assert manager.pending == 0
+
+
+def test_backpressure(monkeypatch: pytest.MonkeyPatch, ref):
+    """受け付け数の上限に達すると、空きが出るまで待つ"""
+    use_fake_model(monkeypatch)
+    gate = threading.Event()
+    _slow_generation(monkeypatch, 0.0, gate)
+
+    async def main():
+        manager = await _open(ref, max_pending=2)
+        tasks = [asyncio.create_task(manager.synthesize(t)) for t in ("一", "二", "三")]
+        await asyncio.sleep(0.1)
+        assert manager.pending == 2
+        assert not any(t.done() for t in tasks)
+        gate.set()
+        results = await asyncio.gather(*tasks)
+        await manager.aclose()
+        return manager, results
+
+    manager, results = asyncio.run(main())
+    assert len(results) == 3
+    assert manager.pending == 0
+
+
+def test_stream(monkeypatch: pytest.MonkeyPatch, ref):
+    """非同期イテレータでチャンクを受け取る"""
+    use_fake_model(monkeypatch)
+
+    async def main():
+        async with await _open(ref) as manager:
+            return [c async for c in manager.synthesize_stream("おはよう。了解。", chunk_ms=100)]
+
+    chunks = asyncio.run(main())
+    assert sum(len(c) for c, _ in chunks) == 8 * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+
+
+def test_errors(monkeypatch: pytest.MonkeyPatch, ref):
+    """入力エラーはそのまま送出され、close() 後は RuntimeError"""
+    use_fake_model(monkeypatch)
+
+    async def main():
+        manager = await _open(ref)
+        with pytest.raises(ValueError):
+            await manager.synthesize(" ")
+        await manager.aclose()
+        with pytest.raises(RuntimeError):
+            await manager.synthesize("テスト")
+        return manager
+
+    manager = asyncio.run(main())
+    assert manager.pending == 0
+    with pytest.raises(ValueError):
+        AsyncVoiceCloneManager(manager.manager, max_pending=0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
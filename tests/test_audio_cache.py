@@ -0,0 +1,156 @@
+# coding=utf-8
+"""
+合成済み音声キャッシュ（AudioCache / make_audio_cache_key）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_audio_cache.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+
+from src.tts import ModelRegistry, VoiceCloneManager
+from src.tts.audio_cache import AudioCache, make_audio_cache_key, normalize_text
+from tests.fakes import use_fake_model
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def _key(ref: str, text: str = "おはよう", **params):
+    return make_audio_cache_key(ref, "参照", text, "Japanese", "model", "torch.float32", **params)
+
+
+def _wav(n: int = 2400) -> np.ndarray:
+    return (0.5 * np.sin(np.arange(n) * 0.05)).astype(np.float32)
+
+
+def test_normalize_text():
+    """NFKC 正規化と空白の整理"""
+    assert normalize_text("  ＯＫ　です  ") == "OK です"
+    assert normalize_text("了解\n\nです") == "了解 です"
+
+
+def test_key_depends_on_inputs(ref, tmp_path: Path):
+    """テキストの表記揺れは同じキー、話者・言語・パラメータが違えば別のキー"""
+    base = _key(ref, seed=0)
+    assert _key(ref, " おはよう ", seed=0).digest == base.digest
+    assert _key(ref, "こんばんは", seed=0).digest != base.digest
+    assert _key(ref, seed=1).digest != base.digest
+    assert make_audio_cache_key(ref, "参照", "おはよう", "English", "model", "torch.float32", seed=0).digest != base.digest
+
+    other = tmp_path / "other.wav"
+    other.write_bytes(b"other")
+    assert make_audio_cache_key(str(other), "参照", "おはよう", "Japanese", "model", "torch.float32", seed=0).digest != base.digest
+
+
+def test_memory_lru(ref):
+    """件数上限を超えると古いものから破棄する"""
+    cache = AudioCache(max_entries=2)
+    keys = [_key(ref, t) for t in ("一", "二", "三")]
+    for key in keys:
+        cache.put(key, _wav(), 24000)
+    assert len(cache) == 2
+    assert cache.get(keys[0]) is None
+    wav, sr = cache.get(keys[2])
+    assert sr == 24000
+    assert not wav.flags.writeable
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["bytes_saved"] == wav.nbytes
+
+
+def test_disk_tier_survives_restart(ref, tmp_path: Path):
+    """ディスク層は FLAC で保存され、別インスタンスから読める"""
+    disk = tmp_path / "cache"
+    key = _key(ref)
+    AudioCache(disk_dir=disk).put(key, _wav(), 24000)
+    assert len(list(disk.glob("*/*.flac"))) == 1
+
+    cache = AudioCache(disk_dir=disk)
+    assert cache.stats()["disk_entries"] == 1
+    wav, sr = cache.get(key)
+    assert sr == 24000
+    assert np.allclose(wav, _wav(), atol=1e-4)
+    assert cache.stats()["disk_hits"] == 1
+    # 2 回目はメモリ層から返す
+    cache.get(key)
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_disk_eviction_by_size(ref, tmp_path: Path):
+    """ディスク層の合計サイズが上限を超えると古いものから削除する"""
+    disk = tmp_path / "cache"
+    probe = AudioCache(max_entries=0, disk_dir=disk)
+    probe.put(_key(ref, "計測"), _wav(24000), 24000)
+    size = probe.stats()["disk_bytes"]
+
+    cache = AudioCache(max_entries=0, disk_dir=tmp_path / "limited", disk_max_bytes=int(size * 2.5))
+    keys = [_key(ref, t) for t in ("一", "二", "三")]
+    for key in keys:
+        cache.put(key, _wav(24000), 24000)
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2
+    assert stats["disk_bytes"] <= size * 2.5
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_missing_disk_file_is_a_miss(ref, tmp_path: Path):
+    """ディスク層のファイルが消えていればミスとして扱う"""
+    disk = tmp_path / "cache"
+    cache = AudioCache(max_entries=0, disk_dir=disk)
+    key = _key(ref)
+    cache.put(key, _wav(), 24000)
+    for path in disk.glob("*/*.flac"):
+        path.unlink()
+    assert cache.get(key) is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_manager_uses_cache(monkeypatch: pytest.MonkeyPatch, ref, tmp_path: Path):
+    """VoiceCloneManager は 2 回目の同じテキストでモデルを呼ばず、シードを固定して生成する"""
+    use_fake_model(monkeypatch)
+    seeds = []
+    monkeypatch.setattr("src.tts.qwen_wrapper.torch.manual_seed", lambda s: seeds.append(s))
+    cache = AudioCache(disk_dir=tmp_path / "cache")
+    with VoiceCloneManager(ref, "参照", device="cpu", registry=ModelRegistry(), audio_cache=cache) as manager:
+        first, sr = manager.synthesize("おはよう")
+        second, _ = manager.synthesize(" おはよう ")
+        manager.synthesize("了解")
+        calls = manager.wrapper._model.generate_calls
+
+    assert [c["text"] for c in calls] == [["おはよう"], ["了解"]]
+    assert np.array_equal(first, second)
+    assert seeds == [0, 0]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 2
+    assert stats["bytes_saved"] == first.nbytes
+
+
+def test_validation():
+    """負の上限はエラー"""
+    with pytest.raises(ValueError):
+        AudioCache(max_entries=-1)
+    with pytest.raises(ValueError):
+        AudioCache(disk_max_bytes=-1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
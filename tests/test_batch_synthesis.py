@@ -0,0 +1,117 @@
+# coding=utf-8
+"""
+バッチ合成（generate_voice_batch / synthesize_many）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_batch_synthesis.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer, VoiceCloneManager
+from src.tts.qwen_wrapper import Qwen3TTSWrapper, bucket_by_length
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def refs(tmp_path: Path) -> tuple[str, str]:
+    a = tmp_path / "a.wav"
+    b = tmp_path / "b.wav"
+    a.write_bytes(b"a")
+    b.write_bytes(b"b")
+    return str(a), str(b)
+
+
+def test_bucket_by_length():
+    """長さ順に並べて max_batch_size 件ずつに分ける"""
+    texts = ["aaaa", "a", "aaa", "aa", "aaaaa"]
+    assert bucket_by_length(texts, 2) == [[1, 3], [2, 0], [4]]
+    assert bucket_by_length(texts, 10) == [[1, 3, 2, 0, 4]]
+
+
+def test_batch_preserves_order(wrapper, refs):
+    """結果は入力順で、各テキストの長さに応じた音声が返る"""
+    texts = ["長い長い長いテキスト", "短い", "中くらいの文"]
+    results = wrapper.generate_voice_batch(texts, [(refs[0], "参照")], "Japanese")
+    assert len(results) == 3
+    for text, (wav, sr) in zip(texts, results):
+        assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+        assert len(wav) == len(text) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+
+
+def test_batch_single_generation_call(wrapper, refs):
+    """max_batch_size 以内なら 1 回の generate_voice_clone でまとめて生成する"""
+    wrapper.generate_voice_batch(["a", "bb", "ccc", "dddd"], [(refs[0], "参照")], "Japanese")
+    assert len(wrapper._model.generate_calls) == 1
+    assert len(wrapper._model.generate_calls[0]["text"]) == 4
+
+    wrapper.generate_voice_batch(["a", "bb", "ccc", "dddd"], [(refs[0], "参照")], "Japanese", max_batch_size=3)
+    assert [len(c["text"]) for c in wrapper._model.generate_calls[1:]] == [3, 1]
+
+
+def test_batch_mixed_speakers(wrapper, refs):
+    """話者混在のバッチでも各テキストに対応する話者のプロンプトが渡る"""
+    texts = ["一", "二二", "三三三"]
+    profiles = [(refs[0], "参照A"), (refs[1], "参照B"), (refs[0], "参照A")]
+    wrapper.generate_voice_batch(texts, profiles, ["Japanese", "English", "Japanese"])
+
+    call = wrapper._model.generate_calls[0]
+    assert call["text"] == texts
+    assert call["language"] == ["Japanese", "English", "Japanese"]
+    assert [item.ref_text for item in call["voice_clone_prompt"]] == ["参照A", "参照B", "参照A"]
+    assert len(wrapper._model.prompt_calls) == 2
+
+
+def test_batch_validation(wrapper, refs):
+    """件数不一致・空テキスト・未対応言語 → ValueError"""
+    with pytest.raises(ValueError, match="profiles"):
+        wrapper.generate_voice_batch(["a", "b", "c"], [(refs[0], "参照")] * 2)
+    with pytest.raises(ValueError, match="languages"):
+        wrapper.generate_voice_batch(["a", "b"], [(refs[0], "参照")], ["Japanese"])
+    with pytest.raises(ValueError, match="text"):
+        wrapper.generate_voice_batch(["a", " "], [(refs[0], "参照")])
+    with pytest.raises(ValueError, match="language"):
+        wrapper.generate_voice_batch(["a"], [(refs[0], "参照")], "French")
+
+
+def test_voice_clone_manager_synthesize_many(monkeypatch: pytest.MonkeyPatch, refs):
+    """VoiceCloneManager.synthesize_many"""
+    use_fake_model(monkeypatch)
+    with VoiceCloneManager(refs[0], "参照", device="cpu", registry=ModelRegistry()) as manager:
+        results = manager.synthesize_many(["おはよう", "了解"], language="ja")
+        assert [len(w) for w, _ in results] == [4 * FakeQwen3TTSModel.SAMPLES_PER_CHAR, 2 * FakeQwen3TTSModel.SAMPLES_PER_CHAR]
+        assert len(manager.wrapper._model.generate_calls) == 1
+
+
+def test_multi_speaker_synthesize_many(monkeypatch: pytest.MonkeyPatch, refs):
+    """MultiSpeakerSynthesizer.synthesize_many は話者の既定言語を使う"""
+    use_fake_model(monkeypatch)
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        synth.register_speaker("alice", refs[0], "こんにちは", "ja")
+        synth.register_speaker("bob", refs[1], "hello", "en")
+        results = synth.synthesize_many(["やあ", "hi", "どうも"], ["alice", "bob", "alice"], [None, None, "en"])
+        assert len(results) == 3
+        call = synth.wrapper._model.generate_calls[0]
+        # 長さ順: "hi"(2) / "やあ"(2) / "どうも"(3)
+        assert sorted(call["language"]) == ["English", "English", "Japanese"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,79 @@
+# coding=utf-8
+"""
+性能計測（src.tools.benchmark の run_suite / compare_results）と偽モデルの単体テスト
+
+実行方法:
+    python -m pytest tests/test_benchmark.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tools.benchmark import METRIC_DIRECTIONS, compare_results, run_suite
+from src.tts.fake_model import FakeQwen3TTSModel, make_fake_loader
+from tests.fakes import use_fake_model
+
+
+def test_fake_model_latency_and_length():
+    """偽モデルの生成時間はバッチ内の最長テキストで決まり、出力長は設定に従う"""
+    model = FakeQwen3TTSModel(latency_per_char_sec=0.01, samples_per_char=10)
+    start = time.perf_counter()
+    wavs, sr = model.generate_voice_clone(["あ" * 5, "い" * 10], language=["Japanese"] * 2)
+    elapsed = time.perf_counter() - start
+    assert [len(w) for w in wavs] == [50, 100]
+    assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+    assert 0.1 <= elapsed < 0.2
+
+
+def test_run_suite_with_fake_backend(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """偽モデルで全指標を計測できる"""
+    use_fake_model(monkeypatch)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    metrics = run_suite(
+        ref_audio_path=str(ref),
+        ref_text="参照",
+        language="Japanese",
+        model_name="fake",
+        device="cpu",
+        dtype=torch.float32,
+        texts=["おはよう", "了解です", "こんばんは"],
+        batch_size=3,
+        model_loader=make_fake_loader(load_latency_sec=0.05, prompt_latency_sec=0.02, generate_latency_sec=0.01),
+    )
+    assert metrics["load_sec"] >= 0.05
+    assert metrics["ref_load_sec"] >= 0.02
+    assert 0 < metrics["ttfa_sec"]
+    assert 0 < metrics["rtf"] < 1
+    for name in ("wrapper_items_per_sec", "batch_items_per_sec", "manager_items_per_sec", "peak_rss_mb"):
+        assert metrics[name] > 0
+    assert metrics["peak_vram_mb"] is None
+    # バッチ生成は 1 回の呼び出しで済むため逐次より速い
+    assert metrics["batch_items_per_sec"] > metrics["wrapper_items_per_sec"]
+
+
+def test_compare_results():
+    """許容範囲を超えて悪化した指標だけを報告する"""
+    baseline = {name: 1.0 for name in METRIC_DIRECTIONS}
+    current = dict(baseline, rtf=1.05, load_sec=1.5, batch_items_per_sec=0.5, manager_items_per_sec=2.0)
+    regressions = compare_results(current, baseline, tolerance=0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("load_sec")
+    assert regressions[1].startswith("batch_items_per_sec")
+    # 値がない・ベースラインが 0 の指標は比較しない
+    assert compare_results({"rtf": 5.0, "peak_vram_mb": None}, {"rtf": 0.0, "peak_vram_mb": 1.0}) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,129 @@
+# coding=utf-8
+"""
+test_synthesis のバルクモード（load_bulk_items / run_bulk）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_bulk_synthesis.py -v
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import soundfile as sf
+
+from src.tools.test_synthesis import BulkItem, load_bulk_items, run_bulk
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+def test_load_text_file(tmp_path: Path):
+    """テキストファイルは 1 行 1 テキスト、出力先は連番"""
+    path = tmp_path / "lines.txt"
+    path.write_text("おはよう\n\n了解\n", encoding="utf-8")
+    items = load_bulk_items(path, "gohan", "ja", tmp_path / "out")
+    assert items == [
+        BulkItem("gohan", "おはよう", "ja", tmp_path / "out" / "0001.wav"),
+        BulkItem("gohan", "了解", "ja", tmp_path / "out" / "0002.wav"),
+    ]
+
+
+def test_load_jsonl(tmp_path: Path):
+    """JSONL は行ごとに話者・言語・出力先を上書きできる"""
+    path = tmp_path / "items.jsonl"
+    rows = [
+        {"speaker": "alice", "text": "Hello", "language": "en", "output": str(tmp_path / "hello.wav")},
+        {"text": "こんにちは"},
+    ]
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in rows), encoding="utf-8")
+    items = load_bulk_items(path, "gohan", "ja", tmp_path / "out")
+    assert items[0] == BulkItem("alice", "Hello", "en", tmp_path / "hello.wav")
+    assert items[1] == BulkItem("gohan", "こんにちは", "ja", tmp_path / "out" / "0002.wav")
+
+
+@pytest.mark.parametrize(
+    "content, speaker",
+    [
+        ("{broken\n", "gohan"),
+        ('{"text": ""}\n', "gohan"),
+        ('{"text": "テスト", "language": "fr"}\n', "gohan"),
+        ('{"text": "テスト"}\n', None),
+    ],
+)
+def test_load_jsonl_errors(tmp_path: Path, content: str, speaker):
+    """不正な行は行番号付きの ValueError"""
+    path = tmp_path / "items.jsonl"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError, match=":1:"):
+        load_bulk_items(path, speaker, "ja", tmp_path)
+
+
+def test_load_missing_file(tmp_path: Path):
+    """入力ファイルがなければ FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        load_bulk_items(tmp_path / "none.txt", "gohan", "ja", tmp_path)
+
+
+def test_run_bulk(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """モデルは 1 回だけロードし、プロンプトは話者ごとに 1 回、全件をファイルに書き出す"""
+    loads = []
+    use_fake_model(monkeypatch)
+    original = FakeQwen3TTSModel.from_pretrained.__func__
+    monkeypatch.setattr(
+        FakeQwen3TTSModel,
+        "from_pretrained",
+        classmethod(lambda cls, *a, **k: loads.append(a) or original(cls, *a, **k)),
+    )
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.wav").write_bytes(name.encode())
+
+    items = [
+        BulkItem(speaker, text, "ja", tmp_path / "out" / f"{i}.wav")
+        for i, (speaker, text) in enumerate([("a", "おはよう"), ("b", "草"), ("a", "了解"), ("b", "ただいま")])
+    ]
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        synth.register_speaker("a", str(tmp_path / "a.wav"), "参照", "ja")
+        synth.register_speaker("b", str(tmp_path / "b.wav"), "参照", "ja")
+        result = run_bulk(items, synth)
+        prompt_calls = len(synth.wrapper._model.prompt_calls)
+
+    assert len(loads) == 1
+    assert prompt_calls == 2
+    assert result["completed"] == 4 and result["failed"] == 0
+    for item in items:
+        data, sr = sf.read(str(item.output))
+        assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+        assert len(data) == len(item.text) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    assert result["audio_sec"] == pytest.approx(
+        sum(len(i.text) for i in items) * FakeQwen3TTSModel.SAMPLES_PER_CHAR / FakeQwen3TTSModel.SAMPLE_RATE
+    )
+    assert result["items_per_sec"] > 0
+    assert result["rtf"] == pytest.approx(result["wall_sec"] / result["audio_sec"])
+
+
+def test_run_bulk_continues_after_failure(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """未登録の話者の行は失敗として数え、残りは合成する"""
+    use_fake_model(monkeypatch)
+    (tmp_path / "a.wav").write_bytes(b"a")
+    items = [
+        BulkItem("unknown", "テスト", "ja", tmp_path / "0.wav"),
+        BulkItem("a", "テスト", "ja", tmp_path / "1.wav"),
+    ]
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        synth.register_speaker("a", str(tmp_path / "a.wav"), "参照", "ja")
+        result = run_bulk(items, synth)
+    assert result["completed"] == 1 and result["failed"] == 1
+    assert not (tmp_path / "0.wav").exists()
+    assert (tmp_path / "1.wav").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+# coding=utf-8
+"""
+CPU 推論モード（src.tts.cpu_mode の動的 int8 量子化・スレッド設定）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_cpu_mode.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import torch
+from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+from src.tools.benchmark import run_cpu_benchmark
+from src.tts import cpu_mode
+from src.tts.fake_model import make_fake_loader
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from tests.fakes import use_fake_model
+
+
+def _stub_model() -> SimpleNamespace:
+    """talker（Linear 2 層と出力ヘッド）を持つ Qwen3TTSModel 相当。"""
+    torch.manual_seed(0)
+    talker = torch.nn.Module()
+    talker.layers = torch.nn.Sequential(torch.nn.Linear(16, 16), torch.nn.ReLU(), torch.nn.Linear(16, 8, bias=False))
+    talker.codec_head = torch.nn.Linear(8, 4)
+    encoder = torch.nn.Linear(16, 16)
+    return SimpleNamespace(model=SimpleNamespace(talker=talker, speaker_encoder=encoder))
+
+
+def test_quantize_talker_linears():
+    """talker の Linear だけを量子化し、出力ヘッドと他のモジュールは float32 のまま"""
+    model = _stub_model()
+    x = torch.randn(4, 16)
+    expected = model.model.talker.layers(x)
+    assert cpu_mode.quantize_model(model) == 2
+    talker = model.model.talker
+    assert isinstance(talker.layers[0], DynamicLinear)
+    assert type(talker.codec_head) is torch.nn.Linear
+    assert type(model.model.speaker_encoder) is torch.nn.Linear
+    assert torch.allclose(talker.layers(x), expected, atol=0.1)
+
+
+def test_save_and_reload_quantized(tmp_path: Path):
+    """保存した量子化済み重みを量子化の計算なしで読み込み、同じ出力になる"""
+    first = _stub_model()
+    assert cpu_mode.apply_int8(first, "org/model", tmp_path) == {"linears": 2, "loaded": False}
+    assert (tmp_path / "org--model" / "talker_int8.pt").exists()
+
+    second = _stub_model()
+    assert cpu_mode.apply_int8(second, "org/model", tmp_path) == {"linears": 2, "loaded": True}
+    assert isinstance(second.model.talker.layers[2], DynamicLinear)
+    x = torch.randn(3, 16)
+    assert torch.equal(first.model.talker.layers(x), second.model.talker.layers(x))
+
+    # フィンガープリントが違えば読み込まない（モデルは変更しない）
+    third = _stub_model()
+    fp = dict(cpu_mode.quantized_fingerprint("org/model"), torch_version="0.0")
+    assert cpu_mode.load_quantized(third, tmp_path / "org--model", fp) == 0
+    assert type(third.model.talker.layers[0]) is torch.nn.Linear
+
+
+def test_checkpoint_update_invalidates_quantized(tmp_path: Path):
+    """同じモデル ID でもチェックポイント（リビジョン・重みファイル）が変われば保存済みの重みを使わない"""
+    checkpoint = tmp_path / "checkpoint"
+    checkpoint.mkdir()
+    (checkpoint / "config.json").write_text("{}", encoding="utf-8")
+    (checkpoint / "model.safetensors").write_bytes(b"v1")
+    quantized = tmp_path / "quantized"
+    assert cpu_mode.apply_int8(_stub_model(), str(checkpoint), quantized)["loaded"] is False
+    assert cpu_mode.apply_int8(_stub_model(), str(checkpoint), quantized)["loaded"] is True
+    (checkpoint / "model.safetensors").write_bytes(b"v2-updated")
+    assert cpu_mode.apply_int8(_stub_model(), str(checkpoint), quantized)["loaded"] is False
+
+    # Hub からロードしたモデルは設定のリビジョンで判定する
+    def from_revision(revision: str) -> SimpleNamespace:
+        model = _stub_model()
+        model.model.config = SimpleNamespace(_commit_hash=revision)
+        return model
+
+    assert cpu_mode.checkpoint_id("org/model", from_revision("abc")) == "revision:abc"
+    assert cpu_mode.apply_int8(from_revision("abc"), "org/model", quantized)["loaded"] is False
+    assert cpu_mode.apply_int8(from_revision("abc"), "org/model", quantized)["loaded"] is True
+    assert cpu_mode.apply_int8(from_revision("def"), "org/model", quantized)["loaded"] is False
+
+
+def test_configure_cpu_threads():
+    """intra-op スレッド数を設定する"""
+    previous = torch.get_num_threads()
+    try:
+        assert cpu_mode.configure_cpu_threads(2)["intra_op"] == 2
+        assert torch.get_num_threads() == 2
+        with pytest.raises(ValueError):
+            cpu_mode.configure_cpu_threads(0)
+    finally:
+        torch.set_num_threads(previous)
+
+
+def test_quantize_requires_cpu_float32(monkeypatch: pytest.MonkeyPatch):
+    """int8 量子化は CPU・float32 のみ"""
+    use_fake_model(monkeypatch)
+    with pytest.raises(ValueError, match="quantize_int8"):
+        Qwen3TTSWrapper(device="cuda:0", dtype=torch.float32, quantize_int8=True)
+    with pytest.raises(ValueError, match="quantize_int8"):
+        Qwen3TTSWrapper(device="cpu", dtype=torch.bfloat16, quantize_int8=True)
+
+
+def test_output_similarity():
+    """同じ声質は 1.0 に近く、異なる音は低い"""
+    sr = 24000
+    t = np.arange(sr, dtype=np.float32) / sr
+    voice = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 440 * t)
+    assert cpu_mode.output_similarity(voice, voice, sr) == pytest.approx(1.0)
+    shifted = np.roll(voice, 1234)
+    assert cpu_mode.output_similarity(voice, shifted, sr) > 0.99
+    noise = np.random.default_rng(0).normal(0, 0.1, sr).astype(np.float32)
+    assert cpu_mode.output_similarity(voice, noise, sr) < 0.5
+
+
+def test_cpu_benchmark_with_fake_backend(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """float32 と int8 の両方を計測し、出力の類似度を返す"""
+    use_fake_model(monkeypatch)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    previous = torch.get_num_threads()
+    try:
+        result = run_cpu_benchmark(
+            ref_audio_path=str(ref),
+            ref_text="参照",
+            language="Japanese",
+            model_name="fake",
+            texts=["おはよう", "こんばんは"],
+            threads=1,
+            model_loader=make_fake_loader(latency_per_char_sec=0.001),
+        )
+    finally:
+        torch.set_num_threads(previous)
+    for name in ("float32", "int8"):
+        assert result[name]["rtf"] > 0
+        assert result[name]["load_sec"] >= 0
+    # 偽モデルには talker がないため量子化される層はない
+    assert result["int8"]["quantized_linears"] == 0
+    assert len(result["similarity"]) == 2
+    assert result["mean_similarity"] == pytest.approx(1.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+# coding=utf-8
+"""
+Discord 用 PCM フレーム化（src.audio.discord_pcm）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_discord_pcm.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+
+from src.audio.discord_pcm import (
+    FRAME_BYTES,
+    FRAME_SAMPLES,
+    DiscordPCMEncoder,
+    get_resampler,
+    to_discord_frames,
+)
+from src.tools.benchmark import run_pcm_benchmark
+
+
+def _sine(freq: float, sr: int, seconds: float = 1.0) -> np.ndarray:
+    t = np.arange(int(sr * seconds)) / sr
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("source_rate", [24000, 16000, 44100, 96000])
+def test_resampler_preserves_tone(source_rate: int):
+    """リサンプル後も同じ周波数・振幅・位相の正弦波になる"""
+    y = get_resampler(source_rate).resample(_sine(440, source_rate))
+    assert len(y) == 48000
+    expected = _sine(440, 48000)
+    assert np.abs(y[1000:-1000] - expected[1000:-1000]).max() < 1e-3
+
+
+def test_resampler_is_cached():
+    """同じレートの組ではフィルタを作り直さない"""
+    assert get_resampler(24000) is get_resampler(24000)
+    with pytest.raises(ValueError):
+        get_resampler(0)
+
+
+def test_frames_are_interleaved_stereo_s16le():
+    """3840 バイトのフレームに分け、左右同じ値・末尾は無音で埋める"""
+    wav = _sine(300, 24000, seconds=0.105)
+    frames = list(to_discord_frames(wav, 24000))
+    assert len(frames) == 6  # 105 ms → 20 ms × 6（最後は 15 ms 分の無音）
+    assert all(len(f) == FRAME_BYTES for f in frames)
+    pcm = np.frombuffer(b"".join(frames), dtype="<i2").reshape(-1, 2)
+    assert np.array_equal(pcm[:, 0], pcm[:, 1])
+    assert np.abs(pcm[:5040]).max() > 16000
+    assert not pcm[5040:].any()
+
+
+def test_clipping_and_multichannel_input():
+    """範囲外はクリップし、2 次元の入力はモノラルにしてから変換する"""
+    loud = np.full(2400, 3.0, dtype=np.float32)
+    pcm = np.frombuffer(DiscordPCMEncoder(24000).encode(loud), dtype="<i2")
+    assert pcm.max() == 32767
+    stereo = np.stack([loud, -loud], axis=-1)
+    pcm = np.frombuffer(DiscordPCMEncoder(24000).encode(stereo), dtype="<i2")
+    assert np.abs(pcm).max() == 0
+
+
+def test_encoder_reuses_buffer_and_detects_overwrite():
+    """作業用バッファは使い回し、フレームの読み出し中に上書きされたら RuntimeError"""
+    encoder = DiscordPCMEncoder(24000)
+    list(encoder.frames(_sine(200, 24000)))
+    buffer = encoder._pcm_buf
+    list(encoder.frames(_sine(200, 24000, seconds=0.5)))
+    assert encoder._pcm_buf is buffer
+
+    frames = encoder.frames(_sine(200, 24000))
+    next(frames)
+    encoder.encode(_sine(300, 24000))
+    with pytest.raises(RuntimeError):
+        next(frames)
+
+
+def test_stream_frames_carries_partial_frames():
+    """チャンクの端数は次のチャンクとつなげ、全体を 1 本で変換したのと同じ長さになる"""
+    chunks = [(_sine(200, 24000, seconds=s), 24000) for s in (0.013, 0.05, 0.007)]
+    frames = list(DiscordPCMEncoder(24000).stream_frames(chunks))
+    total = sum(len(c) for c, _ in chunks) * 2
+    assert len(frames) == -(-total // FRAME_SAMPLES)
+    assert all(len(f) == FRAME_BYTES for f in frames)
+    with pytest.raises(ValueError):
+        list(DiscordPCMEncoder(24000).stream_frames([(np.zeros(10, dtype=np.float32), 16000)]))
+
+
+def test_pcm_benchmark():
+    """従来の経路と同じ出力で、一時メモリが少ない"""
+    result = run_pcm_benchmark(seconds=2.0, repeats=2)
+    assert result["frames"] == 100
+    assert result["max_abs_diff"] <= 1
+    assert result["encoder_peak_mb"] < result["baseline_peak_mb"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,269 @@
+# coding=utf-8
+"""
+優先度・公平性を持つキュー（src.tts.fair_queue）と、BatchScheduler のセグメント単位のプリエンプションの単体テスト
+
+実行方法:
+    python -m pytest tests/test_fair_queue.py -v
+"""
+
+from __future__ import annotations
+
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import torch
+
+from src.tts.fair_queue import FairQueue, classify_priority
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.scheduler import BatchScheduler
+from src.tts.text_segmenter import segment_text
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+class _Clock:
+    """仮想時刻（シミュレーション・飢餓判定のテスト用）。"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _drain(q: FairQueue) -> list:
+    items = []
+    while q.qsize():
+        items.append(q.get(timeout=0))
+    return items
+
+
+def test_round_robin_across_users_and_guilds():
+    """同じ優先度ではギルド → ユーザーの順に持ち分ずつ交互に取り出す"""
+    q = FairQueue(maxsize=100, quantum=10)
+    for i in range(4):
+        q.put(f"a1-{i}", key=("A", "u1"), cost=10)
+    for i in range(2):
+        q.put(f"a2-{i}", key=("A", "u2"), cost=10)
+    for i in range(2):
+        q.put(f"b1-{i}", key=("B", "u3"), cost=10)
+    # ギルド A と B が交互に、A の中では u1 と u2 が交互に順番を得る
+    assert _drain(q) == ["a1-0", "b1-0", "a2-0", "b1-1", "a1-1", "a2-1", "a1-2", "a1-3"]
+
+
+def test_deficit_accounts_for_cost():
+    """重い要素を取り出した利用者は、超えた分だけ次の巡で順番を待つ"""
+    q = FairQueue(maxsize=100, quantum=10, levels=1)
+    q.put("heavy", key=("u1",), cost=30)
+    q.put("heavy-2", key=("u1",), cost=30)
+    for i in range(4):
+        q.put(f"light-{i}", key=("u2",), cost=10)
+    assert _drain(q) == ["heavy", "light-0", "light-1", "light-2", "heavy-2", "light-3"]
+
+
+def test_priority_and_starvation():
+    """高い優先度を先に取り出し、starvation_sec 以上待った低い優先度の要素は先に取り出す"""
+    clock = _Clock()
+    q = FairQueue(maxsize=100, starvation_sec=2.0, clock=clock)
+    q.put("bulk", priority="bulk")
+    q.put("interactive", priority="interactive")
+    q.put("system", priority="system")
+    assert _drain(q) == ["system", "interactive", "bulk"]
+
+    q.put("bulk", priority="bulk")
+    clock.now = 1.0
+    q.put("interactive-1")
+    q.put("interactive-2")
+    assert q.get(timeout=0) == "interactive-1"
+    q.put("bulk-2", priority="bulk")
+    clock.now = 2.5
+    assert q.get(timeout=0) == "bulk"
+    # 直前に bulk を取り出したため、次の starvation_sec までは高い優先度が先
+    assert q.get(timeout=0) == "interactive-2"
+    q.put("interactive-3")
+    clock.now = 3.0
+    assert q.get(timeout=0) == "interactive-3"
+    clock.now = 4.5
+    q.put("interactive-4")
+    assert q.get(timeout=0) == "bulk-2"
+
+
+def test_maxsize_close_and_timeout():
+    """maxsize を超える put は queue.Full（force は入る）、空の get は timeout で queue.Empty、close 後は None"""
+    q = FairQueue(maxsize=1)
+    q.put("a")
+    with pytest.raises(queue.Full):
+        q.put("b")
+    q.put("b", force=True)
+    assert q.qsize() == 2
+    with pytest.raises(ValueError):
+        q.put("c", priority="urgent", force=True)
+    with pytest.raises(ValueError):
+        q.put("c", key=("g", "u", "x"), force=True)
+    assert _drain(q) == ["a", "b"]
+
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(q.get()))
+    waiter.start()
+    q.close()
+    waiter.join(timeout=5)
+    assert got == [None]
+    with pytest.raises(ValueError):
+        FairQueue(maxsize=0)
+
+
+def test_classify_priority():
+    """短い発言は interactive、長文は bulk"""
+    assert classify_priority("おはよう") == "interactive"
+    assert classify_priority("あ" * 41) == "bulk"
+    assert classify_priority("あ" * 41, short_chars=100) == "interactive"
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+LONG_TEXT = "今日は朝から雨が降っていたので、駅まで歩くのをやめてバスに乗りました。" * 6
+
+
+def test_long_text_is_segmented_and_joined(wrapper, ref):
+    """segment_chars を超える長文はセグメントごとに生成し、結合した 1 つの音声を返す"""
+    with BatchScheduler(wrapper, max_wait_ms=0, max_batch_size=1, segment_chars=40) as scheduler:
+        result = scheduler.submit(LONG_TEXT, ref, "参照").result(timeout=10)
+        stats = scheduler.stats()
+    segments = segment_text(LONG_TEXT, max_chars=40)
+    assert result.segments == len(segments) > 1
+    assert [c["text"] for c in wrapper._model.generate_calls] == [[s] for s in segments]
+    assert len(result.wav) > 0
+    assert stats["segmented"] == 1 and stats["completed"] == 1
+
+
+def test_short_request_preempts_long_job(wrapper, ref):
+    """長文の生成中に届いた他の利用者の短い発言は、長文の残りのセグメントより先に生成される"""
+    wrapper._model.latency_per_char_sec = 0.002
+    finished: list[str] = []
+    with BatchScheduler(wrapper, max_wait_ms=0, max_batch_size=1, segment_chars=40) as scheduler:
+        long_future = scheduler.submit(LONG_TEXT, ref, "参照", user="alice")
+        long_future.add_done_callback(lambda f: finished.append("long"))
+        time.sleep(0.05)
+        short_future = scheduler.submit("おはよう", ref, "参照", user="bob")
+        short_future.add_done_callback(lambda f: finished.append("short"))
+        short = short_future.result(timeout=10)
+        long_future.result(timeout=10)
+        with pytest.raises(ValueError):
+            scheduler.submit("おはよう", ref, "参照", priority="urgent")
+
+    assert finished == ["short", "long"]
+    texts = [c["text"][0] for c in wrapper._model.generate_calls]
+    assert 0 < texts.index("おはよう") < len(texts) - 1
+    assert len(short.wav) == len("おはよう") * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+
+
+def test_cancelled_job_skips_remaining_segments(wrapper, ref):
+    """キャンセルした長文の残りのセグメントは生成しない"""
+    wrapper._model.latency_per_char_sec = 0.002
+    with BatchScheduler(wrapper, max_wait_ms=0, max_batch_size=1, segment_chars=40) as scheduler:
+        blocker = scheduler.submit("あ" * 30, ref, "参照")
+        long_future = scheduler.submit(LONG_TEXT, ref, "参照")
+        assert long_future.cancel()
+        blocker.result(timeout=10)
+    assert [c["text"][0] for c in wrapper._model.generate_calls] == ["あ" * 30]
+
+
+def _simulate(fair: bool, seed: int = 0) -> tuple[list[float], list[float]]:
+    """
+    1 台のモデルを共有する混在負荷の離散事象シミュレーション。
+
+    3 人が 400 文字前後の長文を、8 人が短い発言を投稿する（生成時間は文字数に比例）。
+    fair=False は従来の FIFO（長文を 1 回で生成）、fair=True は FairQueue とセグメント単位の入れ直し。
+
+    Returns:
+        (短い発言の待ち + 生成の秒数, 長文の待ち + 生成の秒数)
+    """
+    rng = random.Random(seed)
+    arrivals = []
+    for user in range(3):
+        t = rng.uniform(0, 5)
+        while t < 300:
+            arrivals.append((t, f"long{user}", 400 + rng.randint(-40, 40)))
+            t += rng.expovariate(1 / 25)
+    t = 0.0
+    while t < 300:
+        t += rng.expovariate(1.5)
+        arrivals.append((t, f"short{rng.randrange(8)}", rng.randint(5, 30)))
+    arrivals.sort()
+
+    clock = _Clock()
+    q = FairQueue(maxsize=10_000, clock=clock) if fair else None
+    fifo: deque = deque()
+    short_latency: list[float] = []
+    long_latency: list[float] = []
+    pending = deque(arrivals)
+
+    def put(item: dict) -> None:
+        if fair:
+            job = item["job"]
+            q.put(item, priority=job["priority"], key=("", item["user"]), cost=item["chars"])
+        else:
+            fifo.append(item)
+
+    while pending or (q.qsize() if fair else fifo):
+        while pending and pending[0][0] <= clock.now:
+            arrived_at, user, chars = pending.popleft()
+            job = {"arrived_at": arrived_at, "remaining": chars, "priority": classify_priority("x" * chars)}
+            item = {"job": job, "user": user, "chars": min(chars, 80) if fair else chars}
+            put(item)
+        if not (q.qsize() if fair else fifo):
+            clock.now = pending[0][0]
+            continue
+        item = q.get(timeout=0) if fair else fifo.popleft()
+        clock.now += 0.05 + 0.01 * item["chars"]
+        job = item["job"]
+        job["remaining"] -= item["chars"]
+        if job["remaining"] > 0:
+            put({"job": job, "user": item["user"], "chars": min(job["remaining"], 80)})
+            continue
+        latency = clock.now - job["arrived_at"]
+        (long_latency if item["user"].startswith("long") else short_latency).append(latency)
+    return short_latency, long_latency
+
+
+def test_simulation_fair_queue_lowers_short_p95():
+    """混在負荷で、短い発言の p95 レイテンシは FIFO より大きく下がり、長文も全件完了する"""
+    fifo_short, fifo_long = _simulate(fair=False)
+    fair_short, fair_long = _simulate(fair=True)
+    assert len(fifo_short) == len(fair_short) > 300
+    assert len(fair_long) == len(fifo_long) > 20
+
+    fifo_p95 = float(np.percentile(fifo_short, 95))
+    fair_p95 = float(np.percentile(fair_short, 95))
+    assert fair_p95 < fifo_p95 / 3
+    assert fair_p95 < 2.0
+    # 長文は短い発言に順番を譲る分だけ遅くなるが、飢餓にはならない
+    assert float(np.percentile(fair_long, 95)) < 3 * float(np.percentile(fifo_long, 95))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+# coding=utf-8
+"""
+生成トークン数の見積もり（count_morae / estimate_max_new_tokens）と
+暴走した生成の打ち切り（src.tts.generation_guard）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_generation_guard.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel, LogitsProcessor, LogitsProcessorList
+
+from src.tts.generation_guard import RunawayGuard, RunawayStoppingCriteria, find_runaway, install_runaway_guard
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.text_segmenter import count_morae, estimate_max_new_tokens
+from tests.fakes import use_fake_model
+
+SPEECH = list(range(100, 140))
+EOS = 1
+
+
+def test_count_morae():
+    """かなは 1、小書き文字は 0、漢字・数字は 2、ラテン文字は 0.5、句読点は間として 2"""
+    assert count_morae("きょう") == 2
+    assert count_morae("ちょっと") == 3
+    assert count_morae("ラーメン") == 4
+    assert count_morae("天気") == 4
+    assert count_morae("3台") == 4
+    assert count_morae("GPU") == 1.5
+    assert count_morae("はい。") == 4
+
+
+def test_budget_is_proportional_to_text():
+    """漢字の多い文はかなの文字数より長く見積もり、短い文は下限、極端に長い文は上限で丸める"""
+    kana = estimate_max_new_tokens("あ" * 60)
+    kanji = estimate_max_new_tokens("漢" * 60)
+    assert kanji > kana
+    assert estimate_max_new_tokens("草") == 48
+    assert estimate_max_new_tokens("漢" * 10000) == 2048
+    assert estimate_max_new_tokens("a" * 70, "English") == 120
+
+
+def test_budget_counts_japanese_script_regardless_of_language():
+    """language="English" でも、かな・漢字はモーラ数で見積もり、ラテン文字だけを文字数で数える"""
+    text = "今日は朝から雨が降っていたので、駅まで歩くのをやめてバスに乗りました。"
+    assert estimate_max_new_tokens(text, "English") == estimate_max_new_tokens(text, "Japanese")
+    assert estimate_max_new_tokens(text, "English") > 2 * int(len(text) / 14 * 12 * 2)
+    mixed = "明日のmeetingは10時からです。"
+    latin = sum(1 for ch in mixed if ch.isascii())
+    expected = count_morae("明日のは時からです。") / 7 + latin / 14
+    assert estimate_max_new_tokens(mixed, "English", min_tokens=0) == int(expected * 12 * 2 + 0.5)
+
+
+def test_find_runaway():
+    """末尾の同じトークンの連続・周期的な繰り返しを検出し、最初の 1 周期までを残す長さを返す"""
+    assert find_runaway(SPEECH + [5] * 30, 24, 36, 12) == len(SPEECH) + 1
+    assert find_runaway(SPEECH + [1, 2, 3, 4] * 10, 24, 36, 12) == len(SPEECH) + 4
+    assert find_runaway(SPEECH + [5] * 10, 24, 36, 12) is None
+    assert find_runaway(SPEECH + [1, 2, 3] * 8, 24, 36, 12) is None
+    assert find_runaway(SPEECH, 24, 36, 12) is None
+
+
+def test_detect_matches_find_runaway():
+    """生成中の判定（バッチのテンソル）は系列ごとの find_runaway と一致する"""
+    guard = RunawayGuard()
+    rows = [SPEECH + [5] * 29, SPEECH + [1, 2, 3, 4] * 7 + [1], SPEECH + list(range(200, 229)), SPEECH + [7, 8] * 14 + [7]]
+    done = guard.detect(torch.tensor(rows))
+    expected = [find_runaway(r, guard.silence_frames, guard.loop_frames, guard.max_period) is not None for r in rows]
+    assert done.tolist() == expected == [True, False, False, False]
+    with pytest.raises(ValueError):
+        RunawayGuard(silence_sec=3.0, loop_sec=2.0)
+
+
+def test_stopping_criteria_stops_rows_in_transformers_generate():
+    """transformers の generate で、無音になった系列だけが止まり、他の系列は続く"""
+
+    class Force(LogitsProcessor):
+        def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor) -> torch.Tensor:
+            scores = torch.full_like(scores, -1e9)
+            scores[0, 5] = 0
+            scores[1, 10 + input_ids.shape[1] % 150] = 0
+            return scores
+
+    torch.manual_seed(0)
+    config = GPT2Config(n_layer=1, n_head=2, n_embd=16, vocab_size=200, n_positions=128, eos_token_id=EOS, pad_token_id=EOS)
+    model = GPT2LMHeadModel(config)
+    out = model.generate(
+        torch.tensor([[3], [3]]),
+        attention_mask=torch.ones(2, 1, dtype=torch.long),
+        max_new_tokens=60,
+        do_sample=False,
+        logits_processor=LogitsProcessorList([Force()]),
+        stopping_criteria=[RunawayStoppingCriteria(RunawayGuard())],
+    )
+    assert out.shape[1] == 61
+    assert out[0].tolist().count(5) < 30
+    assert out[0, -1].item() == EOS
+    assert EOS not in out[1].tolist()
+
+
+def _talker_result(rows: list[list[int]]) -> SimpleNamespace:
+    """talker.generate の結果の形（ステップごとの (hidden, codes)、最初のステップの codes は None）。"""
+    steps = [(None, None)]
+    for t in range(len(rows[0])):
+        codes = torch.tensor([[row[t], 0, 0] for row in rows])
+        steps.append((None, codes))
+    return SimpleNamespace(hidden_states=tuple(steps))
+
+
+def test_install_guard_trims_runaway_tail():
+    """talker.generate を包み、止める条件を渡し、末尾のループの始まりに EOS を書き込む"""
+    rows = [SPEECH + [11, 12, 13, 14] * 10, SPEECH + [EOS] + [9] * 40, SPEECH + [6] * 30 + [EOS] * 10]
+    calls = []
+
+    def generate(**kwargs):
+        calls.append(kwargs)
+        return _talker_result(rows)
+
+    model = SimpleNamespace(model=SimpleNamespace(talker=SimpleNamespace(generate=generate)))
+    guard = RunawayGuard()
+    assert install_runaway_guard(model, guard)
+    result = model.model.talker.generate(inputs_embeds=None, eos_token_id=EOS, stopping_criteria=[])
+    assert any(isinstance(c, RunawayStoppingCriteria) for c in calls[0]["stopping_criteria"])
+
+    first = [[hid[-1][row, 0].item() for hid in result.hidden_states[1:]] for row in range(3)]
+    assert first[0].index(EOS) == len(SPEECH) + 4
+    assert first[1].index(EOS) == len(SPEECH)
+    assert first[2].index(EOS) == len(SPEECH) + 1
+    assert guard.stops == 2
+    assert not install_runaway_guard(SimpleNamespace(), guard)
+
+
+def test_wrapper_uses_adaptive_budget(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """generate_voice / generate_voice_batch はテキストの長さから見積もった max_new_tokens を使う"""
+    use_fake_model(monkeypatch)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    wrapper = Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    assert wrapper.runaway_stops == 0
+
+    long_text = "今日はいい天気ですね、少し散歩に出かけてきます。" * 3
+    wrapper.generate_voice("草", str(ref), "参照")
+    wrapper.generate_voice(long_text, str(ref), "参照")
+    wrapper.generate_voice(long_text, str(ref), "参照", max_new_tokens=100)
+    budgets = [c["max_new_tokens"] for c in wrapper._model.generate_calls]
+    assert budgets == [48, estimate_max_new_tokens(long_text), 100]
+
+    wrapper.generate_voice_batch(["はい", long_text], [(str(ref), "参照")], max_batch_size=1)
+    assert [c["max_new_tokens"] for c in wrapper._model.generate_calls[3:]] == [48, estimate_max_new_tokens(long_text)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
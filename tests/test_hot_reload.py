@@ -0,0 +1,202 @@
+# coding=utf-8
+"""
+メタデータのホットリロード（VoiceProfileManager.reload / watch、MultiSpeakerSynthesizer.reload_profiles）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_hot_reload.py -v
+"""
+
+from __future__ import annotations
+
+import csv
+import sys
+import threading
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+
+from src.profile import VoiceProfileManager
+from src.tts.audio_cache import AudioCache, make_audio_cache_key
+from src.tts.model_registry import ModelRegistry
+from src.tts.synthesizer import MultiSpeakerSynthesizer
+from tests.fakes import use_fake_model
+
+FIELDS = ["sample_id", "speaker_name", "audio_path", "corpus_text", "language", "description"]
+
+
+def _row(sample_id: str, speaker: str, text: str = "テキスト", audio: str | None = None) -> dict:
+    return {
+        "sample_id": sample_id,
+        "speaker_name": speaker,
+        "audio_path": audio or f"data/voice_samples/{sample_id}.wav",
+        "corpus_text": text,
+        "language": "ja",
+        "description": "",
+    }
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    samples = tmp_path / "data" / "voice_samples"
+    samples.mkdir(parents=True)
+    for sample_id in ("001", "002", "003", "004", "005"):
+        (samples / f"{sample_id}.wav").write_bytes(b"")
+    return tmp_path
+
+
+def _write(project: Path, rows: list[dict]) -> Path:
+    path = project / "data" / "metadata.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def test_reload_applies_only_changed_rows(project: Path):
+    """追加・変更・削除された行だけを反映し、変わらない行のレコードはそのまま使う"""
+    path = _write(project, [_row("001", "alice"), _row("002", "bob"), _row("003", "carol")])
+    manager = VoiceProfileManager(str(path))
+    bob = manager.get_profile("bob")
+    notified = []
+    manager.add_listener(notified.append)
+
+    _write(project, [_row("001", "alice", "新しいテキスト"), _row("002", "bob"), _row("004", "dave")])
+    changes = manager.reload()
+    assert changes.added == ("004",)
+    assert changes.removed == ("003",)
+    assert changes.modified == ("001",)
+    assert set(changes.speakers) == {"alice", "carol", "dave"}
+    assert notified == [changes]
+    assert manager.get_profile("bob") is bob
+    assert manager.get_profile("alice").corpus_text == "新しいテキスト"
+    assert manager.list_speakers() == ["alice", "bob", "dave"]
+    with pytest.raises(ValueError):
+        manager.get_profile("carol")
+
+    assert not manager.reload()
+    assert len(notified) == 1
+
+
+def test_reload_detects_reorder(project: Path):
+    """行の並べ替えで話者の最初のサンプルが変わった場合も、その話者を変更として扱う"""
+    path = _write(project, [_row("001", "alice"), _row("002", "alice"), _row("003", "bob")])
+    manager = VoiceProfileManager(str(path))
+    _write(project, [_row("002", "alice"), _row("001", "alice"), _row("003", "bob")])
+    changes = manager.reload()
+    assert changes.speakers == ("alice",)
+    assert manager.get_profile("alice").sample_id == "002"
+
+
+def test_reload_validates_changed_rows_only(project: Path):
+    """音声ファイルの確認は追加・変更された行だけ。失敗したら索引は前のまま"""
+    path = _write(project, [_row("001", "alice"), _row("002", "bob")])
+    manager = VoiceProfileManager(str(path))
+    (project / "data" / "voice_samples" / "001.wav").unlink()
+    _write(project, [_row("001", "alice"), _row("002", "bob"), _row("005", "eve")])
+    assert manager.reload().added == ("005",)
+
+    _write(project, [_row("001", "alice"), _row("002", "bob", audio="data/voice_samples/missing.wav")])
+    with pytest.raises(ValueError, match="音声ファイルが存在しません"):
+        manager.reload()
+    assert manager.list_speakers() == ["alice", "bob", "eve"]
+
+
+def test_row_added_before_its_audio_is_retried(project: Path):
+    """音声ファイルより先に追加された行は、ファイルが届いた後の check_for_updates で反映される"""
+    path = _write(project, [_row("001", "alice")])
+    manager = VoiceProfileManager(str(path))
+    _write(project, [_row("001", "alice"), _row("006", "frank")])
+    with pytest.raises(ValueError, match="音声ファイルが存在しません"):
+        manager.check_for_updates()
+    with pytest.raises(ValueError, match="音声ファイルが存在しません"):
+        manager.check_for_updates()
+    assert manager.list_speakers() == ["alice"]
+
+    (project / "data" / "voice_samples" / "006.wav").write_bytes(b"")
+    assert manager.check_for_updates().added == ("006",)
+    assert manager.list_speakers() == ["alice", "frank"]
+    assert manager.check_for_updates() is None
+
+
+def test_watch_notifies_changes(project: Path):
+    """watch() はファイルの変更を検出して再読み込みし、書きかけの内容は on_error に渡す"""
+    path = _write(project, [_row("001", "alice")])
+    manager = VoiceProfileManager(str(path))
+    changed = threading.Event()
+    errors = []
+    manager.add_listener(lambda changes: changed.set())
+    manager.watch(0.02, on_error=errors.append)
+    try:
+        assert manager.check_for_updates() is None
+        path.write_text("sample_id,speaker_name\n", encoding="utf-8")
+        for _ in range(100):
+            if errors:
+                break
+            threading.Event().wait(0.02)
+        assert errors and isinstance(errors[0], ValueError)
+        assert manager.list_speakers() == ["alice"]
+
+        _write(project, [_row("001", "alice"), _row("002", "bob")])
+        assert changed.wait(5)
+        assert manager.list_speakers() == ["alice", "bob"]
+    finally:
+        manager.stop_watching()
+
+
+def test_synthesizer_reload_invalidates_affected_speakers(monkeypatch: pytest.MonkeyPatch, project: Path):
+    """変わった話者だけを登録し直し、その話者のプロンプトと合成済み音声だけをキャッシュから破棄する"""
+    use_fake_model(monkeypatch)
+    path = _write(project, [_row("001", "alice"), _row("002", "bob"), _row("003", "carol")])
+    manager = VoiceProfileManager(str(path))
+    cache = AudioCache(disk_dir=project / "audio_cache")
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry(), audio_cache=cache) as synth:
+        synth.register_profiles(manager)
+        for name in ("alice", "bob", "carol"):
+            synth.synthesize("こんにちは", name)
+        old_alice = synth.get_speaker("alice")
+        assert len(synth.wrapper.prompt_cache) == 3 and len(cache) == 3
+
+        _write(project, [_row("001", "alice", "新しいテキスト"), _row("002", "bob"), _row("004", "dave")])
+        changes = manager.reload()
+        result = synth.reload_profiles(manager, changes.speakers)
+        assert result == {"alice": "updated", "carol": "removed", "dave": "added"}
+        assert synth.list_speakers() == ["alice", "bob", "dave"]
+        assert synth.get_speaker("alice").ref_text == "新しいテキスト"
+        assert len(synth.wrapper.prompt_cache) == 1
+        assert len(cache) == 1 and cache.stats()["disk_entries"] == 1
+
+        key = make_audio_cache_key(
+            old_alice.ref_audio_path, old_alice.ref_text, "こんにちは", "Japanese",
+            synth.wrapper.model_name, synth.wrapper.dtype, seed=0,
+        )
+        assert cache.get(key) is None
+        hits = cache.stats()["memory_hits"]
+        synth.synthesize("こんにちは", "bob")
+        assert cache.stats()["memory_hits"] == hits + 1
+
+
+def test_audio_cache_discard_speaker(tmp_path: Path):
+    """discard_speaker は指定した話者の音声だけをメモリ層とディスク層から消す"""
+    cache = AudioCache(disk_dir=tmp_path)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    wav = np.zeros(100, dtype=np.float32)
+    keys = [make_audio_cache_key(str(ref), "参照", f"文 {i}", "Japanese", "m", "float32") for i in range(3)]
+    cache.put(keys[0], wav, 24000, speaker="alice")
+    cache.put(keys[1], wav, 24000, speaker="alice")
+    cache.put(keys[2], wav, 24000, speaker="bob")
+    assert cache.discard_speaker("alice") == 2
+    assert cache.discard_speaker("alice") == 0
+    assert cache.get(keys[0]) is None and cache.get(keys[2]) is not None
+    assert len(list(tmp_path.glob("*/*.flac"))) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
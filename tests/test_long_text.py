@@ -0,0 +1,151 @@
+# coding=utf-8
+"""
+長文合成（segment_text / estimate_max_new_tokens / join_segments / generate_voice_long）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_long_text.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import torch
+
+from src.audio import join_segments, trim_silence
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.text_segmenter import estimate_max_new_tokens, segment_text
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def test_segment_text_splits_long_sentence():
+    """max_chars を超える文は読点の位置で分割する"""
+    text = "あ" * 30 + "、" + "い" * 30 + "。"
+    assert segment_text(text, max_chars=40) == ["あ" * 30 + "、", "い" * 30 + "。"]
+
+
+def test_segment_text_hard_split():
+    """区切り記号のない長い文は max_chars ごとに分割する"""
+    segments = segment_text("あ" * 100, max_chars=40)
+    assert [len(s) for s in segments] == [40, 40, 20]
+
+
+def test_segment_text_merges_short_sentences():
+    """短い文は次の文とまとめる"""
+    assert segment_text("うん！そうだね。今日は晴れています。", max_chars=80, min_chars=8) == [
+        "うん！そうだね。",
+        "今日は晴れています。",
+    ]
+    assert segment_text("Yes. I agree.", max_chars=80, min_chars=8) == ["Yes. I agree."]
+    assert segment_text("うん！そうだね。", min_chars=0) == ["うん！", "そうだね。"]
+
+
+def test_segment_text_validation():
+    """max_chars は 1 以上"""
+    with pytest.raises(ValueError):
+        segment_text("テスト", max_chars=0)
+    assert segment_text("  ") == []
+
+
+def test_estimate_max_new_tokens_scales_with_length():
+    """生成トークン数の上限はテキスト長に比例し、下限・上限で丸める"""
+    short = estimate_max_new_tokens("はい。")
+    medium = estimate_max_new_tokens("あ" * 70)
+    assert short == 48
+    assert medium == 240
+    assert estimate_max_new_tokens("a" * 70, "English") == 120
+    assert estimate_max_new_tokens("あ" * 10000) == 2048
+
+
+def test_trim_silence():
+    """前後の無音を取り除き、pad 分は残す"""
+    wav = np.zeros(100, dtype=np.float32)
+    wav[40:60] = 0.5
+    assert len(trim_silence(wav)) == 20
+    assert len(trim_silence(wav, pad=5)) == 30
+    assert len(trim_silence(np.zeros(10, dtype=np.float32))) == 0
+
+
+def test_join_segments_inserts_gap():
+    """無音を取り除いたうえで gap_ms の無音を挟む"""
+    sr = 1000
+    a = np.concatenate([np.zeros(50), np.full(100, 0.5), np.zeros(50)]).astype(np.float32)
+    b = np.full(80, 0.5, dtype=np.float32)
+    out = join_segments([a, b], sr, gap_ms=100, crossfade_ms=0)
+    assert out.dtype == np.float32
+    assert len(out) == 100 + 100 + 80
+    assert np.all(out[100:200] == 0.0)
+
+
+def test_join_segments_crossfade():
+    """境界はフェードし、gap_ms=0 ではクロスフェード長だけ重ねる"""
+    sr = 1000
+    a = np.full(100, 0.5, dtype=np.float32)
+    b = np.full(100, 0.5, dtype=np.float32)
+    faded = join_segments([a, b], sr, gap_ms=50, crossfade_ms=10)
+    assert len(faded) == 250
+    assert faded[99] == pytest.approx(0.0)
+    assert faded[150] == pytest.approx(0.0)
+    overlapped = join_segments([a, b], sr, gap_ms=0, crossfade_ms=10)
+    assert len(overlapped) == 190
+    # 重なり部分はフェードアウトとフェードインの和で振幅が保たれる
+    assert np.allclose(overlapped[90:100], 0.5)
+
+
+def test_generate_voice_long_batches_segments(wrapper, ref):
+    """セグメントごとの予算でバッチ生成し、1 つの音声に結合する"""
+    text = "これは短めの文です。" + "あ" * 60 + "。" + "これも短めの文です。"
+    wav, sr = wrapper.generate_voice_long(text, ref, "参照", max_chars=80, max_batch_size=2, gap_ms=100)
+    assert sr == FakeQwen3TTSModel.SAMPLE_RATE
+
+    calls = wrapper._model.generate_calls
+    assert [len(c["text"]) for c in calls] == [2, 1]
+    # 短い 2 文が 1 バッチ、長い文が 1 バッチ。予算はそれぞれの長さから見積もる
+    assert calls[0]["text"] == ["これは短めの文です。", "これも短めの文です。"]
+    assert calls[0]["max_new_tokens"] == estimate_max_new_tokens("これは短めの文です。")
+    assert calls[1]["max_new_tokens"] == estimate_max_new_tokens("あ" * 60 + "。")
+    assert calls[0]["max_new_tokens"] < calls[1]["max_new_tokens"]
+
+    voiced = (10 + 61 + 10) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    gaps = 2 * sr // 10
+    assert voiced <= len(wav) <= voiced + gaps
+
+
+def test_generate_voice_long_single_segment(wrapper, ref):
+    """1 セグメントのテキストは結合せずそのまま返す"""
+    wav, _ = wrapper.generate_voice_long("こんにちは。", ref, "参照")
+    assert len(wav) == 6 * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    assert wrapper._model.generate_calls[0]["max_new_tokens"] == 48
+
+
+def test_generate_voice_long_validation(wrapper, ref):
+    """空テキスト・未対応言語"""
+    with pytest.raises(ValueError):
+        wrapper.generate_voice_long(" ", ref, "参照")
+    with pytest.raises(ValueError):
+        wrapper.generate_voice_long("テスト", ref, "参照", language="French")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
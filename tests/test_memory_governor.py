@@ -0,0 +1,174 @@
+# coding=utf-8
+"""
+メモリガバナー（src.tts.memory_governor）と、メモリ不足からの回復（バッチの分割・生成し直し）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_memory_governor.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts.memory_governor import (
+    DEFAULT_BYTES_PER_TOKEN,
+    PROMPT_TOKENS,
+    MemoryGovernor,
+    estimate_bytes_per_token,
+    is_oom_error,
+)
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.scheduler import BatchScheduler
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+# 1 リクエスト（生成トークン数の上限 48 = 短い発言）の見積もり（bytes_per_token=1024）
+SHORT_REQUEST_BYTES = (48 + PROMPT_TOKENS) * 1024
+
+
+def _governor(free: int, bytes_per_token: int = 1024) -> MemoryGovernor:
+    return MemoryGovernor(bytes_per_token=bytes_per_token, reserve_mb=0, memory_info=lambda: (free, 8 * free))
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def _batch_sizes(wrapper: Qwen3TTSWrapper) -> list[int]:
+    return [len(c["text"]) for c in wrapper._model.generate_calls]
+
+
+def test_is_oom_error_walks_cause_chain():
+    """RuntimeError で包まれた OOM も __cause__ / __context__ をたどって判定する"""
+    oom = torch.cuda.OutOfMemoryError("CUDA out of memory")
+    try:
+        raise RuntimeError("音声生成に失敗しました") from oom
+    except RuntimeError as e:
+        assert is_oom_error(e)
+    try:
+        try:
+            raise MemoryError()
+        except MemoryError:
+            raise ValueError("後処理に失敗")
+    except ValueError as e:
+        assert is_oom_error(e)
+    assert is_oom_error(RuntimeError("DefaultCPUAllocator: can't allocate memory: you tried to allocate 1 bytes"))
+    assert not is_oom_error(RuntimeError("音声生成に失敗しました"))
+    assert not is_oom_error(None)
+
+
+def test_bytes_per_token_from_model_config():
+    """talker の設定（層数・KV ヘッド数・ヘッド次元・dtype）から KV キャッシュのサイズを見積もる"""
+    config = SimpleNamespace(num_hidden_layers=28, num_key_value_heads=8, head_dim=128)
+    model = SimpleNamespace(model=SimpleNamespace(talker=SimpleNamespace(config=config)))
+    bf16 = estimate_bytes_per_token(model, torch.bfloat16)
+    assert bf16 == 2 * 28 * 8 * 128 * 2 * 2
+    assert estimate_bytes_per_token(model, torch.float32) == 2 * bf16
+    no_head_dim = SimpleNamespace(num_hidden_layers=2, num_attention_heads=4, hidden_size=256)
+    model = SimpleNamespace(model=SimpleNamespace(talker=SimpleNamespace(config=no_head_dim)))
+    assert estimate_bytes_per_token(model, torch.float32) == 2 * 2 * 4 * 64 * 4 * 2
+    assert estimate_bytes_per_token(FakeQwen3TTSModel(), torch.float32) == DEFAULT_BYTES_PER_TOKEN
+
+
+def test_max_batch_size_fits_headroom():
+    """余裕に収まる件数を返し、上限で丸め、1 件も収まらなくても 1 を返す"""
+    governor = _governor(free=10 * SHORT_REQUEST_BYTES)
+    assert governor.estimate_bytes([48, 48]) == 2 * SHORT_REQUEST_BYTES
+    assert governor.estimate_bytes([48, 1000]) == 2 * (1000 + PROMPT_TOKENS) * 1024
+    assert governor.max_batch_size(48, 64) == 10
+    assert governor.max_batch_size(48, 4) == 4
+    assert _governor(free=100).max_batch_size(48, 64) == 1
+    with pytest.raises(ValueError):
+        MemoryGovernor(bytes_per_token=0)
+
+
+def test_oom_raises_estimate_and_releases():
+    """OOM が起きたバッチの余裕から 1 トークンあたりの見積もりを引き上げ、OOM 以外の例外は数えない"""
+    governor = _governor(free=10 * SHORT_REQUEST_BYTES)
+    with pytest.raises(torch.cuda.OutOfMemoryError):
+        with governor.track(batch_size=8, budget=48):
+            raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+    assert governor.max_batch_size(48, 64) < 8
+    with pytest.raises(ValueError):
+        with governor.track(batch_size=1, budget=48):
+            raise ValueError("入力不正")
+    with governor.track(batch_size=1, budget=48):
+        pass
+    stats = governor.stats()
+    assert stats["ooms"] == 1 and stats["batches"] == 1
+    assert stats["bytes_per_token"] > 1024
+    assert stats["vram_total_mb"] is None and stats["ram_total_mb"] > 0
+    assert set(stats["max_batch_size"]) == {"128", "512", "2048"}
+
+
+def test_batch_is_split_and_retried_on_oom(wrapper, ref):
+    """OOM になったバッチは半分に分けて生成し直し、全件の音声を入力順で返す"""
+    wrapper._memory = _governor(free=100 * SHORT_REQUEST_BYTES)
+    wrapper._model.oom_batch_size = 2
+    texts = ["おはよう", "草", "了解です", "こんばんは", "またね"]
+    results = wrapper.generate_voice_batch(texts, [(ref, "参照")], max_batch_size=8)
+
+    assert _batch_sizes(wrapper) == [5, 3, 2, 1, 2]
+    for text, (wav, _) in zip(texts, results):
+        assert len(wav) == len(text) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    stats = wrapper.memory_stats()
+    assert stats["ooms"] == 2 and stats["splits"] == 2 and stats["batches"] == 3
+
+    # OOM から補正した見積もりで、次からは収まる件数ずつ生成する
+    wrapper.generate_voice_batch(texts[:4], [(ref, "参照")], max_batch_size=8)
+    assert max(_batch_sizes(wrapper)[5:]) <= 2
+    assert wrapper.memory_stats()["ooms"] == 2
+
+
+def test_single_request_oom_retries_once(wrapper, ref):
+    """1 件でも OOM の場合はキャッシュを解放して 1 回だけ生成し直し、だめならメモリ不足と分かる RuntimeError"""
+    wrapper._model.oom_batch_size = 0
+    with pytest.raises(RuntimeError, match="メモリ不足") as excinfo:
+        wrapper.generate_voice("こんにちは", ref, "参照")
+    assert is_oom_error(excinfo.value)
+    assert len(wrapper._model.generate_calls) == 2
+    with pytest.raises(RuntimeError, match="メモリ不足"):
+        wrapper.generate_voice_batch(["こんにちは"], [(ref, "参照")])
+    assert len(wrapper._model.generate_calls) == 4
+    assert wrapper.memory_stats()["retries"] == 2
+
+    disabled = Qwen3TTSWrapper(device="cpu", dtype=torch.float32, memory_governor=False)
+    disabled._model.oom_batch_size = 0
+    with pytest.raises(RuntimeError):
+        disabled.generate_voice("こんにちは", ref, "参照")
+    assert len(disabled._model.generate_calls) == 1
+    assert disabled.memory_stats() == {}
+
+
+def test_scheduler_admits_only_what_fits(wrapper, ref):
+    """スケジューラは見積もったメモリ使用量が余裕に収まる件数までしかバッチにまとめない"""
+    wrapper._memory = _governor(free=int(2.5 * SHORT_REQUEST_BYTES))
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_size=8) as scheduler:
+        futures = [scheduler.submit(t, ref, "参照") for t in ["はい", "うん", "ええ", "おう"]]
+        for f in futures:
+            f.result(timeout=5)
+        stats = scheduler.stats()
+    assert _batch_sizes(wrapper) == [2, 2]
+    assert stats["memory_limited"] >= 1 and stats["completed"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+# coding=utf-8
+"""
+処理段階の計測（src.tts.metrics）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_metrics.py -v
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from urllib.request import urlopen
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts import ModelRegistry, VoiceCloneManager
+from src.tts import metrics
+from src.tts.metrics import InMemoryMetrics, JsonlMetrics, MultiMetrics, NullMetrics, PrometheusMetrics, span
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def sink():
+    """テスト中だけ InMemoryMetrics を有効にする"""
+    memory = InMemoryMetrics()
+    previous = metrics.set_metrics(memory)
+    yield memory
+    metrics.set_metrics(previous)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def test_disabled_span_is_shared_noop():
+    """無効時は共有の空オブジェクトを返す（計測しない）"""
+    assert isinstance(metrics.get_metrics(), NullMetrics)
+    first = span("a", text_chars=1)
+    assert first is span("b")
+    with first as s:
+        s.set(audio_sec=1.0)
+
+
+def test_generate_voice_stages(monkeypatch: pytest.MonkeyPatch, sink, ref):
+    """generate_voice の各段階が属性付きで記録される"""
+    use_fake_model(monkeypatch)
+    wrapper = Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    wrapper.generate_voice("テスト", ref, "参照")
+    wrapper.generate_voice("テスト", ref, "参照")
+
+    summary = sink.summary()
+    assert set(summary) == {"tts.generate_voice", "tts.ref_load", "tts.prompt_build", "tts.generate", "tts.postprocess"}
+    # 参照音声の読み込みとプロンプト作成はキャッシュにより 1 回だけ
+    assert summary["tts.ref_load"]["count"] == 1
+    assert summary["tts.prompt_build"]["count"] == 1
+    generate = summary["tts.generate"]
+    assert generate["count"] == 2
+    assert generate["text_chars_total"] == 6
+    audio_sec = 3 * FakeQwen3TTSModel.SAMPLES_PER_CHAR / FakeQwen3TTSModel.SAMPLE_RATE
+    assert generate["audio_sec_total"] == pytest.approx(2 * audio_sec)
+    assert generate["tokens_total"] == 2 * int(audio_sec * 12)
+    assert summary["tts.generate_voice"]["audio_sec_total"] == pytest.approx(2 * audio_sec)
+
+
+def test_manager_span(monkeypatch: pytest.MonkeyPatch, sink, ref):
+    """VoiceCloneManager.synthesize も記録される"""
+    use_fake_model(monkeypatch)
+    with VoiceCloneManager(ref, "参照", device="cpu", registry=ModelRegistry()) as manager:
+        manager.synthesize("おはよう")
+    entry = sink.summary()["manager.synthesize"]
+    assert entry["count"] == 1
+    assert entry["text_chars_total"] == 4
+
+
+def test_failed_span_is_recorded(sink):
+    """例外で抜けたスパンも記録される"""
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+    assert sink.summary()["failing"]["count"] == 1
+
+
+def test_histogram_quantiles():
+    """分位点はバケット境界で近似する"""
+    memory = InMemoryMetrics(buckets=(0.1, 1.0, 10.0))
+    for value in [0.05] * 90 + [5.0] * 10:
+        memory.record("x", value, {})
+    entry = memory.summary()["x"]
+    assert entry["p50"] == 0.1
+    assert entry["p95"] == 10.0
+    assert entry["max"] == 5.0
+
+
+def test_prometheus_render_and_serve():
+    """Prometheus のテキスト形式で出力し、HTTP で公開する"""
+    prom = PrometheusMetrics(buckets=(0.1, 1.0))
+    prom.record("tts.generate", 0.5, {"audio_sec": 2.0})
+    text = prom.render()
+    assert 'tts_span_duration_seconds_bucket{span="tts.generate",le="0.1"} 0' in text
+    assert 'tts_span_duration_seconds_bucket{span="tts.generate",le="1.0"} 1' in text
+    assert 'tts_span_duration_seconds_count{span="tts.generate"} 1' in text
+    assert 'tts_span_audio_sec_total{span="tts.generate"} 2.0' in text
+
+    server = prom.serve(port=0)
+    try:
+        port = server.server_address[1]
+        with urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            assert resp.status == 200
+            assert "tts_span_duration_seconds_sum" in resp.read().decode("utf-8")
+    finally:
+        prom.close()
+
+
+def test_jsonl_sink(tmp_path: Path):
+    """1 スパン 1 行の JSON を追記する"""
+    path = tmp_path / "logs" / "metrics.jsonl"
+    jsonl = JsonlMetrics(path)
+    both = MultiMetrics(jsonl, NullMetrics(), InMemoryMetrics())
+    both.record("tts.generate", 0.25, {"text_chars": 3})
+    both.record("tts.postprocess", 0.001, {})
+    both.close()
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["span"] for r in rows] == ["tts.generate", "tts.postprocess"]
+    assert rows[0]["text_chars"] == 3
+    assert rows[0]["duration_sec"] == 0.25
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
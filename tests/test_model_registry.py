@@ -0,0 +1,148 @@
+# coding=utf-8
+"""
+モデル共有（ModelRegistry）と複数話者合成（MultiSpeakerSynthesizer）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_model_registry.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer, VoiceCloneManager
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+MODEL = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
+
+
+@pytest.fixture
+def loads(monkeypatch: pytest.MonkeyPatch) -> list:
+    """from_pretrained の呼び出し（モデルロード）を記録する。"""
+    use_fake_model(monkeypatch)
+    calls: list = []
+
+    def from_pretrained(name, **kwargs):
+        calls.append((name, kwargs))
+        return FakeQwen3TTSModel()
+
+    monkeypatch.setattr(FakeQwen3TTSModel, "from_pretrained", staticmethod(from_pretrained))
+    return calls
+
+
+@pytest.fixture
+def ref_audio(tmp_path: Path) -> Path:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"RIFF0000WAVE")
+    return path
+
+
+def test_acquire_shares_model(loads):
+    """同じキーの acquire は同じ wrapper を返し、モデルを 1 回だけロードする"""
+    registry = ModelRegistry()
+    a = registry.acquire(MODEL, "cpu", torch.float32)
+    b = registry.acquire(MODEL, "cpu", torch.float32)
+    assert a is b
+    assert len(loads) == 1
+    assert registry.refcount(MODEL, "cpu", torch.float32) == 2
+
+    c = registry.acquire(MODEL, "cpu", torch.bfloat16)
+    assert c is not a
+    assert len(loads) == 2
+
+
+def test_release_unloads_at_zero(loads):
+    """参照カウントが 0 になるとモデルを解放し、次の acquire で再ロードする"""
+    registry = ModelRegistry()
+    a = registry.acquire(MODEL, "cpu", torch.float32)
+    registry.acquire(MODEL, "cpu", torch.float32)
+    assert registry.release(a) is False
+    assert a._model is not None
+    assert registry.release(a) is True
+    assert a._model is None
+    assert registry.loaded() == []
+
+    with pytest.raises(ValueError, match="レジストリが管理していないモデル"):
+        registry.release(a)
+
+    registry.acquire(MODEL, "cpu", torch.float32)
+    assert len(loads) == 2
+
+
+def test_voice_clone_managers_share_model(loads, ref_audio: Path):
+    """話者ごとの VoiceCloneManager が 1 つのモデルを共有する"""
+    registry = ModelRegistry()
+    m1 = VoiceCloneManager(str(ref_audio), "参照A", device="cpu", registry=registry)
+    m2 = VoiceCloneManager(str(ref_audio), "参照B", device="cpu", registry=registry)
+    assert m1.wrapper is m2.wrapper
+    assert len(loads) == 1
+
+    m1.close()
+    m1.close()  # 2 回目は何もしない
+    assert registry.refcount(MODEL, "cpu", torch.float32) == 1
+    wav, sr = m2.synthesize("こんにちは")
+    assert wav.size > 0
+    m2.close()
+    assert registry.loaded() == []
+
+
+def test_multi_speaker_switches_per_call(loads, tmp_path: Path):
+    """呼び出しごとに話者を切り替えてもモデルは再ロードされず、プロンプトは話者ごとに 1 回だけ作る"""
+    audio_a = tmp_path / "a.wav"
+    audio_b = tmp_path / "b.wav"
+    audio_a.write_bytes(b"a")
+    audio_b.write_bytes(b"b")
+
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        synth.register_speaker("alice", str(audio_a), "こんにちは", "ja")
+        synth.register_speaker("bob", str(audio_b), "hello", "en")
+        assert synth.list_speakers() == ["alice", "bob"]
+
+        for speaker in ("alice", "bob", "alice", "bob"):
+            wav, sr = synth.synthesize("テスト", speaker=speaker)
+            assert wav.ndim == 1
+
+        model = synth.wrapper._model
+        assert len(loads) == 1
+        assert len(model.prompt_calls) == 2
+        assert [c["language"] for c in model.generate_calls] == ["Japanese", "English"] * 2
+
+    with pytest.raises(RuntimeError, match="close"):
+        synth.wrapper
+
+
+def test_multi_speaker_errors(loads, ref_audio: Path):
+    """未登録話者・不正な言語・存在しない参照音声"""
+    synth = MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry())
+    with pytest.raises(ValueError, match="話者が登録されていません"):
+        synth.synthesize("テスト", speaker="nobody")
+    with pytest.raises(ValueError, match="language"):
+        synth.register_speaker("alice", str(ref_audio), "こんにちは", "fr")
+    with pytest.raises(FileNotFoundError):
+        synth.register_speaker("alice", "/nonexistent.wav", "こんにちは")
+    synth.close()
+
+
+def test_register_profiles(loads):
+    """VoiceProfileManager の全話者を登録する"""
+    from src.profile import VoiceProfileManager
+
+    manager = VoiceProfileManager(str(_PROJECT_ROOT / "data" / "metadata.csv"))
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        assert synth.register_profiles(manager) == manager.list_speakers()
+        profile = synth.get_speaker("gohan")
+        assert Path(profile.ref_audio_path).exists()
+        assert profile.language == "Japanese"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
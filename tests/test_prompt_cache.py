@@ -0,0 +1,128 @@
+# coding=utf-8
+"""
+参照音声プロンプトキャッシュ（PromptCache / Qwen3TTSWrapper.get_voice_clone_prompt）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_prompt_cache.py -v
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts import qwen_wrapper
+from src.tts.prompt_cache import PromptCache, make_prompt_key
+from tests.fakes import FakePromptItem, FakeQwen3TTSModel, fake_ref_audio
+
+
+def _item(n: int) -> list:
+    """埋め込みのみ n 要素（float32）のプロンプト。"""
+    return [FakePromptItem(None, torch.zeros(n), True, False, None)]
+
+
+@pytest.fixture
+def ref_audio(tmp_path: Path) -> Path:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"RIFF0000WAVE")
+    return path
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> qwen_wrapper.Qwen3TTSWrapper:
+    monkeypatch.setattr(qwen_wrapper, "Qwen3TTSModel", FakeQwen3TTSModel)
+    w = qwen_wrapper.Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    monkeypatch.setattr(w, "_load_ref_audio", fake_ref_audio)
+    return w
+
+
+def test_lru_eviction_by_entries():
+    """件数上限を超えると最も古いエントリが破棄される"""
+    cache = PromptCache(max_entries=2)
+    keys = [make_prompt_key(f"https://example.com/{i}.wav", "t", "m", "d") for i in range(3)]
+    cache.put(keys[0], _item(4))
+    cache.put(keys[1], _item(4))
+    assert cache.get(keys[0]) is not None  # keys[0] を最近使用に
+    cache.put(keys[2], _item(4))
+    assert keys[1] not in cache
+    assert keys[0] in cache and keys[2] in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cap():
+    """メモリ上限を超えると古いエントリから破棄され、上限超えの単体エントリは保持しない"""
+    cache = PromptCache(max_entries=10, max_bytes=100)
+    k1 = make_prompt_key("https://example.com/a.wav", "t", "m", "d")
+    k2 = make_prompt_key("https://example.com/b.wav", "t", "m", "d")
+    cache.put(k1, _item(16))  # 64 bytes
+    cache.put(k2, _item(16))
+    assert k1 not in cache
+    assert cache.stats()["bytes"] == 64
+
+    k3 = make_prompt_key("https://example.com/c.wav", "t", "m", "d")
+    cache.put(k3, _item(64))  # 256 bytes
+    assert k3 not in cache
+
+
+def test_key_changes_with_file_and_settings(ref_audio: Path):
+    """ファイルの更新・ref_text・dtype が変わるとキーが変わる"""
+    key = make_prompt_key(str(ref_audio), "text", "m", torch.float32)
+    assert key == make_prompt_key(str(ref_audio), " text ", "m", torch.float32)
+    assert key != make_prompt_key(str(ref_audio), "other", "m", torch.float32)
+    assert key != make_prompt_key(str(ref_audio), "text", "m", torch.bfloat16)
+
+    st = ref_audio.stat()
+    os.utime(ref_audio, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert key != make_prompt_key(str(ref_audio), "text", "m", torch.float32)
+
+
+def test_key_missing_file():
+    """存在しないファイル → FileNotFoundError"""
+    with pytest.raises(FileNotFoundError, match="参照音声ファイルが見つかりません"):
+        make_prompt_key("/nonexistent/ref.wav", "text", "m", "d")
+
+
+def test_wrapper_reuses_prompt(wrapper, ref_audio: Path):
+    """同じ参照音声での 2 回目以降の生成はプロンプトを再計算しない"""
+    for text in ("こんにちは", "おはよう", "了解"):
+        wav, sr = wrapper.generate_voice(text, str(ref_audio), "参照テキスト")
+        assert wav.ndim == 1 and sr == FakeQwen3TTSModel.SAMPLE_RATE
+
+    model = wrapper._model
+    assert len(model.prompt_calls) == 1
+    assert len(model.generate_calls) == 3
+    assert model.generate_calls[0]["voice_clone_prompt"] is model.generate_calls[2]["voice_clone_prompt"]
+    stats = wrapper.prompt_cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_wrapper_recomputes_on_ref_text_change(wrapper, ref_audio: Path):
+    """ref_text が変わるとプロンプトを作り直す"""
+    wrapper.generate_voice("こんにちは", str(ref_audio), "参照テキスト A")
+    wrapper.generate_voice("こんにちは", str(ref_audio), "参照テキスト B")
+    assert len(wrapper._model.prompt_calls) == 2
+
+
+def test_wrapper_cache_disabled(monkeypatch: pytest.MonkeyPatch, ref_audio: Path):
+    """prompt_cache_size=0 では毎回プロンプトを作る"""
+    monkeypatch.setattr(qwen_wrapper, "Qwen3TTSModel", FakeQwen3TTSModel)
+    w = qwen_wrapper.Qwen3TTSWrapper(device="cpu", dtype=torch.float32, prompt_cache_size=0)
+    monkeypatch.setattr(w, "_load_ref_audio", fake_ref_audio)
+    w.generate_voice("こんにちは", str(ref_audio), "参照テキスト")
+    w.generate_voice("こんにちは", str(ref_audio), "参照テキスト")
+    assert len(w._model.prompt_calls) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,130 @@
+# coding=utf-8
+"""
+事前計算プロンプトの保存（PromptArtifactStore）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_prompt_store.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.profile import PromptArtifactStore, VoiceProfileManager
+from src.tts import qwen_wrapper
+from tests.fakes import FakeQwen3TTSModel, fake_ref_audio
+
+MODEL = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    """data/metadata.csv と参照音声を持つ一時プロジェクト。"""
+    (tmp_path / "data" / "voice_samples").mkdir(parents=True)
+    (tmp_path / "data" / "voice_samples" / "a.wav").write_bytes(b"audio-a")
+    (tmp_path / "data" / "voice_samples" / "b.wav").write_bytes(b"audio-b")
+    (tmp_path / "data" / "metadata.csv").write_text(
+        "sample_id,speaker_name,audio_path,corpus_text,language,description\n"
+        "001,alice,data/voice_samples/a.wav,こんにちは,ja,\n"
+        "002,bob,data/voice_samples/b.wav,hello,en,\n",
+        encoding="utf-8",
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> qwen_wrapper.Qwen3TTSWrapper:
+    monkeypatch.setattr(qwen_wrapper, "Qwen3TTSModel", FakeQwen3TTSModel)
+    w = qwen_wrapper.Qwen3TTSWrapper(model_name=MODEL, device="cpu", dtype=torch.float32)
+    monkeypatch.setattr(w, "_load_ref_audio", fake_ref_audio)
+    return w
+
+
+def test_save_and_load_roundtrip(project: Path, wrapper):
+    """保存したプロンプトを同じテンソル値で読み込める"""
+    store = PromptArtifactStore(project / "models" / "prompts")
+    audio = project / "data" / "voice_samples" / "a.wav"
+    prompt = wrapper.get_voice_clone_prompt(str(audio), "こんにちは")
+    fp = store.fingerprint(audio, "こんにちは", MODEL, torch.float32)
+    store.save("001", prompt, fp)
+
+    loaded = store.load("001", fp)
+    assert loaded is not None and len(loaded) == 1
+    assert torch.equal(loaded[0].ref_code, prompt[0].ref_code)
+    assert torch.equal(loaded[0].ref_spk_embedding, prompt[0].ref_spk_embedding)
+    assert loaded[0].ref_text == "こんにちは"
+    assert loaded[0].icl_mode and not loaded[0].x_vector_only_mode
+
+
+def test_invalidated_on_changes(project: Path, wrapper):
+    """参照音声・corpus_text・モデルが変わると無効になる"""
+    store = PromptArtifactStore(project / "models" / "prompts")
+    audio = project / "data" / "voice_samples" / "a.wav"
+    fp = store.fingerprint(audio, "こんにちは", MODEL, torch.float32)
+    store.save("001", wrapper.get_voice_clone_prompt(str(audio), "こんにちは"), fp)
+    assert store.is_valid("001", fp)
+
+    assert not store.is_valid("001", store.fingerprint(audio, "こんばんは", MODEL, torch.float32))
+    assert not store.is_valid("001", store.fingerprint(audio, "こんにちは", "other/model", torch.float32))
+    assert not store.is_valid("001", store.fingerprint(audio, "こんにちは", MODEL, torch.bfloat16))
+
+    audio.write_bytes(b"audio-a-rerecorded")
+    assert not store.is_valid("001", store.fingerprint(audio, "こんにちは", MODEL, torch.float32))
+    assert store.load("001", store.fingerprint(audio, "こんにちは", MODEL, torch.float32)) is None
+
+
+def test_corrupt_artifact_is_invalid(project: Path):
+    """壊れたファイルは無効として扱う"""
+    store = PromptArtifactStore(project / "models" / "prompts")
+    store.root.mkdir(parents=True)
+    store.path_for("001").write_bytes(b"\x00garbage")
+    audio = project / "data" / "voice_samples" / "a.wav"
+    assert not store.is_valid("001", store.fingerprint(audio, "こんにちは", MODEL, torch.float32))
+
+
+def test_rejects_sample_id_outside_root(project: Path):
+    """保存ディレクトリの外を指す sample_id（パスの区切り・..）は ValueError"""
+    store = PromptArtifactStore(project / "models" / "prompts")
+    assert store.path_for("001.v2") == store.root / "001.v2.safetensors"
+    for sample_id in ("../x", "a/b", "..", "", "a\\b"):
+        with pytest.raises(ValueError):
+            store.path_for(sample_id)
+
+
+def test_artifact_status(project: Path, wrapper):
+    """VoiceProfileManager が sample_id ごとの成果物の有無を返す"""
+    manager = VoiceProfileManager(str(project / "data" / "metadata.csv"))
+    store = PromptArtifactStore(project / "models" / "prompts")
+    assert manager.artifact_status(store, MODEL, torch.float32) == {"001": False, "002": False}
+
+    profile = manager.get_profile("alice")
+    store.ensure(wrapper, profile["sample_id"], manager.resolve_audio_path(profile), profile["corpus_text"])
+    assert manager.artifact_status(store, MODEL, torch.float32) == {"001": True, "002": False}
+
+
+def test_ensure_loads_into_wrapper_cache(project: Path, wrapper, monkeypatch: pytest.MonkeyPatch):
+    """有効な成果物があれば新しいプロセス（wrapper）でもプロンプトを再計算しない"""
+    store = PromptArtifactStore(project / "models" / "prompts")
+    audio = project / "data" / "voice_samples" / "a.wav"
+    assert store.ensure(wrapper, "001", audio, "こんにちは") is False
+    assert len(wrapper._model.prompt_calls) == 1
+
+    fresh = qwen_wrapper.Qwen3TTSWrapper(model_name=MODEL, device="cpu", dtype=torch.float32)
+    monkeypatch.setattr(fresh, "_load_ref_audio", fake_ref_audio)
+    assert store.ensure(fresh, "001", audio, "こんにちは") is True
+    fresh.generate_voice("おはよう", str(audio), "こんにちは")
+    assert fresh._model.prompt_calls == []
+    assert fresh.prompt_cache_stats()["hits"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,155 @@
+# coding=utf-8
+"""
+参照音声の前処理（src.audio.reference）と正規形の保存（src.profile.reference_store）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_reference.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from src.audio.reference import REFERENCE_SAMPLE_RATE, decode_audio, preprocess_reference, rms_dbfs
+from src.profile import PromptArtifactStore, ReferenceStore
+from src.profile.reference_store import load_canonical_reference, reference_id
+from src.tts.model_registry import ModelRegistry
+from src.tts.qwen_wrapper import load_ref_audio
+from src.tts.startup import prepare_reference
+from src.tts.synthesizer import MultiSpeakerSynthesizer
+from tests.fakes import use_fake_model
+
+MODEL = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
+
+
+def _voice(sr: int, lead: float = 0.5, body: float = 1.0, tail: float = 0.5, amp: float = 0.05) -> np.ndarray:
+    """前後に無音のある正弦波（音声の代わり）。"""
+    t = np.arange(int(sr * body)) / sr
+    tone = (amp * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    return np.concatenate([np.zeros(int(sr * lead), np.float32), tone, np.zeros(int(sr * tail), np.float32)])
+
+
+def _write_wav(path: Path, wav: np.ndarray, sr: int) -> Path:
+    sf.write(str(path), wav, sr, subtype="PCM_16")
+    return path
+
+
+def test_preprocess_trims_resamples_and_normalizes():
+    """24 kHz に変換し、前後の無音を余白 100 ms まで除き、有音区間を -20 dBFS にそろえる"""
+    y = preprocess_reference(_voice(44100), 44100)
+    assert y.dtype == np.float32
+    assert abs(len(y) / REFERENCE_SAMPLE_RATE - 1.2) < 0.01
+    assert abs(rms_dbfs(y) - (-20.0)) < 0.1
+
+
+def test_preprocess_stereo_and_peak_limit():
+    """ステレオはモノラルにし、目標音量でピークが上限を超える場合は上限に合わせる"""
+    spike = _voice(24000, amp=0.01)
+    spike[18000] = 0.5
+    stereo = np.stack([spike, spike], axis=-1)
+    y = preprocess_reference(stereo, 24000)
+    assert y.ndim == 1
+    assert np.abs(y).max() <= 10 ** (-1.0 / 20) + 1e-6
+    with pytest.raises(ValueError):
+        preprocess_reference(np.zeros(1000, np.float32), 24000)
+    with pytest.raises(ValueError):
+        preprocess_reference(np.zeros(0, np.float32), 24000)
+
+
+def test_decode_audio_int_pcm_is_float(tmp_path: Path):
+    """16 bit PCM の WAV も [-1, 1] の float32 で読む"""
+    path = _write_wav(tmp_path / "ref.wav", _voice(16000, amp=0.5), 16000)
+    wav, sr = decode_audio(path)
+    assert sr == 16000 and wav.dtype == np.float32
+    assert 0.45 < np.abs(wav).max() <= 0.5
+    with pytest.raises(FileNotFoundError):
+        decode_audio(tmp_path / "missing.wav")
+    (tmp_path / "broken.wav").write_bytes(b"not audio")
+    with pytest.raises(ValueError):
+        decode_audio(tmp_path / "broken.wav")
+
+
+def test_reference_store_reuses_and_invalidates(tmp_path: Path):
+    """正規形は 1 回だけ作り、元ファイルが変わったら作り直す"""
+    src = _write_wav(tmp_path / "ref.wav", _voice(16000), 16000)
+    store = ReferenceStore(tmp_path / "references")
+    path = store.ensure("001", src)
+    assert path == store.path_for("001")
+    mtime = path.stat().st_mtime_ns
+
+    assert store.ensure("001", src) == path
+    assert path.stat().st_mtime_ns == mtime
+
+    _write_wav(src, _voice(16000, body=2.0), 16000)
+    store.ensure("001", src)
+    wav, sr = load_canonical_reference(path)
+    assert sr == REFERENCE_SAMPLE_RATE
+    assert abs(len(wav) / sr - 2.2) < 0.01
+
+
+def test_reference_store_rejects_sample_id_outside_root(tmp_path: Path):
+    """保存ディレクトリの外を指す sample_id は ValueError で、外にファイルを書かない"""
+    src = _write_wav(tmp_path / "ref.wav", _voice(16000), 16000)
+    store = ReferenceStore(tmp_path / "references")
+    for sample_id in ("../escaped", "sub/001", ".."):
+        with pytest.raises(ValueError):
+            store.ensure(sample_id, src)
+    assert not (tmp_path / "escaped.npy").exists() and not (tmp_path / "escaped.json").exists()
+
+
+def test_load_ref_audio_memory_maps_canonical(tmp_path: Path):
+    """正規形（.npy）は書き込み不可のメモリマップで読む"""
+    src = _write_wav(tmp_path / "ref.wav", _voice(16000), 16000)
+    path = ReferenceStore(tmp_path / "references").ensure("001", src)
+    wav, sr = load_ref_audio(str(path))
+    assert isinstance(wav, np.memmap) and not wav.flags.writeable
+    assert sr == REFERENCE_SAMPLE_RATE
+    np.save(tmp_path / "bad.npy", np.zeros((2, 10), np.float32))
+    with pytest.raises(ValueError):
+        load_ref_audio(str(tmp_path / "bad.npy"))
+
+
+def test_prepare_reference_uses_canonical(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """reference_store 指定時は正規形を読み、フィンガープリントに前処理の設定を含める"""
+    use_fake_model(monkeypatch)
+    src = _write_wav(tmp_path / "ref.wav", _voice(16000), 16000)
+    references = ReferenceStore(tmp_path / "references")
+    store = PromptArtifactStore(tmp_path / "prompts")
+
+    prepared = prepare_reference(
+        src, "参照", model_name=MODEL, device="cpu", dtype=torch.float32,
+        store=store, sample_id="001", reference_store=references,
+    )
+    assert prepared.audio_path == str(references.path_for("001"))
+    assert prepared.fingerprint["reference"] == reference_id()
+    raw = store.fingerprint(src, "参照", MODEL, torch.float32)
+    assert raw["reference"] == "raw" and raw["audio_sha256"] == prepared.fingerprint["audio_sha256"]
+
+
+def test_synthesizer_registers_canonical_reference(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """reference_store 指定時は register_speaker で参照音声を正規形に置き換える"""
+    use_fake_model(monkeypatch)
+    src = _write_wav(tmp_path / "ref.wav", _voice(16000), 16000)
+    references = ReferenceStore(tmp_path / "references")
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry(), reference_store=references) as synth:
+        profile = synth.register_speaker("alice", str(src), "参照")
+        assert profile.ref_audio_path == str(references.path_for("alice"))
+        profile = synth.register_speaker("bob", str(src), "参照", sample_id="002")
+        assert profile.ref_audio_path == str(references.path_for("002"))
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        assert synth.register_speaker("alice", str(src), "参照").ref_audio_path == str(src)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
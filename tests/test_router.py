@@ -0,0 +1,259 @@
+# coding=utf-8
+"""
+複数レプリカのルーター（src.server.router）の単体テスト
+
+レプリカには偽モデルの合成デーモン（同じプロセスの Unix ソケット・リモートの代わりの localhost の HTTP）と、
+python -m src.server --backend fake で起動するローカルワーカーのプロセスを使う。
+
+実行方法:
+    python -m pytest tests/test_router.py -v
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+
+from src.audio import float_to_wav_bytes
+from src.server import ServerUnavailableError, SynthesisClient, SynthesisServer
+from src.server.protocol import HEADER_REPLICA
+from src.server.router import LocalWorker, Replica, Router, RouterServer, parse_cores
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer
+from tests.fakes import DroppingSocket, use_fake_model
+
+
+class _Cluster:
+    """同じプロセスで動かす偽モデルの合成デーモンの集まり（名前 → サーバ）。"""
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        use_fake_model(monkeypatch)
+        self._tmp_path = tmp_path
+        self._ref = tmp_path / "ref.wav"
+        self._ref.write_bytes(b"ref")
+        self.servers: Dict[str, SynthesisServer] = {}
+        self._synthesizers: List[MultiSpeakerSynthesizer] = []
+
+    def serve(self, name: str, speakers=("alice", "bob"), http: bool = False) -> Replica:
+        synth = MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry())
+        synth.wrapper._model.latency_per_char_sec = 0.01
+        for speaker in speakers:
+            synth.register_speaker(speaker, str(self._ref), "参照", "ja")
+        self._synthesizers.append(synth)
+        if http:
+            server = SynthesisServer(synth, port=0, max_wait_ms=0).start()
+            replica = Replica.remote(server.address, name=name)
+        else:
+            server = SynthesisServer(synth, socket_path=self._tmp_path / f"{name}.sock", max_wait_ms=0).start()
+            replica = Replica(name, SynthesisClient(server.socket_path))
+        self.servers[name] = server
+        return replica
+
+    def close(self) -> None:
+        for server in self.servers.values():
+            server.close()
+        for synth in self._synthesizers:
+            synth.close()
+
+
+@pytest.fixture
+def cluster(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    c = _Cluster(monkeypatch, tmp_path)
+    yield c
+    c.close()
+
+
+def _replica_of(router: Router, speaker: str, text: str = "こんにちは") -> str:
+    _, headers = router.synthesize_bytes(text, speaker)
+    return headers[HEADER_REPLICA]
+
+
+def test_parse_cores():
+    """コア集合の範囲・列挙を CPU 番号のリストにし、不正な形式は ValueError"""
+    assert parse_cores("0-3,8") == [0, 1, 2, 3, 8]
+    assert parse_cores("2") == [2]
+    for spec in ("", "3-1", "a", "-1"):
+        with pytest.raises(ValueError):
+            parse_cores(spec)
+
+
+def test_speaker_affinity_keeps_speaker_on_one_replica(cluster: _Cluster):
+    """空いていれば同じ話者は同じレプリカに送り、アフィニティなしでは件数の少ないレプリカに回す"""
+    replicas = [cluster.serve("a"), cluster.serve("b"), cluster.serve("remote", http=True)]
+    with Router(replicas, health_interval=0) as router:
+        for speaker in ("alice", "bob"):
+            assert len({_replica_of(router, speaker) for _ in range(4)}) == 1
+    fresh = [Replica(r.name, r.client) for r in replicas]
+    with Router(fresh, affinity=False, health_interval=0) as router:
+        assert len({_replica_of(router, "alice") for _ in range(3)}) == 3
+
+
+def test_concurrent_load_spreads_across_replicas(cluster: _Cluster):
+    """同時に多くのリクエストが来ると、優先するレプリカが混んだ分は他のレプリカに回す"""
+    replicas = [cluster.serve("a"), cluster.serve("b"), cluster.serve("remote", http=True)]
+    with Router(replicas, policy="least-loaded", health_interval=0) as router:
+        with ThreadPoolExecutor(max_workers=9) as pool:
+            used = list(pool.map(lambda i: _replica_of(router, "alice", "あ" * 20), range(18)))
+        stats = router.stats()
+    assert len(set(used)) == 3
+    assert stats["requests"] == 18 and stats["failovers"] == 0
+    assert all(r["inflight"] == 0 for r in stats["replicas"])
+
+
+def test_routes_only_to_replicas_with_speaker(cluster: _Cluster):
+    """話者が登録されているレプリカだけに送り、どこにもいない話者は LookupError"""
+    replicas = [cluster.serve("a"), cluster.serve("carol-only", speakers=("carol",))]
+    with Router(replicas, health_interval=0) as router:
+        assert _replica_of(router, "carol") == "carol-only"
+        assert _replica_of(router, "alice") == "a"
+        with pytest.raises(LookupError):
+            router.synthesize_bytes("こんにちは", "dave")
+        assert router.health()["speakers"] == ["alice", "bob", "carol"]
+
+
+def test_failover_and_recovery(cluster: _Cluster):
+    """止まったレプリカへのリクエストは別のレプリカで送り直し、ヘルスチェックで外す・戻す"""
+    replicas = [cluster.serve("a"), cluster.serve("b")]
+    with Router(replicas, health_interval=0) as router:
+        preferred = _replica_of(router, "alice")
+        other = "b" if preferred == "a" else "a"
+        cluster.servers[preferred].close()
+
+        assert _replica_of(router, "alice") == other
+        stats = router.stats()
+        assert stats["failovers"] == 1
+        down = next(r for r in stats["replicas"] if r["name"] == preferred)
+        assert not down["healthy"] and down["errors"] == 1 and down["last_error"]
+        assert _replica_of(router, "alice") == other
+
+        cluster.servers[other].close()
+        with pytest.raises(ServerUnavailableError):
+            router.synthesize_bytes("こんにちは", "alice")
+        assert router.health()["status"] == "unavailable"
+
+        replicas_by_name = {r.name: r for r in replicas}
+        restarted = cluster.serve(preferred)
+        replicas_by_name[preferred].client = restarted.client
+        router.check_health()
+        assert _replica_of(router, "alice") == preferred
+        assert router.stats()["failed"] == 1
+
+
+def test_failover_when_replica_dies_mid_request(cluster: _Cluster, tmp_path: Path):
+    """処理中に接続が切れたレプリカは外して別のレプリカで送り直し、話者のいるレプリカが尽きたら 503 相当"""
+    replicas = [cluster.serve("a"), cluster.serve("b"), cluster.serve("carol-only", speakers=("carol",))]
+    dropping = DroppingSocket(tmp_path / "drop.sock")
+    try:
+        with Router(replicas, health_interval=0) as router:
+            preferred = _replica_of(router, "alice")
+            by_name = {r.name: r for r in replicas}
+            by_name[preferred].client = SynthesisClient(dropping.path)
+            by_name["carol-only"].client = SynthesisClient(dropping.path)
+
+            assert _replica_of(router, "alice") != preferred
+            stats = router.stats()
+            assert stats["failovers"] == 1 and dropping.received == 1
+            down = next(r for r in stats["replicas"] if r["name"] == preferred)
+            assert not down["healthy"] and "途切れました" in down["last_error"]
+
+            # carol がいるレプリカは処理中に止まり、残りのレプリカには carol がいない
+            with pytest.raises(ServerUnavailableError, match="途切れました"):
+                router.synthesize_bytes("こんにちは", "carol")
+            assert dropping.received == 2 and router.stats()["failed"] == 1
+    finally:
+        dropping.close()
+
+
+def test_router_server_speaks_daemon_api(cluster: _Cluster):
+    """RouterServer は合成デーモンと同じ API で待ち受け、SynthesisClient がそのまま使える"""
+    replicas = [cluster.serve("a"), cluster.serve("remote", http=True)]
+    with Router(replicas, health_interval=0) as router, RouterServer(router, port=0) as server:
+        server.start()
+        client = SynthesisClient(url=server.address)
+        assert client.is_available()
+        assert client.speakers() == ["alice", "bob"]
+        pcm, headers = client.synthesize_bytes("こんにちは", "alice", audio_format="pcm", priority="system", user="u1")
+        assert len(pcm) > 0 and headers[HEADER_REPLICA] in ("a", "remote")
+        assert int(headers["X-Sample-Rate"]) > 0
+        wav, _ = client.synthesize("こんにちは", "bob")
+        assert len(wav) > 0
+        with pytest.raises(ValueError, match="話者が登録されていません"):
+            client.synthesize("こんにちは", "dave")
+        with pytest.raises(ValueError, match="language"):
+            client.synthesize("hello", "alice", language="fr")
+        assert client.stats()["requests"] == 4
+
+
+def _write_metadata(tmp_path: Path) -> Path:
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(float_to_wav_bytes(0.3 * np.sin(np.arange(24000, dtype=np.float32) * 0.05), 24000))
+    metadata = tmp_path / "data" / "metadata.csv"
+    metadata.parent.mkdir()
+    metadata.write_text(
+        "sample_id,speaker_name,audio_path,corpus_text,language\n"
+        f"001,alice,{ref},参照です,ja\n"
+        f"002,bob,{ref},参照です,ja\n",
+        encoding="utf-8",
+    )
+    return metadata
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="コアの固定は Linux のみ")
+def test_local_worker_processes(tmp_path: Path):
+    """コアに固定したローカルワーカーのプロセスに振り分け、処理中に止まったワーカーへのリクエストは別のワーカーで送り直して起動し直す"""
+    metadata = _write_metadata(tmp_path)
+    core = sorted(os.sched_getaffinity(0))[0]
+    daemon_args = [
+        "--metadata", str(metadata), "--backend", "fake", "--raw-reference", "--no-prompt-store",
+        "--watch-interval", "0", "--max-wait-ms", "0", "--fake-latency-per-char", "0.01",
+    ]  # fmt: skip
+    workers = [
+        LocalWorker(tmp_path / f"w{i}.sock", daemon_args, cores=[core], log_path=tmp_path / f"w{i}.log",
+                    restart_backoff_sec=0)
+        for i in range(2)
+    ]  # fmt: skip
+    router = Router([Replica.local(w, f"w{i}") for i, w in enumerate(workers)], health_interval=0)
+    try:
+        for w in workers:
+            w.start()
+        for w in workers:
+            assert w.wait_ready(timeout=120), (tmp_path / "w0.log").read_text(errors="replace")
+            assert os.sched_getaffinity(w.pid) == {core}
+            assert "--threads" in w.command() and "--cores" in w.command()
+        router.start()
+        preferred = _replica_of(router, "alice")
+        assert router.health()["speakers"] == ["alice", "bob"]
+
+        victim = workers[int(preferred[1])]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            inflight = pool.submit(_replica_of, router, "alice", "あ" * 300)
+            time.sleep(0.5)
+            assert router.stats()["replicas"][int(preferred[1])]["inflight"] == 1
+            victim._process.kill()
+            victim._process.wait()
+            assert inflight.result(timeout=60) != preferred
+        assert router.stats()["failovers"] == 1
+
+        router.check_health()
+        assert victim.restarts == 1 and router.stats()["restarts"] == 1
+        assert victim.wait_ready(timeout=120)
+        router.check_health()
+        assert _replica_of(router, "alice") == preferred
+    finally:
+        router.close()
+    assert not any(w.alive for w in workers)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,180 @@
+# coding=utf-8
+"""
+マイクロバッチングスケジューラ（BatchScheduler）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_scheduler.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.scheduler import BatchScheduler, QueueFullError
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def _batch_sizes(wrapper: Qwen3TTSWrapper) -> list[int]:
+    return [len(c["text"]) for c in wrapper._model.generate_calls]
+
+
+def test_requests_in_window_are_batched(wrapper, ref):
+    """待ち時間内に届いたリクエストは 1 回の生成にまとめられ、各自の音声が返る"""
+    texts = ["おはよう", "草", "了解です", "こんばんは"]
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_size=8) as scheduler:
+        futures = [scheduler.submit(t, ref, "参照") for t in texts]
+        results = [f.result(timeout=5) for f in futures]
+
+    assert _batch_sizes(wrapper) == [4]
+    for text, result in zip(texts, results):
+        assert len(result.wav) == len(text) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+        assert result.sample_rate == FakeQwen3TTSModel.SAMPLE_RATE
+        assert result.batch_size == 4
+        assert result.queue_wait_sec >= 0.0
+        assert result.compute_sec >= 0.0
+
+
+def test_max_batch_size(wrapper, ref):
+    """件数上限でバッチを分ける"""
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_size=2) as scheduler:
+        futures = [scheduler.submit(f"テキスト{i}", ref, "参照") for i in range(5)]
+        for f in futures:
+            f.result(timeout=5)
+    assert _batch_sizes(wrapper) == [2, 2, 1]
+
+
+def test_token_budget(wrapper, ref):
+    """テキスト長の合計上限を超えるリクエストは次のバッチに回す"""
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_tokens=10) as scheduler:
+        futures = [scheduler.submit(t, ref, "参照") for t in ("あいうえお", "かきくけ", "さしすせそ")]
+        for f in futures:
+            f.result(timeout=5)
+    assert _batch_sizes(wrapper) == [2, 1]
+
+
+def test_queue_full(wrapper, ref, monkeypatch: pytest.MonkeyPatch):
+    """キューが上限に達すると QueueFullError"""
+    gate = threading.Event()
+    original = wrapper.generate_voice_batch
+
+    def blocked(*args, **kwargs):
+        gate.wait(timeout=5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(wrapper, "generate_voice_batch", blocked)
+    scheduler = BatchScheduler(wrapper, max_wait_ms=0, max_batch_size=1, max_queue_size=2)
+    try:
+        first = scheduler.submit("一", ref, "参照")
+        # ワーカーが 1 件目を取り出して生成中になるまで待つ
+        for _ in range(100):
+            if scheduler.queue_depth() == 0:
+                break
+            threading.Event().wait(0.01)
+        scheduler.submit("二", ref, "参照")
+        scheduler.submit("三", ref, "参照")
+        with pytest.raises(QueueFullError):
+            scheduler.submit("四", ref, "参照")
+        assert scheduler.stats()["queue_depth"] == 2
+    finally:
+        gate.set()
+        scheduler.close()
+    assert first.result(timeout=5).wav.size > 0
+    assert scheduler.stats()["completed"] == 3
+
+
+def test_failure_propagates(wrapper, ref, monkeypatch: pytest.MonkeyPatch):
+    """1 件ずつ生成し直しても失敗するリクエストの Future には例外が設定される"""
+    def fail(*args, **kwargs):
+        raise RuntimeError("音声生成に失敗しました: boom")
+
+    monkeypatch.setattr(wrapper, "generate_voice_batch", fail)
+    with BatchScheduler(wrapper, max_wait_ms=100) as scheduler:
+        futures = [scheduler.submit(t, ref, "参照") for t in ("一", "二")]
+        for f in futures:
+            with pytest.raises(RuntimeError, match="boom"):
+                f.result(timeout=5)
+        stats = scheduler.stats()
+    assert stats["failed"] == 2 and stats["completed"] == 0
+
+
+def test_failure_is_isolated_to_its_request(wrapper, ref, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """参照音声がない・生成に失敗するリクエストだけが失敗し、同じバッチの他のリクエスト（長文のセグメントを含む）は完了する"""
+    generate = wrapper._model.generate_voice_clone
+    attempts: list[int] = []
+
+    def fail_on_bad_text(*, text, **kwargs):
+        attempts.append(len(text))
+        if any("だめ" in t for t in ([text] if isinstance(text, str) else text)):
+            raise RuntimeError("boom")
+        return generate(text=text, **kwargs)
+
+    monkeypatch.setattr(wrapper._model, "generate_voice_clone", fail_on_bad_text)
+    long_text = "今日は朝から雨が降っていました。駅まで歩くのをやめてバスに乗りました。"
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_size=8, segment_chars=20) as scheduler:
+        ok = scheduler.submit("おはよう", ref, "参照", user="alice")
+        long_job = scheduler.submit(long_text, ref, "参照", user="bob")
+        missing = scheduler.submit("こんにちは", str(tmp_path / "missing.wav"), "参照", user="carol")
+        bad = scheduler.submit("だめです", ref, "参照", user="dave")
+        assert len(ok.result(timeout=5).wav) == len("おはよう") * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+        assert long_job.result(timeout=5).segments == 2
+        with pytest.raises(FileNotFoundError):
+            missing.result(timeout=5)
+        with pytest.raises(RuntimeError, match="boom"):
+            bad.result(timeout=5)
+        stats = scheduler.stats()
+    assert stats["failed"] == 2 and stats["completed"] == 2
+    # まとめたバッチが失敗し、1 件ずつ生成し直した
+    assert attempts[0] > 1 and set(attempts[1:]) == {1}
+
+
+def test_submit_validation(wrapper, ref):
+    """空テキスト・未対応言語・停止後の submit"""
+    scheduler = BatchScheduler(wrapper)
+    with pytest.raises(ValueError):
+        scheduler.submit(" ", ref, "参照")
+    with pytest.raises(ValueError):
+        scheduler.submit("テスト", ref, "参照", language="French")
+    scheduler.close()
+    with pytest.raises(RuntimeError, match="停止"):
+        scheduler.submit("テスト", ref, "参照")
+
+
+def test_stats(wrapper, ref):
+    """待ち時間と生成時間の統計"""
+    with BatchScheduler(wrapper, max_wait_ms=50) as scheduler:
+        for f in [scheduler.submit("テスト", ref, "参照") for _ in range(3)]:
+            f.result(timeout=5)
+        stats = scheduler.stats()
+    assert stats["submitted"] == 3
+    assert stats["completed"] == 3
+    assert stats["batches"] == 1
+    assert stats["avg_batch_size"] == 3.0
+    assert stats["avg_queue_wait_sec"] >= 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,210 @@
+# coding=utf-8
+"""
+常駐合成デーモン（src.server）とクライアントの単体テスト
+
+実行方法:
+    python -m pytest tests/test_server.py -v
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+
+from src.audio import float_to_wav_bytes, wav_bytes_to_float
+from src.server import ServerError, ServerUnavailableError, SynthesisClient, SynthesisServer
+from src.tools.test_synthesis import BulkItem, run_bulk
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer
+from tests.fakes import DroppingSocket, use_fake_model
+
+
+@pytest.fixture
+def synthesizer(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    use_fake_model(monkeypatch)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    synth = MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry())
+    synth.register_speaker("alice", str(ref), "参照", "ja")
+    yield synth
+    synth.close()
+
+
+@pytest.fixture
+def server(synthesizer: MultiSpeakerSynthesizer, tmp_path: Path):
+    with SynthesisServer(synthesizer, socket_path=tmp_path / "tts.sock", max_wait_ms=200) as srv:
+        srv.start()
+        yield srv
+
+
+def test_wav_bytes_roundtrip():
+    """float 音声 → WAV バイト列 → float 音声で 16bit の精度に戻る"""
+    wav = np.sin(np.linspace(0, 20, 2400)).astype(np.float32) * 0.5
+    restored, sr = wav_bytes_to_float(float_to_wav_bytes(wav, 24000))
+    assert sr == 24000
+    assert np.allclose(restored, wav, atol=1e-4)
+    with pytest.raises(ValueError):
+        wav_bytes_to_float(b"not a wav")
+
+
+def test_health_and_speakers(server: SynthesisServer):
+    """ソケットは所有者のみ読み書きでき、health / speakers を返す"""
+    assert server.socket_path.stat().st_mode & 0o777 == 0o600
+    client = SynthesisClient(server.socket_path)
+    assert client.is_available()
+    health = client.health()
+    assert health["status"] == "ok"
+    assert health["speakers"] == ["alice"]
+    assert client.speakers() == ["alice"]
+
+
+def test_synthesize_wav_and_pcm(server: SynthesisServer):
+    """WAV と生 PCM（s16le）で同じ音声を返し、サンプリングレート等をヘッダで返す"""
+    client = SynthesisClient(server.socket_path)
+    wav, sr = client.synthesize("こんにちは", speaker="alice")
+    assert sr > 0 and len(wav) > 0
+
+    pcm, headers = client.synthesize_bytes("こんにちは", "alice", audio_format="pcm")
+    assert int(headers["X-Sample-Rate"]) == sr
+    assert headers["Content-Type"].startswith("audio/L16")
+    assert len(pcm) == 2 * len(wav)
+    assert float(headers["X-Compute-Sec"]) >= 0
+
+
+def test_concurrent_clients_are_batched(server: SynthesisServer):
+    """同時に来たリクエストはまとめて 1 回の生成になる"""
+    client = SynthesisClient(server.socket_path)
+    texts = [f"テキスト{i}です。" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda t: client.synthesize_bytes(t, "alice"), texts))
+    assert max(int(headers["X-Batch-Size"]) for _, headers in results) > 1
+    assert server.stats()["completed"] == 4
+    assert server.stats()["batches"] < 4
+    assert server.stats()["memory"]["batches"] == server.stats()["batches"]
+
+
+def test_error_statuses(server: SynthesisServer):
+    """入力不正・未登録の話者は ValueError、未知のパスは 404"""
+    client = SynthesisClient(server.socket_path)
+    with pytest.raises(ValueError, match="話者が登録されていません"):
+        client.synthesize("こんにちは", speaker="bob")
+    with pytest.raises(ValueError, match="text"):
+        client.synthesize(" ", speaker="alice")
+    with pytest.raises(ValueError, match="language"):
+        client.synthesize("hello", speaker="alice", language="fr")
+    with pytest.raises(ValueError, match="format"):
+        client._request("POST", "/synthesize", {"text": "a", "speaker": "alice", "format": "mp3"})
+    with pytest.raises(ValueError, match="不明なパス"):
+        client._get_json("/nothing")
+
+
+def test_http_transport(synthesizer: MultiSpeakerSynthesizer):
+    """port を指定すると localhost の HTTP で待ち受ける"""
+    with SynthesisServer(synthesizer, port=0) as srv:
+        srv.start()
+        client = SynthesisClient(url=srv.address)
+        wav, sr = client.synthesize("hello", speaker="alice", language="en")
+        assert len(wav) > 0
+    assert not client.is_available()
+
+
+def test_stale_socket_and_running_server(synthesizer: MultiSpeakerSynthesizer, tmp_path: Path):
+    """前回のソケットファイルは置き換え、動いているデーモンがあれば起動しない"""
+    path = tmp_path / "tts.sock"
+    path.write_bytes(b"")
+    with SynthesisServer(synthesizer, socket_path=path) as srv:
+        srv.start()
+        with pytest.raises(RuntimeError, match="既に起動"):
+            SynthesisServer(synthesizer, socket_path=path)
+    assert not path.exists()
+
+
+def test_client_without_server(tmp_path: Path):
+    """デーモンが起動していなければ is_available は False、依頼すると ServerUnavailableError"""
+    client = SynthesisClient(tmp_path / "missing.sock")
+    assert not client.is_available()
+    with pytest.raises(ServerUnavailableError):
+        client.synthesize("こんにちは", speaker="alice")
+    assert issubclass(ServerUnavailableError, ServerError)
+    with pytest.raises(ValueError):
+        SynthesisClient(url="ftp://localhost")
+
+
+def test_client_dropped_connection_is_unavailable(tmp_path: Path):
+    """リクエストの送信後にデーモンが接続を閉じると ServerUnavailableError"""
+    dropping = DroppingSocket(tmp_path / "drop.sock")
+    try:
+        client = SynthesisClient(dropping.path)
+        with pytest.raises(ServerUnavailableError, match="途切れました"):
+            client.synthesize("こんにちは", speaker="alice")
+        assert not client.is_available()
+    finally:
+        dropping.close()
+
+
+def test_timed_out_request_is_not_generated(synthesizer: MultiSpeakerSynthesizer, tmp_path: Path):
+    """request_timeout を過ぎたリクエストはキャンセルされ、キューから取り出されても生成しない"""
+    synthesizer.wrapper._model.latency_per_char_sec = 0.05
+    with SynthesisServer(
+        synthesizer, socket_path=tmp_path / "tts.sock", max_wait_ms=0, max_batch_size=1, request_timeout=0.3
+    ) as srv:
+        srv.start()
+        client = SynthesisClient(srv.socket_path)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            blocker = pool.submit(client.synthesize, "あ" * 10, "alice")
+            time.sleep(0.1)
+            with pytest.raises(ServerError, match="秒以内に終わりませんでした"):
+                client.synthesize("いいい", speaker="alice")
+            with pytest.raises(ServerError):
+                blocker.result(timeout=10)
+    # close() はキューに残ったリクエストを処理してから終わる
+    texts = [t for c in synthesizer.wrapper._model.generate_calls for t in c["text"]]
+    assert "いいい" not in texts
+
+
+def test_run_bulk_through_client(server: SynthesisServer, tmp_path: Path):
+    """バルクモードはクライアント経由でも同じように合成・保存する"""
+    client = SynthesisClient(server.socket_path)
+    items = [
+        BulkItem(speaker="alice", text="一つ目。", language="ja", output=tmp_path / "out" / "1.wav"),
+        BulkItem(speaker="bob", text="二つ目。", language="ja", output=tmp_path / "out" / "2.wav"),
+    ]
+    result = run_bulk(items, client)
+    assert result["completed"] == 1
+    assert result["failed"] == 1
+    assert (tmp_path / "out" / "1.wav").exists()
+
+
+def test_cli_uses_running_daemon(server: SynthesisServer, tmp_path: Path):
+    """デーモンが応答すれば CLI はモデルも torch も読み込まずに合成する"""
+    output = tmp_path / "cli.wav"
+    code = (
+        "import sys; from src.tools.test_synthesis import main; main(); "
+        "assert 'torch' not in sys.modules, 'torch'"
+    )
+    proc = subprocess.run(
+        [
+            sys.executable, "-c", code, "--speaker", "alice", "--text", "こんにちは",
+            "--socket", str(server.socket_path), "--output", str(output),
+        ],
+        cwd=_PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert output.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
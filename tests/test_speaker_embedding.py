@@ -0,0 +1,209 @@
+# coding=utf-8
+"""
+x-vector のみモード（話者埋め込みの融合、Qwen3TTSWrapper.get_speaker_embedding_prompt、
+MultiSpeakerSynthesizer(clone_mode="xvector")）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_speaker_embedding.py -v
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tools.benchmark import run_clone_mode_benchmark
+from src.tts.audio_cache import AudioCache
+from src.tts.fake_model import make_fake_loader
+from src.tts.model_registry import ModelRegistry
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.scheduler import BatchScheduler
+from src.tts.speaker_embedding import fuse_speaker_embeddings
+from src.tts.synthesizer import MultiSpeakerSynthesizer
+from tests.fakes import use_fake_model
+
+
+@pytest.fixture
+def refs(tmp_path: Path) -> list[str]:
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"ref{i}.wav"
+        path.write_bytes(b"ref%d" % i)
+        paths.append(str(path))
+    return paths
+
+
+def _last_prompt(wrapper: Qwen3TTSWrapper) -> list:
+    return wrapper._model.generate_calls[-1]["voice_clone_prompt"]
+
+
+def test_fuse_mean_keeps_norm():
+    """mean は重み付き平均の向きで、ノルムを各埋め込みのノルムの重み付き平均に合わせる"""
+    a = torch.tensor([3.0, 0.0])
+    b = torch.tensor([0.0, 1.0])
+    fused = fuse_speaker_embeddings([a, b], weights=[1.0, 1.0])
+    assert fused.norm().item() == pytest.approx(2.0)
+    assert fused[0] > fused[1] > 0
+    weighted = fuse_speaker_embeddings([a, b], weights=[0.0, 1.0])
+    assert torch.allclose(weighted, b)
+    assert fuse_speaker_embeddings([a]) is a
+
+
+def test_fuse_median_ignores_outlier():
+    """median は要素ごとの中央値で、他と大きく異なるサンプルの影響を受けない"""
+    embeddings = [torch.tensor([1.0, 1.0]), torch.tensor([1.2, 0.8]), torch.tensor([100.0, -100.0])]
+    fused = fuse_speaker_embeddings(embeddings, method="median")
+    assert torch.allclose(fused, torch.tensor([1.2, 0.8]))
+    half = fuse_speaker_embeddings([e.half() for e in embeddings], method="median")
+    assert half.dtype == torch.float16
+
+
+def test_fuse_rejects_invalid_input():
+    """空・形の不一致・未対応の方法・不正な重みは ValueError"""
+    a = torch.ones(4)
+    with pytest.raises(ValueError):
+        fuse_speaker_embeddings([])
+    with pytest.raises(ValueError):
+        fuse_speaker_embeddings([a, torch.ones(3)])
+    with pytest.raises(ValueError):
+        fuse_speaker_embeddings([a, a], method="max")
+    with pytest.raises(ValueError):
+        fuse_speaker_embeddings([a, a], weights=[1.0])
+    with pytest.raises(ValueError):
+        fuse_speaker_embeddings([a, a], weights=[-1.0, 2.0])
+
+
+def test_embedding_prompt_is_cached_and_discarded(monkeypatch: pytest.MonkeyPatch, refs: list[str]):
+    """全サンプルの埋め込みを 1 回だけ計算してキャッシュし、サンプルの 1 つを無効化すると破棄する"""
+    use_fake_model(monkeypatch)
+    wrapper = Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    prompt = wrapper.get_speaker_embedding_prompt(refs)
+    assert len(prompt) == 1
+    assert prompt[0].x_vector_only_mode and prompt[0].ref_code is None
+    assert wrapper._model.prompt_calls and len(wrapper._model.prompt_calls) == 3
+
+    assert wrapper.get_speaker_embedding_prompt(refs) is prompt
+    assert wrapper.get_speaker_embedding_prompt(refs, "median") is not prompt
+    assert len(wrapper._model.prompt_calls) == 6
+
+    wrapper.invalidate_voice_clone_prompt(refs[1])
+    assert wrapper.get_speaker_embedding_prompt(refs) is not prompt
+    with pytest.raises(ValueError):
+        wrapper.get_speaker_embedding_prompt([])
+    with pytest.raises(ValueError):
+        wrapper.get_speaker_embedding_prompt(refs, "max")
+
+
+def test_generate_with_embedding_prompt_skips_ref_text(monkeypatch: pytest.MonkeyPatch, refs: list[str]):
+    """voice_clone_prompt を渡した生成は参照テキストが空でもよく、渡したプロンプトをそのまま使う"""
+    use_fake_model(monkeypatch)
+    wrapper = Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    prompt = wrapper.get_speaker_embedding_prompt(refs)
+    wav, _ = wrapper.generate_voice("こんにちは", refs[0], "", voice_clone_prompt=prompt)
+    assert len(wav) > 0
+    assert _last_prompt(wrapper) == prompt
+    with pytest.raises(ValueError):
+        wrapper.generate_voice("こんにちは", refs[0], "")
+
+
+def test_synthesizer_xvector_mode(monkeypatch: pytest.MonkeyPatch, refs: list[str]):
+    """clone_mode="xvector" は話者の全サンプルを融合したプロンプトで生成し、音声キャッシュのキーも分ける"""
+    use_fake_model(monkeypatch)
+    samples = [(f"00{i}", path) for i, path in enumerate(refs)]
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry(), clone_mode="xvector") as synth:
+        profile = synth.register_speaker("alice", refs[0], "参照", samples=samples)
+        assert profile.embedding_paths == tuple(refs)
+        synth.synthesize("こんにちは", "alice")
+        prompt = _last_prompt(synth.wrapper)
+        assert prompt[0].x_vector_only_mode
+        assert synth.get_speaker_prompt("alice") is prompt
+
+        synth.unregister_speaker("alice")
+        synth.register_speaker("alice", refs[0], "参照")
+        assert synth.get_speaker_prompt("alice") is not prompt
+
+    with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry()) as synth:
+        synth.register_speaker("alice", refs[0], "参照", samples=samples)
+        assert synth.get_speaker("alice").embedding_paths == ()
+        assert synth.get_speaker_prompt("alice") is None
+        synth.synthesize("こんにちは", "alice")
+        assert not _last_prompt(synth.wrapper)[0].x_vector_only_mode
+    with pytest.raises(ValueError):
+        MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry(), clone_mode="icl")
+
+
+def test_xvector_audio_cache_key_tracks_every_sample(monkeypatch: pytest.MonkeyPatch, refs: list[str], tmp_path: Path):
+    """融合する参照音声のどれかを撮り直すと、再起動後もディスクの音声キャッシュを使わずに生成し直す"""
+    use_fake_model(monkeypatch)
+    samples = [(f"00{i}", path) for i, path in enumerate(refs)]
+    disk = tmp_path / "audio_cache"
+
+    def synthesize() -> int:
+        cache = AudioCache(max_entries=0, disk_dir=disk)
+        with MultiSpeakerSynthesizer(device="cpu", registry=ModelRegistry(), clone_mode="xvector", audio_cache=cache) as synth:
+            synth.register_speaker("alice", refs[0], "参照", samples=samples)
+            synth.synthesize("こんにちは", "alice")
+            return len(synth.wrapper._model.generate_calls)
+
+    assert synthesize() == 1
+    assert synthesize() == 0
+    Path(refs[2]).write_bytes(b"re-recorded")
+    st = os.stat(refs[2])
+    os.utime(refs[2], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert synthesize() == 1
+
+
+def test_scheduler_mixes_prompt_modes(monkeypatch: pytest.MonkeyPatch, refs: list[str]):
+    """スケジューラはプロンプト指定のリクエストと参照音声からのリクエストを同じバッチにまとめられる"""
+    use_fake_model(monkeypatch)
+    wrapper = Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+    prompt = wrapper.get_speaker_embedding_prompt(refs)
+    with BatchScheduler(wrapper, max_wait_ms=300, max_batch_size=8) as scheduler:
+        futures = [
+            scheduler.submit("おはよう", refs[0], "", voice_clone_prompt=prompt),
+            scheduler.submit("こんばんは", refs[1], "参照"),
+        ]
+        for f in futures:
+            f.result(timeout=5)
+        with pytest.raises(ValueError):
+            scheduler.submit("おはよう", refs[0], "")
+    items = _last_prompt(wrapper)
+    assert [item.x_vector_only_mode for item in items] == [True, False]
+
+
+def test_clone_mode_benchmark_with_fake_backend(monkeypatch: pytest.MonkeyPatch, refs: list[str]):
+    """偽モデルで両方のモードを計測でき、xvector のプロンプトは参照音声コードを持たない"""
+    use_fake_model(monkeypatch)
+    results = run_clone_mode_benchmark(
+        samples=[(path, "参照") for path in refs],
+        language="Japanese",
+        model_name="fake",
+        device="cpu",
+        dtype=torch.float32,
+        texts=["おはよう", "了解です", "こんばんは"],
+        model_loader=make_fake_loader(prompt_latency_sec=0.01, generate_latency_sec=0.005),
+    )
+    assert set(results) == {"full", "xvector"}
+    assert results["full"]["ref_code_frames"] > 0
+    assert results["xvector"]["ref_code_frames"] == 0
+    assert results["xvector"]["prompt_kb"] < results["full"]["prompt_kb"]
+    for r in results.values():
+        assert r["prompt_sec"] >= 0.01
+        assert 0 < r["rtf"] and r["peak_vram_mb"] is None
+    with pytest.raises(ValueError):
+        run_clone_mode_benchmark(
+            samples=[], language="Japanese", model_name="fake", device="cpu", dtype=torch.float32, texts=["a"]
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
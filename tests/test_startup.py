@@ -0,0 +1,147 @@
+# coding=utf-8
+"""
+起動の高速化（src.tts の遅延 import と src.tts.startup）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_startup.py -v
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import torch
+
+import src.tts
+from src.profile import PromptArtifactStore
+from src.tts import ModelRegistry
+from src.tts.fake_model import make_fake_loader
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.startup import StartupReport, prepare_reference, start_model_load
+from tests.fakes import use_fake_model
+
+MODEL = "Qwen/Qwen3-TTS-12Hz-1.7B-Base"
+
+
+def test_light_imports_do_not_load_torch():
+    """src.tts と CLI の import だけでは torch を読み込まない（--list-speakers 等が速い）"""
+    code = (
+        "import sys; import src.tts, src.tts.startup, src.tools.test_synthesis; "
+        "assert 'torch' not in sys.modules, 'torch'; assert 'qwen_tts' not in sys.modules, 'qwen_tts'"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=_PROJECT_ROOT, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+
+def test_lazy_exports():
+    """公開名は初回アクセス時に定義元モジュールから読み込む"""
+    from src.tts.voice_clone import VoiceCloneManager
+
+    assert src.tts.VoiceCloneManager is VoiceCloneManager
+    assert "Qwen3TTSWrapper" in dir(src.tts)
+    with pytest.raises(AttributeError):
+        src.tts.NoSuchName
+
+
+def test_startup_report_records_threads():
+    """各段階の時刻とスレッドを記録し、並行化による短縮を表示する"""
+    report = StartupReport()
+
+    def work() -> None:
+        with report.phase("background"):
+            time.sleep(0.1)
+
+    t = threading.Thread(target=work, name="worker")
+    t.start()
+    with report.phase("main"):
+        time.sleep(0.1)
+    t.join()
+
+    phases = {p.name: p for p in report.phases()}
+    assert phases["background"].thread == "worker"
+    assert phases["main"].duration >= 0.1
+    text = report.render()
+    assert "background" in text and "並行化による短縮" in text
+
+
+def test_model_load_overlaps_other_work(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """モデルのロード中に参照音声の準備を進め、ロード済みモデルはレジストリで共有される"""
+    use_fake_model(monkeypatch)
+    registry = ModelRegistry()
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+
+    report = StartupReport()
+    start = time.perf_counter()
+    future = start_model_load(
+        MODEL, "cpu", torch.float32, registry=registry, report=report, model_loader=make_fake_loader(load_latency_sec=0.3)
+    )
+    with report.phase("main_work"):
+        time.sleep(0.3)
+        prepared = prepare_reference(ref, "参照", model_name=MODEL, device="cpu", dtype=torch.float32, report=report)
+    wrapper = future.result(timeout=5)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.55
+    assert registry.acquire(MODEL, "cpu", torch.float32) is wrapper
+    assert registry.refcount(MODEL, "cpu", torch.float32) == 2
+    names = {p.name for p in report.phases()}
+    assert {"import", "model_load", "main_work", "ref_decode"} <= names
+    assert prepared.prompt is None and isinstance(prepared.audio[0], np.ndarray)
+
+
+def test_model_load_failure_is_runtime_error(monkeypatch: pytest.MonkeyPatch):
+    """ロードの失敗は RuntimeError として Future に設定される"""
+    registry = ModelRegistry()
+
+    def fail(*args, **kwargs):
+        raise OSError("no weights")
+
+    monkeypatch.setattr(registry, "acquire", fail)
+    future = start_model_load(MODEL, "cpu", torch.float32, registry=registry)
+    with pytest.raises(RuntimeError, match="no weights"):
+        future.result(timeout=5)
+
+
+def test_prepare_reference_uses_prompt_store(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """成果物がなければデコード済み音声から計算して保存し、次回は成果物を読み込む"""
+    use_fake_model(monkeypatch)
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"ref")
+    store = PromptArtifactStore(tmp_path / "prompts")
+    wrapper = Qwen3TTSWrapper(model_name=MODEL, device="cpu", dtype=torch.float32)
+
+    first = prepare_reference(ref, "参照", model_name=MODEL, device="cpu", dtype=torch.float32, store=store, sample_id="001")
+    assert first.prompt is None and first.audio is not None
+    assert first.install(wrapper, store) is False
+    # デコード済みの音声をそのまま渡す（wrapper 側では読み込まない）
+    assert wrapper._model.prompt_calls[0] is first.audio
+    assert store.path_for("001").exists()
+
+    second = prepare_reference(ref, "参照", model_name=MODEL, device="cpu", dtype=torch.float32, store=store, sample_id="001")
+    assert second.prompt is not None and second.audio is None
+    fresh = Qwen3TTSWrapper(model_name=MODEL, device="cpu", dtype=torch.float32)
+    assert second.install(fresh, store) is True
+    fresh.generate_voice("テスト", str(ref), "参照")
+    assert fresh._model.prompt_calls == []
+
+
+def test_prepare_reference_missing_audio(tmp_path: Path):
+    """参照音声がなければ FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        prepare_reference(tmp_path / "missing.wav", "参照", model_name=MODEL)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+# coding=utf-8
+"""
+ストリーミング合成（split_sentences / generate_voice_stream / float_to_pcm16）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_streaming.py -v
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pytest
+import torch
+
+from src.audio import float_to_pcm16
+from src.tts import ModelRegistry, VoiceCloneManager
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.text_segmenter import split_sentences
+from tests.fakes import FakeQwen3TTSModel, use_fake_model
+
+
+@pytest.fixture
+def wrapper(monkeypatch: pytest.MonkeyPatch) -> Qwen3TTSWrapper:
+    use_fake_model(monkeypatch)
+    return Qwen3TTSWrapper(device="cpu", dtype=torch.float32)
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("こんにちは。元気？うん！", ["こんにちは。", "元気？", "うん！"]),
+        ("「行こう。」と言った。", ["「行こう。」", "と言った。"]),
+        ("Hello world. Pi is 3.14! Really?", ["Hello world.", "Pi is 3.14!", "Really?"]),
+        ("一行目\n\n二行目", ["一行目", "二行目"]),
+        ("えっ！？本当", ["えっ！？", "本当"]),
+        ("句点なし", ["句点なし"]),
+        ("   ", []),
+    ],
+)
+def test_split_sentences(text, expected):
+    """日本語・英語の文末と改行で分割する"""
+    assert split_sentences(text) == expected
+
+
+def test_stream_yields_chunks_per_sentence(wrapper, ref):
+    """文ごとに生成し、chunk_ms ごとのチャンクで返す"""
+    chunks = list(wrapper.generate_voice_stream("あいう。かき。", ref, "参照", chunk_ms=50))
+    sr = FakeQwen3TTSModel.SAMPLE_RATE
+    step = sr * 50 // 1000
+    assert all(s == sr for _, s in chunks)
+    assert all(len(c) <= step for c, _ in chunks)
+    total = sum(len(c) for c, _ in chunks)
+    assert total == (4 + 3) * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+    assert [c["text"] for c in wrapper._model.generate_calls] == [["あいう。"], ["かき。"]]
+
+
+def test_stream_is_lazy(wrapper, ref):
+    """最初のチャンクは最初の文を生成しただけで得られる"""
+    stream = wrapper.generate_voice_stream("一文目。二文目。三文目。", ref, "参照")
+    assert wrapper._model.generate_calls == []
+    chunk, _ = next(stream)
+    assert chunk.dtype == np.float32
+    assert len(wrapper._model.generate_calls) == 1
+
+
+def test_stream_validates_eagerly(wrapper, ref):
+    """入力エラーはイテレーション前に送出される"""
+    with pytest.raises(ValueError):
+        wrapper.generate_voice_stream(" ", ref, "参照")
+    with pytest.raises(ValueError):
+        wrapper.generate_voice_stream("テスト", ref, "参照", language="French")
+    with pytest.raises(FileNotFoundError):
+        wrapper.generate_voice_stream("テスト", "/nonexistent.wav", "参照")
+
+
+def test_manager_synthesize_stream(monkeypatch: pytest.MonkeyPatch, ref):
+    """VoiceCloneManager.synthesize_stream"""
+    use_fake_model(monkeypatch)
+    with VoiceCloneManager(ref, "参照", device="cpu", registry=ModelRegistry()) as manager:
+        chunks = list(manager.synthesize_stream("おはよう。了解。", language="ja"))
+        assert sum(len(c) for c, _ in chunks) == 8 * FakeQwen3TTSModel.SAMPLES_PER_CHAR
+
+
+def test_float_to_pcm16():
+    """float → s16le（範囲外はクリップ）"""
+    data = float_to_pcm16(np.array([0.0, 1.0, -1.0, 2.0], dtype=np.float32))
+    assert len(data) == 8
+    assert np.frombuffer(data, dtype="<i2").tolist() == [0, 32767, -32767, 32767]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
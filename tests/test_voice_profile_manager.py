@@ -2,9 +2,10 @@
 """
 タスク5.6-4: VoiceProfileManager 単体テスト
 
-正常系: __init__, list_speakers, get_profile, get_all_profiles
+正常系: __init__, list_speakers, get_profile, get_all_profiles, get_sample,
+       JSON / SQLite のメタデータ、音声ファイルの存在確認の省略
 異常系: メタデータ不在 → FileNotFoundError, 必須カラム欠如 → ValueError,
-       存在しない話者 → ValueError
+       存在しない話者 → ValueError, sample_id の重複 → ValueError
 
 実行方法:
     cd /home/gohan/dev/Voice-clone-Qwen3-TTS
@@ -16,6 +17,9 @@
 
 from __future__ import annotations
 
+import csv
+import json
+import sqlite3
 import sys
 import tempfile
 from pathlib import Path
@@ -27,7 +31,7 @@ if str(_PROJECT_ROOT) not in sys.path:
 
 import pytest
 
-from src.profile import VoiceProfileManager
+from src.profile import VoiceProfile, VoiceProfileManager
 
 
 # メタデータパス（プロジェクトルート基準）
@@ -37,7 +41,7 @@ METADATA_PATH = _PROJECT_ROOT / "data" / "metadata.csv"
 def test_init_loads_metadata():
     """__init__: metadata.csv の正常な読み込み"""
     manager = VoiceProfileManager(str(METADATA_PATH))
-    assert manager._rows
+    assert manager.list_profiles()
     assert len(manager.list_speakers()) >= 1
 
 
@@ -105,5 +109,123 @@ def test_init_missing_required_columns():
         Path(tmp_path).unlink(missing_ok=True)
 
 
+def _write_project(tmp_path: Path, n_speakers: int = 3, per_speaker: int = 2) -> list[dict]:
+    """tmp_path/data に音声ファイルとプロファイルの行を作る。"""
+    samples = tmp_path / "data" / "voice_samples"
+    samples.mkdir(parents=True)
+    rows = []
+    for s in range(n_speakers):
+        for k in range(per_speaker):
+            sample_id = f"{s:03d}_{k}"
+            (samples / f"{sample_id}.wav").write_bytes(b"")
+            rows.append(
+                {
+                    "sample_id": sample_id,
+                    "speaker_name": f"speaker_{s}",
+                    "audio_path": f"data/voice_samples/{sample_id}.wav",
+                    "corpus_text": f"テキスト {sample_id}",
+                    "language": "JA" if k else "ja",
+                    "description": "",
+                }
+            )
+    return rows
+
+
+def _write_csv(path: Path, rows: list[dict]) -> Path:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def test_profiles_are_indexed_records(tmp_path: Path):
+    """プロファイルは不変のレコードで、辞書と同じキーで読め、同じオブジェクトを返す"""
+    rows = _write_project(tmp_path)
+    manager = VoiceProfileManager(str(_write_csv(tmp_path / "data" / "metadata.csv", rows)))
+    assert manager.list_speakers() == ["speaker_0", "speaker_1", "speaker_2"]
+    profile = manager.get_profile("speaker_1")
+    assert isinstance(profile, VoiceProfile)
+    assert profile["sample_id"] == profile.sample_id == "001_0"
+    assert "corpus_text" in profile and "missing" not in profile
+    assert profile.to_dict() == dict(profile)
+    assert dict(manager.get_all_profiles("speaker_1")[1])["language"] == "ja"
+    assert manager.get_profile("speaker_1") is profile
+    assert manager.get_sample("001_0") is profile
+    assert [p.sample_id for p in manager.list_profiles()] == [r["sample_id"] for r in rows]
+    with pytest.raises(AttributeError):
+        profile.corpus_text = "x"  # type: ignore[misc]
+    with pytest.raises(ValueError, match="sample_id が見つかりません"):
+        manager.get_sample("999")
+
+
+def test_json_and_sqlite_metadata(tmp_path: Path):
+    """JSON（配列 / {"profiles": ...}）と SQLite の profiles テーブルからも同じ内容を読む"""
+    rows = _write_project(tmp_path)
+    csv_manager = VoiceProfileManager(str(_write_csv(tmp_path / "data" / "metadata.csv", rows)))
+
+    json_path = tmp_path / "data" / "metadata.json"
+    json_path.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    wrapped_path = tmp_path / "data" / "wrapped.json"
+    wrapped_path.write_text(json.dumps({"profiles": rows}, ensure_ascii=False), encoding="utf-8")
+
+    db_path = tmp_path / "data" / "metadata.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE profiles (sample_id, speaker_name, audio_path, corpus_text, language, description)")
+    conn.executemany("INSERT INTO profiles VALUES (:sample_id, :speaker_name, :audio_path, :corpus_text, :language, :description)", rows)
+    conn.commit()
+    conn.close()
+
+    for path in (json_path, wrapped_path, db_path):
+        manager = VoiceProfileManager(str(path))
+        assert manager.list_profiles() == csv_manager.list_profiles()
+        assert manager.resolve_audio_path(manager.get_profile("speaker_2")).exists()
+
+    bad = tmp_path / "data" / "bad.json"
+    bad.write_text(json.dumps([{"sample_id": "1"}]), encoding="utf-8")
+    with pytest.raises(ValueError, match="必須カラムがありません"):
+        VoiceProfileManager(str(bad))
+
+
+def test_validate_files_optional(tmp_path: Path):
+    """音声ファイルがない行は既定で ValueError、validate_files=False なら読み込める"""
+    rows = _write_project(tmp_path)
+    rows[3]["audio_path"] = "data/voice_samples/missing.wav"
+    path = _write_csv(tmp_path / "data" / "metadata.csv", rows)
+    with pytest.raises(ValueError, match="行 5: 音声ファイルが存在しません"):
+        VoiceProfileManager(str(path))
+    manager = VoiceProfileManager(str(path), validate_files=False)
+    assert len(manager.list_profiles()) == len(rows)
+    with pytest.raises(ValueError):
+        manager.validate_files()
+
+
+def test_duplicate_sample_id(tmp_path: Path):
+    """sample_id の重複 → ValueError"""
+    rows = _write_project(tmp_path)
+    rows[1]["sample_id"] = rows[0]["sample_id"]
+    with pytest.raises(ValueError, match="行 3: sample_id が重複しています"):
+        VoiceProfileManager(str(_write_csv(tmp_path / "data" / "metadata.csv", rows)))
+
+
+def test_many_samples(tmp_path: Path):
+    """数万サンプルでも読み込み・検索できる（音声ファイルの確認は省略）"""
+    rows = [
+        {
+            "sample_id": str(i),
+            "speaker_name": f"speaker_{i // 4}",
+            "audio_path": f"data/voice_samples/{i}.wav",
+            "corpus_text": "テキスト",
+            "language": "ja",
+            "description": "",
+        }
+        for i in range(20000)
+    ]
+    (tmp_path / "data").mkdir()
+    manager = VoiceProfileManager(str(_write_csv(tmp_path / "data" / "metadata.csv", rows)), validate_files=False)
+    assert len(manager.list_speakers()) == 5000
+    assert [p.sample_id for p in manager.get_all_profiles("speaker_4999")] == ["19996", "19997", "19998", "19999"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
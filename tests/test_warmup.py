@@ -0,0 +1,129 @@
+# coding=utf-8
+"""
+起動時のウォームアップと torch.compile モード（src.tts.warmup）の単体テスト
+
+実行方法:
+    python -m pytest tests/test_warmup.py -v
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# プロジェクトルートをパスに追加
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import pytest
+import torch
+
+from src.tools.benchmark import run_warmup_benchmark
+from src.tts import ModelRegistry, MultiSpeakerSynthesizer, VoiceCloneManager
+from src.tts.fake_model import make_fake_loader
+from src.tts.qwen_wrapper import Qwen3TTSWrapper
+from src.tts.warmup import WARMUP_TEXTS, compile_model
+from tests.fakes import use_fake_model
+
+
+@pytest.fixture
+def ref(tmp_path: Path) -> str:
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"ref")
+    return str(path)
+
+
+def test_compile_model_targets(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """生成ループのモジュールだけに torch.compile を適用し、キャッシュ先を設定する"""
+    monkeypatch.delenv("TORCHINDUCTOR_CACHE_DIR", raising=False)
+    monkeypatch.delenv("TORCHINDUCTOR_FX_GRAPH_CACHE", raising=False)
+    talker = torch.nn.Module()
+    talker.model = torch.nn.Linear(2, 2)
+    talker.code_predictor = SimpleNamespace(model=torch.nn.Linear(2, 2))
+    speaker_encoder = torch.nn.Linear(2, 2)
+    model = SimpleNamespace(model=SimpleNamespace(talker=talker, speaker_encoder=speaker_encoder))
+
+    compiled = compile_model(model, "default", cache_dir=tmp_path / "cache")
+    assert compiled == ["talker.model", "talker.code_predictor.model"]
+    assert talker.model._compiled_call_impl is not None
+    assert speaker_encoder._compiled_call_impl is None
+    assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == str((tmp_path / "cache").resolve())
+    assert os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"] == "1"
+    assert (tmp_path / "cache").is_dir()
+
+
+def test_invalid_compile_mode(monkeypatch: pytest.MonkeyPatch):
+    """不正な compile_mode は ValueError（モデルはロードしない）"""
+    use_fake_model(monkeypatch)
+    with pytest.raises(ValueError, match="compile_mode"):
+        Qwen3TTSWrapper(device="cpu", dtype=torch.float32, compile_mode="fastest")
+
+
+def test_wrapper_warmup_absorbs_first_call(monkeypatch: pytest.MonkeyPatch, ref):
+    """ウォームアップで初回の遅れとプロンプト作成を済ませる"""
+    use_fake_model(monkeypatch)
+    wrapper = Qwen3TTSWrapper(
+        device="cpu", dtype=torch.float32, model_loader=make_fake_loader(first_call_latency_sec=0.2)
+    )
+    latencies = wrapper.warmup(ref, "参照", "Japanese")
+    assert len(latencies) == len(WARMUP_TEXTS["Japanese"])
+    assert latencies[0] >= 0.2
+    assert [c["text"][0] for c in wrapper._model.generate_calls] == list(WARMUP_TEXTS["Japanese"])
+    assert len(wrapper._model.prompt_calls) == 1
+
+    wrapper.generate_voice("こんにちは", ref, "参照", "Japanese")
+    assert len(wrapper._model.prompt_calls) == 1
+
+
+def test_manager_and_synthesizer_warmup(monkeypatch: pytest.MonkeyPatch, ref, tmp_path: Path):
+    """VoiceCloneManager は自分の参照音声で、MultiSpeakerSynthesizer は全話者でウォームアップする"""
+    use_fake_model(monkeypatch)
+    registry = ModelRegistry()
+    with VoiceCloneManager(ref, "参照", "en", device="cpu", registry=registry) as manager:
+        assert len(manager.warmup(["Hi."])) == 1
+        assert manager.wrapper._model.generate_calls[-1]["language"] == "English"
+
+    other = tmp_path / "other.wav"
+    other.write_bytes(b"other")
+    with MultiSpeakerSynthesizer(device="cpu", registry=registry) as synth:
+        synth.register_speaker("alice", ref, "参照")
+        synth.register_speaker("bob", str(other), "hello", "en")
+        result = synth.warmup()
+        assert set(result) == {"alice", "bob"}
+        assert len(result["bob"]) == len(WARMUP_TEXTS["English"])
+        assert len(synth.wrapper._model.prompt_calls) == 2
+
+
+def test_warmup_benchmark(monkeypatch: pytest.MonkeyPatch, ref):
+    """ウォームアップなしでは初回が遅く、ありでは初回と定常がほぼ同じになる"""
+    use_fake_model(monkeypatch)
+    results = run_warmup_benchmark(
+        ref_audio_path=ref,
+        ref_text="参照",
+        language="Japanese",
+        model_name="fake",
+        device="cpu",
+        dtype=torch.float32,
+        text="おはようございます。",
+        modes=["none", "warmup"],
+        steady_calls=2,
+        model_loader=make_fake_loader(generate_latency_sec=0.01, first_call_latency_sec=0.2),
+    )
+    assert results["none"]["warmup_sec"] == 0.0
+    assert results["none"]["first_call_sec"] >= 0.2
+    assert results["none"]["first_over_steady"] > 5
+    assert results["warmup"]["warmup_sec"] >= 0.2
+    assert results["warmup"]["first_over_steady"] < 3
+
+    with pytest.raises(ValueError):
+        run_warmup_benchmark(
+            ref_audio_path=ref, ref_text="参照", language="Japanese", model_name="fake",
+            device="cpu", dtype=torch.float32, text="a", modes=["turbo"],
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])